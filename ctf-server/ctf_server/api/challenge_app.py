@@ -1,11 +1,95 @@
 """Setup for main challenge app"""
 
+from contextlib import asynccontextmanager
+import math
 import fastapi
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from ctf_server import config
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.storage_factory import (
+    create_async_storage_service,
+    create_storage_service,
+)
+from ctf_server.db.storage_service import StorageThrottledError
+from ctf_server.service.async_flag_service import AsyncFlagService
+from ctf_server.service.flag_cache import create_flag_cache
+from ctf_server.service.flag_key_filter import create_flag_key_filter
+from ctf_server.service.flag_replica import create_flag_replica
+from ctf_server.service.rate_limiter import RateLimiter, create_rate_limiter
+from ctf_server.service.scoreboard import create_scoreboard
+from ctf_server.service.slow_request_log import SlowRequestLog, create_slow_request_log
+from ctf_server.service.submission_log import create_submission_log
 from . import flag_routes
+from .metrics_middleware import MetricsMiddleware
+from .rate_limit_middleware import RateLimitMiddleware
+from .server_timing_middleware import ServerTimingMiddleware, TimedJSONResponse
 
 
-def create_app():
-    """Initialize main app"""
-    app = fastapi.FastAPI()
+def create_app(
+    flag_service: AsyncFlagService = None,
+    rate_limiter: RateLimiter = None,
+    slow_request_log: SlowRequestLog = None,
+):
+    """Initialize main app
+
+    Args:
+        flag_service (AsyncFlagService): service used by routes, by default
+        service working on configured storage is created
+        rate_limiter (RateLimiter): limiter of submission routes, by default
+        it is created from configuration
+        slow_request_log (SlowRequestLog): log of slow requests, Server-Timing
+        header is sent when it is present, by default it is created from
+        configuration
+    """
+    if flag_service is None:
+        submission_log = create_submission_log()
+        flag_service = AsyncFlagService(
+            create_async_storage_service(),
+            PlainInputStoredHashedStrategy(),
+            create_flag_cache(),
+            create_flag_replica(create_storage_service),
+            create_flag_key_filter(),
+            submission_log,
+            create_scoreboard(submission_log),
+        )
+    if rate_limiter is None:
+        rate_limiter = create_rate_limiter()
+    if slow_request_log is None:
+        slow_request_log = create_slow_request_log()
+
+    @asynccontextmanager
+    async def lifespan(app: fastapi.FastAPI):
+        app.state.flag_service.start()
+        yield
+        await app.state.flag_service.close()
+
+    if slow_request_log is not None:
+        app = fastapi.FastAPI(
+            lifespan=lifespan, default_response_class=TimedJSONResponse
+        )
+    else:
+        app = fastapi.FastAPI(lifespan=lifespan)
+    app.state.flag_service = flag_service
+    app.state.rate_limiter = rate_limiter
+    app.state.slow_request_log = slow_request_log
+    if rate_limiter is not None:
+        app.add_middleware(RateLimitMiddleware, rate_limiter=rate_limiter)
+    if config.metrics["enabled"]:
+        app.add_middleware(MetricsMiddleware)
+    if slow_request_log is not None:
+        app.add_middleware(ServerTimingMiddleware, slow_request_log=slow_request_log)
+    app.add_exception_handler(StorageThrottledError, _storage_throttled)
     app.include_router(flag_routes.router)
     return app
+
+
+async def _storage_throttled(
+    request: Request, error: StorageThrottledError
+) -> JSONResponse:
+    """Database kept throttling requests, client should retry later"""
+    return JSONResponse(
+        {"detail": "STORAGE_THROTTLED"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after_seconds)))},
+    )
@@ -1,53 +1,275 @@
 """Flag endpoints"""
 
+from dataclasses import asdict
 import fastapi
-from fastapi import Response, status
+from fastapi import Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from ctf_server import config
+from ctf_server.core.metrics import CONTENT_TYPE, REGISTRY, render_stats
+from ctf_server.db.cosmos_requests import REQUEST_CHARGES
+from ctf_server.db.mongo_client_registry import mongo_pool_stats
 from ctf_server.model.flag import Flag
 from ctf_server.model.state import State
-from ctf_server.db.azure_proxy import AzureProxy
-from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
-from ctf_server.service.flag_service import FlagService
+from ctf_server.service.async_flag_service import AsyncFlagService
+from ctf_server.service.flag_import import (
+    FILE_FORMATS,
+    merge_import_results,
+    parse_flag_file,
+    summarize_import,
+)
+from ctf_server.service.rate_limiter import retry_after_header, trusted_team_id
+from .rate_limit_middleware import acquire_tokens, request_rate_limit_key
 
 router = fastapi.APIRouter()
-flag_service = FlagService(AzureProxy(), PlainInputStoredHashedStrategy())
+
+
+def get_flag_service(request: Request) -> AsyncFlagService:
+    """Flag service assigned to application"""
+    return request.app.state.flag_service
+
+
+def get_team_id(request: Request) -> str | None:
+    """Team id sent in the same header which identifies team for rate limiting,
+    None when the header is not trusted - set by authenticating proxy"""
+    return trusted_team_id(
+        request.headers.get(config.rate_limit["team_header"]),
+        config.rate_limit["trust_team_header"],
+    )
+
+
+def _service_stats(request: Request, flag_service: AsyncFlagService) -> dict:
+    """Counters of flag service and rate limiter, connection pool and
+    request unit counters are present only when process uses given database"""
+    rate_limiter = request.app.state.rate_limiter
+    pool_stats = mongo_pool_stats()
+    return {
+        **flag_service.stats(),
+        "rate_limiter": asdict(rate_limiter.stats()) if rate_limiter else None,
+        "mongo_pool": asdict(pool_stats) if pool_stats.clients else None,
+        "cosmos_requests": REQUEST_CHARGES.stats() or None,
+    }
+
 
 @router.post("/submit-flag", status_code=status.HTTP_200_OK)
-async def submit_flag(flag: Flag, response: Response) -> dict:
+async def submit_flag(
+    flag: Flag,
+    response: Response,
+    team_id: str | None = Depends(get_team_id),
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
     """Handles flag submit"""
-    state = flag_service.submit_flag(flag)
+    state = await flag_service.submit_flag(flag, team_id)
     if state in (State.INVALID_FORMAT, State.INVALID_FLAG):
         response.status_code = status.HTTP_400_BAD_REQUEST
     return {"state": state}
 
+
+@router.post("/submit-flags", status_code=status.HTTP_200_OK)
+async def submit_flags(
+    flags: list[Flag],
+    request: Request,
+    team_id: str | None = Depends(get_team_id),
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
+    """Handles submit of many flags at once, every flag costs one rate limit
+    token"""
+    if len(flags) > config.submission["max_batch_size"]:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="BATCH_TOO_LARGE",
+        )
+    rate_limiter = request.app.state.rate_limiter
+    if rate_limiter is not None and len(flags) > 1:
+        decision = await acquire_tokens(
+            rate_limiter, request_rate_limit_key(request), len(flags) - 1
+        )
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="RATE_LIMITED",
+                headers={"Retry-After": retry_after_header(decision)},
+            )
+    states = await flag_service.submit_flags(flags, team_id)
+    return {"states": states}
+
+
 @router.post("/flag", status_code=status.HTTP_201_CREATED)
-async def create_flag(flag: Flag, response: Response) -> dict:
+async def create_flag(
+    flag: Flag,
+    response: Response,
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
     """Handles flag create"""
 
-    flag = flag_service.create_flag(flag)
+    flag = await flag_service.create_flag(flag)
     if flag is None:
         response.status_code = status.HTTP_400_BAD_REQUEST
-    return {"error": "CREATE_FAILED" } if flag is None else {"flag": flag}
+    return {"error": "CREATE_FAILED"} if flag is None else {"flag": flag}
+
+
+@router.post("/flags/import", status_code=status.HTTP_200_OK)
+async def import_flags(
+    request: Request,
+    file_format: str = "json",
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
+    """Handles bulk import of flags from JSON or CSV file sent as request body"""
+    if file_format not in FILE_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="UNSUPPORTED_FORMAT"
+        )
+    try:
+        rows = parse_flag_file((await request.body()).decode(), file_format)
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="INVALID_FILE"
+        ) from error
+    flags = [row for row in rows if isinstance(row, Flag)]
+    report = merge_import_results(rows, await flag_service.import_flags(flags))
+    return {"summary": summarize_import(report), "results": report}
+
 
 @router.get("/flag/", status_code=status.HTTP_200_OK)
-async def get_flag(challenge_id: str, task_id: str) -> dict:
+async def get_flag(
+    challenge_id: str,
+    task_id: str,
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
     """Handles flag get request"""
-    flag = flag_service.get_flag(challenge_id, task_id)
+    flag = await flag_service.get_flag(challenge_id, task_id)
     return {"flag": flag}
 
+
 @router.get("/flag", status_code=status.HTTP_200_OK)
-async def get_all_flags() -> dict:
+async def get_all_flags(
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
     """Handles flag submit"""
-    flags = flag_service.get_all_flags()
+    flags = await flag_service.get_all_flags()
     return {"flags": flags}
 
+
+@router.get("/flags", status_code=status.HTTP_200_OK)
+async def get_flags_page(
+    page_size: int = Query(
+        default=config.flag_listing["default_page_size"],
+        ge=1,
+        le=config.flag_listing["max_page_size"],
+    ),
+    continuation_token: str = None,
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
+    """Handles paginated flag listing"""
+    try:
+        flag_page = await flag_service.get_flags_page(page_size, continuation_token)
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="INVALID_CONTINUATION_TOKEN"
+        ) from error
+    return {
+        "flags": flag_page.flags,
+        "continuation_token": flag_page.continuation_token,
+    }
+
+
+@router.get("/flags/stream", status_code=status.HTTP_200_OK)
+async def stream_flags(
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> StreamingResponse:
+    """Handles flag listing streamed as newline delimited JSON"""
+
+    async def flag_lines():
+        async for flag in flag_service.iter_all_flags():
+            yield flag.model_dump_json() + "\n"
+
+    return StreamingResponse(flag_lines(), media_type="application/x-ndjson")
+
+
 @router.put("/flag", status_code=status.HTTP_200_OK)
-async def update_flag(flag: Flag) -> dict:
+async def update_flag(
+    flag: Flag, flag_service: AsyncFlagService = Depends(get_flag_service)
+) -> dict:
     """Handles flag update"""
-    flag = flag_service.update_flag(flag)
-    return {"error": "UPDATE_FAILED" } if flag is None else {"flag": flag}
+    flag = await flag_service.update_flag(flag)
+    return {"error": "UPDATE_FAILED"} if flag is None else {"flag": flag}
+
 
 @router.delete("/flag/", status_code=status.HTTP_200_OK)
-async def delete_flag(challenge_id: str, task_id: str) -> dict:
+async def delete_flag(
+    challenge_id: str,
+    task_id: str,
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
     """Handles flag delete"""
-    is_deleted = flag_service.remove_flag(challenge_id, task_id)
+    is_deleted = await flag_service.remove_flag(challenge_id, task_id)
     return {"is_deleted": is_deleted}
+
+
+@router.get("/scoreboard", status_code=status.HTTP_200_OK)
+async def get_scoreboard(
+    top: int = Query(
+        default=config.scoreboard["default_top"],
+        ge=1,
+        le=config.scoreboard["max_top"],
+    ),
+    team_id: str = None,
+    header_team_id: str | None = Depends(get_team_id),
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
+    """Handles scoreboard request, best teams and position of team given in
+    query or in team header"""
+    scoreboard = flag_service.scoreboard
+    if scoreboard is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="SCOREBOARD_DISABLED"
+        )
+    team_id = team_id or header_team_id
+    return {
+        "ready": scoreboard.is_ready,
+        "top": scoreboard.top(top),
+        "team": scoreboard.team_entry(team_id) if team_id else None,
+    }
+
+
+@router.get("/stats", status_code=status.HTTP_200_OK)
+async def get_stats(
+    request: Request,
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> dict:
+    """Counters of flag service, rate limiter, Mongo DB connection pools and
+    Cosmos DB request units"""
+    return _service_stats(request, flag_service)
+
+
+@router.get("/metrics", status_code=status.HTTP_200_OK)
+async def get_metrics(
+    request: Request,
+    flag_service: AsyncFlagService = Depends(get_flag_service),
+) -> Response:
+    """Latency histograms and counters in Prometheus text format, followed
+    by counters of flag service, rate limiter and databases as gauges"""
+    if not config.metrics["enabled"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="METRICS_DISABLED"
+        )
+    stats = _service_stats(request, flag_service)
+    return Response(
+        REGISTRY.render() + render_stats("ctf", stats), media_type=CONTENT_TYPE
+    )
+
+
+@router.get("/admin/slow-requests", status_code=status.HTTP_200_OK)
+async def get_slow_requests(
+    request: Request,
+    limit: int = Query(default=config.server_timing["slow_request_buffer_size"], ge=1),
+) -> dict:
+    """Most recent requests slower than threshold with their time breakdown"""
+    slow_request_log = request.app.state.slow_request_log
+    if slow_request_log is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="SERVER_TIMING_DISABLED"
+        )
+    return {
+        **asdict(slow_request_log.stats()),
+        "requests": slow_request_log.recent(limit),
+    }
@@ -0,0 +1,84 @@
+"""Rate limiting of submission routes"""
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
+from ctf_server import config
+from ctf_server.service.rate_limiter import (
+    RateLimitDecision,
+    RateLimiter,
+    forwarded_client_address,
+    rate_limit_key,
+    retry_after_header,
+)
+
+SUBMISSION_PATHS = frozenset({"/submit-flag", "/submit-flags"})
+
+
+def request_rate_limit_key(
+    request: Request,
+    team_header: str = config.rate_limit["team_header"],
+    trusted_proxy_hops: int = config.rate_limit["trusted_proxy_hops"],
+) -> str:
+    """Identifier of client sending request, see rate_limit_key. Behind
+    reverse proxies client address is read from X-Forwarded-For entry added
+    by the outermost of trusted_proxy_hops proxies"""
+    return rate_limit_key(
+        request.headers.get(team_header),
+        forwarded_client_address(
+            request.headers.get("X-Forwarded-For"),
+            trusted_proxy_hops,
+            request.client.host if request.client else None,
+        ),
+    )
+
+
+async def acquire_tokens(
+    rate_limiter: RateLimiter, key: str, cost: float = 1
+) -> RateLimitDecision:
+    """Take tokens from rate limiter without blocking event loop"""
+    if rate_limiter.is_blocking:
+        return await run_in_threadpool(rate_limiter.acquire, key, cost)
+    return rate_limiter.acquire(key, cost)
+
+
+class RateLimitMiddleware:
+    """Answers 429 with Retry-After to rate limited requests before they
+    reach routes and flag service. Every request costs one token, batch
+    route takes tokens for the rest of its flags once body is parsed"""
+
+    _TEAM_HEADER = config.rate_limit["team_header"]
+    _TRUSTED_PROXY_HOPS = config.rate_limit["trusted_proxy_hops"]
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rate_limiter: RateLimiter,
+        paths: frozenset[str] = SUBMISSION_PATHS,
+        team_header: str = _TEAM_HEADER,
+        trusted_proxy_hops: int = _TRUSTED_PROXY_HOPS,
+    ) -> None:
+        self._app = app
+        self._rate_limiter = rate_limiter
+        self._paths = paths
+        self._team_header = team_header
+        self._trusted_proxy_hops = trusted_proxy_hops
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self._paths:
+            await self._app(scope, receive, send)
+            return
+        key = request_rate_limit_key(
+            Request(scope), self._team_header, self._trusted_proxy_hops
+        )
+        decision = await acquire_tokens(self._rate_limiter, key)
+        if decision.allowed:
+            await self._app(scope, receive, send)
+            return
+        response = JSONResponse(
+            {"detail": "RATE_LIMITED"},
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": retry_after_header(decision)},
+        )
+        await response(scope, receive, send)
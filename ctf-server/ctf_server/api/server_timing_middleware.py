@@ -0,0 +1,95 @@
+"""Per request time breakdown sent in Server-Timing header"""
+
+import time
+from datetime import datetime, timezone
+from typing import Any
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ctf_server.core.request_timing import (
+    finish_request_timing,
+    record_span,
+    start_request_timing,
+)
+from ctf_server.service.slow_request_log import SlowRequest, SlowRequestLog
+from .metrics_middleware import route_template
+
+TOTAL_SPAN = "total"
+SERIALIZE_SPAN = "serialize"
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response adding rendering of its body to serialize span"""
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            record_span(SERIALIZE_SPAN, time.perf_counter() - started)
+
+
+def server_timing_header(spans: dict[str, tuple[float, int]], total: float) -> str:
+    """Server-Timing header value with duration of each span in milliseconds,
+    number of calls is given as description of spans called more than once"""
+    entries = []
+    for name, (seconds, calls) in spans.items():
+        entry = f"{name};dur={seconds * 1000:.3f}"
+        if calls > 1:
+            entry += f';desc="{calls} calls"'
+        entries.append(entry)
+    entries.append(f"{TOTAL_SPAN};dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Collects time spent in validator, crypto, storage calls and response
+    serialization for every request and sends it in Server-Timing header.
+    Spans may overlap, validator time includes crypto time. Requests slower
+    than threshold of slow request log are captured together with breakdown,
+    their duration includes sending of response body.
+    """
+
+    def __init__(self, app: ASGIApp, slow_request_log: SlowRequestLog) -> None:
+        self._app = app
+        self._slow_request_log = slow_request_log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+        timing, token = start_request_timing()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    server_timing_header(timing.spans(), timing.elapsed()),
+                )
+            await send(message)
+
+        try:
+            await self._app(scope, receive, send_with_timing)
+        finally:
+            finish_request_timing(token)
+            duration_ms = timing.elapsed() * 1000
+            if self._slow_request_log.is_slow(duration_ms):
+                self._slow_request_log.capture(
+                    SlowRequest(
+                        timestamp=datetime.now(timezone.utc),
+                        method=scope["method"],
+                        path=scope["path"],
+                        route=route_template(scope),
+                        status=status_code,
+                        duration_ms=duration_ms,
+                        breakdown_ms={
+                            name: seconds * 1000
+                            for name, (seconds, _) in timing.spans().items()
+                        },
+                    )
+                )
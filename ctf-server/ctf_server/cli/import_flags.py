@@ -0,0 +1,69 @@
+"""
+Imports flags from JSON or CSV file and prints per row report.
+
+Usage:
+    python -m ctf_server.cli.import_flags flags.csv --storage mongodb
+"""
+
+import argparse
+import json
+import logging
+from pathlib import Path
+from ctf_server import config
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.storage_factory import STORAGE_BACKENDS, create_storage_service
+from ctf_server.model.flag import Flag
+from ctf_server.service.flag_import import (
+    FILE_FORMATS,
+    merge_import_results,
+    parse_flag_file,
+    summarize_import,
+)
+from ctf_server.service.flag_service import FlagService
+
+
+def main() -> None:
+    """Imports flag file into configured storage"""
+    parser = argparse.ArgumentParser(description="Import flags from JSON or CSV file")
+    parser.add_argument("file", type=Path, help="JSON or CSV file with flags")
+    parser.add_argument(
+        "--format",
+        choices=FILE_FORMATS,
+        help="file format, detected from file extension by default",
+    )
+    parser.add_argument(
+        "--storage", choices=STORAGE_BACKENDS, default=config.storage["backend"]
+    )
+    parser.add_argument(
+        "--report", type=Path, help="write per row JSON report to given file"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    file_format = args.format or args.file.suffix.lstrip(".").lower()
+    rows = parse_flag_file(args.file.read_text(encoding="utf-8"), file_format)
+    flag_service = FlagService(
+        create_storage_service(args.storage), PlainInputStoredHashedStrategy()
+    )
+    flags = [row for row in rows if isinstance(row, Flag)]
+    try:
+        report = merge_import_results(rows, flag_service.import_flags(flags))
+    finally:
+        flag_service.close()
+
+    report_json = json.dumps(
+        {
+            "summary": summarize_import(report),
+            "results": [result.model_dump(mode="json") for result in report],
+        },
+        indent=2,
+    )
+    if args.report is None:
+        print(report_json)
+    else:
+        args.report.write_text(report_json, encoding="utf-8")
+    logging.info("FLAG_IMPORT::%s", summarize_import(report))
+
+
+if __name__ == "__main__":
+    main()
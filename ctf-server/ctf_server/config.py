@@ -1,4 +1,5 @@
 """Configuration file"""
+import json
 import os
 
 azure_connection = {
@@ -14,6 +15,18 @@ azure_connection = {
 azure = {
     "database_id": os.environ.get("COSMOS_DATABASE", "CtfDevelopment"),
     "container_id": os.environ.get("COSMOS_CONTAINER", "Flag"),
+    "deterministic_ids": os.environ.get("COSMOS_DETERMINISTIC_IDS", "false").lower()
+    == "true",
+    "consistency_level": os.environ.get("COSMOS_CONSISTENCY_LEVEL", ""),
+    "preferred_regions": [
+        region.strip()
+        for region in os.environ.get("COSMOS_PREFERRED_REGIONS", "").split(",")
+        if region.strip()
+    ],
+    "throttle_max_retries": int(os.environ.get("COSMOS_THROTTLE_MAX_RETRIES", "9")),
+    "throttle_max_wait_seconds": float(
+        os.environ.get("COSMOS_THROTTLE_MAX_WAIT_SECONDS", "30")
+    ),
 }
 
 mongo = {
@@ -21,5 +34,132 @@ mongo = {
         "MONGODB_CONNECTION_STRING", "mongodb://<user>:<pass>@localhost:<port>"
     ),
     "database_id": os.environ.get("MONGODB_DATABASE", "CtfLocal"),
-    "collection_id": os.environ.get("MONGODB_COLLECTION", "Flag")
+    "collection_id": os.environ.get("MONGODB_COLLECTION", "Flag"),
+    "ensure_indexes": os.environ.get("MONGODB_ENSURE_INDEXES", "true").lower()
+    == "true",
+    "max_pool_size": int(os.environ.get("MONGODB_MAX_POOL_SIZE", "100")),
+    "min_pool_size": int(os.environ.get("MONGODB_MIN_POOL_SIZE", "0")),
+    "wait_queue_timeout_ms": int(os.environ.get("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "0")),
+    "server_selection_timeout_ms": int(
+        os.environ.get("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "30000")
+    ),
+    "compressors": os.environ.get("MONGODB_COMPRESSORS", ""),
+    "read_concern": os.environ.get("MONGODB_READ_CONCERN", ""),
+    "write_concern": os.environ.get("MONGODB_WRITE_CONCERN", ""),
+}
+
+sqlite = {
+    "path": os.environ.get("SQLITE_PATH", "ctf.sqlite3"),
+    "busy_timeout_seconds": float(os.environ.get("SQLITE_BUSY_TIMEOUT_SECONDS", "5")),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "FULL"),
+}
+
+storage = {
+    "backend": os.environ.get("STORAGE_BACKEND", "azure"),
+}
+
+flag_cache = {
+    "enabled": os.environ.get("FLAG_CACHE_ENABLED", "true").lower() == "true",
+    "max_size": int(os.environ.get("FLAG_CACHE_MAX_SIZE", "1024")),
+    "ttl_seconds": float(os.environ.get("FLAG_CACHE_TTL_SECONDS", "60")),
+}
+
+submission = {
+    "max_batch_size": int(os.environ.get("SUBMISSION_MAX_BATCH_SIZE", "100")),
+    "max_flag_length": int(os.environ.get("SUBMISSION_MAX_FLAG_LENGTH", "256")),
+    "max_id_length": int(os.environ.get("SUBMISSION_MAX_ID_LENGTH", "128")),
+}
+
+flag_listing = {
+    "default_page_size": int(os.environ.get("FLAG_LISTING_PAGE_SIZE", "50")),
+    "max_page_size": int(os.environ.get("FLAG_LISTING_MAX_PAGE_SIZE", "500")),
+}
+
+flag_replica = {
+    "enabled": os.environ.get("FLAG_REPLICA_ENABLED", "false").lower() == "true",
+    "poll_interval_seconds": float(
+        os.environ.get("FLAG_REPLICA_POLL_INTERVAL_SECONDS", "1")
+    ),
+    "resync_interval_seconds": float(
+        os.environ.get("FLAG_REPLICA_RESYNC_INTERVAL_SECONDS", "300")
+    ),
+    "retry_delay_seconds": float(
+        os.environ.get("FLAG_REPLICA_RETRY_DELAY_SECONDS", "5")
+    ),
+}
+
+flag_key_filter = {
+    "enabled": os.environ.get("FLAG_KEY_FILTER_ENABLED", "false").lower() == "true",
+    "refresh_seconds": float(os.environ.get("FLAG_KEY_FILTER_REFRESH_SECONDS", "15")),
+    "miss_lookups_per_second": float(
+        os.environ.get("FLAG_KEY_FILTER_MISS_LOOKUPS_PER_SECOND", "5")
+    ),
+}
+
+rate_limit = {
+    "enabled": os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true",
+    "backend": os.environ.get("RATE_LIMIT_BACKEND", "memory"),
+    "team_header": os.environ.get("RATE_LIMIT_TEAM_HEADER", "X-Team-Id"),
+    "trust_team_header": (
+        os.environ.get("RATE_LIMIT_TRUST_TEAM_HEADER", "false").lower() == "true"
+    ),
+    "trusted_proxy_hops": int(os.environ.get("RATE_LIMIT_TRUSTED_PROXY_HOPS", "0")),
+    "team_rate_per_second": float(os.environ.get("RATE_LIMIT_TEAM_RATE", "5")),
+    "team_burst": float(os.environ.get("RATE_LIMIT_TEAM_BURST", "20")),
+    "global_rate_per_second": float(os.environ.get("RATE_LIMIT_GLOBAL_RATE", "200")),
+    "global_burst": float(os.environ.get("RATE_LIMIT_GLOBAL_BURST", "400")),
+    "mongodb_collection": os.environ.get("RATE_LIMIT_MONGODB_COLLECTION", "RateLimit"),
+}
+
+flag_format = {
+    "challenges": json.loads(os.environ.get("FLAG_FORMATS", "{}")),
+}
+
+flag_storage = {
+    "value_format": os.environ.get("FLAG_VALUE_FORMAT", "hex"),
+}
+
+submission_log = {
+    "enabled": os.environ.get("SUBMISSION_LOG_ENABLED", "false").lower() == "true",
+    "backend": os.environ.get("SUBMISSION_LOG_BACKEND", "azure"),
+    "queue_size": int(os.environ.get("SUBMISSION_LOG_QUEUE_SIZE", "10000")),
+    "flush_size": int(os.environ.get("SUBMISSION_LOG_FLUSH_SIZE", "100")),
+    "flush_interval_seconds": float(
+        os.environ.get("SUBMISSION_LOG_FLUSH_INTERVAL_SECONDS", "1")
+    ),
+    "overflow_policy": os.environ.get("SUBMISSION_LOG_OVERFLOW_POLICY", "drop_newest"),
+    "block_timeout_seconds": float(
+        os.environ.get("SUBMISSION_LOG_BLOCK_TIMEOUT_SECONDS", "0.05")
+    ),
+    "file_path": os.environ.get("SUBMISSION_LOG_FILE_PATH", "submissions.jsonl"),
+    "mongodb_collection": os.environ.get(
+        "SUBMISSION_LOG_MONGODB_COLLECTION", "Submission"
+    ),
+    "azure_container": os.environ.get("SUBMISSION_LOG_AZURE_CONTAINER", "Submission"),
+}
+
+scoreboard = {
+    "enabled": os.environ.get("SCOREBOARD_ENABLED", "true").lower() == "true",
+    "default_points": int(os.environ.get("SCOREBOARD_DEFAULT_POINTS", "100")),
+    "challenge_points": json.loads(os.environ.get("SCOREBOARD_CHALLENGE_POINTS", "{}")),
+    "default_top": int(os.environ.get("SCOREBOARD_DEFAULT_TOP", "10")),
+    "max_top": int(os.environ.get("SCOREBOARD_MAX_TOP", "100")),
+    "rebuild_interval_seconds": float(
+        os.environ.get("SCOREBOARD_REBUILD_INTERVAL_SECONDS", "0")
+    ),
+    "retry_delay_seconds": float(os.environ.get("SCOREBOARD_RETRY_DELAY_SECONDS", "5")),
+}
+
+metrics = {
+    "enabled": os.environ.get("METRICS_ENABLED", "true").lower() == "true",
+}
+
+server_timing = {
+    "enabled": os.environ.get("SERVER_TIMING_ENABLED", "false").lower() == "true",
+    "slow_request_threshold_ms": float(
+        os.environ.get("SERVER_TIMING_SLOW_REQUEST_THRESHOLD_MS", "250")
+    ),
+    "slow_request_buffer_size": int(
+        os.environ.get("SERVER_TIMING_SLOW_REQUEST_BUFFER_SIZE", "100")
+    ),
 }
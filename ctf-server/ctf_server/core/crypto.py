@@ -1,6 +1,11 @@
 """MD5 hashing module"""
 
 import hashlib
+import hmac
+import re
+from ctf_server.core.request_timing import timed_span
+
+_MD5_HEX_PATTERN = re.compile(r"[0-9a-f]{32}")
 
 
 class Crypto:
@@ -17,22 +22,64 @@ class Crypto:
         Returns:
             bool: true if both words have the same md5 value
         """
-        return cls.hash_to_md5(provided_word) == cls.hash_to_md5(actual_word)
+        return hmac.compare_digest(
+            cls.digest_md5(provided_word), cls.digest_md5(actual_word)
+        )
 
     @classmethod
-    def compare_word_with_hash(cls, provided_word: str, md5_hash: str) -> bool:
-        """Compares word with md5 value (case sensitive)
+    def compare_word_with_hash(cls, provided_word: str, md5_hash: str | bytes) -> bool:
+        """Compares word with md5 value in constant time (case sensitive)
 
         Args:
             provided_word (str): flag given by user
-            md5_hash (str): stored hash value
+            md5_hash (str | bytes): stored hash value, hex string or raw digest
 
         Returns:
             bool: true provided word hash matches stored md5 hash value
         """
-        return cls.hash_to_md5(provided_word) == md5_hash
+        if isinstance(md5_hash, bytes):
+            return hmac.compare_digest(cls.digest_md5(provided_word), md5_hash)
+        return hmac.compare_digest(
+            cls.hash_to_md5(provided_word).encode(), md5_hash.encode()
+        )
+
+    @classmethod
+    def compare_hashes(cls, provided_hash: str, md5_hash: str | bytes) -> bool:
+        """Compares md5 hex value given by user with stored md5 value in
+        constant time
+
+        Args:
+            provided_hash (str): md5 hex value given by user
+            md5_hash (str | bytes): stored hash value, hex string or raw digest
+
+        Returns:
+            bool: true if both hashes are equal, false when provided value is
+            not md5 hex value
+        """
+        provided_hash = cls.normalize_md5_hex(provided_hash)
+        if provided_hash is None:
+            return False
+        if isinstance(md5_hash, bytes):
+            return hmac.compare_digest(bytes.fromhex(provided_hash), md5_hash)
+        stored_hash = cls.normalize_md5_hex(md5_hash) or ""
+        return hmac.compare_digest(provided_hash.encode(), stored_hash.encode())
+
+    @classmethod
+    def normalize_md5_hex(cls, value: str) -> str | None:
+        """Returns md5 hex value in lowercase, so it compares the same way
+        with hex text and raw digest
+
+        Args:
+            value (str): md5 hex value in any case
+
+        Returns:
+            str | None: lowercase value, None when it is not 32 hex digits
+        """
+        value = value.lower()
+        return value if _MD5_HEX_PATTERN.fullmatch(value) else None
 
     @classmethod
+    @timed_span("crypto")
     def hash_to_md5(cls, word: str) -> str:
         """Returns md5 of given word
 
@@ -43,3 +90,28 @@ class Crypto:
             str: md5 hash of word
         """
         return hashlib.md5(word.encode()).hexdigest()
+
+    @classmethod
+    @timed_span("crypto")
+    def digest_md5(cls, word: str) -> bytes:
+        """Returns raw md5 digest of given word
+
+        Args:
+            word (str): string to hash
+
+        Returns:
+            bytes: 16 bytes of md5 digest
+        """
+        return hashlib.md5(word.encode()).digest()
+
+    @classmethod
+    def to_hex(cls, value: str | bytes) -> str:
+        """Returns stored value as text, raw digests are hex encoded
+
+        Args:
+            value (str | bytes): stored flag value
+
+        Returns:
+            str: value as text
+        """
+        return value.hex() if isinstance(value, bytes) else value
@@ -0,0 +1,142 @@
+"""Flag formats declared per challenge"""
+
+import re
+from functools import lru_cache
+from ctf_server import config
+
+DEFAULT_FLAG_PREFIX = "flag{"
+DEFAULT_FLAG_SUFFIX = "}"
+DEFAULT_FLAG_BODY = r"[a-z0-9_]+"
+
+
+@lru_cache(maxsize=None)
+def _compile(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+class FlagFormat:
+    """
+    Format of flags of single challenge: literal prefix and suffix around
+    body matching pattern. Length, prefix and suffix are checked before
+    the compiled body pattern runs on body alone, so anchors in the pattern
+    refer to body boundaries.
+    """
+
+    def __init__(
+        self,
+        prefix: str = DEFAULT_FLAG_PREFIX,
+        suffix: str = DEFAULT_FLAG_SUFFIX,
+        body_pattern: str = DEFAULT_FLAG_BODY,
+        max_length: int = None,
+    ) -> None:
+        """
+        Args:
+            prefix (str): literal text every flag starts with, may be empty
+            suffix (str): literal text every flag ends with, may be empty
+            body_pattern (str): regular expression matching whole text
+            between prefix and suffix
+            max_length (int): maximal length of whole flag, unlimited when None
+        """
+        self.prefix = prefix
+        self.suffix = suffix
+        self.body_pattern = body_pattern
+        self.max_length = max_length
+        self._min_length = len(prefix) + len(suffix)
+        self._pattern = _compile(body_pattern)
+
+    @classmethod
+    def from_dict(cls, definition: dict) -> "FlagFormat":
+        """Create format from configuration entry with optional keys prefix,
+        suffix, pattern and max_length"""
+        return cls(
+            prefix=definition.get("prefix", DEFAULT_FLAG_PREFIX),
+            suffix=definition.get("suffix", DEFAULT_FLAG_SUFFIX),
+            body_pattern=definition.get("pattern", DEFAULT_FLAG_BODY),
+            max_length=definition.get("max_length"),
+        )
+
+    def matches(self, flag: str) -> bool:
+        """Check whether flag has this format
+
+        Args:
+            flag (str): flag provided by user
+
+        Returns:
+            bool: True if flag matches format
+        """
+        length = len(flag)
+        if length < self._min_length:
+            return False
+        if self.max_length is not None and length > self.max_length:
+            return False
+        if not (flag.startswith(self.prefix) and flag.endswith(self.suffix)):
+            return False
+        body = flag[len(self.prefix) : length - len(self.suffix)]
+        return self._pattern.fullmatch(body) is not None
+
+
+class FlagFormatRegistry:
+    """Keeps flag format of every challenge, challenges which did not declare
+    their own format use default one"""
+
+    def __init__(
+        self,
+        default_format: FlagFormat = None,
+        formats: dict[str, FlagFormat] = None,
+    ) -> None:
+        self._default_format = default_format or FlagFormat()
+        self._formats = dict(formats or {})
+
+    def register(self, challenge_id: str, flag_format: FlagFormat) -> None:
+        """Declare flag format of challenge
+
+        Args:
+            challenge_id (str): challenge id
+            flag_format (FlagFormat): format of all flags of challenge
+        """
+        self._formats[challenge_id] = flag_format
+
+    def get(self, challenge_id: str = None) -> FlagFormat:
+        """Flag format of challenge, default format when challenge has none"""
+        return self._formats.get(challenge_id, self._default_format)
+
+    def is_valid(self, flag: str, challenge_id: str = None) -> bool:
+        """Check flag against format of its challenge
+
+        Args:
+            flag (str): flag provided by user
+            challenge_id (str): flag challenge id, default format is used when None
+
+        Returns:
+            bool: True if flag matches format
+        """
+        return self.get(challenge_id).matches(flag)
+
+    def validate_many(self, flags: list[str], challenge_ids: list[str]) -> list[bool]:
+        """Check many flags at once, format of each challenge is looked up once
+
+        Args:
+            flags (list[str]): flags provided by user
+            challenge_ids (list[str]): challenge id of each flag
+
+        Returns:
+            list[bool]: result of each flag, in the same order as input
+        """
+        formats: dict[str, FlagFormat] = {}
+        results = []
+        for flag, challenge_id in zip(flags, challenge_ids):
+            flag_format = formats.get(challenge_id)
+            if flag_format is None:
+                flag_format = formats[challenge_id] = self.get(challenge_id)
+            results.append(flag_format.matches(flag))
+        return results
+
+
+def create_flag_format_registry() -> FlagFormatRegistry:
+    """Creates registry with challenge formats declared in configuration"""
+    return FlagFormatRegistry(
+        formats={
+            challenge_id: FlagFormat.from_dict(definition)
+            for challenge_id, definition in config.flag_format["challenges"].items()
+        }
+    )
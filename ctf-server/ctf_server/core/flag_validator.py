@@ -6,6 +6,7 @@ from ctf_server.core.flag_validator_strategy import (
     FlagValidatorStrategy,
     PlainInputPlainStoredValueStrategy,
 )
+from ctf_server.core.request_timing import timed_span
 from ctf_server.model.state import State
 
 
@@ -26,19 +27,38 @@ class FlagValidator:
     def strategy(self, strategy: FlagValidatorStrategy) -> None:
         self._strategy = strategy
 
-    def validate_flag_format(self, flag: str) -> bool:
-        """Check whether flag matches valid pattern: flag{hidden_text}
+    @timed_span("validator")
+    def validate_flag_format(self, flag: str, challenge_id: str = None) -> bool:
+        """Check whether flag matches format of its challenge, by default
+        flag{hidden_text}
 
         Args:
             flag (str): flag word provided by user
+            challenge_id (str): flag challenge id, default format is used when None
 
         Returns:
             bool: true if flag matches format
         """
-        # flag_pattern = re.compile(_FLAG_FORMAT)
-        return self.strategy.is_valid_format(flag)
+        return self.strategy.is_valid_format(flag, challenge_id)
 
-    def is_valid_flag(self, flag: str, actual_flag: str) -> State:
+    @timed_span("validator")
+    def validate_flag_formats(
+        self, flags: list[str], challenge_ids: list[str]
+    ) -> list[bool]:
+        """Check formats of many flags in one call
+
+        Args:
+            flags (list[str]): flag words provided by user
+            challenge_ids (list[str]): challenge id of each flag
+
+        Returns:
+            list[bool]: result of each flag, in the same order as input
+        """
+        return self.strategy.are_valid_formats(flags, challenge_ids)
+
+    def is_valid_flag(
+        self, flag: str, actual_flag: str, challenge_id: str = None
+    ) -> State:
         """
         Check whether provided by user flag is valid:
         - is in correct format
@@ -46,14 +66,29 @@ class FlagValidator:
 
         Args:
             flag (Flag): flag word provided by user
+            actual_flag (str): value kept in storage
+            challenge_id (str): flag challenge id
 
         Returns:
             State: validation state
         """
-        is_valid = self.validate_flag_format(flag)
+        is_valid = self.validate_flag_format(flag, challenge_id)
         if not is_valid:
             logging.debug("FLAG_VALIDATOR::Provided flag with invalid format: %s", flag)
             return State.INVALID_FORMAT
+        return self.compare_with_stored_value(flag, actual_flag)
+
+    @timed_span("validator")
+    def compare_with_stored_value(self, flag: str, actual_flag: str) -> State:
+        """Compare flag which format was already validated with stored value
+
+        Args:
+            flag (str): flag word provided by user
+            actual_flag (str): value kept in storage
+
+        Returns:
+            State: VALID_FLAG if flag matches stored value, INVALID_FLAG otherwise
+        """
         is_valid = self.strategy.is_provided_flag_and_stored_value_equal(
             flag, actual_flag
         )
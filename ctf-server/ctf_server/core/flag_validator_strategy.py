@@ -3,29 +3,52 @@
 import re
 from abc import ABC, abstractmethod
 from ctf_server.core.crypto import Crypto
+from ctf_server.core.flag_format_registry import (
+    FlagFormatRegistry,
+    create_flag_format_registry,
+)
 
-_FLAG_FORMAT = r"^flag\{[a-z0-9_]+\}"
+_HEX_PATTERN = re.compile(r"[0-9a-fA-F]+")
 
 
 class FlagValidatorStrategy(ABC):
     """Declares operation for comparision of user input and stored value"""
 
+    def __init__(self, format_registry: FlagFormatRegistry = None) -> None:
+        """
+        Args:
+            format_registry (FlagFormatRegistry): flag formats of challenges,
+            by default formats are taken from configuration
+        """
+        self._format_registry = format_registry or create_flag_format_registry()
+
+    @property
+    def format_registry(self) -> FlagFormatRegistry:
+        """Flag formats of challenges"""
+        return self._format_registry
+
     @abstractmethod
     def is_provided_flag_and_stored_value_equal(
-        self, user_input: str, stored_value: str
+        self, user_input: str, stored_value: str | bytes
     ) -> bool:
         """Compare user input and stored value, based on specific rules"""
 
-    def is_valid_format(self, flag: str) -> bool:
-        """Check whether flag provided by user matches valid format"""
-        return re.fullmatch(_FLAG_FORMAT, flag) is not None
+    def is_valid_format(self, flag: str, challenge_id: str = None) -> bool:
+        """Check whether flag provided by user matches format of its challenge"""
+        return self._format_registry.is_valid(flag, challenge_id)
+
+    def are_valid_formats(
+        self, flags: list[str], challenge_ids: list[str]
+    ) -> list[bool]:
+        """Check formats of many flags at once"""
+        return self._format_registry.validate_many(flags, challenge_ids)
 
 
 class PlainInputStoredHashedStrategy(FlagValidatorStrategy):
     """Handles comparision when user input is plain text and stored value is md5 hash"""
 
     def is_provided_flag_and_stored_value_equal(
-        self, user_input: str, stored_value: str
+        self, user_input: str, stored_value: str | bytes
     ) -> bool:
         return Crypto.compare_word_with_hash(user_input, stored_value)
 
@@ -46,13 +69,14 @@ class HashedInputHashedStoredValueStrategy(FlagValidatorStrategy):
     """Handles comparision when both user input and stored value are md5 hash"""
 
     def is_provided_flag_and_stored_value_equal(
-        self, user_input: str, stored_value: str
+        self, user_input: str, stored_value: str | bytes
     ) -> bool:
-        return user_input == stored_value
-
-    def is_valid_format(self, flag: str) -> bool:
-        try:
-            int(flag, 16)
-            return True
-        except ValueError:
-            return False
+        return Crypto.compare_hashes(user_input, stored_value)
+
+    def is_valid_format(self, flag: str, challenge_id: str = None) -> bool:
+        return _HEX_PATTERN.fullmatch(flag) is not None
+
+    def are_valid_formats(
+        self, flags: list[str], challenge_ids: list[str]
+    ) -> list[bool]:
+        return [_HEX_PATTERN.fullmatch(flag) is not None for flag in flags]
@@ -0,0 +1,305 @@
+"""Counters and latency histograms exposed in Prometheus text format"""
+
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from typing import Callable, Iterable
+from ctf_server import config
+
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if isinstance(value, bool):
+        return str(int(value))
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with one value per combination of label values"""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        """Add amount to counter of given label values"""
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        """Current value, 0 for label values never counted"""
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def render(self) -> list[str]:
+        """Lines of Prometheus text format"""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ] + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in values
+        ]
+
+
+class Histogram:
+    """
+    Distribution of observed values with one set of buckets per combination
+    of label values. Observation increments single bucket, buckets are made
+    cumulative only when rendered.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Record single value for given label values"""
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self._buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        """Number of observations of given label values"""
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return series[-1] if series is not None else 0
+
+    def render(self) -> list[str]:
+        """Lines of Prometheus text format"""
+        with self._lock:
+            series = sorted(
+                (labels, list(values)) for labels, values in self._series.items()
+            )
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, values in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets + (math.inf,), values):
+                cumulative += bucket_count
+                bucket_labels = _labels(
+                    self.labelnames, labels, f'le="{_number(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(values[-2])}")
+            lines.append(f"{self.name}_count{label_text} {values[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Keeps metrics of the process and renders them together"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> Counter:
+        """Register new counter"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Register new histogram"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in Prometheus text format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+def render_stats(prefix: str, stats: dict) -> str:
+    """
+    Numeric values of nested stats dict as gauges in Prometheus text format,
+    e.g. {"flag_cache": {"hits": 3}} becomes <prefix>_flag_cache_hits 3.
+    Booleans are rendered as 0 or 1, other values and None are left out.
+
+    Args:
+        prefix (str): prefix of gauge names
+        stats (dict): counters collected from components
+
+    Returns:
+        str: gauge lines
+    """
+    lines = []
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            lines.append(render_stats(name, value))
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f"# TYPE {name} gauge\n{name} {_number(value)}\n")
+    return "".join(lines)
+
+
+REGISTRY = MetricsRegistry()
+FLAG_SERVICE_SECONDS = REGISTRY.histogram(
+    "ctf_flag_service_seconds",
+    "Latency of flag service operations",
+    ("operation",),
+)
+STORAGE_SECONDS = REGISTRY.histogram(
+    "ctf_storage_operation_seconds",
+    "Latency of storage calls, count is the number of storage round trips",
+    ("backend", "operation"),
+)
+STORAGE_ERRORS = REGISTRY.counter(
+    "ctf_storage_errors_total",
+    "Storage calls which raised an error",
+    ("backend", "operation"),
+)
+SUBMISSIONS = REGISTRY.counter(
+    "ctf_submissions_total",
+    "Submitted flags by resulting state",
+    ("state",),
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "ctf_http_request_seconds",
+    "Latency of HTTP requests by route template",
+    ("method", "route", "status"),
+)
+
+
+def timed(histogram: Histogram, *labelvalues: str) -> Callable:
+    """
+    Decorator recording duration of every call of function, coroutine,
+    generator or asynchronous generator in histogram, including calls which
+    raise. Generators are timed from the first to the last item. Function is
+    returned unchanged when metrics are disabled.
+
+    Args:
+        histogram (Histogram): histogram of durations
+        labelvalues (str): label values of recorded durations
+    """
+
+    def decorator(function: Callable) -> Callable:
+        if not config.metrics["enabled"]:
+            return function
+        if inspect.isasyncgenfunction(function):
+
+            @functools.wraps(function)
+            async def async_generator_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    async for item in function(*args, **kwargs):
+                        yield item
+                finally:
+                    histogram.observe(time.perf_counter() - started, *labelvalues)
+
+            return async_generator_wrapper
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def coroutine_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started, *labelvalues)
+
+            return coroutine_wrapper
+        if inspect.isgeneratorfunction(function):
+
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    yield from function(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started, *labelvalues)
+
+            return generator_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *labelvalues)
+
+        return wrapper
+
+    return decorator
+
+
+def count_states(states: Iterable) -> None:
+    """Count outcome of every submitted flag"""
+    if not config.metrics["enabled"]:
+        return
+    for state in states:
+        SUBMISSIONS.inc(state.value)
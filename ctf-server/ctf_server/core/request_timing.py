@@ -0,0 +1,79 @@
+"""Breakdown of time spent by single request in named spans"""
+
+import functools
+import time
+from contextvars import ContextVar, Token
+from typing import Callable
+
+
+class RequestTiming:
+    """Total duration and call count of every span of one request. Spans
+    may be nested, e.g. validator span includes crypto span"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._spans: dict[str, list] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add duration of single call of span"""
+        span = self._spans.get(name)
+        if span is None:
+            self._spans[name] = [seconds, 1]
+        else:
+            span[0] += seconds
+            span[1] += 1
+
+    def elapsed(self) -> float:
+        """Seconds since request started"""
+        return time.perf_counter() - self.started
+
+    def spans(self) -> dict[str, tuple[float, int]]:
+        """Duration in seconds and call count of each span, in order of the
+        first call"""
+        return {name: (span[0], span[1]) for name, span in list(self._spans.items())}
+
+
+_current_timing: ContextVar[RequestTiming | None] = ContextVar(
+    "request_timing", default=None
+)
+
+
+def start_request_timing() -> tuple[RequestTiming, Token]:
+    """Start collecting spans of request handled in current context, token
+    is passed to finish_request_timing"""
+    timing = RequestTiming()
+    return timing, _current_timing.set(timing)
+
+
+def finish_request_timing(token: Token) -> None:
+    """Stop collecting spans of request"""
+    _current_timing.reset(token)
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Add span to request handled in current context, does nothing outside
+    of timed request"""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+def timed_span(name: str) -> Callable:
+    """Decorator adding every call of function to span of current request,
+    outside of timed request function is called without measuring time"""
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            timing = _current_timing.get()
+            if timing is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timing.add(name, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
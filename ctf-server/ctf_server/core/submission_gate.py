@@ -0,0 +1,145 @@
+"""Checks of submitted flags which run before stored flag is read"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from ctf_server import config
+from ctf_server.core.flag_validator import FlagValidator
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+
+
+@dataclass
+class SubmissionGateStats:
+    """Snapshot of submission gate counters, rejects are counted per stage"""
+
+    accepted: int
+    rejected_size: int
+    rejected_charset: int
+    rejected_format: int
+
+
+class SubmissionGate:
+    """
+    Staged validation of submitted flags, cheapest stage first:
+    1. size - value and ids longer than configured limits
+    2. charset - value which is not printable ASCII
+    3. format - precompiled format check of validator strategy
+    Only flags passing every stage should be looked up in storage.
+    """
+
+    _MAX_FLAG_LENGTH = config.submission["max_flag_length"]
+    _MAX_ID_LENGTH = config.submission["max_id_length"]
+
+    def __init__(
+        self,
+        flag_validator: FlagValidator,
+        max_flag_length: int = _MAX_FLAG_LENGTH,
+        max_id_length: int = _MAX_ID_LENGTH,
+    ) -> None:
+        self._flag_validator = flag_validator
+        self._max_flag_length = max_flag_length
+        self._max_id_length = max_id_length
+        self._lock = threading.Lock()
+        self._accepted = 0
+        self._rejected = {"size": 0, "charset": 0, "format": 0}
+
+    def check(self, flag: Flag) -> State:
+        """Run every stage on submitted flag
+
+        Args:
+            flag (Flag): flag provided by user
+
+        Returns:
+            State: INVALID_FORMAT or INVALID_FLAG when flag is rejected,
+            None when flag should be compared with stored value
+        """
+        state = self._check_input(flag)
+        if state is not None:
+            return state
+        if not self._flag_validator.validate_flag_format(flag.value, flag.challenge_id):
+            self._count_reject("format")
+            return State.INVALID_FORMAT
+        self._count_accepted(1)
+        return None
+
+    def check_many(self, flags: list[Flag]) -> list[State]:
+        """Run every stage on many submitted flags, formats of flags which
+        passed size and charset stages are checked in one validator call
+
+        Args:
+            flags (list[Flag]): flags provided by user
+
+        Returns:
+            list[State]: state of each rejected flag and None for accepted
+            ones, in the same order as input
+        """
+        states = [self._check_input(flag) for flag in flags]
+        indexes = [index for index, state in enumerate(states) if state is None]
+        valid_formats = self._flag_validator.validate_flag_formats(
+            [flags[index].value for index in indexes],
+            [flags[index].challenge_id for index in indexes],
+        )
+        accepted = 0
+        for index, is_valid_format in zip(indexes, valid_formats):
+            if is_valid_format:
+                accepted += 1
+            else:
+                self._count_reject("format")
+                states[index] = State.INVALID_FORMAT
+        self._count_accepted(accepted)
+        return states
+
+    def check_stored(self, flag: Flag) -> State:
+        """Run size and charset stages on flag which is about to be stored,
+        flag failing them would be rejected at every submission. Rejects are
+        not counted as they are not submissions
+
+        Args:
+            flag (Flag): flag created, updated or imported by admin
+
+        Returns:
+            State: state submission of this flag would get, None when flag
+            can be submitted
+        """
+        reject = self._reject_input(flag)
+        return reject[1] if reject else None
+
+    def _check_input(self, flag: Flag) -> State:
+        reject = self._reject_input(flag)
+        if reject is None:
+            return None
+        stage, state = reject
+        self._count_reject(stage)
+        return state
+
+    def _reject_input(self, flag: Flag) -> tuple[str, State] | None:
+        if (
+            len(flag.challenge_id) > self._max_id_length
+            or len(flag.task_id) > self._max_id_length
+        ):
+            return "size", State.INVALID_FLAG
+        if len(flag.value) > self._max_flag_length:
+            return "size", State.INVALID_FORMAT
+        if not (flag.value.isascii() and flag.value.isprintable()):
+            return "charset", State.INVALID_FORMAT
+        return None
+
+    def stats(self) -> SubmissionGateStats:
+        """Current gate counters"""
+        with self._lock:
+            return SubmissionGateStats(
+                accepted=self._accepted,
+                rejected_size=self._rejected["size"],
+                rejected_charset=self._rejected["charset"],
+                rejected_format=self._rejected["format"],
+            )
+
+    def _count_accepted(self, count: int) -> None:
+        with self._lock:
+            self._accepted += count
+
+    def _count_reject(self, stage: str) -> None:
+        logging.debug("SUBMISSION_GATE::Flag rejected at %s stage", stage)
+        with self._lock:
+            self._rejected[stage] += 1
@@ -0,0 +1,493 @@
+"""Asynchronous proxy for Azure Cosmo DB"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Callable
+from azure.cosmos.aio import CosmosClient, ContainerProxy, DatabaseProxy
+import azure.cosmos.exceptions as exceptions
+from azure.core import MatchConditions
+from azure.cosmos.partition_key import PartitionKey
+import ctf_server.config as config
+from ctf_server.db.async_storage_service import AsyncStorageService
+from ctf_server.db.bulk_write import (
+    COSMOS_BATCH_LIMIT,
+    chunked,
+    group_new_flags_by_challenge,
+)
+from ctf_server.db.cosmos_requests import CosmosRequests, cosmos_client_options
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.dto.flag_documents import (
+    COSMOS_FLAG_UNIQUE_KEY_POLICY,
+    cosmos_flag_id,
+    cosmos_item_to_flag_dto,
+    flag_dto_to_cosmos_item,
+    has_cosmos_flag_unique_key,
+    unique_flags_per_task,
+)
+from ctf_server.model.flag_import import ImportStatus
+
+
+class AsyncAzureProxy(AsyncStorageService):
+    """Handles connection and working with Azure Cosmos DB using asyncio client"""
+
+    _HOST = config.azure_connection["host"]
+    _MASTER_KEY = config.azure_connection["master_key"]
+    _DATABASE_ID = config.azure["database_id"]
+    _CONTAINER_ID = config.azure["container_id"]
+    _DETERMINISTIC_IDS = config.azure["deterministic_ids"]
+    _UPDATE_ATTEMPTS = 3
+    _PAGE_SIZE = config.flag_listing["default_page_size"]
+
+    def __init__(self, deterministic_ids: bool = _DETERMINISTIC_IDS) -> None:
+        """
+        Args:
+            deterministic_ids (bool): when enabled item id is derived from
+            challenge and task ids, so flags are read with point reads instead
+            of queries
+        """
+        self._deterministic_ids = deterministic_ids
+        self._requests = CosmosRequests()
+        self._client: CosmosClient = None
+        self._container: ContainerProxy = None
+        self._unique_key = False
+        self._connect_lock = asyncio.Lock()
+
+    async def _get_container(self) -> ContainerProxy:
+        if self._container is not None:
+            return self._container
+        async with self._connect_lock:
+            if self._container is None:
+                self._client = self._get_client()
+                database = await self._get_or_create_database()
+                container = await self._get_or_create_container(database)
+                self._unique_key = await self._has_unique_key(container)
+                self._container = container
+                logging.info("ASYNC_AZURE_PROXY::Database connection ready")
+        return self._container
+
+    def _get_client(self) -> CosmosClient:
+        return CosmosClient(
+            self._HOST,
+            {"masterKey": self._MASTER_KEY},
+            user_agent="CosmosDBPythonQuickstart",
+            user_agent_overwrite=True,
+            **cosmos_client_options(),
+        )
+
+    async def _has_unique_key(self, container: ContainerProxy) -> bool:
+        properties = await self._requests.call_async("read_container", container.read)
+        if has_cosmos_flag_unique_key(properties):
+            return True
+        logging.warning(
+            "ASYNC_AZURE_PROXY::Container with id=%s has no unique key on task id, "
+            "flags are looked up before create",
+            self._CONTAINER_ID,
+        )
+        return False
+
+    async def _get_or_create_database(self) -> DatabaseProxy:
+        try:
+            db = await self._requests.call_async(
+                "create_database", self._client.create_database, id=self._DATABASE_ID
+            )
+            logging.debug(
+                "ASYNC_AZURE_PROXY::Database with id=%s not found, creating new database",
+                self._DATABASE_ID,
+            )
+        except exceptions.CosmosResourceExistsError:
+            db = self._client.get_database_client(self._DATABASE_ID)
+            logging.debug(
+                "ASYNC_AZURE_PROXY::Database with id=%s found", self._DATABASE_ID
+            )
+        return db
+
+    async def _get_or_create_container(self, database: DatabaseProxy) -> ContainerProxy:
+        try:
+            container = await self._requests.call_async(
+                "create_container",
+                database.create_container,
+                self._CONTAINER_ID,
+                partition_key=PartitionKey(path="/partitionKey"),
+                unique_key_policy=COSMOS_FLAG_UNIQUE_KEY_POLICY,
+            )
+            logging.debug(
+                "ASYNC_AZURE_PROXY::Container with id=%s not found, creating new container",
+                self._CONTAINER_ID,
+            )
+        except exceptions.CosmosResourceExistsError:
+            container = database.get_container_client(self._CONTAINER_ID)
+            logging.debug(
+                "ASYNC_AZURE_PROXY::Container with id=%s found", self._CONTAINER_ID
+            )
+        return container
+
+    async def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get flag from storage based on task and challenge ids"""
+        container = await self._get_container()
+        if self._deterministic_ids:
+            return await self._read_flag(container, challenge_id, task_id)
+        matching_flags = await self._query_flag_items(
+            container, "get_flag", challenge_id, task_id
+        )
+        if not matching_flags:
+            logging.debug(
+                "ASYNC_AZURE_PROXY::Flag not found [challenge_id=%s, task_id=%s]",
+                challenge_id,
+                task_id,
+            )
+            return None
+        if len(matching_flags) != 1:
+            logging.error(
+                "ASYNC_AZURE_PROXY::Count flags matching query: %d", len(matching_flags)
+            )
+            return None
+        logging.debug("ASYNC_AZURE_PROXY::Flag successfully read from DB")
+        return cosmos_item_to_flag_dto(matching_flags[0])
+
+    async def _query_flag_items(
+        self, container: ContainerProxy, operation: str, challenge_id: str, task_id: str
+    ) -> list[dict]:
+        return await self._requests.call_async(
+            operation,
+            container.query_items,
+            query="""
+                SELECT *
+                FROM record
+                WHERE record.partitionKey=@challenge_id AND record.task_id=@task_id
+            """,
+            parameters=[
+                {"name": "@challenge_id", "value": challenge_id},
+                {"name": "@task_id", "value": task_id},
+            ],
+            partition_key=challenge_id,
+        )
+
+    async def _read_flag(
+        self, container: ContainerProxy, challenge_id: str, task_id: str
+    ) -> FlagDto:
+        try:
+            flag = await self._requests.call_async(
+                "get_flag",
+                container.read_item,
+                item=cosmos_flag_id(challenge_id, task_id),
+                partition_key=challenge_id,
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            logging.debug(
+                "ASYNC_AZURE_PROXY::Flag not found [challenge_id=%s, task_id=%s]",
+                challenge_id,
+                task_id,
+            )
+            return None
+        logging.debug("ASYNC_AZURE_PROXY::Flag successfully read from DB")
+        return cosmos_item_to_flag_dto(flag)
+
+    async def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge with single partition query"""
+        container = await self._get_container()
+        matching_flags = await self._requests.call_async(
+            "get_flags",
+            container.query_items,
+            query="""
+                SELECT *
+                FROM record
+                WHERE record.partitionKey=@challenge_id
+                    AND ARRAY_CONTAINS(@task_ids, record.task_id)
+            """,
+            parameters=[
+                {"name": "@challenge_id", "value": challenge_id},
+                {"name": "@task_ids", "value": list(task_ids)},
+            ],
+            partition_key=challenge_id,
+        )
+        flag_dtos = unique_flags_per_task(
+            cosmos_item_to_flag_dto(flag) for flag in matching_flags
+        )
+        logging.debug(
+            "ASYNC_AZURE_PROXY::Flags of challenge_id=%s read from DB count = %d",
+            challenge_id,
+            len(flag_dtos),
+        )
+        return flag_dtos
+
+    async def get_all_flags(self) -> list[FlagDto]:
+        """Get all flags from storage"""
+        flags_dtos = [flag async for flag in self.iter_all_flags()]
+        logging.debug(
+            "ASYNC_AZURE_PROXY::Group of flag retireved from DB size = %d",
+            len(flags_dtos),
+        )
+        return flags_dtos
+
+    async def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags using Cosmos continuation token"""
+        try:
+            return await self._read_page(
+                "get_flags_page", page_size, continuation_token
+            )
+        except exceptions.CosmosHttpResponseError as error:
+            if error.status_code == 400:
+                raise ValueError("Invalid continuation token") from error
+            raise
+
+    async def iter_all_flags(self) -> AsyncIterator[FlagDto]:
+        """Iterate over all flags page by page, every page is retried on its
+        own when throttled"""
+        continuation_token = None
+        while True:
+            page = await self._read_page(
+                "iter_all_flags", self._PAGE_SIZE, continuation_token
+            )
+            for flag in page.flags:
+                yield flag
+            if page.continuation_token is None:
+                return
+            continuation_token = page.continuation_token
+
+    async def _read_page(
+        self, operation: str, page_size: int, continuation_token: str
+    ) -> FlagPageDto:
+        container = await self._get_container()
+        items, continuation_token = await self._requests.call_async(
+            operation, self._fetch_page, container, page_size, continuation_token
+        )
+        flags = [cosmos_item_to_flag_dto(flag) for flag in items]
+        logging.debug(
+            "ASYNC_AZURE_PROXY::Page of flags read from DB size = %d", len(flags)
+        )
+        return FlagPageDto(flags=flags, continuation_token=continuation_token)
+
+    async def _fetch_page(
+        self,
+        container: ContainerProxy,
+        page_size: int,
+        continuation_token: str,
+        response_hook: Callable,
+    ) -> tuple[list[dict], str]:
+        pages = container.read_all_items(
+            max_item_count=page_size, response_hook=response_hook
+        ).by_page(continuation_token)
+        try:
+            items = [item async for item in await anext(pages)]
+        except StopAsyncIteration:
+            items = []
+        return items, pages.continuation_token
+
+    async def create_flag(self, flag: FlagDto) -> FlagDto:
+        """
+        Create flag for task and challenge. Item id is derived from challenge
+        and task ids, so concurrent creates of the same flag conflict. Flag
+        stored under legacy id is rejected by unique key on task id, or by
+        query before create when container has no unique key.
+        """
+        container = await self._get_container()
+        flag.id = cosmos_flag_id(flag.challenge_id, flag.task_id)
+        if (
+            not self._deterministic_ids
+            and not self._unique_key
+            and await self._query_flag_items(
+                container, "create_flag", flag.challenge_id, flag.task_id
+            )
+        ):
+            self._log_existing_flag(flag)
+            return None
+        try:
+            saved_flag = await self._requests.call_async(
+                "create_flag",
+                container.create_item,
+                body=flag_dto_to_cosmos_item(flag),
+            )
+        except exceptions.CosmosResourceExistsError:
+            self._log_existing_flag(flag)
+            return None
+        logging.debug("ASYNC_AZURE_PROXY::Flag saved correctly id=%s", saved_flag["id"])
+        return cosmos_item_to_flag_dto(saved_flag)
+
+    @staticmethod
+    def _log_existing_flag(flag: FlagDto) -> None:
+        logging.error(
+            "ASYNC_AZURE_PROXY::Flag already exists [challenge_id=%s, task_id=%s]",
+            flag.challenge_id,
+            flag.task_id,
+        )
+
+    async def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """
+        Create many flags with transactional batches, one batch per chunk of
+        flags of the same challenge. When batch fails its flags are created one
+        by one to find out which of them already exist.
+        """
+        container = await self._get_container()
+        statuses, indexes_by_challenge = group_new_flags_by_challenge(flags)
+        for challenge_id, indexes in indexes_by_challenge.items():
+            existing_task_ids = await self._existing_task_ids(
+                container, challenge_id, [flags[index].task_id for index in indexes]
+            )
+            new_indexes = []
+            for index in indexes:
+                if flags[index].task_id in existing_task_ids:
+                    statuses[index] = ImportStatus.DUPLICATE
+                else:
+                    flags[index].id = cosmos_flag_id(challenge_id, flags[index].task_id)
+                    new_indexes.append(index)
+            for chunk in chunked(new_indexes, COSMOS_BATCH_LIMIT):
+                await self._create_flags_batch(
+                    container, challenge_id, flags, chunk, statuses
+                )
+        logging.debug("ASYNC_AZURE_PROXY::Bulk create of %d flags finished", len(flags))
+        return statuses
+
+    async def _existing_task_ids(
+        self, container: ContainerProxy, challenge_id: str, task_ids: list[str]
+    ) -> set[str]:
+        if self._deterministic_ids:
+            return set()
+        return set(
+            await self._requests.call_async(
+                "create_flags",
+                container.query_items,
+                query="""
+                    SELECT VALUE record.task_id
+                    FROM record
+                    WHERE record.partitionKey=@challenge_id
+                        AND ARRAY_CONTAINS(@task_ids, record.task_id)
+                """,
+                parameters=[
+                    {"name": "@challenge_id", "value": challenge_id},
+                    {"name": "@task_ids", "value": task_ids},
+                ],
+                partition_key=challenge_id,
+            )
+        )
+
+    async def _create_flags_batch(
+        self,
+        container: ContainerProxy,
+        challenge_id: str,
+        flags: list[FlagDto],
+        indexes: list[int],
+        statuses: list[ImportStatus],
+    ) -> None:
+        try:
+            await self._requests.call_async(
+                "create_flags",
+                container.execute_item_batch,
+                [
+                    ("create", (flag_dto_to_cosmos_item(flags[index]),))
+                    for index in indexes
+                ],
+                partition_key=challenge_id,
+            )
+            for index in indexes:
+                statuses[index] = ImportStatus.CREATED
+            return
+        except exceptions.CosmosBatchOperationError:
+            logging.debug(
+                "ASYNC_AZURE_PROXY::Batch for challenge_id=%s failed, creating flags one by one",
+                challenge_id,
+            )
+        for index in indexes:
+            try:
+                await self._requests.call_async(
+                    "create_flags",
+                    container.create_item,
+                    body=flag_dto_to_cosmos_item(flags[index]),
+                )
+                statuses[index] = ImportStatus.CREATED
+            except exceptions.CosmosResourceExistsError:
+                statuses[index] = ImportStatus.DUPLICATE
+            except exceptions.CosmosHttpResponseError:
+                logging.exception(
+                    "ASYNC_AZURE_PROXY::Could not create flag id=%s", flags[index].id
+                )
+                statuses[index] = ImportStatus.ERROR
+
+    async def update_flag(self, flag: FlagDto) -> FlagDto:
+        """
+        Replace flag item of challenge and task. With deterministic ids item is
+        replaced directly by its id with single request. Otherwise item is
+        found by query and replaced only when its ETag did not change since,
+        replace is tried again when other writer changed item in between.
+        """
+        container = await self._get_container()
+        if self._deterministic_ids:
+            flag.id = cosmos_flag_id(flag.challenge_id, flag.task_id)
+            return await self._replace_flag(container, flag)
+        for _ in range(self._UPDATE_ATTEMPTS):
+            matching_flags = await self._query_flag_items(
+                container, "update_flag", flag.challenge_id, flag.task_id
+            )
+            if len(matching_flags) != 1:
+                logging.error(
+                    "ASYNC_AZURE_PROXY::Count flags to update: %d", len(matching_flags)
+                )
+                return None
+            flag.id = matching_flags[0]["id"]
+            try:
+                return await self._replace_flag(
+                    container, flag, matching_flags[0]["_etag"]
+                )
+            except exceptions.CosmosAccessConditionFailedError:
+                logging.debug(
+                    "ASYNC_AZURE_PROXY::Flag with id=%s changed, retrying", flag.id
+                )
+        logging.error("ASYNC_AZURE_PROXY::Flag with id=%s kept changing", flag.id)
+        return None
+
+    async def _replace_flag(
+        self, container: ContainerProxy, flag: FlagDto, etag: str = None
+    ) -> FlagDto:
+        condition = {}
+        if etag is not None:
+            condition = {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+        try:
+            updated_flag = await self._requests.call_async(
+                "update_flag",
+                container.replace_item,
+                item=flag.id,
+                body=flag_dto_to_cosmos_item(flag),
+                **condition,
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            logging.error(
+                "ASYNC_AZURE_PROXY::Flag with id=%s to update not found", flag.id
+            )
+            return None
+        logging.debug(
+            "ASYNC_AZURE_PROXY::Flag with id=%s updated successfully",
+            updated_flag["id"],
+        )
+        return cosmos_item_to_flag_dto(updated_flag)
+
+    async def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        """Delete flag based on challenge and task ids"""
+        container = await self._get_container()
+        try:
+            await self._requests.call_async(
+                "delete_flag",
+                container.delete_item,
+                item=flag_id,
+                partition_key=challenge_id,
+            )
+            logging.debug(
+                "ASYNC_AZURE_PROXY::Flag with id=%s successfully deleted", flag_id
+            )
+            return True
+        except (
+            exceptions.CosmosResourceNotFoundError,
+            exceptions.CosmosHttpResponseError,
+        ):
+            logging.error(
+                "ASYNC_AZURE_PROXY::Could not delete flag with id=%s", flag_id
+            )
+            return False
+
+    async def close(self) -> None:
+        """Close Cosmos client and its connection pool"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            self._container = None
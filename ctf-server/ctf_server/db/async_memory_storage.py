@@ -0,0 +1,65 @@
+"""Asynchronous storage keeping flags in process memory"""
+
+from typing import AsyncIterator
+from ctf_server.db.async_storage_service import AsyncStorageService
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.memory_storage import InMemoryStorage
+from ctf_server.model.flag_import import ImportStatus
+
+
+class AsyncInMemoryStorage(AsyncStorageService):
+    """Coroutines over in-memory storage. Operations only hold storage lock
+    for dict lookups, so they are called directly on event loop"""
+
+    def __init__(self, storage: InMemoryStorage = None) -> None:
+        """
+        Args:
+            storage (InMemoryStorage): storage to share with synchronous
+            users, new empty storage is created when None
+        """
+        self._storage = storage if storage is not None else InMemoryStorage()
+
+    @property
+    def storage(self) -> InMemoryStorage:
+        """Synchronous storage keeping flags"""
+        return self._storage
+
+    async def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get flag from storage based on task and challenge ids"""
+        return self._storage.get_flag(challenge_id, task_id)
+
+    async def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge"""
+        return self._storage.get_flags(challenge_id, task_ids)
+
+    async def get_all_flags(self) -> list[FlagDto]:
+        """Get all flags from storage"""
+        return self._storage.get_all_flags()
+
+    async def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags ordered by flag id"""
+        return self._storage.get_flags_page(page_size, continuation_token)
+
+    async def iter_all_flags(self) -> AsyncIterator[FlagDto]:
+        """Iterate over all flags in id order"""
+        for flag in self._storage.iter_all_flags():
+            yield flag
+
+    async def create_flag(self, flag: FlagDto) -> FlagDto:
+        """Create flag for task and challenge, flag gets new id"""
+        return self._storage.create_flag(flag)
+
+    async def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """Create many flags, flags of tasks which already have flag are duplicates"""
+        return self._storage.create_flags(flags)
+
+    async def update_flag(self, flag: FlagDto) -> FlagDto:
+        """Update flag value based on challenge and task ids"""
+        return self._storage.update_flag(flag)
+
+    async def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        """Delete flag based on challenge and flag ids"""
+        return self._storage.delete_flag(challenge_id, flag_id)
@@ -0,0 +1,318 @@
+"""Asynchronous proxy for Mongo DB"""
+
+import asyncio
+import logging
+from typing import AsyncIterator
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from ctf_server import config
+from ctf_server.db.async_storage_service import AsyncStorageService
+from ctf_server.db.bulk_write import (
+    MONGO_DUPLICATE_KEY_ERROR,
+    mongo_bulk_insert_statuses,
+    split_stored_flags,
+)
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.dto.flag_documents import (
+    MONGO_FLAG_INDEX_KEYS,
+    MONGO_FLAG_INDEX_NAME,
+    MONGO_FLAG_PROJECTION,
+    flag_dto_to_mongo_document,
+    has_mongo_flag_index,
+    mongo_document_to_flag_dto,
+    mongo_documents_to_page,
+    mongo_flag_keys_query,
+    mongo_flag_value_update,
+    mongo_page_query,
+    unique_flags_per_task,
+)
+from ctf_server.db.mongo_client_registry import (
+    acquire_async_mongo_client,
+    release_mongo_client,
+)
+from ctf_server.model.flag_import import ImportStatus
+
+
+class AsyncMongodbProxy(AsyncStorageService):
+    """Handles connection and flag management in Mongo DB using motor client"""
+
+    _CONNECTION_STRING = config.mongo["connection_string"]
+    _DATABASE_ID = config.mongo["database_id"]
+    _COLLECTION_ID = config.mongo["collection_id"]
+    _ENSURE_INDEXES = config.mongo["ensure_indexes"]
+    _PAGE_SIZE = config.flag_listing["default_page_size"]
+
+    def __init__(
+        self,
+        connection_string: str = _CONNECTION_STRING,
+        ensure_indexes: bool = _ENSURE_INDEXES,
+    ) -> None:
+        self._connection_string = connection_string
+        self._client = None
+        self._collection = None
+        self._ensure_indexes = ensure_indexes
+        self._unique_index: bool = None
+        self._indexes_lock = asyncio.Lock()
+        logging.info("ASYNC_MONGODB_PROXY::Database connection ready")
+
+    def _shared_collection(self) -> AsyncIOMotorCollection:
+        """Collection of client shared with other proxies, client is acquired
+        on first use because motor client belongs to the running loop"""
+        if self._collection is None:
+            self._client = acquire_async_mongo_client(self._connection_string)
+            self._collection = self._client[self._DATABASE_ID][self._COLLECTION_ID]
+        return self._collection
+
+    async def _get_collection(self) -> AsyncIOMotorCollection:
+        if self._unique_index is not None:
+            return self._shared_collection()
+        async with self._indexes_lock:
+            if self._unique_index is None:
+                self._unique_index = await self._prepare_indexes()
+        return self._shared_collection()
+
+    async def _prepare_indexes(self) -> bool:
+        """
+        Unique index is the guard against duplicated flags, so collection is
+        not used until index is built, failed build is tried again on next
+        use. When index bootstrap is turned off and index is missing, stored
+        flags are looked up before every insert.
+
+        Raises:
+            RuntimeError: index could not be created
+
+        Returns:
+            bool: True if unique index is present
+        """
+        if self._ensure_indexes:
+            if not await self.ensure_indexes():
+                raise RuntimeError(
+                    f"Mongo DB flag index {MONGO_FLAG_INDEX_NAME} could not be created"
+                )
+            return True
+        index_information = await self._shared_collection().index_information()
+        if has_mongo_flag_index(index_information):
+            return True
+        logging.warning(
+            "ASYNC_MONGODB_PROXY::Unique flag index missing, flags are looked up "
+            "before insert"
+        )
+        return False
+
+    async def ensure_indexes(self) -> bool:
+        """
+        Creates unique index on challenge and task ids, does nothing when index
+        already exists. Index cannot be created while collection contains
+        duplicated flags.
+
+        Returns:
+            bool: True if index is present
+        """
+        try:
+            await self._shared_collection().create_index(
+                MONGO_FLAG_INDEX_KEYS, name=MONGO_FLAG_INDEX_NAME, unique=True
+            )
+        except OperationFailure as error:
+            logging.error("ASYNC_MONGODB_PROXY::Flag index creation failed: %s", error)
+            return False
+        logging.debug("ASYNC_MONGODB_PROXY::Flag index %s ready", MONGO_FLAG_INDEX_NAME)
+        return True
+
+    async def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get flag from storage based on task and challenge ids"""
+        collection = await self._get_collection()
+        matching_flags = await collection.find(
+            {"challenge_id": challenge_id, "task_id": task_id}, MONGO_FLAG_PROJECTION
+        ).to_list(length=2)
+        if not matching_flags:
+            logging.debug(
+                "ASYNC_MONGODB_PROXY::Flag not found [challenge_id=%s, task_id=%s]",
+                challenge_id,
+                task_id,
+            )
+            return None
+        query_matches = len(matching_flags)
+        if query_matches != 1:
+            logging.error(
+                "ASYNC_MONGODB_PROXY::Invalid flag count find: %d", query_matches
+            )
+            return None
+        logging.debug("ASYNC_MONGODB_PROXY::Flag successfully found in DB")
+        return mongo_document_to_flag_dto(matching_flags[0])
+
+    async def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge with single query"""
+        collection = await self._get_collection()
+        matching_flags = [
+            mongo_document_to_flag_dto(flag_doc)
+            async for flag_doc in collection.find(
+                {"challenge_id": challenge_id, "task_id": {"$in": list(task_ids)}},
+                MONGO_FLAG_PROJECTION,
+            )
+        ]
+        flag_dtos = unique_flags_per_task(matching_flags)
+        logging.debug(
+            "ASYNC_MONGODB_PROXY::Flags of challenge_id=%s found in DB count = %d",
+            challenge_id,
+            len(flag_dtos),
+        )
+        return flag_dtos
+
+    async def get_all_flags(self) -> list[FlagDto]:
+        """Get all flags from storage"""
+        collection = await self._get_collection()
+        flag_dtos = [
+            mongo_document_to_flag_dto(flag_doc)
+            async for flag_doc in collection.find(projection=MONGO_FLAG_PROJECTION)
+        ]
+        logging.debug(
+            "ASYNC_MONGODB_PROXY::All flags retrived count = %d", len(flag_dtos)
+        )
+        return flag_dtos
+
+    async def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags ordered by document id"""
+        query = mongo_page_query(continuation_token)
+        collection = await self._get_collection()
+        documents = (
+            await collection.find(query, MONGO_FLAG_PROJECTION)
+            .sort("_id", ASCENDING)
+            .limit(page_size + 1)
+            .to_list(length=page_size + 1)
+        )
+        return mongo_documents_to_page(documents, page_size)
+
+    async def iter_all_flags(self) -> AsyncIterator[FlagDto]:
+        """Iterate over all flags as cursor fetches them"""
+        collection = await self._get_collection()
+        async for flag_doc in collection.find(
+            projection=MONGO_FLAG_PROJECTION, batch_size=self._PAGE_SIZE
+        ):
+            yield mongo_document_to_flag_dto(flag_doc)
+
+    async def create_flag(self, flag: FlagDto) -> FlagDto:
+        """Create flag for task and challenge with single insert, duplicate is
+        rejected by unique index. Saved flag is built from inserted document
+        instead of reading it back"""
+        collection = await self._get_collection()
+        document = flag_dto_to_mongo_document(flag)
+        try:
+            if not self._unique_index:
+                await self._reject_stored_flag(collection, flag)
+            insert_result = await collection.insert_one(document=document)
+        except DuplicateKeyError:
+            logging.error(
+                "ASYNC_MONGODB_PROXY::Flag already exists [challenge_id=%s, task_id=%s]",
+                flag.challenge_id,
+                flag.task_id,
+            )
+            return None
+        logging.debug(
+            "ASYNC_MONGODB_PROXY::Flag inserted correctly id=%s",
+            insert_result.inserted_id,
+        )
+        return mongo_document_to_flag_dto(
+            {**document, "_id": insert_result.inserted_id}
+        )
+
+    @staticmethod
+    async def _reject_stored_flag(
+        collection: AsyncIOMotorCollection, flag: FlagDto
+    ) -> None:
+        """Raises the error unique index would raise when flag is stored"""
+        if await collection.find_one(
+            {"challenge_id": flag.challenge_id, "task_id": flag.task_id}, {"_id": 1}
+        ):
+            raise DuplicateKeyError("Flag already exists", MONGO_DUPLICATE_KEY_ERROR)
+
+    async def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """Create many flags with single unordered insert, duplicates are
+        rejected by unique index"""
+        if not flags:
+            return []
+        collection = await self._get_collection()
+        if self._unique_index:
+            return await self._insert_flags(collection, flags)
+        stored_keys = {
+            (document["challenge_id"], document["task_id"])
+            async for document in collection.find(
+                mongo_flag_keys_query(flags), {"challenge_id": 1, "task_id": 1}
+            )
+        }
+        statuses, new_indexes = split_stored_flags(flags, stored_keys)
+        new_statuses = await self._insert_flags(
+            collection, [flags[index] for index in new_indexes]
+        )
+        for index, status in zip(new_indexes, new_statuses):
+            statuses[index] = status
+        return statuses
+
+    async def _insert_flags(
+        self, collection: AsyncIOMotorCollection, flags: list[FlagDto]
+    ) -> list[ImportStatus]:
+        if not flags:
+            return []
+        write_errors = []
+        try:
+            await collection.insert_many(
+                [flag_dto_to_mongo_document(flag) for flag in flags], ordered=False
+            )
+        except BulkWriteError as error:
+            write_errors = error.details["writeErrors"]
+        logging.debug(
+            "ASYNC_MONGODB_PROXY::Bulk insert of %d flags, failed = %d",
+            len(flags),
+            len(write_errors),
+        )
+        return mongo_bulk_insert_statuses(len(flags), write_errors)
+
+    async def update_flag(self, flag: FlagDto) -> FlagDto:
+        """Update flag value and read updated document with single
+        find_one_and_update"""
+        collection = await self._get_collection()
+        updated_flag = await collection.find_one_and_update(
+            {"challenge_id": flag.challenge_id, "task_id": flag.task_id},
+            mongo_flag_value_update(flag),
+            projection=MONGO_FLAG_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated_flag is None:
+            logging.error(
+                "ASYNC_MONGODB_PROXY::Flag to update not found "
+                "[challenge_id=%s, task_id=%s]",
+                flag.challenge_id,
+                flag.task_id,
+            )
+            return None
+        logging.debug(
+            "ASYNC_MONGODB_PROXY::Flag with id=%s updated successfully",
+            updated_flag["_id"],
+        )
+        return mongo_document_to_flag_dto(updated_flag)
+
+    async def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        """Delete flag based on challenge and task ids"""
+        delete_query = {"challenge_id": challenge_id, "_id": flag_id}
+        collection = await self._get_collection()
+        delete_result = await collection.delete_one(delete_query)
+        if delete_result.deleted_count == 1:
+            logging.debug(
+                "ASYNC_MONGODB_PROXY::Flag with id=%s successfully deleted", flag_id
+            )
+            return True
+        logging.error(
+            "ASYNC_MONGODB_PROXY::Flag deletion failed deleted count = %d",
+            delete_result.deleted_count,
+        )
+        return False
+
+    async def close(self) -> None:
+        """Release shared motor client"""
+        if self._client is not None:
+            release_mongo_client(self._client)
+            self._client = None
+            self._collection = None
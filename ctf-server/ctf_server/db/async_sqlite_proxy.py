@@ -0,0 +1,80 @@
+"""Asynchronous proxy for embedded SQLite database"""
+
+import asyncio
+from typing import AsyncIterator
+from ctf_server import config
+from ctf_server.db.async_storage_service import AsyncStorageService
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.sqlite_proxy import SqliteProxy
+from ctf_server.model.flag_import import ImportStatus
+
+
+class AsyncSqliteProxy(AsyncStorageService):
+    """
+    Coroutines over SQLite proxy. Every query runs in worker thread, each of
+    which gets its own connection, so reads of cold pages from disk and
+    writes waiting for lock of other writer up to busy timeout do not block
+    event loop. Listing of all flags reads one page per worker call.
+    """
+
+    _PAGE_SIZE = config.flag_listing["default_page_size"]
+
+    def __init__(self, proxy: SqliteProxy = None) -> None:
+        """
+        Args:
+            proxy (SqliteProxy): synchronous proxy, proxy of configured
+            database file is created when None
+        """
+        self._proxy = proxy if proxy is not None else SqliteProxy()
+
+    async def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get flag from storage based on task and challenge ids"""
+        return await asyncio.to_thread(self._proxy.get_flag, challenge_id, task_id)
+
+    async def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge with single query"""
+        return await asyncio.to_thread(self._proxy.get_flags, challenge_id, task_ids)
+
+    async def get_all_flags(self) -> list[FlagDto]:
+        """Get all flags from storage"""
+        return await asyncio.to_thread(self._proxy.get_all_flags)
+
+    async def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags ordered by flag id"""
+        return await asyncio.to_thread(
+            self._proxy.get_flags_page, page_size, continuation_token
+        )
+
+    async def iter_all_flags(self) -> AsyncIterator[FlagDto]:
+        """Iterate over all flags page by page"""
+        continuation_token = None
+        while True:
+            page = await self.get_flags_page(self._PAGE_SIZE, continuation_token)
+            for flag in page.flags:
+                yield flag
+            if page.continuation_token is None:
+                return
+            continuation_token = page.continuation_token
+
+    async def create_flag(self, flag: FlagDto) -> FlagDto:
+        """Create flag for task and challenge, id is assigned by database"""
+        return await asyncio.to_thread(self._proxy.create_flag, flag)
+
+    async def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """Create many flags in single transaction"""
+        return await asyncio.to_thread(self._proxy.create_flags, flags)
+
+    async def update_flag(self, flag: FlagDto) -> FlagDto:
+        """Update flag value based on challenge and task ids"""
+        return await asyncio.to_thread(self._proxy.update_flag, flag)
+
+    async def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        """Delete flag based on challenge and flag ids"""
+        return await asyncio.to_thread(self._proxy.delete_flag, challenge_id, flag_id)
+
+    async def close(self) -> None:
+        """Close connections of all threads"""
+        self._proxy.close()
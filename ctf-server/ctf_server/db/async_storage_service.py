@@ -0,0 +1,57 @@
+"""Interface for asynchronous storage services"""
+
+from abc import ABC, abstractmethod
+from typing import AsyncIterator
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.model.flag_import import ImportStatus
+
+
+class AsyncStorageService(ABC):
+    """Defines group of coroutines to manage flags without blocking event loop"""
+
+    @abstractmethod
+    async def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get flag from storage based on task and challenge ids"""
+
+    @abstractmethod
+    async def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge with single storage query,
+        tasks which do not have exactly one flag are left out"""
+
+    @abstractmethod
+    async def get_all_flags(self) -> list[FlagDto]:
+        """Get all flags from storage"""
+
+    @abstractmethod
+    async def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags, next page is read with returned continuation
+        token, raises ValueError when token is invalid"""
+
+    @abstractmethod
+    def iter_all_flags(self) -> AsyncIterator[FlagDto]:
+        """Iterate over all flags as they are read from storage"""
+
+    @abstractmethod
+    async def create_flag(self, flag: FlagDto) -> FlagDto:
+        """Create flag for task and challenge with single write which relies on
+        unique challenge and task ids, returns None when flag already exists"""
+
+    @abstractmethod
+    async def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """Create many flags with bulk writes, returns status of each flag in input order"""
+
+    @abstractmethod
+    async def update_flag(self, flag: FlagDto) -> FlagDto:
+        """Set value of flag of challenge and task with single atomic write,
+        flag id is not needed. Returns updated flag, None when flag does not
+        exist"""
+
+    @abstractmethod
+    async def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        """Delete flag based on challenge and task ids"""
+
+    async def close(self) -> None:
+        """Release connections held by storage"""
@@ -1,11 +1,32 @@
 """Proxy for Azure Cosmo DB"""
 
 import logging
+import time
+from typing import Callable, Iterator
+from ctf_server.db.bulk_write import (
+    COSMOS_BATCH_LIMIT,
+    chunked,
+    group_new_flags_by_challenge,
+)
+from ctf_server.db.cosmos_requests import CosmosRequests, cosmos_client_options
+from ctf_server.db.dto.flag_change import FlagChangeDto
 from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.dto.flag_documents import (
+    COSMOS_FLAG_UNIQUE_KEY_POLICY,
+    cosmos_flag_id,
+    cosmos_item_to_flag_change,
+    cosmos_item_to_flag_dto,
+    flag_dto_to_cosmos_item,
+    has_cosmos_flag_unique_key,
+    unique_flags_per_task,
+)
 from ctf_server.db.storage_service import StorageService
 import ctf_server.config as config
+from ctf_server.model.flag_import import ImportStatus
 import azure.cosmos.cosmos_client as cosmos_client
 import azure.cosmos.exceptions as exceptions
+from azure.core import MatchConditions
 from azure.cosmos.container import ContainerProxy
 from azure.cosmos.database import DatabaseProxy
 from azure.cosmos.partition_key import PartitionKey
@@ -18,24 +39,53 @@ class AzureProxy(StorageService):
     _MASTER_KEY = config.azure_connection["master_key"]
     _DATABASE_ID = config.azure["database_id"]
     _CONTAINER_ID = config.azure["container_id"]
+    _DETERMINISTIC_IDS = config.azure["deterministic_ids"]
+    _UPDATE_ATTEMPTS = 3
+    _PAGE_SIZE = config.flag_listing["default_page_size"]
+    _CHANGE_POLL_SECONDS = config.flag_replica["poll_interval_seconds"]
+    supports_change_stream = True
 
-    def __init__(self) -> None:
+    def __init__(
+        self, deterministic_ids: bool = _DETERMINISTIC_IDS, sdk_retries: bool = False
+    ) -> None:
+        """
+        Args:
+            deterministic_ids (bool): when enabled item id is derived from
+            challenge and task ids, so flags are read with point reads instead
+            of queries
+            sdk_retries (bool): keep throttle retries of the SDK for requests
+            sent through container directly, e.g. by migrations
+        """
+        self._deterministic_ids = deterministic_ids
+        self._sdk_retries = sdk_retries
+        self._requests = CosmosRequests()
         self._client = self._get_client()
         self._database = self._get_or_create_database()
         self._container = self._get_or_create_container()
+        self._unique_key = self._has_unique_key()
         logging.info("AZURE_PROXY::Database connection ready")
 
+    def close(self) -> None:
+        """Close Cosmos client and its connection pool, sync client is closed
+        by leaving its context"""
+        if self._client is not None:
+            self._client.__exit__(None, None, None)
+            self._client = None
+
     def _get_client(self) -> cosmos_client.CosmosClient:
         return cosmos_client.CosmosClient(
             self._HOST,
             {"masterKey": self._MASTER_KEY},
             user_agent="CosmosDBPythonQuickstart",
             user_agent_overwrite=True,
+            **cosmos_client_options(self._sdk_retries),
         )
 
     def _get_or_create_database(self) -> DatabaseProxy:
         try:
-            db = self._client.create_database(id=self._DATABASE_ID)
+            db = self._requests.call(
+                "create_database", self._client.create_database, id=self._DATABASE_ID
+            )
             logging.debug(
                 "AZURE_PROXY::Database with id=%s not found, creating new database",
                 self._DATABASE_ID,
@@ -47,8 +97,12 @@ class AzureProxy(StorageService):
 
     def _get_or_create_container(self) -> ContainerProxy:
         try:
-            container = self._database.create_container(
-                self._CONTAINER_ID, partition_key=PartitionKey(path="/partitionKey")
+            container = self._requests.call(
+                "create_container",
+                self._database.create_container,
+                self._CONTAINER_ID,
+                partition_key=PartitionKey(path="/partitionKey"),
+                unique_key_policy=COSMOS_FLAG_UNIQUE_KEY_POLICY,
             )
             logging.debug(
                 "AZURE_PROXY::Container with id=%s not found, creating new container",
@@ -59,73 +113,368 @@ class AzureProxy(StorageService):
             logging.debug("AZURE_PROXY::Container with id=%s found", self._DATABASE_ID)
         return container
 
+    def _has_unique_key(self) -> bool:
+        properties = self._requests.call("read_container", self._container.read)
+        if has_cosmos_flag_unique_key(properties):
+            return True
+        logging.warning(
+            "AZURE_PROXY::Container with id=%s has no unique key on task id, "
+            "flags are looked up before create",
+            self._CONTAINER_ID,
+        )
+        return False
+
+    @property
+    def container(self) -> ContainerProxy:
+        """Container keeping flags, requests sent through it directly are
+        retried when throttled only by proxy created with sdk_retries"""
+        return self._container
+
     def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
         """Get flag from storage based on task and challenge ids"""
-        matching_flags = list(
-            self._container.query_items(
-                query="""
-                    SELECT * 
-                    FROM record 
-                    WHERE record.partitionKey=@challenge_id AND record.task_id=@task_id
-                """,
-                parameters=[
-                    {"name": "@challenge_id", "value": challenge_id},
-                    {"name": "@task_id", "value": task_id},
-                ],
+        if self._deterministic_ids:
+            return self._read_flag(challenge_id, task_id)
+        matching_flags = self._query_flag_items("get_flag", challenge_id, task_id)
+        if not matching_flags:
+            logging.debug(
+                "AZURE_PROXY::Flag not found [challenge_id=%s, task_id=%s]",
+                challenge_id,
+                task_id,
             )
-        )
+            return None
         if len(matching_flags) != 1:
-            logging.error("AZURE_PROXY::Count flags matching query: %d", len(matching_flags))
+            logging.error(
+                "AZURE_PROXY::Count flags matching query: %d", len(matching_flags)
+            )
             return None
         logging.debug("AZURE_PROXY::Flag successfully read from DB")
-        return self._dict_to_dto(matching_flags[0])
+        return cosmos_item_to_flag_dto(matching_flags[0])
+
+    def _query_flag_items(
+        self, operation: str, challenge_id: str, task_id: str
+    ) -> list[dict]:
+        return self._requests.call(
+            operation,
+            self._container.query_items,
+            query="""
+                SELECT * 
+                FROM record 
+                WHERE record.partitionKey=@challenge_id AND record.task_id=@task_id
+            """,
+            parameters=[
+                {"name": "@challenge_id", "value": challenge_id},
+                {"name": "@task_id", "value": task_id},
+            ],
+        )
+
+    def _read_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        try:
+            flag = self._requests.call(
+                "get_flag",
+                self._container.read_item,
+                item=cosmos_flag_id(challenge_id, task_id),
+                partition_key=challenge_id,
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            logging.debug(
+                "AZURE_PROXY::Flag not found [challenge_id=%s, task_id=%s]",
+                challenge_id,
+                task_id,
+            )
+            return None
+        logging.debug("AZURE_PROXY::Flag successfully read from DB")
+        return cosmos_item_to_flag_dto(flag)
+
+    def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge with single partition query"""
+        matching_flags = self._requests.call(
+            "get_flags",
+            self._container.query_items,
+            query="""
+                SELECT *
+                FROM record
+                WHERE record.partitionKey=@challenge_id
+                    AND ARRAY_CONTAINS(@task_ids, record.task_id)
+            """,
+            parameters=[
+                {"name": "@challenge_id", "value": challenge_id},
+                {"name": "@task_ids", "value": list(task_ids)},
+            ],
+            partition_key=challenge_id,
+        )
+        flag_dtos = unique_flags_per_task(
+            cosmos_item_to_flag_dto(flag) for flag in matching_flags
+        )
+        logging.debug(
+            "AZURE_PROXY::Flags of challenge_id=%s read from DB count = %d",
+            challenge_id,
+            len(flag_dtos),
+        )
+        return flag_dtos
 
     def get_all_flags(self) -> list[FlagDto]:
         """Get all flags from storage"""
-        flags = self._container.read_all_items(max_item_count=20)
-        flags_dtos = []
-        for flag in flags:
-            flags_dtos.append(self._dict_to_dto(flag))
-        logging.debug("AZURE_PROXY::Group of flag retireved from DB size = %d", len(flags_dtos))
+        flags_dtos = list(self.iter_all_flags())
+        logging.debug(
+            "AZURE_PROXY::Group of flag retireved from DB size = %d", len(flags_dtos)
+        )
         return flags_dtos
 
+    def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags using Cosmos continuation token"""
+        try:
+            return self._read_page("get_flags_page", page_size, continuation_token)
+        except exceptions.CosmosHttpResponseError as error:
+            if error.status_code == 400:
+                raise ValueError("Invalid continuation token") from error
+            raise
+
+    def iter_all_flags(self) -> Iterator[FlagDto]:
+        """Iterate over all flags page by page, every page is retried on its
+        own when throttled"""
+        continuation_token = None
+        while True:
+            page = self._read_page(
+                "iter_all_flags", self._PAGE_SIZE, continuation_token
+            )
+            yield from page.flags
+            if page.continuation_token is None:
+                return
+            continuation_token = page.continuation_token
+
+    def _read_page(
+        self, operation: str, page_size: int, continuation_token: str
+    ) -> FlagPageDto:
+        items, continuation_token = self._requests.call(
+            operation, self._fetch_page, page_size, continuation_token
+        )
+        flags = [cosmos_item_to_flag_dto(flag) for flag in items]
+        logging.debug("AZURE_PROXY::Page of flags read from DB size = %d", len(flags))
+        return FlagPageDto(flags=flags, continuation_token=continuation_token)
+
+    def _fetch_page(
+        self, page_size: int, continuation_token: str, response_hook: Callable
+    ) -> tuple[list[dict], str]:
+        pages = self._container.read_all_items(
+            max_item_count=page_size, response_hook=response_hook
+        ).by_page(continuation_token)
+        try:
+            items = list(next(pages))
+        except StopIteration:
+            items = []
+        return items, pages.continuation_token
+
     def create_flag(self, flag: FlagDto) -> FlagDto:
-        """Create flag for task and challenge"""
-        saved_flag = self._container.create_item(body=self._dto_to_dict(flag))
+        """
+        Create flag for task and challenge. Item id is derived from challenge
+        and task ids, so concurrent creates of the same flag conflict. Flag
+        stored under legacy id is rejected by unique key on task id, or by
+        query before create when container has no unique key.
+        """
+        flag.id = cosmos_flag_id(flag.challenge_id, flag.task_id)
+        if (
+            not self._deterministic_ids
+            and not self._unique_key
+            and self._query_flag_items("create_flag", flag.challenge_id, flag.task_id)
+        ):
+            self._log_existing_flag(flag)
+            return None
+        try:
+            saved_flag = self._requests.call(
+                "create_flag",
+                self._container.create_item,
+                body=flag_dto_to_cosmos_item(flag),
+            )
+        except exceptions.CosmosResourceExistsError:
+            self._log_existing_flag(flag)
+            return None
         logging.debug("AZURE_PROXY::Flag saved correctly id=%s", saved_flag["id"])
-        return self._dict_to_dto(saved_flag)
+        return cosmos_item_to_flag_dto(saved_flag)
+
+    @staticmethod
+    def _log_existing_flag(flag: FlagDto) -> None:
+        logging.error(
+            "AZURE_PROXY::Flag already exists [challenge_id=%s, task_id=%s]",
+            flag.challenge_id,
+            flag.task_id,
+        )
+
+    def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """
+        Create many flags with transactional batches, one batch per chunk of
+        flags of the same challenge. When batch fails its flags are created one
+        by one to find out which of them already exist.
+        """
+        statuses, indexes_by_challenge = group_new_flags_by_challenge(flags)
+        for challenge_id, indexes in indexes_by_challenge.items():
+            existing_task_ids = self._existing_task_ids(
+                challenge_id, [flags[index].task_id for index in indexes]
+            )
+            new_indexes = []
+            for index in indexes:
+                if flags[index].task_id in existing_task_ids:
+                    statuses[index] = ImportStatus.DUPLICATE
+                else:
+                    flags[index].id = cosmos_flag_id(challenge_id, flags[index].task_id)
+                    new_indexes.append(index)
+            for chunk in chunked(new_indexes, COSMOS_BATCH_LIMIT):
+                self._create_flags_batch(challenge_id, flags, chunk, statuses)
+        logging.debug("AZURE_PROXY::Bulk create of %d flags finished", len(flags))
+        return statuses
+
+    def _existing_task_ids(self, challenge_id: str, task_ids: list[str]) -> set[str]:
+        if self._deterministic_ids:
+            return set()
+        return set(
+            self._requests.call(
+                "create_flags",
+                self._container.query_items,
+                query="""
+                    SELECT VALUE record.task_id
+                    FROM record
+                    WHERE record.partitionKey=@challenge_id
+                        AND ARRAY_CONTAINS(@task_ids, record.task_id)
+                """,
+                parameters=[
+                    {"name": "@challenge_id", "value": challenge_id},
+                    {"name": "@task_ids", "value": task_ids},
+                ],
+                partition_key=challenge_id,
+            )
+        )
+
+    def _create_flags_batch(
+        self,
+        challenge_id: str,
+        flags: list[FlagDto],
+        indexes: list[int],
+        statuses: list[ImportStatus],
+    ) -> None:
+        try:
+            self._requests.call(
+                "create_flags",
+                self._container.execute_item_batch,
+                [
+                    ("create", (flag_dto_to_cosmos_item(flags[index]),))
+                    for index in indexes
+                ],
+                partition_key=challenge_id,
+            )
+            for index in indexes:
+                statuses[index] = ImportStatus.CREATED
+            return
+        except exceptions.CosmosBatchOperationError:
+            logging.debug(
+                "AZURE_PROXY::Batch for challenge_id=%s failed, creating flags one by one",
+                challenge_id,
+            )
+        for index in indexes:
+            try:
+                self._requests.call(
+                    "create_flags",
+                    self._container.create_item,
+                    body=flag_dto_to_cosmos_item(flags[index]),
+                )
+                statuses[index] = ImportStatus.CREATED
+            except exceptions.CosmosResourceExistsError:
+                statuses[index] = ImportStatus.DUPLICATE
+            except exceptions.CosmosHttpResponseError:
+                logging.exception(
+                    "AZURE_PROXY::Could not create flag id=%s", flags[index].id
+                )
+                statuses[index] = ImportStatus.ERROR
 
     def update_flag(self, flag: FlagDto) -> FlagDto:
-        """Update flag document based on flag id"""
-        flag_dict = self._dto_to_dict(flag)
-        updated_flag = self._container.replace_item(item=flag_dict["id"], body=flag_dict)
-        logging.debug("AZURE_PROXY::Flag with id=%s updated successfully", updated_flag["id"])
-        return self._dict_to_dto(updated_flag)
+        """
+        Replace flag item of challenge and task. With deterministic ids item is
+        replaced directly by its id with single request. Otherwise item is
+        found by query and replaced only when its ETag did not change since,
+        replace is tried again when other writer changed item in between.
+        """
+        if self._deterministic_ids:
+            flag.id = cosmos_flag_id(flag.challenge_id, flag.task_id)
+            return self._replace_flag(flag)
+        for _ in range(self._UPDATE_ATTEMPTS):
+            matching_flags = self._query_flag_items(
+                "update_flag", flag.challenge_id, flag.task_id
+            )
+            if len(matching_flags) != 1:
+                logging.error(
+                    "AZURE_PROXY::Count flags to update: %d", len(matching_flags)
+                )
+                return None
+            flag.id = matching_flags[0]["id"]
+            try:
+                return self._replace_flag(flag, matching_flags[0]["_etag"])
+            except exceptions.CosmosAccessConditionFailedError:
+                logging.debug("AZURE_PROXY::Flag with id=%s changed, retrying", flag.id)
+        logging.error("AZURE_PROXY::Flag with id=%s kept changing", flag.id)
+        return None
 
+    def _replace_flag(self, flag: FlagDto, etag: str = None) -> FlagDto:
+        condition = {}
+        if etag is not None:
+            condition = {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+        try:
+            updated_flag = self._requests.call(
+                "update_flag",
+                self._container.replace_item,
+                item=flag.id,
+                body=flag_dto_to_cosmos_item(flag),
+                **condition,
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            logging.error("AZURE_PROXY::Flag with id=%s to update not found", flag.id)
+            return None
+        logging.debug(
+            "AZURE_PROXY::Flag with id=%s updated successfully", updated_flag["id"]
+        )
+        return cosmos_item_to_flag_dto(updated_flag)
 
     def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
         """Delete flag based on challenge and task ids"""
         try:
-            self._container.delete_item(item=flag_id, partition_key=challenge_id)
+            self._requests.call(
+                "delete_flag",
+                self._container.delete_item,
+                item=flag_id,
+                partition_key=challenge_id,
+            )
             logging.debug("AZURE_PROXY::Flag with id=%s successfully deleted", flag_id)
             return True
-        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError):
+        except (
+            exceptions.CosmosResourceNotFoundError,
+            exceptions.CosmosHttpResponseError,
+        ):
             logging.error("AZURE_PROXY::Could not delete flag with id=%s", flag_id)
             return False
 
-    def _dto_to_dict(self, flag: FlagDto) -> dict:
-        return {
-            "id": flag.id,
-            "partitionKey": flag.challenge_id,
-            "challenge_id": flag.challenge_id,
-            "task_id": flag.task_id,
-            "value": flag.value,
-        }
-
-    def _dict_to_dto(self, flag_dict: dict) -> FlagDto:
-        return FlagDto(
-            id=flag_dict["id"],
-            challenge_id=flag_dict["challenge_id"],
-            task_id=flag_dict["task_id"],
-            value=flag_dict["value"],
+    def open_change_stream(self) -> Iterator[FlagChangeDto]:
+        """
+        Poll container change feed starting from now. Change feed reports
+        created and replaced items only, deleted flags are not streamed.
+        """
+        _, continuation = self._read_change_feed(None)
+        logging.debug("AZURE_PROXY::Change feed opened")
+        return self._poll_change_feed(continuation)
+
+    def _poll_change_feed(self, continuation: str) -> Iterator[FlagChangeDto]:
+        while True:
+            items, continuation = self._read_change_feed(continuation)
+            for item in items:
+                yield cosmos_item_to_flag_change(item)
+            if not items:
+                yield None
+                time.sleep(self._CHANGE_POLL_SECONDS)
+
+    def _read_change_feed(self, continuation: str) -> tuple[list[dict], str]:
+        items = self._requests.call(
+            "change_feed",
+            self._container.query_items_change_feed,
+            is_start_from_beginning=False,
+            continuation=continuation,
         )
+        headers = self._container.client_connection.last_response_headers
+        return items, headers.get("etag", continuation)
@@ -0,0 +1,81 @@
+"""Submission log kept in Azure Cosmos DB"""
+
+import logging
+from typing import Iterator
+import azure.cosmos.cosmos_client as cosmos_client
+import azure.cosmos.exceptions as exceptions
+from azure.cosmos.partition_key import PartitionKey
+from ctf_server import config
+from ctf_server.db.bulk_write import COSMOS_BATCH_LIMIT, chunked
+from ctf_server.db.cosmos_requests import CosmosRequests, cosmos_client_options
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.db.dto.submission_event_documents import (
+    cosmos_item_to_submission_event,
+    submission_event_to_cosmos_item,
+)
+from ctf_server.db.submission_log_sink import SubmissionLogSink
+
+
+class AzureSubmissionLogSink(SubmissionLogSink):
+    """
+    Groups every batch by challenge and writes each group with transactional
+    batches of at most 100 items, which is one request per challenge for
+    typical flush sizes. Items are upserted, so batch written again after
+    partial failure does not duplicate events.
+    """
+
+    _HOST = config.azure_connection["host"]
+    _MASTER_KEY = config.azure_connection["master_key"]
+    _DATABASE_ID = config.azure["database_id"]
+    _CONTAINER_ID = config.submission_log["azure_container"]
+
+    def __init__(self) -> None:
+        self._requests = CosmosRequests()
+        self._client = cosmos_client.CosmosClient(
+            self._HOST, {"masterKey": self._MASTER_KEY}, **cosmos_client_options()
+        )
+        database = self._requests.call(
+            "create_database",
+            self._client.create_database_if_not_exists,
+            id=self._DATABASE_ID,
+        )
+        try:
+            self._container = self._requests.call(
+                "create_container",
+                database.create_container,
+                self._CONTAINER_ID,
+                partition_key=PartitionKey(path="/partitionKey"),
+            )
+        except exceptions.CosmosResourceExistsError:
+            self._container = database.get_container_client(self._CONTAINER_ID)
+        logging.info("AZURE_SUBMISSION_LOG::Database connection ready")
+
+    def write(self, events: list[SubmissionEventDto]) -> None:
+        items_by_challenge: dict[str, list[dict]] = {}
+        for event in events:
+            item = submission_event_to_cosmos_item(event)
+            items_by_challenge.setdefault(item["partitionKey"], []).append(item)
+        for challenge_id, items in items_by_challenge.items():
+            for chunk in chunked(items, COSMOS_BATCH_LIMIT):
+                self._requests.call(
+                    "submission_log_write",
+                    self._container.execute_item_batch,
+                    [("upsert", (item,)) for item in chunk],
+                    partition_key=challenge_id,
+                )
+
+    def iter_events(self, state: str = None) -> Iterator[SubmissionEventDto]:
+        if state is None:
+            items = self._requests.call(
+                "submission_log_read", self._container.read_all_items
+            )
+        else:
+            items = self._requests.call(
+                "submission_log_read",
+                self._container.query_items,
+                query="SELECT * FROM c WHERE c.state = @state",
+                parameters=[{"name": "@state", "value": state}],
+                enable_cross_partition_query=True,
+            )
+        for item in items:
+            yield cosmos_item_to_submission_event(item)
@@ -0,0 +1,79 @@
+"""Helpers shared by bulk flag writes of storage services"""
+
+from typing import Iterator
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.model.flag_import import ImportStatus
+
+MONGO_DUPLICATE_KEY_ERROR = 11000
+COSMOS_BATCH_LIMIT = 100
+
+
+def group_new_flags_by_challenge(
+    flags: list[FlagDto],
+) -> tuple[list[ImportStatus], dict[str, list[int]]]:
+    """
+    Groups indexes of flags by challenge. Only the first flag for challenge and
+    task pair is kept, the following ones are marked as duplicates.
+
+    Args:
+        flags (list[FlagDto]): flags to create
+
+    Returns:
+        tuple: statuses with duplicates filled in and flag indexes grouped by challenge
+    """
+    statuses = [None] * len(flags)
+    seen_keys = set()
+    indexes_by_challenge: dict[str, list[int]] = {}
+    for index, flag in enumerate(flags):
+        key = (flag.challenge_id, flag.task_id)
+        if key in seen_keys:
+            statuses[index] = ImportStatus.DUPLICATE
+            continue
+        seen_keys.add(key)
+        indexes_by_challenge.setdefault(flag.challenge_id, []).append(index)
+    return statuses, indexes_by_challenge
+
+
+def split_stored_flags(
+    flags: list[FlagDto], stored_keys: set[tuple[str, str]]
+) -> tuple[list[ImportStatus], list[int]]:
+    """
+    Marks flags repeated in input or already stored as duplicates, used by
+    storages which cannot rely on unique index.
+
+    Args:
+        flags (list[FlagDto]): flags to create
+        stored_keys (set[tuple[str, str]]): challenge and task ids of stored flags
+
+    Returns:
+        tuple: statuses with duplicates filled in and indexes of flags to insert
+    """
+    statuses, indexes_by_challenge = group_new_flags_by_challenge(flags)
+    new_indexes = []
+    for indexes in indexes_by_challenge.values():
+        for index in indexes:
+            if (flags[index].challenge_id, flags[index].task_id) in stored_keys:
+                statuses[index] = ImportStatus.DUPLICATE
+            else:
+                new_indexes.append(index)
+    return statuses, sorted(new_indexes)
+
+
+def chunked(indexes: list[int], size: int) -> Iterator[list[int]]:
+    """Splits indexes into chunks of at most given size"""
+    for start in range(0, len(indexes), size):
+        yield indexes[start : start + size]
+
+
+def mongo_bulk_insert_statuses(
+    flag_count: int, write_errors: list[dict]
+) -> list[ImportStatus]:
+    """Translates write errors of unordered insert_many to status of each flag"""
+    statuses = [ImportStatus.CREATED] * flag_count
+    for write_error in write_errors:
+        statuses[write_error["index"]] = (
+            ImportStatus.DUPLICATE
+            if write_error["code"] == MONGO_DUPLICATE_KEY_ERROR
+            else ImportStatus.ERROR
+        )
+    return statuses
@@ -0,0 +1,225 @@
+"""Cosmos DB requests retried on throttling with request charge accounting"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Mapping
+from azure.core.async_paging import AsyncItemPaged
+from azure.core.paging import ItemPaged
+import azure.cosmos.exceptions as exceptions
+from azure.cosmos.documents import ConnectionPolicy, RetryOptions
+from azure.cosmos.http_constants import HttpHeaders, StatusCodes
+from ctf_server import config
+from ctf_server.db.storage_service import StorageThrottledError
+
+# Retry is delayed by up to this fraction of x-ms-retry-after-ms more, so
+# clients throttled together do not retry together
+RETRY_JITTER = 0.2
+# Delay of first retry when throttled response does not carry retry after
+FALLBACK_RETRY_AFTER_SECONDS = 0.1
+
+
+@dataclass
+class CosmosOperationStats:
+    """Requests sent by one storage operation, throttled requests included"""
+
+    requests: int = 0
+    request_units: float = 0.0
+    throttled_requests: int = 0
+    throttle_failures: int = 0
+
+
+class CosmosRequestCharges:
+    """Request units consumed by every storage operation, shared by all
+    Cosmos proxies of the process"""
+
+    def __init__(self) -> None:
+        self._operations: dict[str, CosmosOperationStats] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, operation: str, headers: Mapping[str, Any], throttled: bool = False
+    ) -> None:
+        """Count single response and its request charge"""
+        request_charge = float(headers.get(HttpHeaders.RequestCharge) or 0)
+        with self._lock:
+            stats = self._operations.setdefault(operation, CosmosOperationStats())
+            stats.requests += 1
+            stats.request_units += request_charge
+            stats.throttled_requests += int(throttled)
+
+    def record_failure(self, operation: str) -> None:
+        """Count operation which was still throttled after all retries"""
+        with self._lock:
+            stats = self._operations.setdefault(operation, CosmosOperationStats())
+            stats.throttle_failures += 1
+
+    def stats(self) -> dict[str, dict]:
+        """Counters of every operation which sent at least one request"""
+        with self._lock:
+            return {
+                operation: asdict(stats)
+                for operation, stats in sorted(self._operations.items())
+            }
+
+
+REQUEST_CHARGES = CosmosRequestCharges()
+
+
+def cosmos_client_options(sdk_retries: bool = False) -> dict:
+    """
+    Keyword arguments of every Cosmos client, sync and asyncio alike, built
+    from azure config.
+
+    Args:
+        sdk_retries (bool): keep throttle retries of the SDK, for clients
+        whose requests are not sent through CosmosRequests. Otherwise SDK
+        retries are disabled and CosmosRequests retries throttled requests
+
+    Returns:
+        dict: CosmosClient keyword arguments
+    """
+    connection_policy = ConnectionPolicy()
+    if not sdk_retries:
+        connection_policy.RetryOptions = RetryOptions(max_retry_attempt_count=0)
+    connection_policy.PreferredLocations = list(config.azure["preferred_regions"])
+    return {
+        "connection_policy": connection_policy,
+        "consistency_level": config.azure["consistency_level"] or None,
+    }
+
+
+def _is_throttled(error: exceptions.CosmosHttpResponseError) -> bool:
+    return error.status_code == StatusCodes.TOO_MANY_REQUESTS
+
+
+async def _collect(items: AsyncItemPaged) -> list:
+    return [item async for item in items]
+
+
+class CosmosRequests:
+    """
+    Runs Cosmos requests of storage operations. Throttled request is sent
+    again after delay requested by x-ms-retry-after-ms header plus jitter,
+    until retries or total wait are used up. Request charge of every
+    response is added to operation totals.
+    """
+
+    _MAX_RETRIES = config.azure["throttle_max_retries"]
+    _MAX_WAIT_SECONDS = config.azure["throttle_max_wait_seconds"]
+
+    def __init__(
+        self,
+        max_retries: int = _MAX_RETRIES,
+        max_wait_seconds: float = _MAX_WAIT_SECONDS,
+        charges: CosmosRequestCharges = REQUEST_CHARGES,
+    ) -> None:
+        """
+        Args:
+            max_retries (int): retries of single throttled request
+            max_wait_seconds (float): total wait of single request for retries
+            charges (CosmosRequestCharges): totals updated by every response
+        """
+        self._max_retries = max_retries
+        self._max_wait_seconds = max_wait_seconds
+        self._charges = charges
+
+    def response_hook(self, operation: str) -> Callable:
+        """
+        Response hook of Cosmos SDK calls which records request charge of
+        operation. Queries call the hook once per fetched page and once more
+        with stale headers when pager is created, that call is skipped. Some
+        calls, like database creation, pass headers only.
+        """
+
+        def hook(headers: Mapping[str, Any], result: Any = None) -> None:
+            if not isinstance(result, (ItemPaged, AsyncItemPaged)):
+                self._charges.record(operation, headers)
+
+        return hook
+
+    def call(self, operation: str, function: Callable, *args, **kwargs) -> Any:
+        """
+        Call Cosmos SDK function with response hook of operation, retrying
+        while it is throttled. Lazy query results are read into list, so
+        throttled page is retried as well.
+
+        Args:
+            operation (str): name of storage operation the request belongs to
+            function (Callable): container method
+
+        Raises:
+            StorageThrottledError: request was throttled after all retries
+
+        Returns:
+            Any: result of function
+        """
+        attempt, waited_seconds = 0, 0.0
+        while True:
+            try:
+                result = function(
+                    *args, response_hook=self.response_hook(operation), **kwargs
+                )
+                return list(result) if isinstance(result, ItemPaged) else result
+            except exceptions.CosmosHttpResponseError as error:
+                delay = self._retry_delay(operation, error, attempt, waited_seconds)
+            time.sleep(delay)
+            attempt, waited_seconds = attempt + 1, waited_seconds + delay
+
+    async def call_async(
+        self, operation: str, function: Callable, *args, **kwargs
+    ) -> Any:
+        """Coroutine version of call, for methods of asyncio container"""
+        attempt, waited_seconds = 0, 0.0
+        while True:
+            try:
+                result = function(
+                    *args, response_hook=self.response_hook(operation), **kwargs
+                )
+                if isinstance(result, AsyncItemPaged):
+                    return await _collect(result)
+                return await result
+            except exceptions.CosmosHttpResponseError as error:
+                delay = self._retry_delay(operation, error, attempt, waited_seconds)
+            await asyncio.sleep(delay)
+            attempt, waited_seconds = attempt + 1, waited_seconds + delay
+
+    def _retry_delay(
+        self,
+        operation: str,
+        error: exceptions.CosmosHttpResponseError,
+        attempt: int,
+        waited_seconds: float,
+    ) -> float:
+        """Delay before next attempt, error is raised again when it is not
+        throttling or no retry is left"""
+        if not _is_throttled(error):
+            raise error
+        headers = error.headers or {}
+        self._charges.record(operation, headers, throttled=True)
+        retry_after_ms = headers.get(HttpHeaders.RetryAfterInMilliseconds)
+        if retry_after_ms:
+            retry_after = float(retry_after_ms) / 1000
+        else:
+            retry_after = FALLBACK_RETRY_AFTER_SECONDS * 2**attempt
+        delay = retry_after * (1 + random.uniform(0, RETRY_JITTER))
+        if (
+            attempt >= self._max_retries
+            or waited_seconds + delay > self._max_wait_seconds
+        ):
+            self._charges.record_failure(operation)
+            logging.error(
+                "COSMOS_REQUESTS::Operation %s throttled after %d retries",
+                operation,
+                attempt,
+            )
+            raise StorageThrottledError(
+                f"Cosmos DB throttled {operation}", retry_after
+            ) from error
+        logging.debug(
+            "COSMOS_REQUESTS::Operation %s throttled, retry in %.3f s", operation, delay
+        )
+        return delay
@@ -0,0 +1,16 @@
+"""Flag change Data Transfer Object"""
+from dataclasses import dataclass
+from ctf_server.db.dto.flag_dto import FlagDto
+
+FLAG_UPSERT = "upsert"
+FLAG_DELETE = "delete"
+
+
+@dataclass
+class FlagChangeDto:
+    """Class for single flag change read from storage change stream"""
+
+    operation: str
+    flag_id: str
+    flag: FlagDto | None = None
+    timestamp: float | None = None
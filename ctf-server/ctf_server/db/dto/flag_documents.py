@@ -0,0 +1,212 @@
+"""Conversions between Flag DTO and documents kept in databases"""
+
+import base64
+import hashlib
+from collections import Counter
+from typing import Iterable
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING
+from ctf_server.db.dto.flag_change import FLAG_DELETE, FLAG_UPSERT, FlagChangeDto
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+
+MONGO_FLAG_INDEX_NAME = "challenge_id_task_id_unique"
+MONGO_FLAG_INDEX_KEYS = [("challenge_id", ASCENDING), ("task_id", ASCENDING)]
+MONGO_FLAG_PROJECTION = {
+    "challenge_id": 1,
+    "task_id": 1,
+    "value": 1,
+    "digest_algorithm": 1,
+}
+# Task id is unique within challenge partition, applied when container is created
+COSMOS_FLAG_UNIQUE_KEY_POLICY = {"uniqueKeys": [{"paths": ["/task_id"]}]}
+
+DIGEST_ALGORITHM_FIELD = "digest_algorithm"
+MD5_ALGORITHM = "md5"
+
+
+def cosmos_flag_id(challenge_id: str, task_id: str) -> str:
+    """
+    Deterministic Cosmos DB item id for challenge and task pair. Id is a hash,
+    so it never contains characters forbidden in Cosmos ids ('/', '\\', '?', '#').
+
+    Args:
+        challenge_id (str): flag challenge id
+        task_id (str): flag task id
+
+    Returns:
+        str: item id unique for challenge and task pair
+    """
+    key = f"{len(challenge_id)}:{challenge_id}:{task_id}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _is_raw_digest(document: dict) -> bool:
+    """Raw digests are tagged with their algorithm, untagged values are hex text"""
+    algorithm = document.get(DIGEST_ALGORITHM_FIELD)
+    if algorithm is None:
+        return False
+    if algorithm != MD5_ALGORITHM:
+        raise ValueError(f"Unsupported digest algorithm: {algorithm}")
+    return True
+
+
+def flag_dto_to_cosmos_item(flag: FlagDto) -> dict:
+    """Convert flag dto to Cosmos DB item, raw digest is kept as base64 text"""
+    item = {
+        "id": flag.id,
+        "partitionKey": flag.challenge_id,
+        "challenge_id": flag.challenge_id,
+        "task_id": flag.task_id,
+        "value": flag.value,
+    }
+    if isinstance(flag.value, bytes):
+        item["value"] = base64.b64encode(flag.value).decode()
+        item[DIGEST_ALGORITHM_FIELD] = MD5_ALGORITHM
+    return item
+
+
+def cosmos_item_to_flag_dto(item: dict) -> FlagDto:
+    """Convert Cosmos DB item to flag dto"""
+    value = item["value"]
+    if _is_raw_digest(item):
+        value = base64.b64decode(value)
+    return FlagDto(
+        id=item["id"],
+        challenge_id=item["challenge_id"],
+        task_id=item["task_id"],
+        value=value,
+    )
+
+
+def cosmos_item_to_flag_change(item: dict) -> FlagChangeDto:
+    """Convert item read from Cosmos DB change feed to flag change, change feed
+    returns latest version of created and replaced items only"""
+    return FlagChangeDto(
+        operation=FLAG_UPSERT,
+        flag_id=item["id"],
+        flag=cosmos_item_to_flag_dto(item),
+        timestamp=item.get("_ts"),
+    )
+
+
+def flag_dto_to_mongo_document(flag: FlagDto) -> dict:
+    """Convert flag dto to Mongo DB document, document id is assigned by database.
+    Raw digest is kept as BSON binary"""
+    document = {
+        "challenge_id": flag.challenge_id,
+        "task_id": flag.task_id,
+        "value": flag.value,
+    }
+    if isinstance(flag.value, bytes):
+        document[DIGEST_ALGORITHM_FIELD] = MD5_ALGORITHM
+    return document
+
+
+def mongo_document_to_flag_dto(document: dict) -> FlagDto:
+    """Convert Mongo DB document to flag dto"""
+    value = document["value"]
+    if _is_raw_digest(document):
+        value = bytes(value)
+    return FlagDto(
+        id=document["_id"],
+        challenge_id=document["challenge_id"],
+        task_id=document["task_id"],
+        value=value,
+    )
+
+
+def mongo_flag_value_update(flag: FlagDto) -> dict:
+    """Update setting value of flag document together with its digest tag"""
+    if isinstance(flag.value, bytes):
+        return {"$set": {"value": flag.value, DIGEST_ALGORITHM_FIELD: MD5_ALGORITHM}}
+    return {"$set": {"value": flag.value}, "$unset": {DIGEST_ALGORITHM_FIELD: ""}}
+
+
+def unique_flags_per_task(flags: Iterable[FlagDto]) -> list[FlagDto]:
+    """Leave out flags of tasks which have more than one flag stored, the same
+    way single flag reads treat ambiguous matches"""
+    flags = list(flags)
+    task_counts = Counter(flag.task_id for flag in flags)
+    return [flag for flag in flags if task_counts[flag.task_id] == 1]
+
+
+def has_mongo_flag_index(index_information: dict) -> bool:
+    """True when collection has unique index on challenge and task ids, index
+    may be created by operators under other name"""
+    return any(
+        index.get("unique") and list(index["key"]) == MONGO_FLAG_INDEX_KEYS
+        for index in index_information.values()
+    )
+
+
+def has_cosmos_flag_unique_key(container_properties: dict) -> bool:
+    """True when container has unique key on task id, the key is set only
+    when container is created"""
+    unique_key_policy = container_properties.get("uniqueKeyPolicy") or {}
+    return any(
+        unique_key.get("paths") == ["/task_id"]
+        for unique_key in unique_key_policy.get("uniqueKeys", [])
+    )
+
+
+def mongo_flag_keys_query(flags: list[FlagDto]) -> dict:
+    """Query selecting documents of challenge and task pairs of flags"""
+    task_ids_by_challenge: dict[str, set[str]] = {}
+    for flag in flags:
+        task_ids_by_challenge.setdefault(flag.challenge_id, set()).add(flag.task_id)
+    return {
+        "$or": [
+            {"challenge_id": challenge_id, "task_id": {"$in": sorted(task_ids)}}
+            for challenge_id, task_ids in task_ids_by_challenge.items()
+        ]
+    }
+
+
+def mongo_page_query(continuation_token: str = None) -> dict:
+    """Query selecting documents after the last document of previous page,
+    documents are paged in _id order"""
+    if continuation_token is None:
+        return {}
+    try:
+        return {"_id": {"$gt": ObjectId(continuation_token)}}
+    except (InvalidId, TypeError) as error:
+        raise ValueError("Invalid continuation token") from error
+
+
+def mongo_documents_to_page(documents: list[dict], page_size: int) -> FlagPageDto:
+    """Builds page from up to page_size + 1 documents, the extra document only
+    tells whether next page exists"""
+    has_next_page = len(documents) > page_size
+    documents = documents[:page_size]
+    return FlagPageDto(
+        flags=[mongo_document_to_flag_dto(document) for document in documents],
+        continuation_token=str(documents[-1]["_id"]) if has_next_page else None,
+    )
+
+
+def mongo_change_to_flag_change(change: dict) -> FlagChangeDto:
+    """Convert Mongo DB change stream event to flag change, returns None for
+    events which do not change single flag"""
+    cluster_time = change.get("clusterTime")
+    timestamp = cluster_time.time if cluster_time is not None else None
+    operation = change["operationType"]
+    if operation == "delete":
+        return FlagChangeDto(
+            operation=FLAG_DELETE,
+            flag_id=change["documentKey"]["_id"],
+            timestamp=timestamp,
+        )
+    if operation not in ("insert", "update", "replace"):
+        return None
+    document = change.get("fullDocument")
+    if document is None:
+        # document was deleted before update was looked up, delete event follows
+        return None
+    return FlagChangeDto(
+        operation=FLAG_UPSERT,
+        flag_id=document["_id"],
+        flag=mongo_document_to_flag_dto(document),
+        timestamp=timestamp,
+    )
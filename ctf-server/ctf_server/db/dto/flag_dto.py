@@ -4,8 +4,9 @@ from dataclasses import dataclass
 
 @dataclass
 class FlagDto:
-    """Class for Flag DTO"""
+    """Class for Flag DTO, value is hex string or raw digest bytes"""
+
     id: str
-    value: str
+    value: str | bytes
     challenge_id: str
     task_id: str
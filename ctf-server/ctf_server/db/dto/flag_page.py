@@ -0,0 +1,11 @@
+"""Flag page Data Transfer Object"""
+from dataclasses import dataclass
+from ctf_server.db.dto.flag_dto import FlagDto
+
+
+@dataclass
+class FlagPageDto:
+    """Class for page of flags read from storage"""
+
+    flags: list[FlagDto]
+    continuation_token: str | None
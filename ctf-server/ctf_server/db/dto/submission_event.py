@@ -0,0 +1,18 @@
+"""Submission Event Data Transfer Object"""
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+@dataclass
+class SubmissionEventDto:
+    """Single flag submission kept in submission log, team id is None when
+    request did not identify team. Id is assigned once, so batch written
+    again after partial failure does not duplicate events"""
+
+    team_id: str | None
+    challenge_id: str
+    task_id: str
+    state: str
+    timestamp: datetime
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
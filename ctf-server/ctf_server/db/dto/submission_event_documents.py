@@ -0,0 +1,83 @@
+"""Conversions between Submission Event DTO and documents kept in databases"""
+
+import json
+from datetime import datetime, timezone
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+
+
+def submission_event_to_mongo_document(event: SubmissionEventDto) -> dict:
+    """Convert submission event to Mongo DB document, timestamp is kept as date"""
+    return {
+        "_id": event.id,
+        "team_id": event.team_id,
+        "challenge_id": event.challenge_id,
+        "task_id": event.task_id,
+        "state": event.state,
+        "timestamp": event.timestamp,
+    }
+
+
+def submission_event_to_cosmos_item(event: SubmissionEventDto) -> dict:
+    """Convert submission event to Cosmos DB item partitioned by challenge"""
+    return {
+        "id": event.id,
+        "partitionKey": event.challenge_id,
+        "team_id": event.team_id,
+        "challenge_id": event.challenge_id,
+        "task_id": event.task_id,
+        "state": event.state,
+        "timestamp": event.timestamp.isoformat(),
+    }
+
+
+def submission_event_to_json_line(event: SubmissionEventDto) -> str:
+    """Convert submission event to single line of JSON lines file"""
+    return (
+        json.dumps(
+            {
+                "id": event.id,
+                "team_id": event.team_id,
+                "challenge_id": event.challenge_id,
+                "task_id": event.task_id,
+                "state": event.state,
+                "timestamp": event.timestamp.isoformat(),
+            }
+        )
+        + "\n"
+    )
+
+
+def _utc(timestamp: datetime) -> datetime:
+    """Mongo DB returns naive dates, all timestamps are compared as UTC"""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def mongo_document_to_submission_event(document: dict) -> SubmissionEventDto:
+    """Convert Mongo DB document to submission event"""
+    return SubmissionEventDto(
+        id=document["_id"],
+        team_id=document["team_id"],
+        challenge_id=document["challenge_id"],
+        task_id=document["task_id"],
+        state=document["state"],
+        timestamp=_utc(document["timestamp"]),
+    )
+
+
+def cosmos_item_to_submission_event(item: dict) -> SubmissionEventDto:
+    """Convert Cosmos DB item or parsed JSON line to submission event"""
+    return SubmissionEventDto(
+        id=item["id"],
+        team_id=item["team_id"],
+        challenge_id=item["challenge_id"],
+        task_id=item["task_id"],
+        state=item["state"],
+        timestamp=_utc(datetime.fromisoformat(item["timestamp"])),
+    )
+
+
+def json_line_to_submission_event(line: str) -> SubmissionEventDto:
+    """Convert single line of JSON lines file to submission event"""
+    return cosmos_item_to_submission_event(json.loads(line))
@@ -0,0 +1,182 @@
+"""Storage wrappers recording latency of every storage call"""
+
+import time
+from typing import AsyncIterator, Callable, Iterator
+from ctf_server import config
+from ctf_server.core.metrics import STORAGE_ERRORS, STORAGE_SECONDS
+from ctf_server.core.request_timing import record_span
+from ctf_server.db.async_storage_service import AsyncStorageService
+from ctf_server.db.dto.flag_change import FlagChangeDto
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.storage_service import StorageService
+from ctf_server.model.flag_import import ImportStatus
+
+
+def is_storage_instrumented() -> bool:
+    """True when storage calls are timed for metrics or Server-Timing header"""
+    return config.metrics["enabled"] or config.server_timing["enabled"]
+
+
+class InstrumentedStorage(StorageService):
+    """Passes calls to wrapped storage and records their latency and errors
+    labelled by backend and operation, latency is also added to breakdown of
+    current request"""
+
+    def __init__(self, storage: StorageService, backend: str) -> None:
+        self._storage = storage
+        self._backend = backend
+
+    @property
+    def storage(self) -> StorageService:
+        """Wrapped storage"""
+        return self._storage
+
+    @property
+    def supports_change_stream(self) -> bool:
+        return self._storage.supports_change_stream
+
+    def _record(self, operation: str, seconds: float) -> None:
+        STORAGE_SECONDS.observe(seconds, self._backend, operation)
+        record_span(f"storage.{operation}", seconds)
+
+    def _call(self, operation: str, function: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        except Exception:
+            STORAGE_ERRORS.inc(self._backend, operation)
+            raise
+        finally:
+            self._record(operation, time.perf_counter() - started)
+
+    def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        return self._call("get_flag", self._storage.get_flag, challenge_id, task_id)
+
+    def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        return self._call("get_flags", self._storage.get_flags, challenge_id, task_ids)
+
+    def get_all_flags(self) -> list[FlagDto]:
+        return self._call("get_all_flags", self._storage.get_all_flags)
+
+    def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        return self._call(
+            "get_flags_page",
+            self._storage.get_flags_page,
+            page_size,
+            continuation_token,
+        )
+
+    def iter_all_flags(self) -> Iterator[FlagDto]:
+        """Iterate over all flags, whole iteration is recorded as one call"""
+        started = time.perf_counter()
+        try:
+            yield from self._storage.iter_all_flags()
+        except Exception:
+            STORAGE_ERRORS.inc(self._backend, "iter_all_flags")
+            raise
+        finally:
+            self._record("iter_all_flags", time.perf_counter() - started)
+
+    def create_flag(self, flag: FlagDto) -> FlagDto:
+        return self._call("create_flag", self._storage.create_flag, flag)
+
+    def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        return self._call("create_flags", self._storage.create_flags, flags)
+
+    def update_flag(self, flag: FlagDto) -> FlagDto:
+        return self._call("update_flag", self._storage.update_flag, flag)
+
+    def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        return self._call(
+            "delete_flag", self._storage.delete_flag, challenge_id, flag_id
+        )
+
+    def close(self) -> None:
+        self._storage.close()
+
+    def open_change_stream(self) -> Iterator[FlagChangeDto]:
+        return self._storage.open_change_stream()
+
+
+class AsyncInstrumentedStorage(AsyncStorageService):
+    """Passes coroutine calls to wrapped storage and records their latency
+    and errors labelled by backend and operation, latency is also added to
+    breakdown of current request"""
+
+    def __init__(self, storage: AsyncStorageService, backend: str) -> None:
+        self._storage = storage
+        self._backend = backend
+
+    @property
+    def storage(self) -> AsyncStorageService:
+        """Wrapped storage"""
+        return self._storage
+
+    def _record(self, operation: str, seconds: float) -> None:
+        STORAGE_SECONDS.observe(seconds, self._backend, operation)
+        record_span(f"storage.{operation}", seconds)
+
+    async def _call(self, operation: str, function: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return await function(*args)
+        except Exception:
+            STORAGE_ERRORS.inc(self._backend, operation)
+            raise
+        finally:
+            self._record(operation, time.perf_counter() - started)
+
+    async def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        return await self._call(
+            "get_flag", self._storage.get_flag, challenge_id, task_id
+        )
+
+    async def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        return await self._call(
+            "get_flags", self._storage.get_flags, challenge_id, task_ids
+        )
+
+    async def get_all_flags(self) -> list[FlagDto]:
+        return await self._call("get_all_flags", self._storage.get_all_flags)
+
+    async def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        return await self._call(
+            "get_flags_page",
+            self._storage.get_flags_page,
+            page_size,
+            continuation_token,
+        )
+
+    async def iter_all_flags(self) -> AsyncIterator[FlagDto]:
+        """Iterate over all flags, whole iteration is recorded as one call"""
+        started = time.perf_counter()
+        try:
+            async for flag in self._storage.iter_all_flags():
+                yield flag
+        except Exception:
+            STORAGE_ERRORS.inc(self._backend, "iter_all_flags")
+            raise
+        finally:
+            self._record("iter_all_flags", time.perf_counter() - started)
+
+    async def create_flag(self, flag: FlagDto) -> FlagDto:
+        return await self._call("create_flag", self._storage.create_flag, flag)
+
+    async def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        return await self._call("create_flags", self._storage.create_flags, flags)
+
+    async def update_flag(self, flag: FlagDto) -> FlagDto:
+        return await self._call("update_flag", self._storage.update_flag, flag)
+
+    async def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        return await self._call(
+            "delete_flag", self._storage.delete_flag, challenge_id, flag_id
+        )
+
+    async def close(self) -> None:
+        await self._storage.close()
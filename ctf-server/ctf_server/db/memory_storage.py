@@ -0,0 +1,175 @@
+"""Storage keeping flags in process memory"""
+
+import bisect
+import dataclasses
+import itertools
+import logging
+import re
+import threading
+from typing import Iterator
+from ctf_server import config
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.storage_service import StorageService
+from ctf_server.model.flag_import import ImportStatus
+
+_FLAG_ID_PATTERN = re.compile(r"[0-9a-f]{24}")
+
+
+class InMemoryStorage(StorageService):
+    """
+    Keeps flags in dict indexed by challenge and task ids, with secondary
+    index of flag ids used by paging and deletes. Flags get increasing
+    ids in the same format as Mongo DB object ids, so pages are ordered by
+    id like in Mongo DB. Flags are copied in and out, so changing returned
+    flag does not change stored one. Storage is local to the process and
+    lost on restart, it is meant for tests, load tests and local runs.
+    """
+
+    _PAGE_SIZE = config.flag_listing["default_page_size"]
+
+    def __init__(self) -> None:
+        self._flags: dict[tuple[str, str], FlagDto] = {}
+        self._keys_by_id: dict[str, tuple[str, str]] = {}
+        self._ids: list[str] = []
+        self._id_counter = itertools.count(1)
+        self._lock = threading.Lock()
+        logging.info("MEMORY_STORAGE::Storage ready")
+
+    def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get flag from storage based on task and challenge ids"""
+        with self._lock:
+            flag = self._flags.get((challenge_id, task_id))
+        if flag is None:
+            logging.debug(
+                "MEMORY_STORAGE::Flag not found [challenge_id=%s, task_id=%s]",
+                challenge_id,
+                task_id,
+            )
+            return None
+        return dataclasses.replace(flag)
+
+    def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge"""
+        with self._lock:
+            flags = [
+                self._flags[(challenge_id, task_id)]
+                for task_id in dict.fromkeys(task_ids)
+                if (challenge_id, task_id) in self._flags
+            ]
+        return [dataclasses.replace(flag) for flag in flags]
+
+    def get_all_flags(self) -> list[FlagDto]:
+        """Get all flags from storage"""
+        return list(self.iter_all_flags())
+
+    def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags ordered by flag id"""
+        if continuation_token is not None and not _FLAG_ID_PATTERN.fullmatch(
+            continuation_token
+        ):
+            raise ValueError("Invalid continuation token")
+        with self._lock:
+            start = (
+                bisect.bisect_right(self._ids, continuation_token)
+                if continuation_token is not None
+                else 0
+            )
+            page_ids = self._ids[start : start + page_size]
+            has_next_page = start + page_size < len(self._ids)
+            flags = [self._flags[self._keys_by_id[flag_id]] for flag_id in page_ids]
+        return FlagPageDto(
+            flags=[dataclasses.replace(flag) for flag in flags],
+            continuation_token=page_ids[-1] if has_next_page and page_ids else None,
+        )
+
+    def iter_all_flags(self) -> Iterator[FlagDto]:
+        """Iterate over all flags in id order, page by page"""
+        continuation_token = None
+        while True:
+            page = self.get_flags_page(self._PAGE_SIZE, continuation_token)
+            yield from page.flags
+            if page.continuation_token is None:
+                return
+            continuation_token = page.continuation_token
+
+    def create_flag(self, flag: FlagDto) -> FlagDto:
+        """Create flag for task and challenge, flag gets new id"""
+        with self._lock:
+            saved_flag = self._insert(flag)
+        if saved_flag is None:
+            logging.error(
+                "MEMORY_STORAGE::Flag already exists [challenge_id=%s, task_id=%s]",
+                flag.challenge_id,
+                flag.task_id,
+            )
+            return None
+        logging.debug("MEMORY_STORAGE::Flag saved correctly id=%s", saved_flag.id)
+        return dataclasses.replace(saved_flag)
+
+    def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """Create many flags under single lock, flags of tasks which already
+        have flag are duplicates"""
+        with self._lock:
+            statuses = [
+                ImportStatus.CREATED
+                if self._insert(flag) is not None
+                else ImportStatus.DUPLICATE
+                for flag in flags
+            ]
+        logging.debug(
+            "MEMORY_STORAGE::Bulk insert of %d flags, duplicates = %d",
+            len(flags),
+            statuses.count(ImportStatus.DUPLICATE),
+        )
+        return statuses
+
+    def update_flag(self, flag: FlagDto) -> FlagDto:
+        """Update flag value based on challenge and task ids"""
+        key = (flag.challenge_id, flag.task_id)
+        with self._lock:
+            stored_flag = self._flags.get(key)
+            if stored_flag is not None:
+                stored_flag = self._flags[key] = dataclasses.replace(
+                    stored_flag, value=flag.value
+                )
+        if stored_flag is None:
+            logging.error(
+                "MEMORY_STORAGE::Flag to update not found [challenge_id=%s, task_id=%s]",
+                flag.challenge_id,
+                flag.task_id,
+            )
+            return None
+        logging.debug(
+            "MEMORY_STORAGE::Flag with id=%s updated successfully", stored_flag.id
+        )
+        return dataclasses.replace(stored_flag)
+
+    def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        """Delete flag based on challenge and flag ids"""
+        with self._lock:
+            key = self._keys_by_id.get(flag_id)
+            deleted = key is not None and key[0] == challenge_id
+            if deleted:
+                del self._keys_by_id[flag_id]
+                del self._flags[key]
+                del self._ids[bisect.bisect_left(self._ids, flag_id)]
+        if not deleted:
+            logging.error("MEMORY_STORAGE::Could not delete flag with id=%s", flag_id)
+            return False
+        logging.debug("MEMORY_STORAGE::Flag with id=%s successfully deleted", flag_id)
+        return True
+
+    def _insert(self, flag: FlagDto) -> FlagDto:
+        """Store copy of flag with new id, returns None if task already has
+        flag. Has to be called with lock held"""
+        key = (flag.challenge_id, flag.task_id)
+        if key in self._flags:
+            return None
+        saved_flag = dataclasses.replace(flag, id=f"{next(self._id_counter):024x}")
+        self._flags[key] = saved_flag
+        self._keys_by_id[saved_flag.id] = key
+        self._ids.append(saved_flag.id)
+        return saved_flag
@@ -0,0 +1,223 @@
+"""Process-wide registry of pooled Mongo DB clients"""
+
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+from ctf_server import config
+
+
+@dataclass
+class MongoPoolStats:
+    """
+    Connection pool counters summed over all registered clients. Every
+    client keeps one pool per server, each pool holds at most max_pool_size
+    connections, so single process can open up to
+    clients * pools * max_pool_size connections.
+    """
+
+    clients: int = 0
+    pools: int = 0
+    max_pool_size: int = 0
+    open_connections: int = 0
+    checked_out_connections: int = 0
+    waiting_check_outs: int = 0
+    check_out_failures: int = 0
+    pool_clears: int = 0
+
+
+class _PoolListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events of single client, events are published
+    by driver threads"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.pools = 0
+        self.open_connections = 0
+        self.checked_out_connections = 0
+        self.waiting_check_outs = 0
+        self.check_out_failures = 0
+        self.pool_clears = 0
+
+    def _add(self, **counters: int) -> None:
+        with self._lock:
+            for name, amount in counters.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def counters(self) -> dict[str, int]:
+        """Current values of all counters"""
+        with self._lock:
+            return {
+                "pools": self.pools,
+                "open_connections": self.open_connections,
+                "checked_out_connections": self.checked_out_connections,
+                "waiting_check_outs": self.waiting_check_outs,
+                "check_out_failures": self.check_out_failures,
+                "pool_clears": self.pool_clears,
+            }
+
+    def pool_created(self, event) -> None:
+        self._add(pools=1)
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        self._add(pool_clears=1)
+
+    def pool_closed(self, event) -> None:
+        self._add(pools=-1)
+
+    def connection_created(self, event) -> None:
+        self._add(open_connections=1)
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self._add(open_connections=-1)
+
+    def connection_check_out_started(self, event) -> None:
+        self._add(waiting_check_outs=1)
+
+    def connection_check_out_failed(self, event) -> None:
+        self._add(waiting_check_outs=-1, check_out_failures=1)
+
+    def connection_checked_out(self, event) -> None:
+        self._add(waiting_check_outs=-1, checked_out_connections=1)
+
+    def connection_checked_in(self, event) -> None:
+        self._add(checked_out_connections=-1)
+
+
+@dataclass
+class _RegisteredClient:
+    client: MongoClient | AsyncIOMotorClient
+    listener: _PoolListener
+    references: int = 0
+
+
+_clients: dict[tuple, _RegisteredClient] = {}
+_clients_lock = threading.Lock()
+
+
+def mongo_client_options() -> dict:
+    """
+    Keyword arguments of every registered client built from mongo config,
+    empty and zero settings are left to driver defaults.
+
+    Returns:
+        dict: MongoClient keyword arguments
+    """
+    settings = config.mongo
+    options = {
+        "maxPoolSize": settings["max_pool_size"],
+        "minPoolSize": settings["min_pool_size"],
+        "serverSelectionTimeoutMS": settings["server_selection_timeout_ms"],
+    }
+    if settings["wait_queue_timeout_ms"]:
+        options["waitQueueTimeoutMS"] = settings["wait_queue_timeout_ms"]
+    if settings["compressors"]:
+        options["compressors"] = settings["compressors"]
+    if settings["read_concern"]:
+        options["readConcernLevel"] = settings["read_concern"]
+    if settings["write_concern"]:
+        write_concern = settings["write_concern"]
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    return options
+
+
+def _acquire(key: tuple, client_class: type, connection_string: str):
+    with _clients_lock:
+        registered = _clients.get(key)
+        if registered is None:
+            listener = _PoolListener()
+            client = client_class(
+                connection_string, event_listeners=[listener], **mongo_client_options()
+            )
+            registered = _clients[key] = _RegisteredClient(client, listener)
+            logging.info("MONGO_CLIENTS::Created %s", client_class.__name__)
+        registered.references += 1
+        return registered.client
+
+
+def acquire_mongo_client(connection_string: str) -> MongoClient:
+    """
+    Shared client of connection string, created on first use. Clients are not
+    shared with forked processes, child process gets its own client.
+
+    Args:
+        connection_string (str): Mongo DB connection string
+
+    Returns:
+        MongoClient: pooled client, has to be released instead of closed
+    """
+    return _acquire(
+        ("sync", os.getpid(), connection_string), MongoClient, connection_string
+    )
+
+
+def acquire_async_mongo_client(connection_string: str) -> AsyncIOMotorClient:
+    """
+    Shared motor client of connection string and running event loop. Motor
+    client is bound to the loop which used it first, so every loop gets its
+    own client.
+
+    Args:
+        connection_string (str): Mongo DB connection string
+
+    Returns:
+        AsyncIOMotorClient: pooled client, has to be released instead of closed
+    """
+    loop = asyncio.get_running_loop()
+    return _acquire(
+        ("async", os.getpid(), loop, connection_string),
+        AsyncIOMotorClient,
+        connection_string,
+    )
+
+
+def release_mongo_client(client: MongoClient | AsyncIOMotorClient) -> None:
+    """Drop one reference to client, client is closed with its pool when no
+    user is left"""
+    with _clients_lock:
+        for key, registered in _clients.items():
+            if registered.client is client:
+                registered.references -= 1
+                if registered.references > 0:
+                    return
+                del _clients[key]
+                break
+        else:
+            return
+    client.close()
+    logging.info("MONGO_CLIENTS::Closed %s", type(client).__name__)
+
+
+def close_mongo_clients() -> None:
+    """Close every registered client regardless of references"""
+    with _clients_lock:
+        registered_clients = list(_clients.values())
+        _clients.clear()
+    for registered in registered_clients:
+        registered.client.close()
+    logging.info("MONGO_CLIENTS::Closed %d clients", len(registered_clients))
+
+
+def mongo_pool_stats() -> MongoPoolStats:
+    """Connection pool counters of clients registered by this process"""
+    stats = MongoPoolStats(max_pool_size=config.mongo["max_pool_size"])
+    with _clients_lock:
+        listeners = [
+            registered.listener
+            for key, registered in _clients.items()
+            if key[1] == os.getpid()
+        ]
+    for listener in listeners:
+        stats.clients += 1
+        for name, value in listener.counters().items():
+            setattr(stats, name, getattr(stats, name) + value)
+    return stats
@@ -1,10 +1,39 @@
 """Proxy for Mongo DB"""
 
 import logging
-from pymongo import MongoClient
+from typing import Iterator
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from ctf_server import config
+from ctf_server.db.mongo_client_registry import (
+    acquire_mongo_client,
+    release_mongo_client,
+)
 from ctf_server.db.storage_service import StorageService
+from ctf_server.db.bulk_write import (
+    MONGO_DUPLICATE_KEY_ERROR,
+    mongo_bulk_insert_statuses,
+    split_stored_flags,
+)
+from ctf_server.db.dto.flag_change import FlagChangeDto
 from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.dto.flag_documents import (
+    MONGO_FLAG_INDEX_KEYS,
+    MONGO_FLAG_INDEX_NAME,
+    MONGO_FLAG_PROJECTION,
+    flag_dto_to_mongo_document,
+    has_mongo_flag_index,
+    mongo_change_to_flag_change,
+    mongo_document_to_flag_dto,
+    mongo_documents_to_page,
+    mongo_flag_keys_query,
+    mongo_flag_value_update,
+    mongo_page_query,
+    unique_flags_per_task,
+)
+from ctf_server.model.flag_import import ImportStatus
 
 
 class MongodbProxy(StorageService):
@@ -13,58 +42,223 @@ class MongodbProxy(StorageService):
     _CONNECTION_STRING = config.mongo["connection_string"]
     _DATABASE_ID = config.mongo["database_id"]
     _COLLECTION_ID = config.mongo["collection_id"]
+    _ENSURE_INDEXES = config.mongo["ensure_indexes"]
+    _PAGE_SIZE = config.flag_listing["default_page_size"]
+    _CHANGE_POLL_SECONDS = config.flag_replica["poll_interval_seconds"]
+    supports_change_stream = True
 
-    def __init__(self, connection_string: str = _CONNECTION_STRING) -> None:
-        self._client = MongoClient(connection_string)
+    def __init__(
+        self,
+        connection_string: str = _CONNECTION_STRING,
+        ensure_indexes: bool = _ENSURE_INDEXES,
+    ) -> None:
+        self._client = acquire_mongo_client(connection_string)
         self._database = self._client[self._DATABASE_ID]
         self._collection = self._database[self._COLLECTION_ID]
+        self._unique_index = self._prepare_indexes(ensure_indexes)
         logging.info("MONGODB_PROXY::Database connection ready")
 
+    def ensure_indexes(self) -> bool:
+        """
+        Creates unique index on challenge and task ids, does nothing when index
+        already exists. Index cannot be created while collection contains
+        duplicated flags.
+
+        Returns:
+            bool: True if index is present
+        """
+        try:
+            self._collection.create_index(
+                MONGO_FLAG_INDEX_KEYS, name=MONGO_FLAG_INDEX_NAME, unique=True
+            )
+        except OperationFailure as error:
+            logging.error("MONGODB_PROXY::Flag index creation failed: %s", error)
+            return False
+        logging.debug("MONGODB_PROXY::Flag index %s ready", MONGO_FLAG_INDEX_NAME)
+        return True
+
+    def _prepare_indexes(self, ensure_indexes: bool) -> bool:
+        """
+        Unique index is the guard against duplicated flags, so proxy is not
+        created when index cannot be built. When index bootstrap is turned off
+        and index is missing, stored flags are looked up before every insert.
+
+        Raises:
+            RuntimeError: index could not be created
+
+        Returns:
+            bool: True if unique index is present
+        """
+        if ensure_indexes:
+            if not self.ensure_indexes():
+                raise RuntimeError(
+                    f"Mongo DB flag index {MONGO_FLAG_INDEX_NAME} could not be created"
+                )
+            return True
+        if has_mongo_flag_index(self._collection.index_information()):
+            return True
+        logging.warning(
+            "MONGODB_PROXY::Unique flag index missing, flags are looked up "
+            "before insert"
+        )
+        return False
+
+    @property
+    def collection(self) -> Collection:
+        """Collection keeping flags"""
+        return self._collection
+
     def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
         """Get flag from storage based on task and challenge ids"""
         matching_flags = list(
-            self._collection.find({"challenge_id": challenge_id, "task_id": task_id})
+            self._collection.find(
+                {"challenge_id": challenge_id, "task_id": task_id},
+                MONGO_FLAG_PROJECTION,
+            ).limit(2)
         )
+        if not matching_flags:
+            logging.debug(
+                "MONGODB_PROXY::Flag not found [challenge_id=%s, task_id=%s]",
+                challenge_id,
+                task_id,
+            )
+            return None
         query_matches = len(matching_flags)
         if query_matches != 1:
             logging.error("MONGODB_PROXY::Invalid flag count find: %d", query_matches)
             return None
         logging.debug("MONGODB_PROXY::Flag successfully found in DB")
-        return self._document_to_dto(matching_flags[0])
+        return mongo_document_to_flag_dto(matching_flags[0])
+
+    def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge with single query"""
+        matching_flags = self._collection.find(
+            {"challenge_id": challenge_id, "task_id": {"$in": list(task_ids)}},
+            MONGO_FLAG_PROJECTION,
+        )
+        flag_dtos = unique_flags_per_task(
+            mongo_document_to_flag_dto(flag_doc) for flag_doc in matching_flags
+        )
+        logging.debug(
+            "MONGODB_PROXY::Flags of challenge_id=%s found in DB count = %d",
+            challenge_id,
+            len(flag_dtos),
+        )
+        return flag_dtos
 
     def get_all_flags(self) -> list[FlagDto]:
         """Get all flags from storage"""
-        flags = self._collection.find()
-        flag_dtos = [self._document_to_dto(flag_doc) for flag_doc in flags]
+        flags = self._collection.find(projection=MONGO_FLAG_PROJECTION)
+        flag_dtos = [mongo_document_to_flag_dto(flag_doc) for flag_doc in flags]
         logging.debug("MONGODB_PROXY::All flags retrived count = %d", len(flag_dtos))
         return flag_dtos
 
-    def create_flag(self, flag: FlagDto) -> FlagDto:
-        """Create flag for task and challenge"""
-        insert_result = self._collection.insert_one(
-            document=self._dto_to_document(flag)
+    def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags ordered by document id"""
+        documents = list(
+            self._collection.find(
+                mongo_page_query(continuation_token), MONGO_FLAG_PROJECTION
+            )
+            .sort("_id", ASCENDING)
+            .limit(page_size + 1)
         )
+        return mongo_documents_to_page(documents, page_size)
+
+    def iter_all_flags(self) -> Iterator[FlagDto]:
+        """Iterate over all flags as cursor fetches them"""
+        for flag_doc in self._collection.find(
+            projection=MONGO_FLAG_PROJECTION, batch_size=self._PAGE_SIZE
+        ):
+            yield mongo_document_to_flag_dto(flag_doc)
+
+    def create_flag(self, flag: FlagDto) -> FlagDto:
+        """Create flag for task and challenge with single insert, duplicate is
+        rejected by unique index. Saved flag is built from inserted document
+        instead of reading it back"""
+        document = flag_dto_to_mongo_document(flag)
+        try:
+            if not self._unique_index:
+                self._reject_stored_flag(flag)
+            insert_result = self._collection.insert_one(document=document)
+        except DuplicateKeyError:
+            logging.error(
+                "MONGODB_PROXY::Flag already exists [challenge_id=%s, task_id=%s]",
+                flag.challenge_id,
+                flag.task_id,
+            )
+            return None
         logging.debug(
             "MONGODB_PROXY::Flag inserted correctly id=%s", insert_result.inserted_id
         )
-        get_inserted_query = {"_id": insert_result.inserted_id}
-        saved_flag = self._collection.find(get_inserted_query)[0]
-        return self._document_to_dto(saved_flag)
+        return mongo_document_to_flag_dto(
+            {**document, "_id": insert_result.inserted_id}
+        )
+
+    def _reject_stored_flag(self, flag: FlagDto) -> None:
+        """Raises the error unique index would raise when flag is stored"""
+        if self._collection.find_one(
+            {"challenge_id": flag.challenge_id, "task_id": flag.task_id}, {"_id": 1}
+        ):
+            raise DuplicateKeyError("Flag already exists", MONGO_DUPLICATE_KEY_ERROR)
+
+    def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """Create many flags with single unordered insert, duplicates are
+        rejected by unique index"""
+        if not flags:
+            return []
+        if self._unique_index:
+            return self._insert_flags(flags)
+        stored_keys = {
+            (document["challenge_id"], document["task_id"])
+            for document in self._collection.find(
+                mongo_flag_keys_query(flags), {"challenge_id": 1, "task_id": 1}
+            )
+        }
+        statuses, new_indexes = split_stored_flags(flags, stored_keys)
+        new_statuses = self._insert_flags([flags[index] for index in new_indexes])
+        for index, status in zip(new_indexes, new_statuses):
+            statuses[index] = status
+        return statuses
+
+    def _insert_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        if not flags:
+            return []
+        write_errors = []
+        try:
+            self._collection.insert_many(
+                [flag_dto_to_mongo_document(flag) for flag in flags], ordered=False
+            )
+        except BulkWriteError as error:
+            write_errors = error.details["writeErrors"]
+        logging.debug(
+            "MONGODB_PROXY::Bulk insert of %d flags, failed = %d",
+            len(flags),
+            len(write_errors),
+        )
+        return mongo_bulk_insert_statuses(len(flags), write_errors)
 
     def update_flag(self, flag: FlagDto) -> FlagDto:
-        """Update flag document based on flag id"""
-        query = {"challenge_id": flag.challenge_id, "task_id": flag.task_id}
-        updated_values = {"$set": {"value": flag.value}}
-        update_result = self._collection.update_one(query, updated_values)
-        if update_result.modified_count != 1:
+        """Update flag value and read updated document with single
+        find_one_and_update"""
+        updated_flag = self._collection.find_one_and_update(
+            {"challenge_id": flag.challenge_id, "task_id": flag.task_id},
+            mongo_flag_value_update(flag),
+            projection=MONGO_FLAG_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated_flag is None:
             logging.error(
-                "MONGODB_PROXY::Invalid updated flag count: %d",
-                update_result.modified_count,
+                "MONGODB_PROXY::Flag to update not found [challenge_id=%s, task_id=%s]",
+                flag.challenge_id,
+                flag.task_id,
             )
             return None
-        updated_flag = self._collection.find(query)[0]
-        logging.debug("MONGODB_PROXY::Flag with id=%s updated successfully", flag.id)
-        return self._document_to_dto(updated_flag)
+        logging.debug(
+            "MONGODB_PROXY::Flag with id=%s updated successfully", updated_flag["_id"]
+        )
+        return mongo_document_to_flag_dto(updated_flag)
 
     def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
         """Delete flag based on challenge and task ids"""
@@ -81,17 +275,25 @@ class MongodbProxy(StorageService):
         )
         return False
 
-    def _dto_to_document(self, flag_dto: FlagDto):
-        return {
-            "challenge_id": flag_dto.challenge_id,
-            "task_id": flag_dto.task_id,
-            "value": flag_dto.value,
-        }
+    def close(self) -> None:
+        """Release shared Mongo DB client"""
+        if self._client is not None:
+            release_mongo_client(self._client)
+            self._client = None
 
-    def _document_to_dto(self, flag_doc) -> FlagDto:
-        return FlagDto(
-            id=flag_doc["_id"],
-            challenge_id=flag_doc["challenge_id"],
-            task_id=flag_doc["task_id"],
-            value=flag_doc["value"],
+    def open_change_stream(self) -> Iterator[FlagChangeDto]:
+        """Watch flag collection with change stream, requires replica set"""
+        stream = self._collection.watch(
+            full_document="updateLookup",
+            max_await_time_ms=int(self._CHANGE_POLL_SECONDS * 1000),
         )
+        logging.debug("MONGODB_PROXY::Change stream opened")
+        return self._read_change_stream(stream)
+
+    @staticmethod
+    def _read_change_stream(stream) -> Iterator[FlagChangeDto]:
+        with stream:
+            while stream.alive:
+                change = stream.try_next()
+                yield mongo_change_to_flag_change(change) if change else None
+        logging.debug("MONGODB_PROXY::Change stream closed")
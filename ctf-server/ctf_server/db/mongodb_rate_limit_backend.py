@@ -0,0 +1,101 @@
+"""Token buckets shared by many nodes through Mongo DB"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from ctf_server import config
+from ctf_server.db.mongo_client_registry import acquire_mongo_client
+from ctf_server.db.rate_limit_backend import RateLimitBackend
+
+
+class MongodbRateLimitBackend(RateLimitBackend):
+    """
+    Keeps every bucket in single document updated atomically with pipeline
+    update, so nodes sharing the collection share limits. Buckets which
+    would be full again are removed by TTL index.
+    """
+
+    is_blocking = True
+
+    _CONNECTION_STRING = config.mongo["connection_string"]
+    _DATABASE_ID = config.mongo["database_id"]
+    _COLLECTION_ID = config.rate_limit["mongodb_collection"]
+
+    def __init__(self, connection_string: str = _CONNECTION_STRING) -> None:
+        self._client = acquire_mongo_client(connection_string)
+        self._collection = self._client[self._DATABASE_ID][self._COLLECTION_ID]
+        try:
+            self._collection.create_index(
+                "expires_at", name="expires_at_ttl", expireAfterSeconds=0
+            )
+        except OperationFailure as error:
+            logging.error("MONGODB_RATE_LIMIT::TTL index creation failed: %s", error)
+        logging.info("MONGODB_RATE_LIMIT::Database connection ready")
+
+    def acquire(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        now = time.time()
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=capacity / rate)
+        refilled_tokens = {
+            "$min": [
+                capacity,
+                {
+                    "$add": [
+                        {"$ifNull": ["$tokens", capacity]},
+                        {
+                            "$multiply": [
+                                {
+                                    "$max": [
+                                        0,
+                                        {
+                                            "$subtract": [
+                                                now,
+                                                {"$ifNull": ["$updated_at", now]},
+                                            ]
+                                        },
+                                    ]
+                                },
+                                rate,
+                            ]
+                        },
+                    ]
+                },
+            ]
+        }
+        pipeline = [
+            {"$set": {"tokens": refilled_tokens, "updated_at": now}},
+            {
+                "$set": {
+                    "allowed": {"$gte": ["$tokens", cost]},
+                    "expires_at": expires_at,
+                }
+            },
+            {
+                "$set": {
+                    "tokens": {
+                        "$cond": [
+                            "$allowed",
+                            {"$subtract": ["$tokens", cost]},
+                            "$tokens",
+                        ]
+                    }
+                }
+            },
+        ]
+        try:
+            bucket = self._update_bucket(key, pipeline)
+        except DuplicateKeyError:
+            # two nodes created the same bucket at once, the retry updates it
+            bucket = self._update_bucket(key, pipeline)
+        if bucket["allowed"]:
+            return 0.0
+        return (cost - bucket["tokens"]) / rate
+
+    def _update_bucket(self, key: str, pipeline: list[dict]) -> dict:
+        return self._collection.find_one_and_update(
+            {"_id": key},
+            pipeline,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
@@ -0,0 +1,60 @@
+"""Submission log kept in Mongo DB"""
+
+import logging
+from typing import Iterator
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
+from ctf_server import config
+from ctf_server.db.bulk_write import MONGO_DUPLICATE_KEY_ERROR
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.db.dto.submission_event_documents import (
+    mongo_document_to_submission_event,
+    submission_event_to_mongo_document,
+)
+from ctf_server.db.mongo_client_registry import (
+    acquire_mongo_client,
+    release_mongo_client,
+)
+from ctf_server.db.submission_log_sink import SubmissionLogSink
+
+
+class MongodbSubmissionLogSink(SubmissionLogSink):
+    """Inserts every batch with single unordered insert_many. Events written
+    by earlier, partially failed attempt are skipped as duplicates"""
+
+    _CONNECTION_STRING = config.mongo["connection_string"]
+    _DATABASE_ID = config.mongo["database_id"]
+    _COLLECTION_ID = config.submission_log["mongodb_collection"]
+
+    def __init__(self, connection_string: str = _CONNECTION_STRING) -> None:
+        self._client = acquire_mongo_client(connection_string)
+        self._collection = self._client[self._DATABASE_ID][self._COLLECTION_ID]
+        try:
+            self._collection.create_index(
+                [("team_id", ASCENDING), ("timestamp", ASCENDING)],
+                name="team_id_timestamp",
+            )
+        except OperationFailure as error:
+            logging.error("MONGODB_SUBMISSION_LOG::Index creation failed: %s", error)
+        logging.info("MONGODB_SUBMISSION_LOG::Database connection ready")
+
+    def write(self, events: list[SubmissionEventDto]) -> None:
+        try:
+            self._collection.insert_many(
+                [submission_event_to_mongo_document(event) for event in events],
+                ordered=False,
+            )
+        except BulkWriteError as error:
+            if any(
+                write_error["code"] != MONGO_DUPLICATE_KEY_ERROR
+                for write_error in error.details["writeErrors"]
+            ) or error.details.get("writeConcernErrors"):
+                raise
+
+    def iter_events(self, state: str = None) -> Iterator[SubmissionEventDto]:
+        query = {} if state is None else {"state": state}
+        for document in self._collection.find(query):
+            yield mongo_document_to_submission_event(document)
+
+    def close(self) -> None:
+        release_mongo_client(self._client)
@@ -0,0 +1,50 @@
+"""Token bucket storage used by rate limiter"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class RateLimitBackend(ABC):
+    """Keeps token buckets, one per rate limited key"""
+
+    is_blocking = False
+    """True when acquire does network calls and should not run on event loop"""
+
+    @abstractmethod
+    def acquire(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        """Take cost tokens from bucket of key, bucket is refilled with rate
+        tokens per second up to capacity. Returns 0 when tokens were taken,
+        otherwise seconds after which enough tokens will be available"""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Token buckets local to the process"""
+
+    _SWEEP_EVERY = 1024
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def acquire(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self._calls += 1
+            if self._calls % self._SWEEP_EVERY == 0:
+                self._sweep(now)
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, 0))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            full_at = now + (capacity - tokens + cost) / rate
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now, full_at)
+                return 0.0
+            self._buckets[key] = (tokens, now, full_at)
+            return (cost - tokens) / rate
+
+    def _sweep(self, now: float) -> None:
+        """Drop buckets which are full again, they behave like missing ones"""
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if bucket[2] > now
+        }
@@ -0,0 +1,272 @@
+"""Proxy for embedded SQLite database"""
+
+import json
+import logging
+import sqlite3
+import threading
+from typing import Iterator
+from ctf_server import config
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.db.storage_service import StorageService
+from ctf_server.model.flag_import import ImportStatus
+
+SQLITE_FLAG_INDEX_NAME = "flag_challenge_id_task_id_unique"
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS flag (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    challenge_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    value NOT NULL
+)"""
+_CREATE_INDEX = (
+    f"CREATE UNIQUE INDEX IF NOT EXISTS {SQLITE_FLAG_INDEX_NAME} "
+    "ON flag (challenge_id, task_id)"
+)
+_COLUMNS = "id, challenge_id, task_id, value"
+_SELECT_FLAG = f"SELECT {_COLUMNS} FROM flag WHERE challenge_id = ? AND task_id = ?"
+_SELECT_FLAGS = (
+    f"SELECT {_COLUMNS} FROM flag WHERE challenge_id = ? "
+    "AND task_id IN (SELECT value FROM json_each(?))"
+)
+_SELECT_PAGE = f"SELECT {_COLUMNS} FROM flag WHERE id > ? ORDER BY id LIMIT ?"
+_INSERT_FLAG = (
+    "INSERT INTO flag (challenge_id, task_id, value) VALUES (?, ?, ?) "
+    "ON CONFLICT (challenge_id, task_id) DO NOTHING"
+)
+_CREATE_FLAG = f"{_INSERT_FLAG} RETURNING {_COLUMNS}"
+_UPDATE_FLAG = (
+    "UPDATE flag SET value = ? WHERE challenge_id = ? AND task_id = ? "
+    f"RETURNING {_COLUMNS}"
+)
+_DELETE_FLAG = "DELETE FROM flag WHERE challenge_id = ? AND id = ?"
+
+
+def _row_to_flag_dto(row: tuple) -> FlagDto:
+    """Convert table row to flag dto, raw digest is kept as blob"""
+    flag_id, challenge_id, task_id, value = row
+    return FlagDto(
+        id=str(flag_id), challenge_id=challenge_id, task_id=task_id, value=value
+    )
+
+
+def _flag_id(flag_id: str) -> int:
+    """Row id of flag id, None when flag id cannot belong to any row"""
+    try:
+        return int(flag_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class SqliteProxy(StorageService):
+    """
+    Handles flag management in SQLite database file, meant for single node
+    deployments which need durable flags without database server.
+
+    Database runs in WAL mode, so readers do not wait for writer and many
+    processes on one machine can share the file. Every thread uses its own
+    connection, which keeps compiled statements of constant queries in its
+    statement cache, so repeated queries are not parsed again.
+    """
+
+    _PATH = config.sqlite["path"]
+    _BUSY_TIMEOUT_SECONDS = config.sqlite["busy_timeout_seconds"]
+    _SYNCHRONOUS = config.sqlite["synchronous"]
+    _PAGE_SIZE = config.flag_listing["default_page_size"]
+
+    def __init__(
+        self,
+        path: str = _PATH,
+        busy_timeout_seconds: float = _BUSY_TIMEOUT_SECONDS,
+        synchronous: str = _SYNCHRONOUS,
+    ) -> None:
+        """
+        Args:
+            path (str): database file, created with flag table when missing
+            busy_timeout_seconds (float): wait for lock held by other writer
+            synchronous (str): SQLite synchronous mode, FULL syncs every commit
+        """
+        self._path = path
+        self._busy_timeout_seconds = busy_timeout_seconds
+        self._synchronous = synchronous
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute(_CREATE_TABLE)
+        connection.execute(_CREATE_INDEX)
+        logging.info("SQLITE_PROXY::Database %s ready", path)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of calling thread, opened on first use"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout_seconds,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute(f"PRAGMA synchronous = {self._synchronous}")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get flag from storage based on task and challenge ids"""
+        row = (
+            self._connection().execute(_SELECT_FLAG, (challenge_id, task_id)).fetchone()
+        )
+        if row is None:
+            logging.debug(
+                "SQLITE_PROXY::Flag not found [challenge_id=%s, task_id=%s]",
+                challenge_id,
+                task_id,
+            )
+            return None
+        return _row_to_flag_dto(row)
+
+    def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge with single query, task ids
+        are passed as one JSON array, so the query text does not depend on
+        their count"""
+        rows = self._connection().execute(
+            _SELECT_FLAGS, (challenge_id, json.dumps(list(task_ids)))
+        )
+        flag_dtos = [_row_to_flag_dto(row) for row in rows]
+        logging.debug(
+            "SQLITE_PROXY::Flags of challenge_id=%s found in DB count = %d",
+            challenge_id,
+            len(flag_dtos),
+        )
+        return flag_dtos
+
+    def get_all_flags(self) -> list[FlagDto]:
+        """Get all flags from storage"""
+        return list(self.iter_all_flags())
+
+    def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags ordered by flag id"""
+        last_id = 0
+        if continuation_token is not None:
+            last_id = _flag_id(continuation_token)
+            if last_id is None:
+                raise ValueError("Invalid continuation token")
+        rows = (
+            self._connection()
+            .execute(_SELECT_PAGE, (last_id, page_size + 1))
+            .fetchall()
+        )
+        has_next_page = len(rows) > page_size
+        flags = [_row_to_flag_dto(row) for row in rows[:page_size]]
+        return FlagPageDto(
+            flags=flags, continuation_token=flags[-1].id if has_next_page else None
+        )
+
+    def iter_all_flags(self) -> Iterator[FlagDto]:
+        """Iterate over all flags page by page, no read transaction is kept
+        open between pages"""
+        continuation_token = None
+        while True:
+            page = self.get_flags_page(self._PAGE_SIZE, continuation_token)
+            yield from page.flags
+            if page.continuation_token is None:
+                return
+            continuation_token = page.continuation_token
+
+    def create_flag(self, flag: FlagDto) -> FlagDto:
+        """Create flag for task and challenge with single statement returning
+        inserted row, id is assigned by database. Returned rows are read to
+        the end, so the statement finishes and commits"""
+        rows = (
+            self._connection()
+            .execute(_CREATE_FLAG, (flag.challenge_id, flag.task_id, flag.value))
+            .fetchall()
+        )
+        if not rows:
+            logging.error(
+                "SQLITE_PROXY::Flag already exists [challenge_id=%s, task_id=%s]",
+                flag.challenge_id,
+                flag.task_id,
+            )
+            return None
+        logging.debug("SQLITE_PROXY::Flag inserted correctly id=%s", rows[0][0])
+        return _row_to_flag_dto(rows[0])
+
+    def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """Create many flags in single transaction, flags of tasks which
+        already have flag are duplicates"""
+        if not flags:
+            return []
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            statuses = [
+                ImportStatus.CREATED
+                if connection.execute(
+                    _INSERT_FLAG, (flag.challenge_id, flag.task_id, flag.value)
+                ).rowcount
+                == 1
+                else ImportStatus.DUPLICATE
+                for flag in flags
+            ]
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        logging.debug(
+            "SQLITE_PROXY::Bulk insert of %d flags, duplicates = %d",
+            len(flags),
+            statuses.count(ImportStatus.DUPLICATE),
+        )
+        return statuses
+
+    def update_flag(self, flag: FlagDto) -> FlagDto:
+        """Update flag value based on challenge and task ids with single
+        statement returning updated row"""
+        rows = (
+            self._connection()
+            .execute(_UPDATE_FLAG, (flag.value, flag.challenge_id, flag.task_id))
+            .fetchall()
+        )
+        if not rows:
+            logging.error(
+                "SQLITE_PROXY::Flag to update not found [challenge_id=%s, task_id=%s]",
+                flag.challenge_id,
+                flag.task_id,
+            )
+            return None
+        logging.debug("SQLITE_PROXY::Flag with id=%s updated successfully", rows[0][0])
+        return _row_to_flag_dto(rows[0])
+
+    def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
+        """Delete flag based on challenge and flag ids"""
+        row_id = _flag_id(flag_id)
+        deleted_count = 0
+        if row_id is not None:
+            deleted_count = (
+                self._connection()
+                .execute(_DELETE_FLAG, (challenge_id, row_id))
+                .rowcount
+            )
+        if deleted_count == 1:
+            logging.debug("SQLITE_PROXY::Flag with id=%s successfully deleted", flag_id)
+            return True
+        logging.error(
+            "SQLITE_PROXY::Flag deletion failed deleted count = %d", deleted_count
+        )
+        return False
+
+    def close(self) -> None:
+        """Close connections of all threads"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+        logging.debug("SQLITE_PROXY::Closed %d connections", len(connections))
@@ -0,0 +1,59 @@
+"""Creates flag storage selected by configuration"""
+
+from ctf_server import config
+from ctf_server.db.async_azure_proxy import AsyncAzureProxy
+from ctf_server.db.async_memory_storage import AsyncInMemoryStorage
+from ctf_server.db.async_mongodb_proxy import AsyncMongodbProxy
+from ctf_server.db.async_sqlite_proxy import AsyncSqliteProxy
+from ctf_server.db.async_storage_service import AsyncStorageService
+from ctf_server.db.azure_proxy import AzureProxy
+from ctf_server.db.instrumented_storage import (
+    AsyncInstrumentedStorage,
+    InstrumentedStorage,
+    is_storage_instrumented,
+)
+from ctf_server.db.memory_storage import InMemoryStorage
+from ctf_server.db.mongodb_proxy import MongodbProxy
+from ctf_server.db.sqlite_proxy import SqliteProxy
+from ctf_server.db.storage_service import StorageService
+
+_STORAGES = {
+    "azure": AzureProxy,
+    "memory": InMemoryStorage,
+    "mongodb": MongodbProxy,
+    "sqlite": SqliteProxy,
+}
+_ASYNC_STORAGES = {
+    "azure": AsyncAzureProxy,
+    "memory": AsyncInMemoryStorage,
+    "mongodb": AsyncMongodbProxy,
+    "sqlite": AsyncSqliteProxy,
+}
+STORAGE_BACKENDS = tuple(sorted(_STORAGES))
+
+
+def create_storage_service(backend: str = None) -> StorageService:
+    """Creates storage of given backend, configured backend is used when None.
+    Storage calls are timed when metrics or server timing are enabled"""
+    backend = backend or config.storage["backend"]
+    storage = _STORAGES[backend]()
+    if is_storage_instrumented():
+        return InstrumentedStorage(storage, backend)
+    return storage
+
+
+def storage_supports_change_stream(backend: str = None) -> bool:
+    """True when storage of given backend can stream changes of flags,
+    configured backend is used when None"""
+    return _STORAGES[backend or config.storage["backend"]].supports_change_stream
+
+
+def create_async_storage_service(backend: str = None) -> AsyncStorageService:
+    """Creates asynchronous storage of given backend, configured backend is
+    used when None. Storage calls are timed when metrics or server timing
+    are enabled"""
+    backend = backend or config.storage["backend"]
+    storage = _ASYNC_STORAGES[backend]()
+    if is_storage_instrumented():
+        return AsyncInstrumentedStorage(storage, backend)
+    return storage
@@ -1,28 +1,76 @@
 """Interface for storage services"""
 
 from abc import ABC, abstractmethod
+from typing import Iterator
+from ctf_server.db.dto.flag_change import FlagChangeDto
 from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_page import FlagPageDto
+from ctf_server.model.flag_import import ImportStatus
+
+
+class StorageThrottledError(Exception):
+    """Raised when database keeps rejecting requests because of throttling
+    after all retries"""
+
+    def __init__(self, message: str, retry_after_seconds: float) -> None:
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
 
 
 class StorageService(ABC):
     """Defines group of functions to manage flags"""
 
+    # Storages which stream changes of flags set it and override open_change_stream
+    supports_change_stream = False
+
     @abstractmethod
     def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
         """Get flag from storage based on task and challenge ids"""
 
+    @abstractmethod
+    def get_flags(self, challenge_id: str, task_ids: list[str]) -> list[FlagDto]:
+        """Get flags of many tasks of one challenge with single storage query,
+        tasks which do not have exactly one flag are left out"""
+
     @abstractmethod
     def get_all_flags(self) -> list[FlagDto]:
         """Get all flags from storage"""
 
+    @abstractmethod
+    def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPageDto:
+        """Get single page of flags, next page is read with returned continuation
+        token, raises ValueError when token is invalid"""
+
+    @abstractmethod
+    def iter_all_flags(self) -> Iterator[FlagDto]:
+        """Iterate over all flags as they are read from storage"""
+
     @abstractmethod
     def create_flag(self, flag: FlagDto) -> FlagDto:
-        """Create flag for task and challenge"""
+        """Create flag for task and challenge with single write which relies on
+        unique challenge and task ids, returns None when flag already exists"""
+
+    @abstractmethod
+    def create_flags(self, flags: list[FlagDto]) -> list[ImportStatus]:
+        """Create many flags with bulk writes, returns status of each flag in input order"""
 
     @abstractmethod
     def update_flag(self, flag: FlagDto) -> FlagDto:
-        """Update flag document based on flag id"""
+        """Set value of flag of challenge and task with single atomic write,
+        flag id is not needed. Returns updated flag, None when flag does not
+        exist"""
 
     @abstractmethod
     def delete_flag(self, challenge_id: str, flag_id: str) -> bool:
         """Delete flag based on challenge and task ids"""
+
+    def close(self) -> None:
+        """Release connections held by storage"""
+
+    def open_change_stream(self) -> Iterator[FlagChangeDto]:
+        """Start watching changes of flags made from now on, yields None when
+        no change arrived within poll interval. Called only when storage
+        supports change stream"""
+        raise NotImplementedError("Storage does not support change streams")
@@ -0,0 +1,56 @@
+"""Storage of submission log batches"""
+
+from abc import ABC, abstractmethod
+from typing import Iterator
+from ctf_server import config
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.db.dto.submission_event_documents import (
+    json_line_to_submission_event,
+    submission_event_to_json_line,
+)
+
+
+class SubmissionLogSink(ABC):
+    """Writes batches of submission events collected by submission log"""
+
+    @abstractmethod
+    def write(self, events: list[SubmissionEventDto]) -> None:
+        """Store batch of events, raises when batch could not be stored"""
+
+    def iter_events(self, state: str = None) -> Iterator[SubmissionEventDto]:
+        """Read stored events, only the ones with given state when it is set.
+        Events are not ordered"""
+        raise NotImplementedError("Submission log sink cannot be read")
+
+    def close(self) -> None:
+        """Release resources, called once after the last write"""
+
+
+class FileSubmissionLogSink(SubmissionLogSink):
+    """Appends events to local JSON lines file"""
+
+    _FILE_PATH = config.submission_log["file_path"]
+
+    def __init__(self, file_path: str = _FILE_PATH) -> None:
+        self._file_path = file_path
+        self._file = open(
+            file_path, "a", encoding="utf-8"
+        )  # pylint: disable=consider-using-with
+
+    def write(self, events: list[SubmissionEventDto]) -> None:
+        self._file.write(
+            "".join(submission_event_to_json_line(event) for event in events)
+        )
+        self._file.flush()
+
+    def iter_events(self, state: str = None) -> Iterator[SubmissionEventDto]:
+        with open(self._file_path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                event = json_line_to_submission_event(line)
+                if state is None or event.state == state:
+                    yield event
+
+    def close(self) -> None:
+        self._file.close()
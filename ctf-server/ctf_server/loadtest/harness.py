@@ -0,0 +1,336 @@
+"""
+Drives challenge app with generated traffic and reports throughput and
+latency percentiles per route as JSON. App runs on in-memory storage,
+so no database is needed. Requests are sent in-process through ASGI
+interface (asgi mode) or over HTTP to uvicorn listening on local socket
+(uvicorn mode).
+
+Usage:
+    python -m ctf_server.loadtest.harness --mode uvicorn --requests 20000 \
+        --concurrency 64 --traffic submit=80,get=10,list=5,create=5 \
+        --flags valid=20,invalid=60,unknown=20 --output report.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator
+from urllib.parse import urlencode
+import aiohttp
+import uvicorn
+from ctf_server import config
+from ctf_server.api.challenge_app import create_app
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.async_memory_storage import AsyncInMemoryStorage
+from ctf_server.db.instrumented_storage import (
+    AsyncInstrumentedStorage,
+    is_storage_instrumented,
+)
+from ctf_server.loadtest.scenario import (
+    FLAG_KINDS,
+    TRAFFIC_KINDS,
+    LoadRequest,
+    LoadScenario,
+    parse_mix,
+)
+from ctf_server.service.async_flag_service import AsyncFlagService
+from ctf_server.service.flag_cache import create_flag_cache
+
+ASGI_MODE = "asgi"
+UVICORN_MODE = "uvicorn"
+
+Sender = Callable[[LoadRequest], Awaitable[int]]
+
+
+@dataclass
+class RouteLatencies:
+    """Latencies of all requests of single route, in seconds"""
+
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def add(self, latency: float, status: int | None) -> None:
+        """Record single request, status is None when request failed"""
+        self.latencies.append(latency)
+        if status is None:
+            self.errors += 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest rank percentile of sorted values, 0 for empty list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def build_report(
+    routes: dict[str, RouteLatencies], duration_seconds: float, settings: dict
+) -> dict:
+    """Summary of load test run with requests per second and p50, p95 and
+    p99 latency in milliseconds for every route and for all routes together"""
+
+    def summarize(
+        latencies: list[float], statuses: dict[int, int], errors: int
+    ) -> dict:
+        ordered = sorted(latencies)
+        return {
+            "requests": len(ordered),
+            "rps": len(ordered) / duration_seconds if duration_seconds else 0.0,
+            "p50_ms": percentile(ordered, 0.50) * 1000,
+            "p95_ms": percentile(ordered, 0.95) * 1000,
+            "p99_ms": percentile(ordered, 0.99) * 1000,
+            "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+            "statuses": {
+                str(status): count for status, count in sorted(statuses.items())
+            },
+            "errors": errors,
+        }
+
+    all_statuses: dict[int, int] = {}
+    for route in routes.values():
+        for status, count in route.statuses.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+    return {
+        "settings": settings,
+        "duration_seconds": duration_seconds,
+        "total": summarize(
+            [latency for route in routes.values() for latency in route.latencies],
+            all_statuses,
+            sum(route.errors for route in routes.values()),
+        ),
+        "routes": {
+            name: summarize(route.latencies, route.statuses, route.errors)
+            for name, route in sorted(routes.items())
+        },
+    }
+
+
+async def run_requests(
+    send: Sender, requests: Iterator[LoadRequest], concurrency: int
+) -> tuple[dict[str, RouteLatencies], float]:
+    """Send requests with given number of concurrent workers
+
+    Args:
+        send (Sender): sends request and returns response status
+        requests (Iterator[LoadRequest]): requests to send
+        concurrency (int): number of requests in flight
+
+    Returns:
+        tuple: latencies per route and duration of whole run in seconds
+    """
+    routes: dict[str, RouteLatencies] = {}
+
+    async def worker() -> None:
+        for request in requests:
+            started = time.perf_counter()
+            try:
+                status = await send(request)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = None
+            latency = time.perf_counter() - started
+            routes.setdefault(request.route, RouteLatencies()).add(latency, status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return routes, time.perf_counter() - started
+
+
+def create_load_test_app(scenario: LoadScenario):
+    """Challenge app working on in-memory storage seeded with scenario flags,
+    rate limiting is disabled because all traffic comes from one client.
+    Storage calls are timed like in production when instrumentation is enabled"""
+    storage = AsyncInMemoryStorage()
+    if is_storage_instrumented():
+        storage = AsyncInstrumentedStorage(storage, "memory")
+    flag_service = AsyncFlagService(
+        storage, PlainInputStoredHashedStrategy(), create_flag_cache()
+    )
+    rate_limit_enabled = config.rate_limit["enabled"]
+    config.rate_limit["enabled"] = False
+    try:
+        app = create_app(flag_service)
+    finally:
+        config.rate_limit["enabled"] = rate_limit_enabled
+
+    async def seed() -> None:
+        for flag in scenario.seed_flags():
+            await flag_service.create_flag(flag)
+
+    return app, seed
+
+
+def asgi_sender(app) -> Sender:
+    """Calls ASGI app directly, without network and HTTP parsing"""
+
+    async def send(request: LoadRequest) -> int:
+        body = json.dumps(request.body).encode() if request.body is not None else b""
+        headers = [(b"content-type", b"application/json")] + [
+            (name.lower().encode(), value.encode())
+            for name, value in request.headers.items()
+        ]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "scheme": "http",
+            "path": request.path,
+            "raw_path": request.path.encode(),
+            "query_string": urlencode(request.params).encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80),
+        }
+        request_messages = [{"type": "http.request", "body": body, "more_body": False}]
+        response_complete = asyncio.Event()
+        status = None
+
+        async def receive() -> dict:
+            if request_messages:
+                return request_messages.pop()
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send_message(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif not message.get("more_body", False):
+                response_complete.set()
+
+        await app(scope, receive, send_message)
+        return status
+
+    return send
+
+
+def aiohttp_sender(session: aiohttp.ClientSession, base_url: str) -> Sender:
+    """Sends requests over HTTP and reads whole response body"""
+
+    async def send(request: LoadRequest) -> int:
+        async with session.request(
+            request.method,
+            base_url + request.path,
+            params=request.params,
+            json=request.body,
+            headers=request.headers,
+        ) as response:
+            await response.read()
+            return response.status
+
+    return send
+
+
+async def run_asgi(
+    scenario: LoadScenario, request_count: int, concurrency: int
+) -> tuple[dict[str, RouteLatencies], float]:
+    """Run load test in-process, app lifespan is run around the test"""
+    app, seed = create_load_test_app(scenario)
+    async with app.router.lifespan_context(app):
+        await seed()
+        return await run_requests(
+            asgi_sender(app), scenario.requests(request_count), concurrency
+        )
+
+
+async def run_uvicorn(
+    scenario: LoadScenario, request_count: int, concurrency: int
+) -> tuple[dict[str, RouteLatencies], float]:
+    """Run load test against uvicorn started in background thread on free
+    local port, client and server use separate event loops. Flags are
+    seeded before server starts"""
+    app, seed = create_load_test_app(scenario)
+    await seed()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+    thread = threading.Thread(
+        target=server.run, kwargs={"sockets": [listener]}, daemon=True
+    )
+    thread.start()
+    try:
+        while not server.started:
+            if not thread.is_alive():
+                raise RuntimeError("Uvicorn did not start")
+            await asyncio.sleep(0.05)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await run_requests(
+                aiohttp_sender(session, f"http://127.0.0.1:{port}"),
+                scenario.requests(request_count),
+                concurrency,
+            )
+    finally:
+        server.should_exit = True
+        await asyncio.to_thread(thread.join)
+        listener.close()
+
+
+_RUNNERS = {ASGI_MODE: run_asgi, UVICORN_MODE: run_uvicorn}
+
+
+def main() -> None:
+    """Runs load test and writes JSON report"""
+    parser = argparse.ArgumentParser(description="Load test challenge app")
+    parser.add_argument("--mode", choices=sorted(_RUNNERS), default=ASGI_MODE)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--traffic",
+        default="submit=80,get=10,list=5,create=5",
+        help=f"weights of request kinds: {', '.join(TRAFFIC_KINDS)}",
+    )
+    parser.add_argument(
+        "--flags",
+        default="valid=20,invalid=60,unknown=20",
+        help=f"weights of submitted flag kinds: {', '.join(FLAG_KINDS)}",
+    )
+    parser.add_argument("--challenges", type=int, default=10)
+    parser.add_argument("--tasks-per-challenge", type=int, default=10)
+    parser.add_argument("--teams", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", type=Path, help="write JSON report to file instead of stdout"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        scenario = LoadScenario(
+            parse_mix(args.traffic, TRAFFIC_KINDS),
+            parse_mix(args.flags, FLAG_KINDS),
+            challenges=args.challenges,
+            tasks_per_challenge=args.tasks_per_challenge,
+            teams=args.teams,
+            seed=args.seed,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    routes, duration = asyncio.run(
+        _RUNNERS[args.mode](scenario, args.requests, args.concurrency)
+    )
+    settings = {key: value for key, value in vars(args).items() if key != "output"}
+    report = build_report(routes, duration, settings)
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
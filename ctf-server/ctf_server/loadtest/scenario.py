@@ -0,0 +1,193 @@
+"""Traffic generated by load tests"""
+
+import itertools
+import random
+from dataclasses import dataclass, field
+from typing import Iterator
+from ctf_server import config
+from ctf_server.model.flag import Flag
+
+SUBMIT = "submit"
+GET = "get"
+LIST = "list"
+CREATE = "create"
+TRAFFIC_KINDS = (SUBMIT, GET, LIST, CREATE)
+
+VALID = "valid"
+INVALID = "invalid"
+UNKNOWN = "unknown"
+FLAG_KINDS = (VALID, INVALID, UNKNOWN)
+
+ROUTES = {
+    SUBMIT: "POST /submit-flag",
+    GET: "GET /flag/",
+    LIST: "GET /flags",
+    CREATE: "POST /flag",
+}
+
+
+@dataclass
+class LoadRequest:
+    """Single HTTP request sent by load test"""
+
+    route: str
+    method: str
+    path: str
+    params: dict[str, str] = field(default_factory=dict)
+    body: dict = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+def parse_mix(text: str, kinds: tuple[str, ...]) -> dict[str, float]:
+    """Parse mix given as comma separated kind=weight pairs, e.g. submit=7,list=3
+
+    Args:
+        text (str): mix definition
+        kinds (tuple[str, ...]): allowed kinds
+
+    Returns:
+        dict[str, float]: weight of every allowed kind, missing ones are 0
+    """
+    weights = dict.fromkeys(kinds, 0.0)
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        kind, _, weight = part.partition("=")
+        if kind not in weights:
+            raise ValueError(f"Unknown kind '{kind}', allowed: {', '.join(kinds)}")
+        weights[kind] = float(weight)
+        if weights[kind] < 0:
+            raise ValueError(f"Weight of '{kind}' cannot be negative")
+    if not any(weights.values()):
+        raise ValueError("At least one weight has to be positive")
+    return weights
+
+
+class LoadScenario:
+    """
+    Flags seeded into storage before the test and stream of requests sent
+    during it. Submitted flags are correct (valid), have correct format but
+    wrong value (invalid) or refer to task which does not exist (unknown).
+    Created flags always use new task ids. Stream is deterministic for
+    given seed.
+    """
+
+    def __init__(
+        self,
+        traffic_mix: dict[str, float],
+        flag_mix: dict[str, float],
+        challenges: int = 10,
+        tasks_per_challenge: int = 10,
+        teams: int = 50,
+        page_size: int = 50,
+        seed: int = 0,
+    ) -> None:
+        self._traffic_kinds = list(traffic_mix)
+        self._traffic_weights = list(traffic_mix.values())
+        self._flag_kinds = list(flag_mix)
+        self._flag_weights = list(flag_mix.values())
+        self._challenges = challenges
+        self._tasks_per_challenge = tasks_per_challenge
+        self._teams = teams
+        self._page_size = page_size
+        self._random = random.Random(seed)
+        self._created = itertools.count()
+
+    def seed_flags(self) -> list[Flag]:
+        """Flags which have to be stored before the test starts"""
+        return [
+            Flag(
+                challenge_id=self._challenge_id(challenge),
+                task_id=self._task_id(task),
+                value=self._flag_value(challenge, task),
+            )
+            for challenge in range(self._challenges)
+            for task in range(self._tasks_per_challenge)
+        ]
+
+    def requests(self, count: int) -> Iterator[LoadRequest]:
+        """Generate requests following traffic mix
+
+        Args:
+            count (int): number of requests
+
+        Returns:
+            Iterator[LoadRequest]: requests in sending order
+        """
+        for _ in range(count):
+            kind = self._random.choices(self._traffic_kinds, self._traffic_weights)[0]
+            yield getattr(self, f"_{kind}_request")()
+
+    def _submit_request(self) -> LoadRequest:
+        challenge, task = self._random_task()
+        flag_kind = self._random.choices(self._flag_kinds, self._flag_weights)[0]
+        value = self._flag_value(challenge, task)
+        task_id = self._task_id(task)
+        if flag_kind == INVALID:
+            value = f"flag{{wrong_{self._random.randrange(10**6)}}}"
+        elif flag_kind == UNKNOWN:
+            task_id = f"unknown{self._random.randrange(10**6)}"
+        return LoadRequest(
+            route=ROUTES[SUBMIT],
+            method="POST",
+            path="/submit-flag",
+            body={
+                "challenge_id": self._challenge_id(challenge),
+                "task_id": task_id,
+                "value": value,
+            },
+            headers={
+                config.rate_limit["team_header"]: (
+                    f"team{self._random.randrange(self._teams)}"
+                )
+            },
+        )
+
+    def _get_request(self) -> LoadRequest:
+        challenge, task = self._random_task()
+        return LoadRequest(
+            route=ROUTES[GET],
+            method="GET",
+            path="/flag/",
+            params={
+                "challenge_id": self._challenge_id(challenge),
+                "task_id": self._task_id(task),
+            },
+        )
+
+    def _list_request(self) -> LoadRequest:
+        return LoadRequest(
+            route=ROUTES[LIST],
+            method="GET",
+            path="/flags",
+            params={"page_size": str(self._page_size)},
+        )
+
+    def _create_request(self) -> LoadRequest:
+        number = next(self._created)
+        return LoadRequest(
+            route=ROUTES[CREATE],
+            method="POST",
+            path="/flag",
+            body={
+                "challenge_id": self._challenge_id(number % self._challenges),
+                "task_id": f"created{number}",
+                "value": f"flag{{created_{number}}}",
+            },
+        )
+
+    def _random_task(self) -> tuple[int, int]:
+        return (
+            self._random.randrange(self._challenges),
+            self._random.randrange(self._tasks_per_challenge),
+        )
+
+    @staticmethod
+    def _challenge_id(challenge: int) -> str:
+        return f"challenge{challenge}"
+
+    @staticmethod
+    def _task_id(task: int) -> str:
+        return f"task{task}"
+
+    @staticmethod
+    def _flag_value(challenge: int, task: int) -> str:
+        return f"flag{{load_{challenge}_{task}}}"
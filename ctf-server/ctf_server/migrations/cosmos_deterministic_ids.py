@@ -0,0 +1,102 @@
+"""
+Rewrites Cosmos DB flag items created with timestamp ids, so their ids are
+derived from challenge and task ids and they can be read with point reads.
+
+Usage:
+    python -m ctf_server.migrations.cosmos_deterministic_ids [--dry-run]
+"""
+
+import argparse
+import logging
+from dataclasses import dataclass, field
+import azure.cosmos.exceptions as exceptions
+from azure.cosmos.container import ContainerProxy
+from azure.cosmos.http_constants import StatusCodes
+from ctf_server.db.azure_proxy import AzureProxy
+from ctf_server.db.dto.flag_documents import cosmos_flag_id
+
+
+@dataclass
+class MigrationReport:
+    """Summary of migrated items"""
+
+    migrated: list[str] = field(default_factory=list)
+    already_migrated: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)
+
+
+def migrate_to_deterministic_ids(
+    container: ContainerProxy, dry_run: bool = False
+) -> MigrationReport:
+    """
+    Copies every item with legacy id to item with deterministic id and removes
+    the legacy one in single transactional batch of the item partition, so
+    readers never see both items and failed swap leaves legacy item only.
+    Legacy item is deleted first, otherwise unique key on task id would
+    reject the copy.
+    When item with deterministic id already exists legacy item is left
+    untouched and reported as conflict.
+
+    Args:
+        container (ContainerProxy): container keeping flags
+        dry_run (bool): only report what would be migrated
+
+    Returns:
+        MigrationReport: ids of migrated, skipped and conflicting items
+    """
+    report = MigrationReport()
+    for item in list(container.read_all_items()):
+        new_id = cosmos_flag_id(item["challenge_id"], item["task_id"])
+        if item["id"] == new_id:
+            report.already_migrated.append(item["id"])
+            continue
+        if dry_run:
+            report.migrated.append(item["id"])
+            continue
+        new_item = {
+            key: value for key, value in item.items() if not key.startswith("_")
+        }
+        new_item["id"] = new_id
+        try:
+            container.execute_item_batch(
+                [("delete", (item["id"],)), ("create", (new_item,))],
+                partition_key=item["partitionKey"],
+            )
+        except exceptions.CosmosBatchOperationError as error:
+            if error.status_code != StatusCodes.CONFLICT:
+                raise
+            logging.error(
+                "COSMOS_MIGRATION::Item %s conflicts with existing item %s",
+                item["id"],
+                new_id,
+            )
+            report.conflicts.append(item["id"])
+            continue
+        logging.debug("COSMOS_MIGRATION::Item %s migrated to %s", item["id"], new_id)
+        report.migrated.append(item["id"])
+    return report
+
+
+def main() -> None:
+    """Runs migration on container configured for the application"""
+    parser = argparse.ArgumentParser(
+        description="Migrate Cosmos DB flag items to deterministic ids"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only list items to migrate"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    container = AzureProxy(sdk_retries=True).container
+    report = migrate_to_deterministic_ids(container, args.dry_run)
+    logging.info(
+        "COSMOS_MIGRATION::migrated=%d already_migrated=%d conflicts=%d",
+        len(report.migrated),
+        len(report.already_migrated),
+        len(report.conflicts),
+    )
+
+
+if __name__ == "__main__":
+    main()
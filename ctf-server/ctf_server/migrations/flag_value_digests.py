@@ -0,0 +1,191 @@
+"""
+Rewrites flag values stored as md5 hex strings to raw digests tagged with
+their algorithm (BSON binary in Mongo DB, base64 text in Cosmos DB).
+Both formats are readable, so migration can run while application works.
+
+Usage:
+    python -m ctf_server.migrations.flag_value_digests --storage mongodb [--dry-run]
+"""
+
+import argparse
+import logging
+from dataclasses import dataclass, field
+import azure.cosmos.exceptions as exceptions
+from azure.core import MatchConditions
+from azure.cosmos.container import ContainerProxy
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from ctf_server.core.crypto import Crypto
+from ctf_server.db.azure_proxy import AzureProxy
+from ctf_server.db.bulk_write import chunked
+from ctf_server.db.dto.flag_documents import (
+    DIGEST_ALGORITHM_FIELD,
+    MD5_ALGORITHM,
+    cosmos_item_to_flag_dto,
+    flag_dto_to_cosmos_item,
+)
+from ctf_server.db.mongodb_proxy import MongodbProxy
+
+_MONGO_BATCH_SIZE = 500
+
+
+@dataclass
+class DigestMigrationReport:
+    """Summary of migrated flags"""
+
+    migrated: list[str] = field(default_factory=list)
+    already_migrated: list[str] = field(default_factory=list)
+    invalid: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)
+
+
+def md5_hex_to_digest(value: str) -> bytes:
+    """Raw digest of md5 hex value, None when value is not md5 hex"""
+    if not isinstance(value, str):
+        return None
+    value = Crypto.normalize_md5_hex(value)
+    return bytes.fromhex(value) if value is not None else None
+
+
+def migrate_cosmos_flag_values(
+    container: ContainerProxy, dry_run: bool = False
+) -> DigestMigrationReport:
+    """
+    Replaces every item keeping hex value with item keeping base64 digest.
+    Items changed after they were read are left untouched and reported as
+    conflicts, migration can be run again for them.
+
+    Args:
+        container (ContainerProxy): container keeping flags
+        dry_run (bool): only report what would be migrated
+
+    Returns:
+        DigestMigrationReport: ids of migrated, skipped and failed items
+    """
+    report = DigestMigrationReport()
+    for item in container.read_all_items():
+        if DIGEST_ALGORITHM_FIELD in item:
+            report.already_migrated.append(item["id"])
+            continue
+        digest = md5_hex_to_digest(item["value"])
+        if digest is None:
+            report.invalid.append(item["id"])
+            continue
+        if dry_run:
+            report.migrated.append(item["id"])
+            continue
+        flag = cosmos_item_to_flag_dto(item)
+        flag.value = digest
+        try:
+            container.replace_item(
+                item=item["id"],
+                body=flag_dto_to_cosmos_item(flag),
+                etag=item["_etag"],
+                match_condition=MatchConditions.IfNotModified,
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            logging.error("DIGEST_MIGRATION::Item %s changed meanwhile", item["id"])
+            report.conflicts.append(item["id"])
+            continue
+        report.migrated.append(item["id"])
+    return report
+
+
+def migrate_mongo_flag_values(
+    collection: Collection, dry_run: bool = False
+) -> DigestMigrationReport:
+    """
+    Sets binary digest on every document keeping hex value with unordered
+    bulk writes. Update matches old value, so document changed meanwhile
+    is not overwritten and is reported as conflict, migration can be run
+    again for it.
+
+    Args:
+        collection (Collection): collection keeping flags
+        dry_run (bool): only report what would be migrated
+
+    Returns:
+        DigestMigrationReport: ids of migrated, skipped and failed documents
+    """
+    report = DigestMigrationReport()
+    pending = []
+    for document in collection.find({}, {"value": 1, DIGEST_ALGORITHM_FIELD: 1}):
+        document_id = str(document["_id"])
+        if DIGEST_ALGORITHM_FIELD in document:
+            report.already_migrated.append(document_id)
+            continue
+        digest = md5_hex_to_digest(document["value"])
+        if digest is None:
+            report.invalid.append(document_id)
+            continue
+        if dry_run:
+            report.migrated.append(document_id)
+            continue
+        pending.append((document["_id"], document["value"], digest))
+    for chunk in chunked(pending, _MONGO_BATCH_SIZE):
+        _write_mongo_digests(collection, chunk, report)
+    return report
+
+
+def _write_mongo_digests(
+    collection: Collection,
+    chunk: list[tuple[object, str, bytes]],
+    report: DigestMigrationReport,
+) -> None:
+    result = collection.bulk_write(
+        [
+            UpdateOne(
+                {"_id": document_id, "value": value},
+                {"$set": {"value": digest, DIGEST_ALGORITHM_FIELD: MD5_ALGORITHM}},
+            )
+            for document_id, value, digest in chunk
+        ],
+        ordered=False,
+    )
+    if result.matched_count == len(chunk):
+        report.migrated.extend(str(document_id) for document_id, _, _ in chunk)
+        return
+    stored_values = {
+        document["_id"]: document["value"]
+        for document in collection.find(
+            {"_id": {"$in": [document_id for document_id, _, _ in chunk]}},
+            {"value": 1},
+        )
+    }
+    for document_id, _, digest in chunk:
+        if stored_values.get(document_id) == digest:
+            report.migrated.append(str(document_id))
+            continue
+        logging.error("DIGEST_MIGRATION::Document %s changed meanwhile", document_id)
+        report.conflicts.append(str(document_id))
+
+
+def main() -> None:
+    """Runs migration on storage configured for the application"""
+    parser = argparse.ArgumentParser(
+        description="Migrate flag values from md5 hex strings to raw digests"
+    )
+    parser.add_argument("--storage", choices=["azure", "mongodb"], default="azure")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only list flags to migrate"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.storage == "mongodb":
+        collection = MongodbProxy(ensure_indexes=False).collection
+        report = migrate_mongo_flag_values(collection, args.dry_run)
+    else:
+        container = AzureProxy(sdk_retries=True).container
+        report = migrate_cosmos_flag_values(container, args.dry_run)
+    logging.info(
+        "DIGEST_MIGRATION::migrated=%d already_migrated=%d invalid=%d conflicts=%d",
+        len(report.migrated),
+        len(report.already_migrated),
+        len(report.invalid),
+        len(report.conflicts),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""Flag import module"""
+
+from enum import Enum
+from pydantic import BaseModel
+
+
+class ImportStatus(str, Enum):
+    """Result of importing single flag"""
+
+    CREATED = "CREATED"
+    DUPLICATE = "DUPLICATE"
+    ERROR = "ERROR"
+
+
+class FlagImportResult(BaseModel):
+    """Class for keeping import result of single row"""
+
+    row: int
+    challenge_id: str | None = None
+    task_id: str | None = None
+    status: ImportStatus
+    error: str | None = None
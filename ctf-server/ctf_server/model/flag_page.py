@@ -0,0 +1,11 @@
+"""Flag page module"""
+
+from pydantic import BaseModel
+from ctf_server.model.flag import Flag
+
+
+class FlagPage(BaseModel):
+    """Class for keeping page of flags with token pointing to the next page"""
+
+    flags: list[Flag]
+    continuation_token: str | None = None
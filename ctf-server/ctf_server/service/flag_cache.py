@@ -0,0 +1,148 @@
+"""In-process read-through cache for stored flags"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from ctf_server import config
+from ctf_server.db.dto.flag_dto import FlagDto
+
+
+@dataclass
+class FlagCacheStats:
+    """Snapshot of flag cache counters"""
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    size: int
+
+
+class FlagCache:
+    """
+    Keeps recently read flags in memory keyed by (challenge_id, task_id).
+    Entries expire after ttl and the least recently used entry is evicted
+    when cache is full. Cache is local to the process, so changes made by
+    other workers are visible only after entry expires.
+
+    Every invalidation stamps its key with next cache generation. Flag read
+    from storage is put with generation taken before the read and it is
+    dropped when its key was invalidated since, so slow read never brings
+    back value replaced or deleted in the meantime.
+    """
+
+    _MAX_SIZE = config.flag_cache["max_size"]
+    _TTL_SECONDS = config.flag_cache["ttl_seconds"]
+
+    def __init__(
+        self, max_size: int = _MAX_SIZE, ttl_seconds: float = _TTL_SECONDS
+    ) -> None:
+        if max_size <= 0:
+            raise ValueError("Flag cache size must be positive")
+        self._max_size = max_size
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[
+            tuple[str, str], tuple[float, FlagDto]
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._generation = 0
+        self._cleared_at = 0
+        self._invalidated_at: dict[tuple[str, str], int] = {}
+
+    def get(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get cached flag
+
+        Args:
+            challenge_id (str): flag challenge id
+            task_id (str): flag task id
+
+        Returns:
+            FlagDto: cached flag or None if entry is missing or expired
+        """
+        key = (challenge_id, task_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, flag = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return flag
+
+    def generation(self) -> int:
+        """Current generation, taken before flag is read from storage"""
+        with self._lock:
+            return self._generation
+
+    def put(self, flag: FlagDto, read_generation: int = None) -> None:
+        """Store flag in cache, evicts least recently used entry when cache is full
+
+        Args:
+            flag (FlagDto): flag read from or saved in storage
+            read_generation (int): generation taken before flag was read,
+            flag is not stored when its key was invalidated since. None for
+            flags just written to storage
+        """
+        key = (flag.challenge_id, flag.task_id)
+        with self._lock:
+            if read_generation is not None and read_generation < max(
+                self._cleared_at, self._invalidated_at.get(key, 0)
+            ):
+                logging.debug("FLAG_CACHE::Stale read dropped for key=%s", key)
+                return
+            self._entries[key] = (time.monotonic() + self._ttl_seconds, flag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._evictions += 1
+                logging.debug("FLAG_CACHE::Evicted flag for key=%s", evicted_key)
+
+    def invalidate(self, challenge_id: str, task_id: str) -> None:
+        """Remove flag from cache
+
+        Args:
+            challenge_id (str): flag challenge id
+            task_id (str): flag task id
+        """
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at[(challenge_id, task_id)] = self._generation
+            self._entries.pop((challenge_id, task_id), None)
+
+    def clear(self) -> None:
+        """Remove all entries from cache"""
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = self._generation
+            self._invalidated_at.clear()
+            self._entries.clear()
+
+    def stats(self) -> FlagCacheStats:
+        """Current cache counters"""
+        with self._lock:
+            return FlagCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                size=len(self._entries),
+            )
+
+
+def create_flag_cache() -> FlagCache:
+    """Creates flag cache based on configuration, returns None if cache is disabled"""
+    if not config.flag_cache["enabled"]:
+        return None
+    return FlagCache()
@@ -0,0 +1,86 @@
+"""Parsing of flag files used by bulk import"""
+
+import csv
+import io
+import json
+from pydantic import ValidationError
+from ctf_server.model.flag import Flag
+from ctf_server.model.flag_import import FlagImportResult, ImportStatus
+
+FILE_FORMATS = ("json", "csv")
+
+
+def parse_flag_file(content: str, file_format: str) -> list[Flag | FlagImportResult]:
+    """
+    Reads flags from JSON list of objects or CSV file with header
+    challenge_id,task_id,value.
+
+    Args:
+        content (str): file content
+        file_format (str): one of FILE_FORMATS
+
+    Returns:
+        list[Flag | FlagImportResult]: parsed flag or error result for each row
+    """
+    if file_format == "json":
+        records = json.loads(content)
+        if not isinstance(records, list):
+            raise ValueError("JSON flag file has to contain list of flags")
+    elif file_format == "csv":
+        records = list(csv.DictReader(io.StringIO(content)))
+    else:
+        raise ValueError(f"Unsupported flag file format: {file_format}")
+
+    rows = []
+    for row, record in enumerate(records, start=1):
+        try:
+            rows.append(Flag.model_validate(record))
+        except ValidationError as error:
+            rows.append(
+                FlagImportResult(
+                    row=row,
+                    challenge_id=_get_field(record, "challenge_id"),
+                    task_id=_get_field(record, "task_id"),
+                    status=ImportStatus.ERROR,
+                    error=f"INVALID_ROW: {error.errors()[0]['msg']}",
+                )
+            )
+    return rows
+
+
+def merge_import_results(
+    rows: list[Flag | FlagImportResult], results: list[FlagImportResult]
+) -> list[FlagImportResult]:
+    """
+    Builds report for whole file from rows rejected while parsing and results
+    of importing parsed flags.
+
+    Args:
+        rows (list[Flag | FlagImportResult]): output of parse_flag_file
+        results (list[FlagImportResult]): import results of parsed flags in order
+
+    Returns:
+        list[FlagImportResult]: result of every row numbered like in the file
+    """
+    imported = iter(results)
+    report = []
+    for row, parsed in enumerate(rows, start=1):
+        if isinstance(parsed, FlagImportResult):
+            report.append(parsed)
+        else:
+            report.append(next(imported).model_copy(update={"row": row}))
+    return report
+
+
+def summarize_import(report: list[FlagImportResult]) -> dict:
+    """Counts rows per import status"""
+    return {
+        status.value: sum(1 for result in report if result.status == status)
+        for status in ImportStatus
+    }
+
+
+def _get_field(record, field: str) -> str | None:
+    if isinstance(record, dict) and isinstance(record.get(field), str):
+        return record[field]
+    return None
@@ -0,0 +1,187 @@
+"""Negative lookup filter for challenge and task pairs which have no flag"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable
+from ctf_server import config
+
+
+@dataclass
+class FlagKeyFilterStats:
+    """Snapshot of flag key filter counters"""
+
+    loaded: bool
+    size: int
+    rejected: int
+    refreshes: int
+    miss_checks: int
+    refresh_errors: int
+
+
+class FlagKeyFilter:
+    """
+    Exact set of (challenge_id, task_id) pairs which have a stored flag.
+    Set is updated with flags created and deleted by this process and
+    rebuilt from storage every refresh interval. Before the first load
+    every pair is treated as possibly existing.
+
+    Flags created by other workers are missing in the set until the next
+    refresh. Unknown pairs are rejected without storage, except for a small
+    number of storage lookups per second shared by all unknown pairs, so
+    new flag of other worker is usually found before the refresh while
+    guessed pairs cost at most miss lookups per second of storage reads.
+    Found pairs are added to the set.
+    """
+
+    _REFRESH_SECONDS = config.flag_key_filter["refresh_seconds"]
+    _MISS_LOOKUPS_PER_SECOND = config.flag_key_filter["miss_lookups_per_second"]
+
+    def __init__(
+        self,
+        refresh_seconds: float = _REFRESH_SECONDS,
+        miss_lookups_per_second: float = _MISS_LOOKUPS_PER_SECOND,
+    ) -> None:
+        self._refresh_seconds = refresh_seconds
+        self._miss_lookups_per_second = miss_lookups_per_second
+        self._miss_lookup_tokens = miss_lookups_per_second
+        self._miss_lookups_updated_at = time.monotonic()
+        self._keys: set[tuple[str, str]] = set()
+        self._loaded_at: float = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._loads = 0
+        self._miss_checks = 0
+        self._refresh_errors = 0
+
+    def might_exist(self, challenge_id: str, task_id: str) -> bool:
+        """Check whether flag can be stored for challenge and task
+
+        Args:
+            challenge_id (str): flag challenge id
+            task_id (str): flag task id
+
+        Returns:
+            bool: False when filter is loaded, pair is unknown and budget of
+            miss lookups is used up
+        """
+        key = (challenge_id, task_id)
+        with self._lock:
+            if self._loaded_at is None or key in self._keys:
+                return True
+            if self._take_miss_lookup():
+                self._miss_checks += 1
+                return True
+            self._rejected += 1
+        logging.debug(
+            "FLAG_KEY_FILTER::Unknown key [challenge_id=%s, task_id=%s]",
+            challenge_id,
+            task_id,
+        )
+        return False
+
+    def _take_miss_lookup(self) -> bool:
+        now = time.monotonic()
+        self._miss_lookup_tokens = min(
+            self._miss_lookups_per_second,
+            self._miss_lookup_tokens
+            + (now - self._miss_lookups_updated_at) * self._miss_lookups_per_second,
+        )
+        self._miss_lookups_updated_at = now
+        if self._miss_lookup_tokens < 1:
+            return False
+        self._miss_lookup_tokens -= 1
+        return True
+
+    def begin_refresh(self) -> bool:
+        """Reserve refresh of keys when filter is not loaded or outdated
+
+        Returns:
+            bool: True if caller should load keys and pass them to load, other
+            callers keep using current keys meanwhile
+        """
+        with self._lock:
+            if self._refreshing:
+                return False
+            if (
+                self._loaded_at is not None
+                and time.monotonic() - self._loaded_at < self._refresh_seconds
+            ):
+                return False
+            self._refreshing = True
+            return True
+
+    def abort_refresh(self) -> None:
+        """Release refresh reserved with begin_refresh after loading failed"""
+        with self._lock:
+            self._refreshing = False
+            self._refresh_errors += 1
+
+    def load(self, keys: Iterable[tuple[str, str]]) -> None:
+        """Replace known keys with keys of all stored flags
+
+        Args:
+            keys (Iterable[tuple[str, str]]): challenge and task ids of stored flags
+        """
+        loaded_keys = set(keys)
+        with self._lock:
+            self._keys = loaded_keys
+            self._loaded_at = time.monotonic()
+            self._refreshing = False
+            self._loads += 1
+        logging.debug("FLAG_KEY_FILTER::Loaded %d keys", len(loaded_keys))
+
+    def add(self, challenge_id: str, task_id: str) -> None:
+        """Mark pair as known after flag was created
+
+        Args:
+            challenge_id (str): flag challenge id
+            task_id (str): flag task id
+        """
+        with self._lock:
+            self._keys.add((challenge_id, task_id))
+
+    def record_lookup(self, challenge_id: str, task_id: str, found: bool) -> None:
+        """Remember result of storage lookup of pair, found pair is added
+        so it is not rejected before the next refresh
+
+        Args:
+            challenge_id (str): flag challenge id
+            task_id (str): flag task id
+            found (bool): True if storage returned flag
+        """
+        if not found:
+            return
+        with self._lock:
+            self._keys.add((challenge_id, task_id))
+
+    def remove(self, challenge_id: str, task_id: str) -> None:
+        """Mark pair as unknown after flag was deleted
+
+        Args:
+            challenge_id (str): flag challenge id
+            task_id (str): flag task id
+        """
+        with self._lock:
+            self._keys.discard((challenge_id, task_id))
+
+    def stats(self) -> FlagKeyFilterStats:
+        """Current filter counters"""
+        with self._lock:
+            return FlagKeyFilterStats(
+                loaded=self._loaded_at is not None,
+                size=len(self._keys),
+                rejected=self._rejected,
+                refreshes=self._loads,
+                miss_checks=self._miss_checks,
+                refresh_errors=self._refresh_errors,
+            )
+
+
+def create_flag_key_filter() -> FlagKeyFilter:
+    """Creates flag key filter based on configuration, returns None if filter is disabled"""
+    if not config.flag_key_filter["enabled"]:
+        return None
+    return FlagKeyFilter()
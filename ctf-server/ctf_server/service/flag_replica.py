@@ -0,0 +1,274 @@
+"""In-memory replica of all stored flags kept current by storage change stream"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable
+from ctf_server import config
+from ctf_server.db.dto.flag_change import FLAG_DELETE, FlagChangeDto
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.storage_factory import storage_supports_change_stream
+from ctf_server.db.storage_service import StorageService
+
+
+@dataclass
+class FlagReplicaStats:
+    """Snapshot of flag replica state"""
+
+    ready: bool
+    size: int
+    changes_applied: int
+    resyncs: int
+    lag_seconds: float | None
+    staleness_seconds: float | None
+
+
+class FlagReplica:
+    """
+    Holds every stored flag in memory keyed by (challenge_id, task_id).
+    Background thread loads all flags and then applies changes read from
+    storage change stream. Change stream is opened before flags are loaded,
+    so no change made during the load is missed.
+
+    Replica is reloaded every resync interval, which also removes flags
+    deleted in storages whose change stream does not report deletes
+    (Cosmos DB change feed). Until the first load finishes, and after
+    change stream fails, replica is not ready and reads should go to storage.
+    """
+
+    _RESYNC_INTERVAL_SECONDS = config.flag_replica["resync_interval_seconds"]
+    _RETRY_DELAY_SECONDS = config.flag_replica["retry_delay_seconds"]
+
+    def __init__(
+        self,
+        storage_factory: Callable[[], StorageService],
+        resync_interval_seconds: float = _RESYNC_INTERVAL_SECONDS,
+        retry_delay_seconds: float = _RETRY_DELAY_SECONDS,
+    ) -> None:
+        """
+        Args:
+            storage_factory (Callable[[], StorageService]): creates storage
+            used by background thread, it is called on that thread so slow
+            connection does not block startup
+            resync_interval_seconds (float): time after which all flags are
+            loaded again
+            retry_delay_seconds (float): wait before reconnecting after failure
+        """
+        self._storage_factory = storage_factory
+        self._storage_service: StorageService = None
+        self._resync_interval_seconds = resync_interval_seconds
+        self._retry_delay_seconds = retry_delay_seconds
+        self._flags: dict[tuple[str, str], FlagDto] = {}
+        self._keys_by_id: dict[str, tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread = None
+        self._changes_applied = 0
+        self._loads = 0
+        self._lag_seconds: float = None
+        self._synced_at: float = None
+
+    @property
+    def is_ready(self) -> bool:
+        """True when replica holds all flags and follows change stream"""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Block until replica is ready
+
+        Args:
+            timeout (float): maximal wait in seconds, None waits forever
+
+        Returns:
+            bool: True if replica is ready
+        """
+        return self._ready.wait(timeout)
+
+    def start(self) -> None:
+        """Start background synchronization, does nothing when already started"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="flag-replica", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop background synchronization
+
+        Args:
+            timeout (float): maximal wait for background thread in seconds
+        """
+        self._stopped.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+        self._ready.clear()
+
+    def get(self, challenge_id: str, task_id: str) -> FlagDto:
+        """Get flag from replica
+
+        Args:
+            challenge_id (str): flag challenge id
+            task_id (str): flag task id
+
+        Returns:
+            FlagDto: replicated flag or None if it is not stored
+        """
+        with self._lock:
+            return self._flags.get((challenge_id, task_id))
+
+    def load(self, flags: Iterable[FlagDto]) -> None:
+        """Replace replica content with flags read from storage, tasks with
+        more than one stored flag are left out like in storage reads
+
+        Args:
+            flags (Iterable[FlagDto]): all stored flags
+        """
+        loaded_flags: dict[tuple[str, str], FlagDto] = {}
+        duplicated_keys = set()
+        for flag in flags:
+            key = (flag.challenge_id, flag.task_id)
+            if key in loaded_flags:
+                duplicated_keys.add(key)
+            loaded_flags[key] = flag
+        for key in duplicated_keys:
+            del loaded_flags[key]
+        keys_by_id = {flag.id: key for key, flag in loaded_flags.items()}
+        with self._lock:
+            self._flags = loaded_flags
+            self._keys_by_id = keys_by_id
+            self._loads += 1
+            self._synced_at = time.monotonic()
+        logging.info("FLAG_REPLICA::Loaded %d flags", len(loaded_flags))
+
+    def put(self, flag: FlagDto) -> None:
+        """Store flag written by this process before change stream delivers it
+
+        Args:
+            flag (FlagDto): flag saved in storage
+        """
+        with self._lock:
+            self._put(flag)
+
+    def remove(self, challenge_id: str, task_id: str) -> None:
+        """Remove flag deleted by this process
+
+        Args:
+            challenge_id (str): flag challenge id
+            task_id (str): flag task id
+        """
+        with self._lock:
+            flag = self._flags.pop((challenge_id, task_id), None)
+            if flag is not None:
+                self._keys_by_id.pop(flag.id, None)
+
+    def apply(self, change: FlagChangeDto) -> None:
+        """Apply change read from storage change stream
+
+        Args:
+            change (FlagChangeDto): created, updated or deleted flag
+        """
+        with self._lock:
+            if change.operation == FLAG_DELETE:
+                key = self._keys_by_id.pop(change.flag_id, None)
+                if key is not None:
+                    del self._flags[key]
+            else:
+                self._put(change.flag)
+            self._changes_applied += 1
+            self._synced_at = time.monotonic()
+            if change.timestamp is not None:
+                self._lag_seconds = max(time.time() - change.timestamp, 0.0)
+
+    def stats(self) -> FlagReplicaStats:
+        """Current replica state, staleness is time since replica last heard
+        from storage and lag is delay of the last applied change"""
+        with self._lock:
+            return FlagReplicaStats(
+                ready=self._ready.is_set(),
+                size=len(self._flags),
+                changes_applied=self._changes_applied,
+                resyncs=max(self._loads - 1, 0),
+                lag_seconds=self._lag_seconds,
+                staleness_seconds=(
+                    time.monotonic() - self._synced_at
+                    if self._synced_at is not None
+                    else None
+                ),
+            )
+
+    def _put(self, flag: FlagDto) -> None:
+        key = (flag.challenge_id, flag.task_id)
+        previous_flag = self._flags.get(key)
+        if previous_flag is not None:
+            self._keys_by_id.pop(previous_flag.id, None)
+        self._flags[key] = flag
+        self._keys_by_id[flag.id] = key
+
+    def _mark_synced(self) -> None:
+        with self._lock:
+            self._synced_at = time.monotonic()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                if self._storage_service is None:
+                    self._storage_service = self._storage_factory()
+                if not self._storage_service.supports_change_stream:
+                    logging.error(
+                        "FLAG_REPLICA::Storage does not support change streams"
+                    )
+                    self._ready.clear()
+                    return
+                self._sync()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("FLAG_REPLICA::Synchronization failed, retrying")
+                self._ready.clear()
+                self._stopped.wait(self._retry_delay_seconds)
+
+    def _sync(self) -> None:
+        """Loads all flags and follows change stream until resync is due"""
+        changes = self._storage_service.open_change_stream()
+        try:
+            self.load(self._storage_service.iter_all_flags())
+            self._ready.set()
+            resync_at = time.monotonic() + self._resync_interval_seconds
+            for change in changes:
+                if self._stopped.is_set():
+                    return
+                if change is None:
+                    self._mark_synced()
+                else:
+                    self.apply(change)
+                if time.monotonic() >= resync_at:
+                    logging.debug("FLAG_REPLICA::Resync interval passed")
+                    return
+            logging.warning("FLAG_REPLICA::Change stream ended, reloading flags")
+        finally:
+            close = getattr(changes, "close", None)
+            if close is not None:
+                close()
+
+
+def create_flag_replica(
+    storage_factory: Callable[[], StorageService],
+) -> FlagReplica:
+    """Creates flag replica based on configuration, returns None if replica is disabled
+
+    Raises:
+        ValueError: replica is enabled for storage which cannot stream changes
+    """
+    if not config.flag_replica["enabled"]:
+        return None
+    if not storage_supports_change_stream():
+        raise ValueError(
+            "Flag replica needs storage with change stream, "
+            f"{config.storage['backend']} storage has none"
+        )
+    return FlagReplica(storage_factory)
@@ -1,43 +1,117 @@
 """Module that contains logick for base actions on flags"""
 
 import logging
-from datetime import datetime as dt
-from ctf_server.core.crypto import Crypto
-from ctf_server.core.flag_validator import FlagValidator
+import threading
+from typing import Iterator
 from ctf_server.core.flag_validator_strategy import FlagValidatorStrategy
+from ctf_server.core.metrics import FLAG_SERVICE_SECONDS, timed
 from ctf_server.db.dto.flag_dto import FlagDto
 from ctf_server.db.storage_service import StorageService
 from ctf_server.model.flag import Flag
+from ctf_server.model.flag_import import FlagImportResult
+from ctf_server.model.flag_page import FlagPage
 from ctf_server.model.state import State
+from ctf_server.service.flag_cache import FlagCache
+from ctf_server.service.flag_key_filter import FlagKeyFilter
+from ctf_server.service.flag_replica import FlagReplica
+from ctf_server.service.flag_service_base import FlagServiceBase
+from ctf_server.service.scoreboard import Scoreboard
+from ctf_server.service.single_flight import SingleFlight
+from ctf_server.service.submission_log import SubmissionLog
 
 
-class FlagService:
+class FlagService(FlagServiceBase):
     """Class with base functions to work on flags"""
 
     def __init__(
-        self, storage_service: StorageService, strategy: FlagValidatorStrategy
+        self,
+        storage_service: StorageService,
+        strategy: FlagValidatorStrategy,
+        flag_cache: FlagCache = None,
+        flag_replica: FlagReplica = None,
+        flag_key_filter: FlagKeyFilter = None,
+        submission_log: SubmissionLog = None,
+        scoreboard: Scoreboard = None,
     ) -> None:
+        super().__init__(
+            strategy,
+            flag_cache,
+            flag_replica,
+            flag_key_filter,
+            submission_log,
+            scoreboard,
+        )
         self._storage_service = storage_service
-        self._flag_validator = FlagValidator(strategy)
+        self._single_flight = SingleFlight()
 
-    def submit_flag(self, flag: Flag) -> State:
+    @timed(FLAG_SERVICE_SECONDS, "submit_flag")
+    def submit_flag(self, flag: Flag, team_id: str = None) -> State:
         """
-        Takes one flag as an input, then based on its challenge and task
-        reference the correct flag value is requested from storage. Finally
+        Takes one flag as an input and rejects it early when its size, charset
+        or format is invalid. Then based on its challenge and task reference
+        the correct flag value is requested from storage. Finally
         uses flag validator to check whether provided flag is correct for
-        specific task.
+        specific task. Result is queued in submission log when it is enabled.
 
         Args:
             flag (Flag): flag provided by user
+            team_id (str): team which submitted flag, None when unknown
 
         Returns:
             state (State): state calculated based on user input
         """
-        actual_flag = self._storage_service.get_flag(flag.challenge_id, flag.task_id)
+        state = self._check_submission(flag)
+        self._record_submissions([flag], [state], team_id)
+        return state
+
+    def _check_submission(self, flag: Flag) -> State:
+        state = self._submission_gate.check(flag)
+        if state is not None:
+            return state
+        actual_flag = self._get_stored_flag(flag.challenge_id, flag.task_id)
         if actual_flag is None:
             return State.INVALID_FLAG
-        return self._flag_validator.is_valid_flag(flag.value, actual_flag.value)
+        return self._flag_validator.compare_with_stored_value(
+            flag.value, actual_flag.value
+        )
+
+    @timed(FLAG_SERVICE_SECONDS, "submit_flags")
+    def submit_flags(self, flags: list[Flag], team_id: str = None) -> list[State]:
+        """
+        Validates many submitted flags at once. Format of every flag is checked
+        before storage is used, then stored flags are read with one storage
+        query per challenge.
+
+        Args:
+            flags (list[Flag]): flags provided by user
+            team_id (str): team which submitted flags, None when unknown
+
+        Returns:
+            list[State]: state of each flag, in the same order as input
+        """
+        self._refresh_key_filter()
+        states, stored_flags, tasks_to_read = self._start_batch(flags)
+        read_generation = self._cache_generation()
+        for challenge_id, task_ids in tasks_to_read.items():
+            for flag_dto in self._storage_service.get_flags(
+                challenge_id, sorted(task_ids)
+            ):
+                stored_flags[(flag_dto.challenge_id, flag_dto.task_id)] = flag_dto
+                self._cache_put(flag_dto, read_generation)
+            for task_id in task_ids:
+                self._key_filter_record_lookup(
+                    challenge_id, task_id, stored_flags.get((challenge_id, task_id))
+                )
+        logging.debug(
+            "FLAG_SERVICE::Batch of %d flags read from %d challenges",
+            len(flags),
+            len(tasks_to_read),
+        )
+        states = self._finish_batch(flags, states, stored_flags)
+        self._record_submissions(flags, states, team_id)
+        return states
 
+    @timed(FLAG_SERVICE_SECONDS, "get_flag")
     def get_flag(self, challenge_id: str, task_id: id) -> Flag:
         """Get flag per challenge and task id
 
@@ -48,31 +122,48 @@ class FlagService:
         Returns:
             Flag: returns flag from storage
         """
-        logging.debug("Try to get a flag [challenge_id=%s, task_id=%s]", challenge_id, task_id)
-        flag_dto = self._storage_service.get_flag(challenge_id, task_id)
+        logging.debug(
+            "Try to get a flag [challenge_id=%s, task_id=%s]", challenge_id, task_id
+        )
+        flag_dto = self._get_stored_flag(challenge_id, task_id)
         if flag_dto is None:
             return None
-        return Flag(
-            value=flag_dto.value,
-            challenge_id=flag_dto.challenge_id,
-            task_id=flag_dto.task_id,
-        )
+        return self._to_flag(flag_dto)
 
+    @timed(FLAG_SERVICE_SECONDS, "get_all_flags")
     def get_all_flags(self) -> list[Flag]:
         """Get all flags from storage"""
         logging.debug("Try to get all")
         flag_dtos = self._storage_service.get_all_flags()
-        flags = []
-        for flag_dto in flag_dtos:
-            flags.append(
-                Flag(
-                    value=flag_dto.value,
-                    challenge_id=flag_dto.challenge_id,
-                    task_id=flag_dto.task_id,
-                )
-            )
-        return flags
+        return [self._to_flag(flag_dto) for flag_dto in flag_dtos]
+
+    @timed(FLAG_SERVICE_SECONDS, "get_flags_page")
+    def get_flags_page(
+        self, page_size: int, continuation_token: str = None
+    ) -> FlagPage:
+        """Get single page of flags
+
+        Args:
+            page_size (int): maximal number of flags in page
+            continuation_token (str): token returned with previous page, None
+            for the first page
+
+        Returns:
+            FlagPage: flags and token of the next page, token is None on last page
+        """
+        flag_page = self._storage_service.get_flags_page(page_size, continuation_token)
+        return FlagPage(
+            flags=[self._to_flag(flag_dto) for flag_dto in flag_page.flags],
+            continuation_token=flag_page.continuation_token,
+        )
 
+    @timed(FLAG_SERVICE_SECONDS, "iter_all_flags")
+    def iter_all_flags(self) -> Iterator[Flag]:
+        """Iterate over all flags without loading them all into memory"""
+        for flag_dto in self._storage_service.iter_all_flags():
+            yield self._to_flag(flag_dto)
+
+    @timed(FLAG_SERVICE_SECONDS, "create_flag")
     def create_flag(self, flag: Flag) -> Flag:
         """Based on flag details provided by user creates object in storage
 
@@ -82,32 +173,35 @@ class FlagService:
         Returns:
             Flag: returns None if there is an error otherwise returns saved flag dto
         """
-        if flag.value is None:
-            logging.debug("FLAG_SERVICE::Flag creation failed - flag value is none")
-            return None
-        is_valid_format = self._flag_validator.validate_flag_format(flag.value)
-        if not is_valid_format:
-            logging.debug("FLAG_SERVICE::Flag creation failed - invalid flag format")
+        if not self._is_valid_new_value(flag, "creation"):
             return None
 
-        if self._storage_service.get_flag(flag.challenge_id, flag.task_id) is not None:
+        flag_dto = self._storage_service.create_flag(self._new_flag_dto(flag))
+        if flag_dto is None:
             logging.debug("FLAG_SERVICE::Flag creation failed - flag already exists")
             return None
-
-        flag_dto = FlagDto(
-            id=str(int(dt.timestamp(dt.now()))),
-            value=Crypto.hash_to_md5(flag.value),
-            challenge_id=flag.challenge_id,
-            task_id=flag.task_id,
-        )
-        flag_dto = self._storage_service.create_flag(flag_dto)
+        self._cache_put(flag_dto)
+        self._replica_put(flag_dto)
+        self._key_filter_add(flag_dto.challenge_id, flag_dto.task_id)
         logging.debug("FLAG_SERVICE::Flag created successfully")
-        return Flag(
-            value=flag_dto.value,
-            challenge_id=flag_dto.challenge_id,
-            task_id=flag_dto.task_id,
-        )
+        return self._to_flag(flag_dto)
+
+    @timed(FLAG_SERVICE_SECONDS, "import_flags")
+    def import_flags(self, flags: list[Flag]) -> list[FlagImportResult]:
+        """Creates many flags at once, every value is hashed once and all flags
+        are written with storage bulk writes
+
+        Args:
+            flags (list[Flag]): flags to import
+
+        Returns:
+            list[FlagImportResult]: result of each flag, in the same order as input
+        """
+        results, indexes, flag_dtos = self._start_import(flags)
+        statuses = self._storage_service.create_flags(flag_dtos) if flag_dtos else []
+        return self._finish_import(flags, results, indexes, statuses)
 
+    @timed(FLAG_SERVICE_SECONDS, "remove_flag")
     def remove_flag(self, challenge_id: str, task_id: str) -> bool:
         """Delete flag based on assigned challenge and task ids
 
@@ -119,10 +213,15 @@ class FlagService:
             bool: returns True if flag was deleted successfully
         """
         flag = self._storage_service.get_flag(challenge_id, task_id)
-        if flag is None:
-            return False
-        return self._storage_service.delete_flag(challenge_id, flag.id)
+        is_deleted = flag is not None and (
+            self._storage_service.delete_flag(challenge_id, flag.id)
+        )
+        self._cache_invalidate(challenge_id, task_id)
+        self._replica_remove(challenge_id, task_id)
+        self._key_filter_remove(challenge_id, task_id)
+        return is_deleted
 
+    @timed(FLAG_SERVICE_SECONDS, "update_flag")
     def update_flag(self, flag: Flag):
         """Based on flag details provided by user updated existing object in storage
 
@@ -132,27 +231,60 @@ class FlagService:
         Returns:
             Flag: returns None if there is an error otherwise returns saved flag dto
         """
-        if flag.value is None:
-            logging.debug("FLAG_SERVICE::Flag updated failed - flag value is none")
-            return None
-        is_valid_format = self._flag_validator.validate_flag_format(flag.value)
-        if not is_valid_format:
-            logging.debug("FLAG_SERVICE::Flag update failed - invalid flag format")
+        if not self._is_valid_new_value(flag, "update"):
             return None
 
-        existing_flag = self._storage_service.get_flag(flag.challenge_id, flag.task_id)
-        if existing_flag is None:
+        flag_dto = self._storage_service.update_flag(self._flag_value_dto(flag))
+        self._cache_invalidate(flag.challenge_id, flag.task_id)
+        if flag_dto is None:
             logging.debug("FLAG_SERVICE::Flag update failed - flag does not exists")
             return None
+        self._cache_put(flag_dto)
+        self._replica_put(flag_dto)
+        logging.debug("FLAG_SERVICE::Flag updated successfully")
+        return self._to_flag(flag_dto)
 
-        existing_flag.value = Crypto.hash_to_md5(flag.value)
-        flag_dto = self._storage_service.update_flag(existing_flag)
-        if flag_dto is None:
-            logging.debug("FLAG_SERVICE::Flag update failed")
+    def close(self) -> None:
+        """Release storage connections. Flag replica and submission log may
+        be shared by many services, they are stopped by their owner"""
+        self._storage_service.close()
+
+    def _get_stored_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        if self._replica_ready():
+            return self._flag_replica.get(challenge_id, task_id)
+        self._refresh_key_filter()
+        if not self._key_may_exist(challenge_id, task_id):
             return None
-        logging.debug("FLAG_SERVICE::Flag updated successfully")
-        return Flag(
-            value=flag_dto.value,
-            challenge_id=flag_dto.challenge_id,
-            task_id=flag_dto.task_id,
+        flag_dto = self._cache_get(challenge_id, task_id)
+        if flag_dto is not None:
+            return flag_dto
+        return self._single_flight.do(
+            (challenge_id, task_id), lambda: self._read_flag(challenge_id, task_id)
         )
+
+    def _read_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        read_generation = self._cache_generation()
+        flag_dto = self._storage_service.get_flag(challenge_id, task_id)
+        self._cache_put(flag_dto, read_generation)
+        self._key_filter_record_lookup(challenge_id, task_id, flag_dto)
+        return flag_dto
+
+    def _refresh_key_filter(self) -> None:
+        """Start loading keys in background thread when refresh is due,
+        request which triggered it keeps using current keys"""
+        if self._begin_key_filter_refresh():
+            threading.Thread(
+                target=self._load_key_filter, name="flag-key-filter", daemon=True
+            ).start()
+
+    def _load_key_filter(self) -> None:
+        try:
+            self._flag_key_filter.load(
+                [
+                    (flag_dto.challenge_id, flag_dto.task_id)
+                    for flag_dto in self._storage_service.iter_all_flags()
+                ]
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            self._flag_key_filter.abort_refresh()
+            logging.exception("FLAG_SERVICE::Could not load keys of flag key filter")
@@ -0,0 +1,344 @@
+"""Logic shared by synchronous and asynchronous flag services"""
+
+import logging
+from dataclasses import asdict
+from datetime import datetime as dt
+from datetime import timezone
+from ctf_server import config
+from ctf_server.core.crypto import Crypto
+from ctf_server.core.flag_validator import FlagValidator
+from ctf_server.core.flag_validator_strategy import FlagValidatorStrategy
+from ctf_server.core.metrics import count_states
+from ctf_server.core.submission_gate import SubmissionGate
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.model.flag import Flag
+from ctf_server.model.flag_import import FlagImportResult, ImportStatus
+from ctf_server.model.state import State
+from ctf_server.service.flag_cache import FlagCache
+from ctf_server.service.flag_key_filter import FlagKeyFilter
+from ctf_server.service.flag_replica import FlagReplica
+from ctf_server.service.scoreboard import Scoreboard
+from ctf_server.service.single_flight import AsyncSingleFlight, SingleFlight
+from ctf_server.service.submission_log import SubmissionLog
+
+
+class FlagServiceBase:
+    """Validation and conversions which do not touch storage"""
+
+    _single_flight: SingleFlight | AsyncSingleFlight
+    _VALUE_FORMAT = config.flag_storage["value_format"]
+
+    def __init__(
+        self,
+        strategy: FlagValidatorStrategy,
+        flag_cache: FlagCache = None,
+        flag_replica: FlagReplica = None,
+        flag_key_filter: FlagKeyFilter = None,
+        submission_log: SubmissionLog = None,
+        scoreboard: Scoreboard = None,
+    ) -> None:
+        self._flag_validator = FlagValidator(strategy)
+        self._submission_gate = SubmissionGate(self._flag_validator)
+        self._flag_cache = flag_cache
+        self._flag_replica = flag_replica
+        self._flag_key_filter = flag_key_filter
+        self._submission_log = submission_log
+        self._scoreboard = scoreboard
+
+    @property
+    def scoreboard(self) -> Scoreboard | None:
+        """Scoreboard fed by accepted submissions, None when disabled"""
+        return self._scoreboard
+
+    def start(self) -> None:
+        """Start loading flag replica, reads go to storage until it is ready,
+        start writer of submission log and rebuild of scoreboard"""
+        if self._flag_replica is not None:
+            self._flag_replica.start()
+        if self._submission_log is not None:
+            self._submission_log.start()
+        if self._scoreboard is not None:
+            self._scoreboard.start()
+
+    def stats(self) -> dict:
+        """Counters of submission gate, storage lookup coalescing, flag cache,
+        flag replica, flag key filter, submission log and scoreboard, None for
+        disabled ones"""
+        return {
+            "submission_gate": asdict(self._submission_gate.stats()),
+            "single_flight": asdict(self._single_flight.stats()),
+            "flag_cache": (
+                asdict(self._flag_cache.stats()) if self._flag_cache else None
+            ),
+            "flag_replica": (
+                asdict(self._flag_replica.stats()) if self._flag_replica else None
+            ),
+            "flag_key_filter": (
+                asdict(self._flag_key_filter.stats()) if self._flag_key_filter else None
+            ),
+            "submission_log": (
+                asdict(self._submission_log.stats()) if self._submission_log else None
+            ),
+            "scoreboard": (
+                asdict(self._scoreboard.stats()) if self._scoreboard else None
+            ),
+        }
+
+    def _is_valid_new_value(self, flag: Flag, action: str) -> bool:
+        if flag.value is None:
+            logging.debug("FLAG_SERVICE::Flag %s failed - flag value is none", action)
+            return False
+        if self._submission_gate.check_stored(flag) is not None:
+            logging.debug(
+                "FLAG_SERVICE::Flag %s failed - flag exceeds submission limits", action
+            )
+            return False
+        is_valid_format = self._flag_validator.validate_flag_format(
+            flag.value, flag.challenge_id
+        )
+        if not is_valid_format:
+            logging.debug("FLAG_SERVICE::Flag %s failed - invalid flag format", action)
+            return False
+        return True
+
+    def _new_flag_dto(self, flag: Flag) -> FlagDto:
+        return FlagDto(
+            id=str(int(dt.timestamp(dt.now()))),
+            value=self._hash_value(flag.value),
+            challenge_id=flag.challenge_id,
+            task_id=flag.task_id,
+        )
+
+    def _flag_value_dto(self, flag: Flag) -> FlagDto:
+        """Flag with new hashed value identified by challenge and task ids only"""
+        return FlagDto(
+            id=None,
+            value=self._hash_value(flag.value),
+            challenge_id=flag.challenge_id,
+            task_id=flag.task_id,
+        )
+
+    def _hash_value(self, value: str) -> str | bytes:
+        """Hash of flag value in configured storage format, raw digest
+        for binary format and hex string otherwise"""
+        if self._VALUE_FORMAT == "binary":
+            return Crypto.digest_md5(value)
+        return Crypto.hash_to_md5(value)
+
+    def _record_submissions(
+        self, flags: list[Flag], states: list[State], team_id: str
+    ) -> None:
+        """Queue submission events, flag values are not logged, and count
+        accepted flags of identified team on scoreboard, outcomes are counted
+        in metrics"""
+        count_states(states)
+        if self._submission_log is None and self._scoreboard is None:
+            return
+        timestamp = dt.now(timezone.utc)
+        for flag, state in zip(flags, states):
+            if self._scoreboard is not None and team_id and state == State.VALID_FLAG:
+                self._scoreboard.record_solve(
+                    team_id, flag.challenge_id, flag.task_id, timestamp
+                )
+            if self._submission_log is None:
+                continue
+            self._submission_log.record(
+                SubmissionEventDto(
+                    team_id=team_id,
+                    challenge_id=flag.challenge_id,
+                    task_id=flag.task_id,
+                    state=state.value,
+                    timestamp=timestamp,
+                )
+            )
+
+    def _cache_get(self, challenge_id: str, task_id: str) -> FlagDto:
+        if self._flag_cache is None:
+            return None
+        return self._flag_cache.get(challenge_id, task_id)
+
+    def _cache_generation(self) -> int:
+        if self._flag_cache is None:
+            return None
+        return self._flag_cache.generation()
+
+    def _cache_put(self, flag_dto: FlagDto, read_generation: int = None) -> None:
+        """Cache flag, flags read from storage pass generation taken before
+        the read"""
+        if self._flag_cache is not None and flag_dto is not None:
+            self._flag_cache.put(flag_dto, read_generation)
+
+    def _cache_invalidate(self, challenge_id: str, task_id: str) -> None:
+        if self._flag_cache is not None:
+            self._flag_cache.invalidate(challenge_id, task_id)
+
+    def _replica_ready(self) -> bool:
+        return self._flag_replica is not None and self._flag_replica.is_ready
+
+    def _replica_put(self, flag_dto: FlagDto) -> None:
+        if self._flag_replica is not None and flag_dto is not None:
+            self._flag_replica.put(flag_dto)
+
+    def _replica_remove(self, challenge_id: str, task_id: str) -> None:
+        if self._flag_replica is not None:
+            self._flag_replica.remove(challenge_id, task_id)
+
+    def _key_may_exist(self, challenge_id: str, task_id: str) -> bool:
+        if self._flag_key_filter is None:
+            return True
+        return self._flag_key_filter.might_exist(challenge_id, task_id)
+
+    def _begin_key_filter_refresh(self) -> bool:
+        """True when caller should load keys of all flags into key filter,
+        filter is not used while replica is ready"""
+        if self._flag_key_filter is None or self._replica_ready():
+            return False
+        return self._flag_key_filter.begin_refresh()
+
+    def _key_filter_add(self, challenge_id: str, task_id: str) -> None:
+        if self._flag_key_filter is not None:
+            self._flag_key_filter.add(challenge_id, task_id)
+
+    def _key_filter_record_lookup(
+        self, challenge_id: str, task_id: str, flag_dto: FlagDto
+    ) -> None:
+        if self._flag_key_filter is not None:
+            self._flag_key_filter.record_lookup(
+                challenge_id, task_id, flag_dto is not None
+            )
+
+    def _key_filter_remove(self, challenge_id: str, task_id: str) -> None:
+        if self._flag_key_filter is not None:
+            self._flag_key_filter.remove(challenge_id, task_id)
+
+    def _start_batch(
+        self, flags: list[Flag]
+    ) -> tuple[list[State], dict[tuple[str, str], FlagDto], dict[str, set[str]]]:
+        """Runs submission gate on every submitted flag and takes stored flags
+        of accepted ones from replica or cache
+
+        Returns:
+            tuple: states of rejected flags filled in, stored flags found
+            in cache and task ids to read from storage grouped by challenge
+        """
+        stored_flags = {}
+        tasks_to_read: dict[str, set[str]] = {}
+        replica_ready = self._replica_ready()
+        states = self._submission_gate.check_many(flags)
+        for index, flag in enumerate(flags):
+            if states[index] is not None:
+                continue
+            key = (flag.challenge_id, flag.task_id)
+            if key in stored_flags or flag.task_id in tasks_to_read.get(
+                flag.challenge_id, ()
+            ):
+                continue
+            if replica_ready:
+                replicated_flag = self._flag_replica.get(*key)
+                if replicated_flag is not None:
+                    stored_flags[key] = replicated_flag
+                continue
+            if not self._key_may_exist(*key):
+                continue
+            cached_flag = self._cache_get(*key)
+            if cached_flag is not None:
+                stored_flags[key] = cached_flag
+            else:
+                tasks_to_read.setdefault(flag.challenge_id, set()).add(flag.task_id)
+        return states, stored_flags, tasks_to_read
+
+    def _finish_batch(
+        self,
+        flags: list[Flag],
+        states: list[State],
+        stored_flags: dict[tuple[str, str], FlagDto],
+    ) -> list[State]:
+        for index, flag in enumerate(flags):
+            if states[index] is not None:
+                continue
+            stored_flag = stored_flags.get((flag.challenge_id, flag.task_id))
+            if stored_flag is None:
+                states[index] = State.INVALID_FLAG
+            else:
+                states[index] = self._flag_validator.compare_with_stored_value(
+                    flag.value, stored_flag.value
+                )
+        return states
+
+    def _start_import(
+        self, flags: list[Flag]
+    ) -> tuple[list[FlagImportResult], list[int], list[FlagDto]]:
+        """Validates submission limits and format of imported flags and
+        hashes valid ones
+
+        Returns:
+            tuple: results with errors filled in, indexes of valid flags
+            and their dtos to write
+        """
+        results = [None] * len(flags)
+        checked = []
+        for index, flag in enumerate(flags):
+            state = self._submission_gate.check_stored(flag)
+            if state is not None:
+                results[index] = self._import_result(
+                    index, flag, ImportStatus.ERROR, state.name
+                )
+                continue
+            checked.append(index)
+        valid_formats = self._flag_validator.validate_flag_formats(
+            [flags[index].value for index in checked],
+            [flags[index].challenge_id for index in checked],
+        )
+        indexes = []
+        flag_dtos = []
+        for index, is_valid_format in zip(checked, valid_formats):
+            flag = flags[index]
+            if not is_valid_format:
+                results[index] = self._import_result(
+                    index, flag, ImportStatus.ERROR, "INVALID_FORMAT"
+                )
+                continue
+            indexes.append(index)
+            flag_dtos.append(self._new_flag_dto(flag))
+        return results, indexes, flag_dtos
+
+    def _finish_import(
+        self,
+        flags: list[Flag],
+        results: list[FlagImportResult],
+        indexes: list[int],
+        statuses: list[ImportStatus],
+    ) -> list[FlagImportResult]:
+        for index, status in zip(indexes, statuses):
+            flag = flags[index]
+            if status == ImportStatus.CREATED:
+                self._cache_invalidate(flag.challenge_id, flag.task_id)
+                self._key_filter_add(flag.challenge_id, flag.task_id)
+            results[index] = self._import_result(index, flag, status)
+        logging.debug(
+            "FLAG_SERVICE::Imported %d flags, created = %d",
+            len(flags),
+            statuses.count(ImportStatus.CREATED),
+        )
+        return results
+
+    @staticmethod
+    def _import_result(
+        index: int, flag: Flag, status: ImportStatus, error: str = None
+    ) -> FlagImportResult:
+        return FlagImportResult(
+            row=index + 1,
+            challenge_id=flag.challenge_id,
+            task_id=flag.task_id,
+            status=status,
+            error=error,
+        )
+
+    @staticmethod
+    def _to_flag(flag_dto: FlagDto) -> Flag:
+        return Flag(
+            value=Crypto.to_hex(flag_dto.value),
+            challenge_id=flag_dto.challenge_id,
+            task_id=flag_dto.task_id,
+        )
@@ -0,0 +1,77 @@
+"""Process wide access to lazily created flag service"""
+
+import logging
+import threading
+from typing import Callable, TypeVar
+from ctf_server.service.flag_service import FlagService
+
+T = TypeVar("T")
+
+
+class FlagServiceProvider:
+    """
+    Keeps single flag service for the whole process lifetime, so storage
+    clients and their connections are reused between requests. Service is
+    created on first use and recreated when it fails with recoverable error.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], FlagService],
+        recoverable_errors: tuple[type[Exception], ...] = (),
+    ) -> None:
+        self._factory = factory
+        self._recoverable_errors = recoverable_errors
+        self._flag_service: FlagService = None
+        self._lock = threading.Lock()
+
+    def get(self) -> FlagService:
+        """Returns shared flag service, creates it when called for the first time"""
+        flag_service = self._flag_service
+        if flag_service is not None:
+            return flag_service
+        with self._lock:
+            if self._flag_service is None:
+                logging.info("FLAG_SERVICE_PROVIDER::Creating flag service")
+                self._flag_service = self._factory()
+            return self._flag_service
+
+    def reset(self, flag_service: FlagService = None) -> None:
+        """Drops shared flag service so the next call creates a new one,
+        dropped service releases its storage connections
+
+        Args:
+            flag_service (FlagService): broken service, when provided service
+            is dropped only if it was not replaced by another thread already
+        """
+        with self._lock:
+            dropped_service = self._flag_service
+            if flag_service is not None and dropped_service is not flag_service:
+                return
+            self._flag_service = None
+        if dropped_service is None:
+            return
+        try:
+            dropped_service.close()
+        except Exception:  # pylint: disable=broad-exception-caught
+            logging.exception("FLAG_SERVICE_PROVIDER::Could not close flag service")
+
+    def run(self, action: Callable[[FlagService], T]) -> T:
+        """Runs action on shared service, on recoverable error service is
+        recreated and action is retried once
+
+        Args:
+            action (Callable[[FlagService], T]): operation to run on service
+
+        Returns:
+            T: action result
+        """
+        flag_service = self.get()
+        try:
+            return action(flag_service)
+        except self._recoverable_errors:
+            logging.exception(
+                "FLAG_SERVICE_PROVIDER::Flag service failed, recreating storage client"
+            )
+            self.reset(flag_service)
+        return action(self.get())
@@ -0,0 +1,98 @@
+"""Ordered collection with positional lookups"""
+
+import random
+from typing import Any, Iterator
+
+_MAX_LEVELS = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, levels: int) -> None:
+        self.key = key
+        self.next: list[_Node] = [None] * levels
+        # number of bottom level steps to the next node of each level
+        self.width = [1] * levels
+
+
+class RankIndex:
+    """
+    Indexable skip list of unique, mutually comparable keys. Insert, remove
+    and position lookup take O(log n) expected time, iteration from the
+    smallest key is linear in number of visited keys.
+    """
+
+    def __init__(self) -> None:
+        self._head = _Node(None, _MAX_LEVELS)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Any]:
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def add(self, key: Any) -> None:
+        """Insert key, key must not be present already"""
+        chain = [self._head] * _MAX_LEVELS
+        steps_at_level = [0] * _MAX_LEVELS
+        node = self._head
+        for level in reversed(range(_MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        new_node = _Node(key, self._random_levels())
+        steps = 0
+        for level in range(len(new_node.next)):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(len(new_node.next), _MAX_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key: Any) -> None:
+        """Remove key, raises KeyError when it is not present"""
+        chain = [self._head] * _MAX_LEVELS
+        node = self._head
+        for level in reversed(range(_MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), _MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key: Any) -> int:
+        """Zero based position of key, raises KeyError when it is not present"""
+        position = 0
+        node = self._head
+        for level in reversed(range(_MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0] is None or node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    @staticmethod
+    def _random_levels() -> int:
+        levels = 1
+        while levels < _MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
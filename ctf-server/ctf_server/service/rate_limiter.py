@@ -0,0 +1,196 @@
+"""Per team and global rate limiting of flag submissions"""
+
+import logging
+import math
+import threading
+from dataclasses import dataclass
+from ctf_server import config
+from ctf_server.db.mongodb_rate_limit_backend import MongodbRateLimitBackend
+from ctf_server.db.rate_limit_backend import InMemoryRateLimitBackend, RateLimitBackend
+
+GLOBAL_KEY = "global"
+
+_BACKENDS = {"memory": InMemoryRateLimitBackend, "mongodb": MongodbRateLimitBackend}
+
+
+@dataclass
+class RateLimitDecision:
+    """Result of single rate limit check"""
+
+    allowed: bool
+    retry_after_seconds: float = 0.0
+    scope: str | None = None
+
+
+@dataclass
+class RateLimiterStats:
+    """Snapshot of rate limiter counters"""
+
+    allowed: int
+    limited_team: int
+    limited_global: int
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiting with bucket per team and one global bucket.
+    Team bucket is checked first, so team over its limit does not use
+    global budget. Global limit is disabled when its rate is not positive.
+    """
+
+    _TEAM_RATE = config.rate_limit["team_rate_per_second"]
+    _TEAM_BURST = config.rate_limit["team_burst"]
+    _GLOBAL_RATE = config.rate_limit["global_rate_per_second"]
+    _GLOBAL_BURST = config.rate_limit["global_burst"]
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        team_rate: float = _TEAM_RATE,
+        team_burst: float = _TEAM_BURST,
+        global_rate: float = _GLOBAL_RATE,
+        global_burst: float = _GLOBAL_BURST,
+    ) -> None:
+        """
+        Args:
+            backend (RateLimitBackend): storage of token buckets
+            team_rate (float): tokens added to team bucket per second
+            team_burst (float): team bucket capacity
+            global_rate (float): tokens added to global bucket per second
+            global_burst (float): global bucket capacity
+        """
+        self._backend = backend
+        self._team_rate = team_rate
+        self._team_burst = team_burst
+        self._global_rate = global_rate
+        self._global_burst = global_burst
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._limited = {"team": 0, "global": 0}
+
+    @property
+    def is_blocking(self) -> bool:
+        """True when checks do network calls"""
+        return self._backend.is_blocking
+
+    def acquire(self, team_id: str, cost: float = 1) -> RateLimitDecision:
+        """Take tokens for request of team, cost above bucket capacity is
+        lowered to the capacity so that request waits for full bucket instead
+        of being limited forever
+
+        Args:
+            team_id (str): team or client identifier
+            cost (float): tokens used by request
+
+        Returns:
+            RateLimitDecision: whether request is allowed and when to retry
+        """
+        retry_after = self._backend.acquire(
+            f"team:{team_id}",
+            self._team_rate,
+            self._team_burst,
+            min(cost, self._team_burst),
+        )
+        if retry_after > 0:
+            return self._limit("team", team_id, retry_after)
+        if self._global_rate > 0:
+            retry_after = self._backend.acquire(
+                GLOBAL_KEY,
+                self._global_rate,
+                self._global_burst,
+                min(cost, self._global_burst),
+            )
+            if retry_after > 0:
+                return self._limit("global", team_id, retry_after)
+        with self._lock:
+            self._allowed += 1
+        return RateLimitDecision(allowed=True)
+
+    def stats(self) -> RateLimiterStats:
+        """Current rate limiter counters"""
+        with self._lock:
+            return RateLimiterStats(
+                allowed=self._allowed,
+                limited_team=self._limited["team"],
+                limited_global=self._limited["global"],
+            )
+
+    def _limit(self, scope: str, team_id: str, retry_after: float) -> RateLimitDecision:
+        logging.debug(
+            "RATE_LIMITER::Request of team=%s limited by %s bucket", team_id, scope
+        )
+        with self._lock:
+            self._limited[scope] += 1
+        return RateLimitDecision(
+            allowed=False, retry_after_seconds=retry_after, scope=scope
+        )
+
+
+def rate_limit_key(
+    team_id: str | None,
+    client_address: str | None,
+    trust_team_header: bool = config.rate_limit["trust_team_header"],
+) -> str:
+    """Identifier of rate limited client, team id sent in header or client
+    address when team id is missing. Team header is used only when it is
+    trusted - set by proxy which authenticates teams and drops the header
+    sent by clients - otherwise every made up team id would get new bucket"""
+    team_id = trusted_team_id(team_id, trust_team_header)
+    if team_id:
+        return team_id
+    return f"client:{client_address or 'unknown'}"
+
+
+def trusted_team_id(
+    team_id: str | None,
+    trust_team_header: bool = config.rate_limit["trust_team_header"],
+) -> str | None:
+    """Team id sent in team header when the header is trusted, None otherwise.
+    Submissions are credited to team id only when it is set by proxy which
+    authenticates teams, otherwise any client could score for any team"""
+    return team_id if trust_team_header else None
+
+
+def forwarded_client_address(
+    forwarded_for: str | None, trusted_hops: int, peer_address: str = None
+) -> str | None:
+    """
+    Address of client behind trusted proxies. Every proxy appends address of
+    its peer to X-Forwarded-For, so the entry added by the outermost trusted
+    proxy is trusted_hops entries from the right. Entries left of it are sent
+    by client and ignored.
+
+    Args:
+        forwarded_for (str): X-Forwarded-For header value
+        trusted_hops (int): number of trusted proxies in front of server
+        peer_address (str): address of connected peer, used when no proxy
+        is trusted or header is missing
+
+    Returns:
+        str: client address without port
+    """
+    entries = [entry.strip() for entry in (forwarded_for or "").split(",")]
+    entries = [entry for entry in entries if entry]
+    if trusted_hops <= 0 or not entries:
+        return peer_address
+    return _without_port(entries[-min(trusted_hops, len(entries))])
+
+
+def _without_port(address: str) -> str:
+    if address.startswith("[") and "]" in address:
+        return address[1 : address.index("]")]
+    if address.count(":") == 1:
+        return address.split(":")[0]
+    return address
+
+
+def retry_after_header(decision: RateLimitDecision) -> str:
+    """Value of Retry-After header in whole seconds, at least one"""
+    return str(max(1, math.ceil(decision.retry_after_seconds)))
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Creates rate limiter based on configuration, returns None if limiting is disabled"""
+    if not config.rate_limit["enabled"]:
+        return None
+    return RateLimiter(_BACKENDS[config.rate_limit["backend"]]())
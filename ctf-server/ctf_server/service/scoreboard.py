@@ -0,0 +1,296 @@
+"""Team scores maintained incrementally from accepted submissions"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable
+from ctf_server import config
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.db.submission_log_sink import SubmissionLogSink
+from ctf_server.model.state import State
+from ctf_server.service.rank_index import RankIndex
+from ctf_server.service.submission_log import SubmissionLog
+
+
+@dataclass
+class ScoreboardEntry:
+    """Position of single team, rank starts from 1"""
+
+    rank: int
+    team_id: str
+    score: int
+    solves: int
+    last_solve_at: datetime
+
+
+@dataclass
+class ScoreboardStats:
+    """Snapshot of scoreboard state"""
+
+    ready: bool
+    teams: int
+    solves: int
+    rebuilds: int
+
+
+class _TeamScore:
+    __slots__ = ("score", "solves", "last_solve_at")
+
+    def __init__(self) -> None:
+        self.score = 0
+        self.solves = 0
+        self.last_solve_at: datetime = None
+
+
+class _Standings:
+    """Scores of all teams, team ranking key orders higher score first and
+    earlier last solve first among equal scores"""
+
+    def __init__(self, default_points: int, challenge_points: dict[str, int]) -> None:
+        self._default_points = default_points
+        self._challenge_points = challenge_points
+        self.teams: dict[str, _TeamScore] = {}
+        self.solved: dict[tuple[str, str, str], datetime] = {}
+        self.ranking = RankIndex()
+
+    @staticmethod
+    def key(team_id: str, team: _TeamScore) -> tuple:
+        return (-team.score, team.last_solve_at, team_id)
+
+    def add_solve(
+        self, team_id: str, challenge_id: str, task_id: str, timestamp: datetime
+    ) -> bool:
+        solve = (team_id, challenge_id, task_id)
+        if solve in self.solved:
+            return False
+        self.solved[solve] = timestamp
+        team = self.teams.get(team_id)
+        if team is None:
+            team = self.teams[team_id] = _TeamScore()
+        else:
+            self.ranking.remove(self.key(team_id, team))
+        team.score += self._challenge_points.get(challenge_id, self._default_points)
+        team.solves += 1
+        if team.last_solve_at is None or timestamp > team.last_solve_at:
+            team.last_solve_at = timestamp
+        self.ranking.add(self.key(team_id, team))
+        return True
+
+    def entry(self, rank: int, team_id: str) -> ScoreboardEntry:
+        team = self.teams[team_id]
+        return ScoreboardEntry(
+            rank=rank,
+            team_id=team_id,
+            score=team.score,
+            solves=team.solves,
+            last_solve_at=team.last_solve_at,
+        )
+
+
+class Scoreboard:
+    """
+    Keeps team scores in memory. Every accepted flag of a team is counted
+    once and ranking is updated in O(log n) time, so top teams and rank of
+    single team are read without touching storage.
+
+    On start scores are rebuilt from submission log history, and again
+    every rebuild interval when it is positive, which lets many workers
+    converge to the same scoreboard. Solves counted by this process are
+    merged into rebuilt scores, so solves recorded while rebuild runs, still
+    buffered by submission log or dropped by its overflow policy are not lost.
+
+    Solves are credited to team sent in team header, so the server has to
+    run behind proxy which authenticates teams, sets the header and drops
+    the one sent by clients. Without RATE_LIMIT_TRUST_TEAM_HEADER=true
+    submissions are not credited to any team.
+    """
+
+    _DEFAULT_POINTS = config.scoreboard["default_points"]
+    _CHALLENGE_POINTS = config.scoreboard["challenge_points"]
+    _REBUILD_INTERVAL_SECONDS = config.scoreboard["rebuild_interval_seconds"]
+    _RETRY_DELAY_SECONDS = config.scoreboard["retry_delay_seconds"]
+
+    def __init__(
+        self,
+        history: SubmissionLogSink = None,
+        default_points: int = _DEFAULT_POINTS,
+        challenge_points: dict[str, int] = None,
+        rebuild_interval_seconds: float = _REBUILD_INTERVAL_SECONDS,
+        retry_delay_seconds: float = _RETRY_DELAY_SECONDS,
+    ) -> None:
+        """
+        Args:
+            history (SubmissionLogSink): submission log read by rebuilds,
+            scoreboard starts empty when None
+            default_points (int): points for task of challenge without own value
+            challenge_points (dict[str, int]): points for task of each challenge
+            rebuild_interval_seconds (float): time between rebuilds, only
+            the startup rebuild runs when it is not positive
+            retry_delay_seconds (float): wait before retrying failed startup rebuild
+        """
+        self._history = history
+        self._default_points = default_points
+        self._challenge_points = (
+            self._CHALLENGE_POINTS if challenge_points is None else challenge_points
+        )
+        self._rebuild_interval_seconds = rebuild_interval_seconds
+        self._retry_delay_seconds = retry_delay_seconds
+        self._standings = self._new_standings()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread = None
+        self._rebuilds = 0
+
+    @property
+    def is_ready(self) -> bool:
+        """True when scores include submission history"""
+        return self._ready.is_set()
+
+    def start(self) -> None:
+        """Start rebuilding scores from history in background, scoreboard
+        without history is ready at once"""
+        if self._history is None:
+            self._ready.set()
+            return
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="scoreboard-rebuild", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop background rebuilds
+
+        Args:
+            timeout (float): maximal wait for rebuild in progress
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def record_solve(
+        self, team_id: str, challenge_id: str, task_id: str, timestamp: datetime
+    ) -> bool:
+        """Count accepted flag of team
+
+        Args:
+            team_id (str): team which submitted flag
+            challenge_id (str): challenge id
+            task_id (str): task id
+            timestamp (datetime): time of submission
+
+        Returns:
+            bool: False when team already solved this task
+        """
+        with self._lock:
+            return self._standings.add_solve(team_id, challenge_id, task_id, timestamp)
+
+    def top(self, count: int) -> list[ScoreboardEntry]:
+        """Best teams, ordered from the first place
+
+        Args:
+            count (int): maximal number of teams
+
+        Returns:
+            list[ScoreboardEntry]: positions of best teams
+        """
+        with self._lock:
+            entries = []
+            for rank, (_, _, team_id) in enumerate(self._standings.ranking, start=1):
+                if rank > count:
+                    break
+                entries.append(self._standings.entry(rank, team_id))
+            return entries
+
+    def team_entry(self, team_id: str) -> ScoreboardEntry | None:
+        """Position of team, None when team has not solved any task"""
+        with self._lock:
+            team = self._standings.teams.get(team_id)
+            if team is None:
+                return None
+            rank = self._standings.ranking.index(self._standings.key(team_id, team)) + 1
+            return self._standings.entry(rank, team_id)
+
+    def rebuild(self, events: Iterable[SubmissionEventDto]) -> None:
+        """Replace scores with ones computed from submission history merged
+        with solves already counted by scoreboard
+
+        Args:
+            events (Iterable[SubmissionEventDto]): stored submissions, only
+            accepted flags of identified teams are counted
+        """
+        standings = self._new_standings()
+        solves = sorted(
+            (
+                event
+                for event in events
+                if event.state == State.VALID_FLAG and event.team_id
+            ),
+            key=lambda event: event.timestamp,
+        )
+        for event in solves:
+            standings.add_solve(
+                event.team_id, event.challenge_id, event.task_id, event.timestamp
+            )
+        with self._lock:
+            for solve, timestamp in self._standings.solved.items():
+                standings.add_solve(*solve, timestamp)
+            self._standings = standings
+            self._rebuilds += 1
+        self._ready.set()
+
+    def stats(self) -> ScoreboardStats:
+        """Current scoreboard state"""
+        with self._lock:
+            return ScoreboardStats(
+                ready=self.is_ready,
+                teams=len(self._standings.teams),
+                solves=len(self._standings.solved),
+                rebuilds=self._rebuilds,
+            )
+
+    def _new_standings(self) -> _Standings:
+        return _Standings(self._default_points, self._challenge_points)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.rebuild(self._history.iter_events(State.VALID_FLAG))
+                logging.info("SCOREBOARD::Scores rebuilt from submission history")
+            except NotImplementedError:
+                logging.error("SCOREBOARD::Submission history cannot be read")
+                self._ready.set()
+                return
+            except Exception:  # pylint: disable=broad-exception-caught
+                logging.exception("SCOREBOARD::Rebuild failed")
+            if not self.is_ready:
+                self._stopped.wait(self._retry_delay_seconds)
+            elif self._rebuild_interval_seconds > 0:
+                self._stopped.wait(self._rebuild_interval_seconds)
+            else:
+                return
+
+
+def create_scoreboard(submission_log: SubmissionLog = None) -> Scoreboard:
+    """Creates scoreboard rebuilt from history of submission log, returns
+    None if scoreboard is disabled"""
+    if not config.scoreboard["enabled"]:
+        return None
+    if not config.rate_limit["trust_team_header"]:
+        logging.warning(
+            "SCOREBOARD::Team header is not trusted, submissions are not credited"
+            " to teams. Run the server behind proxy which authenticates teams and"
+            " sets %s, then set RATE_LIMIT_TRUST_TEAM_HEADER=true",
+            config.rate_limit["team_header"],
+        )
+    if submission_log is None:
+        logging.warning(
+            "SCOREBOARD::Submission log is disabled, scores are kept only in memory"
+            " of this process and are lost on restart. Set SUBMISSION_LOG_ENABLED"
+            " or SCOREBOARD_ENABLED=false"
+        )
+        return Scoreboard()
+    return Scoreboard(submission_log.sink)
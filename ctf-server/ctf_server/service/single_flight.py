@@ -0,0 +1,140 @@
+"""Coalescing of concurrent identical storage lookups"""
+
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    """Snapshot of single flight counters, coalesce ratio is share of calls
+    which waited for lookup started by another caller"""
+
+    calls: int
+    executions: int
+    coalesced: int
+    coalesce_ratio: float
+
+
+class _SingleFlightCounters:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._executions = 0
+        self._coalesced = 0
+
+    def count(self, coalesced: bool) -> None:
+        with self._lock:
+            if coalesced:
+                self._coalesced += 1
+            else:
+                self._executions += 1
+
+    def stats(self) -> SingleFlightStats:
+        """Current counters"""
+        with self._lock:
+            calls = self._executions + self._coalesced
+            return SingleFlightStats(
+                calls=calls,
+                executions=self._executions,
+                coalesced=self._coalesced,
+                coalesce_ratio=self._coalesced / calls if calls else 0.0,
+            )
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Threads asking for the same key while lookup for it is in flight wait
+    for that lookup and share its result or error instead of starting their own.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._counters = _SingleFlightCounters()
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        """Run function once for all concurrent callers of the same key
+
+        Args:
+            key (Hashable): identifies lookup
+            function (Callable[[], T]): lookup to run
+
+        Returns:
+            T: result of function
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+        self._counters.count(coalesced=not is_leader)
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> SingleFlightStats:
+        """Current single flight counters"""
+        return self._counters.stats()
+
+
+class AsyncSingleFlight:
+    """
+    Coroutines asking for the same key while lookup for it is in flight
+    await the same task. Lookup runs as separate task, so cancelling one of
+    the callers does not cancel it for others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._counters = _SingleFlightCounters()
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """Run coroutine function once for all concurrent callers of the same key
+
+        Args:
+            key (Hashable): identifies lookup
+            function (Callable[[], Awaitable[T]]): lookup to run
+
+        Returns:
+            T: result of function
+        """
+        task = self._calls.get(key)
+        self._counters.count(coalesced=task is not None)
+        if task is None:
+            task = asyncio.ensure_future(function())
+            self._calls[key] = task
+            task.add_done_callback(lambda done_task: self._finish(key, done_task))
+        return await asyncio.shield(task)
+
+    def stats(self) -> SingleFlightStats:
+        """Current single flight counters"""
+        return self._counters.stats()
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # marks error as retrieved when every caller was cancelled
+            task.exception()
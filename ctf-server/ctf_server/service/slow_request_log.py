@@ -0,0 +1,84 @@
+"""Bounded history of requests slower than threshold"""
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from ctf_server import config
+
+
+@dataclass
+class SlowRequest:
+    """Request which took longer than threshold with time spent in each span"""
+
+    timestamp: datetime
+    method: str
+    path: str
+    route: str
+    status: int
+    duration_ms: float
+    breakdown_ms: dict[str, float]
+
+
+@dataclass
+class SlowRequestLogStats:
+    """Snapshot of slow request log counters"""
+
+    threshold_ms: float
+    captured: int
+    kept: int
+
+
+class SlowRequestLog:
+    """Ring buffer keeping the most recent slow requests, the oldest one is
+    dropped when buffer is full"""
+
+    _THRESHOLD_MS = config.server_timing["slow_request_threshold_ms"]
+    _SIZE = config.server_timing["slow_request_buffer_size"]
+
+    def __init__(self, threshold_ms: float = _THRESHOLD_MS, size: int = _SIZE) -> None:
+        """
+        Args:
+            threshold_ms (float): requests taking at least this long are kept
+            size (int): maximal number of kept requests
+        """
+        self._threshold_ms = threshold_ms
+        self._requests: deque[SlowRequest] = deque(maxlen=size)
+        self._captured = 0
+        self._lock = threading.Lock()
+
+    def is_slow(self, duration_ms: float) -> bool:
+        """True when request of given duration should be captured"""
+        return duration_ms >= self._threshold_ms
+
+    def capture(self, request: SlowRequest) -> None:
+        """Keep slow request, evicting the oldest one when buffer is full"""
+        with self._lock:
+            self._requests.append(request)
+            self._captured += 1
+
+    def recent(self, limit: int = None) -> list[SlowRequest]:
+        """Kept requests, the most recent first
+
+        Args:
+            limit (int): maximal number of returned requests, all when None
+        """
+        with self._lock:
+            requests = list(reversed(self._requests))
+        return requests if limit is None else requests[:limit]
+
+    def stats(self) -> SlowRequestLogStats:
+        """Current counters"""
+        with self._lock:
+            return SlowRequestLogStats(
+                threshold_ms=self._threshold_ms,
+                captured=self._captured,
+                kept=len(self._requests),
+            )
+
+
+def create_slow_request_log() -> SlowRequestLog:
+    """Creates slow request log, returns None if server timing is disabled"""
+    if not config.server_timing["enabled"]:
+        return None
+    return SlowRequestLog()
@@ -0,0 +1,233 @@
+"""Buffered log of flag submissions written in background"""
+
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from ctf_server import config
+from ctf_server.db.azure_submission_log_sink import AzureSubmissionLogSink
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.db.mongodb_submission_log_sink import MongodbSubmissionLogSink
+from ctf_server.db.submission_log_sink import FileSubmissionLogSink, SubmissionLogSink
+
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+OVERFLOW_POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+_SINKS = {
+    "azure": AzureSubmissionLogSink,
+    "mongodb": MongodbSubmissionLogSink,
+    "file": FileSubmissionLogSink,
+}
+
+
+@dataclass
+class SubmissionLogStats:
+    """Snapshot of submission log counters, dropped events did not fit into
+    queue and lost ones could not be written before shutdown"""
+
+    recorded: int
+    written: int
+    dropped: int
+    lost: int
+    write_errors: int
+    queued: int
+
+
+class SubmissionLog:
+    """
+    Collects submission events in bounded queue, background thread writes
+    them to sink in batches of flush size or every flush interval, whichever
+    comes first. Batch which failed to write is kept and retried after flush
+    interval. Stopping writes everything still queued before thread exits.
+
+    When queue is full new event is dropped (drop_newest), oldest queued
+    event is dropped (drop_oldest) or caller waits up to block timeout for
+    free space and drops the event after it (block).
+    """
+
+    _QUEUE_SIZE = config.submission_log["queue_size"]
+    _FLUSH_SIZE = config.submission_log["flush_size"]
+    _FLUSH_INTERVAL_SECONDS = config.submission_log["flush_interval_seconds"]
+    _OVERFLOW_POLICY = config.submission_log["overflow_policy"]
+    _BLOCK_TIMEOUT_SECONDS = config.submission_log["block_timeout_seconds"]
+
+    def __init__(
+        self,
+        sink: SubmissionLogSink,
+        queue_size: int = _QUEUE_SIZE,
+        flush_size: int = _FLUSH_SIZE,
+        flush_interval_seconds: float = _FLUSH_INTERVAL_SECONDS,
+        overflow_policy: str = _OVERFLOW_POLICY,
+        block_timeout_seconds: float = _BLOCK_TIMEOUT_SECONDS,
+    ) -> None:
+        """
+        Args:
+            sink (SubmissionLogSink): storage of event batches
+            queue_size (int): maximal number of events waiting for write
+            flush_size (int): maximal number of events written at once
+            flush_interval_seconds (float): maximal time event waits for write
+            overflow_policy (str): drop_newest, drop_oldest or block
+            block_timeout_seconds (float): maximal wait of block policy
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self._sink = sink
+        self._queue_size = queue_size
+        self._flush_size = flush_size
+        self._flush_interval_seconds = flush_interval_seconds
+        self._overflow_policy = overflow_policy
+        self._block_timeout_seconds = block_timeout_seconds
+        self._events: deque[SubmissionEventDto] = deque()
+        self._condition = threading.Condition()
+        self._thread: threading.Thread = None
+        self._stopping = False
+        self._recorded = 0
+        self._written = 0
+        self._dropped = 0
+        self._lost = 0
+        self._write_errors = 0
+
+    @property
+    def sink(self) -> SubmissionLogSink:
+        """Storage events are written to"""
+        return self._sink
+
+    @property
+    def is_blocking(self) -> bool:
+        """True when record may wait for free space and should not run on event loop"""
+        return self._overflow_policy == BLOCK
+
+    def start(self) -> None:
+        """Start background writer, does nothing when already started"""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="submission-log", daemon=True
+            )
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """Write all queued events and stop background writer, events recorded
+        afterwards are dropped. Queued events are written by caller when
+        writer was never started
+
+        Args:
+            timeout (float): maximal wait for writer, no limit when None
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is None:
+            self._run()
+        else:
+            thread.join(timeout)
+            if thread.is_alive():
+                logging.error("SUBMISSION_LOG::Writer did not finish before timeout")
+                return
+        self._sink.close()
+
+    def record(self, event: SubmissionEventDto) -> bool:
+        """Queue event for writing
+
+        Args:
+            event (SubmissionEventDto): submission to log
+
+        Returns:
+            bool: False when event was dropped
+        """
+        with self._condition:
+            if self._stopping:
+                self._dropped += 1
+                return False
+            if len(self._events) >= self._queue_size and not self._make_room():
+                self._dropped += 1
+                return False
+            self._events.append(event)
+            self._recorded += 1
+            if len(self._events) >= self._flush_size:
+                self._condition.notify_all()
+        return True
+
+    def stats(self) -> SubmissionLogStats:
+        """Current submission log counters"""
+        with self._condition:
+            return SubmissionLogStats(
+                recorded=self._recorded,
+                written=self._written,
+                dropped=self._dropped,
+                lost=self._lost,
+                write_errors=self._write_errors,
+                queued=len(self._events),
+            )
+
+    def _make_room(self) -> bool:
+        """Apply overflow policy to full queue, called with condition held"""
+        if self._overflow_policy == DROP_OLDEST:
+            self._events.popleft()
+            self._dropped += 1
+            return True
+        if self._overflow_policy == BLOCK:
+            return (
+                self._condition.wait_for(
+                    lambda: len(self._events) < self._queue_size or self._stopping,
+                    self._block_timeout_seconds,
+                )
+                and not self._stopping
+            )
+        return False
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: len(self._events) >= self._flush_size or self._stopping,
+                    self._flush_interval_seconds,
+                )
+                stopping = self._stopping
+                batch = [
+                    self._events.popleft()
+                    for _ in range(min(self._flush_size, len(self._events)))
+                ]
+                # wakes callers waiting for free space
+                self._condition.notify_all()
+            if batch and not self._write(batch, stopping):
+                with self._condition:
+                    self._events.extendleft(reversed(batch))
+                    self._condition.wait_for(
+                        lambda: self._stopping, self._flush_interval_seconds
+                    )
+                continue
+            if stopping:
+                with self._condition:
+                    if not self._events:
+                        return
+
+    def _write(self, batch: list[SubmissionEventDto], stopping: bool) -> bool:
+        """Write batch to sink, returns False when it should be retried. Batches
+        which fail during shutdown are lost"""
+        try:
+            self._sink.write(batch)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logging.exception(
+                "SUBMISSION_LOG::Could not write batch of %d events", len(batch)
+            )
+            with self._condition:
+                self._write_errors += 1
+                if stopping:
+                    self._lost += len(batch)
+            return stopping
+        with self._condition:
+            self._written += len(batch)
+        return True
+
+
+def create_submission_log() -> SubmissionLog:
+    """Creates submission log writing to configured sink, returns None if
+    logging of submissions is disabled"""
+    if not config.submission_log["enabled"]:
+        return None
+    return SubmissionLog(_SINKS[config.submission_log["backend"]]())
@@ -1,14 +1,50 @@
 """Azure Function API for flag submitter"""
 
+import atexit
 import logging
+import math
 import azure.functions as func
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from ctf_server import config
 from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
-from ctf_server.db.azure_proxy import AzureProxy
+from ctf_server.db.storage_factory import create_storage_service
+from ctf_server.db.storage_service import StorageThrottledError
 from ctf_server.model.flag import Flag
 from ctf_server.model.state import State
+from ctf_server.service.flag_cache import create_flag_cache
+from ctf_server.service.flag_key_filter import create_flag_key_filter
+from ctf_server.service.flag_replica import create_flag_replica
 from ctf_server.service.flag_service import FlagService
+from ctf_server.service.flag_service_provider import FlagServiceProvider
+from ctf_server.service.rate_limiter import (
+    create_rate_limiter,
+    forwarded_client_address,
+    rate_limit_key,
+    retry_after_header,
+    trusted_team_id,
+)
+from ctf_server.service.submission_log import create_submission_log
 
 app = func.FunctionApp()
+flag_replica = create_flag_replica(create_storage_service)
+if flag_replica is not None:
+    flag_replica.start()
+submission_log = create_submission_log()
+if submission_log is not None:
+    submission_log.start()
+    atexit.register(submission_log.stop)
+flag_service_provider = FlagServiceProvider(
+    lambda: FlagService(
+        create_storage_service(),
+        PlainInputStoredHashedStrategy(),
+        create_flag_cache(),
+        flag_replica,
+        create_flag_key_filter(),
+        submission_log,
+    ),
+    recoverable_errors=(ServiceRequestError, ServiceResponseError),
+)
+rate_limiter = create_rate_limiter()
 
 
 @app.route(
@@ -17,7 +53,22 @@ app = func.FunctionApp()
 def submit(req: func.HttpRequest) -> func.HttpResponse:
     """Based on user input request to check whether  flag is valid"""
     logging.info("FUNCTION_APP: Request to submit flag")
-    
+
+    if rate_limiter is not None:
+        decision = rate_limiter.acquire(
+            rate_limit_key(
+                req.headers.get(config.rate_limit["team_header"]),
+                _client_address(req),
+            )
+        )
+        if not decision.allowed:
+            logging.info("FUNCTION_APP: Submit rate limited")
+            return func.HttpResponse(
+                "RATE_LIMITED",
+                status_code=429,
+                headers={"Retry-After": retry_after_header(decision)},
+            )
+
     try:
         req_body = req.get_json()
         value = req_body.get("value")
@@ -29,8 +80,25 @@ def submit(req: func.HttpRequest) -> func.HttpResponse:
 
     if value and task_id and challenge_id:
         flag = Flag(value=value, challenge_id=challenge_id, task_id=task_id)
-        flag_service = FlagService(AzureProxy(), PlainInputStoredHashedStrategy())
-        state = flag_service.submit_flag(flag=flag)
+        try:
+            state = flag_service_provider.run(
+                lambda flag_service: flag_service.submit_flag(
+                    flag=flag,
+                    team_id=trusted_team_id(
+                        req.headers.get(config.rate_limit["team_header"]),
+                        config.rate_limit["trust_team_header"],
+                    ),
+                )
+            )
+        except StorageThrottledError as error:
+            logging.warning("FUNCTION_APP: Submit throttled by storage")
+            return func.HttpResponse(
+                "STORAGE_THROTTLED",
+                status_code=503,
+                headers={
+                    "Retry-After": str(max(1, math.ceil(error.retry_after_seconds)))
+                },
+            )
         return func.HttpResponse(state, status_code=200)
 
     return func.HttpResponse(
@@ -39,6 +107,16 @@ def submit(req: func.HttpRequest) -> func.HttpResponse:
     )
 
 
+def _client_address(req: func.HttpRequest) -> str:
+    """Address appended to X-Forwarded-For by Functions front end, or by the
+    outermost of trusted proxies configured in front of it. Entries sent by
+    client are ignored"""
+    return forwarded_client_address(
+        req.headers.get("X-Forwarded-For"),
+        1 + config.rate_limit["trusted_proxy_hops"],
+    )
+
+
 @app.route(
     route="health", auth_level=func.AuthLevel.ANONYMOUS, methods=[func.HttpMethod.GET]
 )
@@ -0,0 +1,64 @@
+"""Test Mongo DB proxy module"""
+
+import pytest
+from ctf_server.db.dto.flag_documents import MONGO_FLAG_INDEX_NAME
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.mongodb_proxy import MongodbProxy
+from ctf_server.model.flag_import import ImportStatus
+from tests.storage_contract import StorageContract
+
+
+class TestMongodbProxy(StorageContract):
+    """Tests storage contract and Mongo DB specific behaviour of proxy"""
+
+    @pytest.fixture(name="storage")
+    def fixture_storage(
+        self, empty_flag_collection, connection_url  # pylint: disable=unused-argument
+    ) -> MongodbProxy:
+        """Proxy of empty flag collection, unique index is created by proxy"""
+        return MongodbProxy(connection_url)
+
+    def test_unique_index_should_be_created_once(
+        self, empty_flag_collection, connection_url
+    ):
+        """Test index bootstrap is idempotent"""
+        proxy = MongodbProxy(connection_url)
+        assert proxy.ensure_indexes()
+
+        index = empty_flag_collection.index_information()[MONGO_FLAG_INDEX_NAME]
+        assert index["unique"]
+        assert index["key"] == [("challenge_id", 1), ("task_id", 1)]
+
+    def test_index_should_not_be_created_when_disabled(
+        self, empty_flag_collection, connection_url
+    ):
+        """Test index bootstrap can be turned off"""
+        empty_flag_collection.drop_indexes()
+        MongodbProxy(connection_url, ensure_indexes=False)
+
+        assert MONGO_FLAG_INDEX_NAME not in empty_flag_collection.index_information()
+
+    def test_flag_should_not_be_duplicated_without_index(
+        self, empty_flag_collection, connection_url
+    ):
+        """Stored flag is looked up before insert when index is missing"""
+        empty_flag_collection.drop_indexes()
+        proxy = MongodbProxy(connection_url, ensure_indexes=False)
+        flag = FlagDto(id=None, value="hash", challenge_id="c", task_id="t")
+
+        assert proxy.create_flag(flag) is not None
+        assert proxy.create_flag(flag) is None
+        assert proxy.create_flags([flag]) == [ImportStatus.DUPLICATE]
+        assert empty_flag_collection.count_documents({}) == 1
+
+    def test_proxy_should_not_be_created_when_index_cannot_be_built(
+        self, empty_flag_collection, connection_url
+    ):
+        """Duplicated flags block unique index, proxy refuses to start"""
+        empty_flag_collection.drop_indexes()
+        empty_flag_collection.insert_many(
+            [{"challenge_id": "c", "task_id": "t", "value": "hash"} for _ in range(2)]
+        )
+
+        with pytest.raises(RuntimeError):
+            MongodbProxy(connection_url)
@@ -0,0 +1,31 @@
+"""Test Mongo DB rate limit backend module"""
+
+from concurrent.futures import ThreadPoolExecutor
+from ctf_server.db.mongodb_rate_limit_backend import MongodbRateLimitBackend
+
+
+class TestMongodbRateLimitBackend:
+    """Tests token buckets shared through Mongo DB"""
+
+    def test_burst_should_be_allowed_then_limited(self, connection_url):
+        """Test bucket allows capacity requests and then asks to wait"""
+        backend = MongodbRateLimitBackend(connection_url)
+        key = "burst-team"
+
+        assert [backend.acquire(key, 0.01, 3) for _ in range(3)] == [0, 0, 0]
+        assert backend.acquire(key, 0.01, 3) > 0
+
+    def test_nodes_should_share_bucket(self, connection_url):
+        """Test concurrent acquires from many clients take exactly capacity tokens"""
+        backends = [MongodbRateLimitBackend(connection_url) for _ in range(4)]
+        key = "shared-team"
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(
+                    lambda index: backends[index % 4].acquire(key, 0.001, 10),
+                    range(20),
+                )
+            )
+
+        assert results.count(0) == 10
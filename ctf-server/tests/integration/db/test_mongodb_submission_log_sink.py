@@ -0,0 +1,33 @@
+"""Test Mongo DB submission log sink module"""
+
+from datetime import datetime, timezone
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.db.mongodb_submission_log_sink import MongodbSubmissionLogSink
+
+
+def _event(task_id: str) -> SubmissionEventDto:
+    return SubmissionEventDto(
+        team_id="team",
+        challenge_id="firstchallenge",
+        task_id=task_id,
+        state="INVALID_FLAG",
+        timestamp=datetime.now(timezone.utc),
+    )
+
+
+class TestMongodbSubmissionLogSink:
+    """Tests batch inserts of submission events"""
+
+    def test_batch_written_again_should_not_duplicate_events(self, connection_url):
+        """Test retry of partially written batch inserts only missing events"""
+        sink = MongodbSubmissionLogSink(connection_url)
+        # pylint: disable-next=protected-access
+        collection = sink._collection
+        collection.delete_many({})
+        events = [_event("firsttask"), _event("secondtask")]
+
+        sink.write(events[:1])
+        sink.write(events)
+
+        assert collection.count_documents({"team_id": "team"}) == 2
+        sink.close()
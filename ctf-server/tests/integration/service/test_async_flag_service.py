@@ -0,0 +1,77 @@
+"""Test asynchronous flag management service module"""
+
+import asyncio
+from ctf_server.core.crypto import Crypto
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.async_mongodb_proxy import AsyncMongodbProxy
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+from ctf_server.service.async_flag_service import AsyncFlagService
+
+
+def _run_with_service(connection_url: str, action):
+    async def run():
+        flag_service = AsyncFlagService(
+            AsyncMongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+        )
+        try:
+            return await action(flag_service)
+        finally:
+            await flag_service.close()
+
+    return asyncio.run(run())
+
+
+class TestAsyncFlagService:
+    """Tests asynchronous flag service functions"""
+
+    def test_concurrent_submits_should_be_validated(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test many submissions awaited at once"""
+        valid_flag = Flag(
+            value="flag{test_1}", task_id="firsttask", challenge_id="firstchallenge"
+        )
+        invalid_flag = Flag(
+            value="flag{wrong}", task_id="firsttask", challenge_id="firstchallenge"
+        )
+
+        async def submit_all(flag_service: AsyncFlagService):
+            return await asyncio.gather(
+                *[flag_service.submit_flag(valid_flag) for _ in range(10)],
+                flag_service.submit_flag(invalid_flag),
+            )
+
+        states = _run_with_service(connection_url, submit_all)
+        assert states[:10] == [State.VALID_FLAG] * 10
+        assert states[10] == State.INVALID_FLAG
+
+    def test_valid_flag_should_be_created_updated_and_removed(
+        self, empty_flag_collection, connection_url
+    ):
+        """Test flag lifecycle through asynchronous service"""
+        flag = Flag(
+            value="flag{test}", task_id="firsttask", challenge_id="firstchallenge"
+        )
+        updated = Flag(
+            value="flag{test_updated}",
+            task_id="firsttask",
+            challenge_id="firstchallenge",
+        )
+
+        async def lifecycle(flag_service: AsyncFlagService):
+            created_flag = await flag_service.create_flag(flag)
+            duplicated_flag = await flag_service.create_flag(flag)
+            updated_flag = await flag_service.update_flag(updated)
+            is_deleted = await flag_service.remove_flag(flag.challenge_id, flag.task_id)
+            return created_flag, duplicated_flag, updated_flag, is_deleted
+
+        created_flag, duplicated_flag, updated_flag, is_deleted = _run_with_service(
+            connection_url, lifecycle
+        )
+        assert created_flag.value == Crypto.hash_to_md5(flag.value)
+        assert duplicated_flag is None
+        assert updated_flag.value == Crypto.hash_to_md5(updated.value)
+        assert is_deleted
+        assert len(list(empty_flag_collection.find())) == 0
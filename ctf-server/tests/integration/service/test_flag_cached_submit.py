@@ -0,0 +1,72 @@
+"""Test flag management service module - cached submit part"""
+
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.mongodb_proxy import MongodbProxy
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+from ctf_server.service.flag_cache import FlagCache
+from ctf_server.service.flag_service import FlagService
+
+
+class TestFlagCachedSubmit:
+    """Tests flag submit with read-through cache"""
+
+    def test_repeated_submit_should_be_served_from_cache(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test second submit does not read storage again"""
+        flag_cache = FlagCache(max_size=10, ttl_seconds=60)
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+            flag_cache,
+        )
+        flag = Flag(
+            value="flag{test_1}", task_id="firsttask", challenge_id="firstchallenge"
+        )
+
+        assert flag_service.submit_flag(flag) == State.VALID_FLAG
+        flag_collection_with_data.delete_many({})
+        assert flag_service.submit_flag(flag) == State.VALID_FLAG
+
+        stats = flag_cache.stats()
+        assert stats.hits == 1
+        assert stats.misses == 1
+
+    def test_updated_flag_should_refresh_cache(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test submit after update is validated against new value"""
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+            FlagCache(max_size=10, ttl_seconds=60),
+        )
+        old_flag = Flag(
+            value="flag{test_1}", task_id="firsttask", challenge_id="firstchallenge"
+        )
+        new_flag = Flag(
+            value="flag{test_new}", task_id="firsttask", challenge_id="firstchallenge"
+        )
+
+        assert flag_service.submit_flag(old_flag) == State.VALID_FLAG
+        assert flag_service.update_flag(new_flag) is not None
+        assert flag_service.submit_flag(old_flag) == State.INVALID_FLAG
+        assert flag_service.submit_flag(new_flag) == State.VALID_FLAG
+
+    def test_removed_flag_should_be_invalidated_in_cache(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test submit after remove is not answered from cache"""
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+            FlagCache(max_size=10, ttl_seconds=60),
+        )
+        flag = Flag(
+            value="flag{test_1}", task_id="firsttask", challenge_id="firstchallenge"
+        )
+
+        assert flag_service.submit_flag(flag) == State.VALID_FLAG
+        assert flag_service.remove_flag(flag.challenge_id, flag.task_id)
+        assert flag_service.submit_flag(flag) == State.INVALID_FLAG
@@ -0,0 +1,48 @@
+"""Test flag management service module - bulk import part"""
+
+from ctf_server.core.crypto import Crypto
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.mongodb_proxy import MongodbProxy
+from ctf_server.model.flag import Flag
+from ctf_server.model.flag_import import ImportStatus
+from ctf_server.service.flag_service import FlagService
+
+
+class TestFlagImport:
+    """Tests bulk flag import"""
+
+    def test_import_should_report_created_duplicated_and_invalid_flags(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test mixed import"""
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+        )
+        flags = [
+            Flag(value="flag{new}", task_id="thirdtask", challenge_id="firstchallenge"),
+            Flag(
+                value="flag{test_1}", task_id="firsttask", challenge_id="firstchallenge"
+            ),
+            Flag(
+                value="flag{Invalid}",
+                task_id="fourthtask",
+                challenge_id="firstchallenge",
+            ),
+            Flag(value="flag{new}", task_id="thirdtask", challenge_id="firstchallenge"),
+        ]
+
+        results = flag_service.import_flags(flags)
+
+        assert [result.status for result in results] == [
+            ImportStatus.CREATED,
+            ImportStatus.DUPLICATE,
+            ImportStatus.ERROR,
+            ImportStatus.DUPLICATE,
+        ]
+        assert [result.row for result in results] == [1, 2, 3, 4]
+        assert len(list(flag_collection_with_data.find())) == 4
+        stored_flag = flag_collection_with_data.find_one(
+            {"challenge_id": "firstchallenge", "task_id": "thirdtask"}
+        )
+        assert stored_flag["value"] == Crypto.hash_to_md5("flag{new}")
@@ -0,0 +1,96 @@
+"""Test flag management service module - negative lookup part"""
+
+import time
+from ctf_server.core.crypto import Crypto
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.mongodb_proxy import MongodbProxy
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+from ctf_server.service.flag_key_filter import FlagKeyFilter
+from ctf_server.service.flag_service import FlagService
+
+
+def _wait_until_loaded(flag_key_filter: FlagKeyFilter) -> None:
+    deadline = time.monotonic() + 5
+    while not flag_key_filter.stats().loaded:
+        assert time.monotonic() < deadline, "Keys were not loaded in background"
+        time.sleep(0.01)
+
+
+class TestFlagKeyFilter:
+    """Tests flag submit with negative lookup filter"""
+
+    def test_unknown_task_should_be_rejected_without_storage_read(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test submit for task missing in loaded keys is answered by filter"""
+        flag_key_filter = FlagKeyFilter(refresh_seconds=60, miss_lookups_per_second=0)
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+            flag_key_filter=flag_key_filter,
+        )
+        valid_flag = Flag(
+            value="flag{test_1}", task_id="firsttask", challenge_id="firstchallenge"
+        )
+        unknown_flag = Flag(
+            value="flag{test_1}", task_id="unknowntask", challenge_id="firstchallenge"
+        )
+
+        assert flag_service.submit_flag(valid_flag) == State.VALID_FLAG
+        _wait_until_loaded(flag_key_filter)
+        assert flag_service.submit_flag(unknown_flag) == State.INVALID_FLAG
+        assert flag_service.submit_flags([unknown_flag, valid_flag]) == [
+            State.INVALID_FLAG,
+            State.VALID_FLAG,
+        ]
+
+        stats = flag_key_filter.stats()
+        assert stats.loaded
+        assert stats.size == 3
+        assert (stats.miss_checks, stats.rejected) == (0, 2)
+
+    def test_flag_created_by_other_worker_should_be_accepted(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test flag stored after filter was loaded is looked up in storage"""
+        flag_key_filter = FlagKeyFilter(refresh_seconds=60)
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+            flag_key_filter=flag_key_filter,
+        )
+        flag = Flag(
+            value="flag{test_new}", task_id="newtask", challenge_id="firstchallenge"
+        )
+        assert flag_service.submit_flags([]) == []
+        _wait_until_loaded(flag_key_filter)
+
+        flag_collection_with_data.insert_one(
+            {
+                "challenge_id": flag.challenge_id,
+                "task_id": flag.task_id,
+                "value": Crypto.hash_to_md5(flag.value),
+            }
+        )
+
+        assert flag_service.submit_flag(flag) == State.VALID_FLAG
+
+    def test_created_flag_should_be_added_to_filter(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test flag created by the service can be submitted before refresh"""
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+            flag_key_filter=FlagKeyFilter(refresh_seconds=60),
+        )
+        flag = Flag(
+            value="flag{test_new}", task_id="newtask", challenge_id="firstchallenge"
+        )
+
+        assert flag_service.submit_flag(flag) == State.INVALID_FLAG
+        assert flag_service.create_flag(flag) is not None
+        assert flag_service.submit_flag(flag) == State.VALID_FLAG
+        assert flag_service.remove_flag(flag.challenge_id, flag.task_id)
+        assert flag_service.submit_flag(flag) == State.INVALID_FLAG
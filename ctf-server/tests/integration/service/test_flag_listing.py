@@ -0,0 +1,38 @@
+"""Test flag management service module - paginated listing part"""
+
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.mongodb_proxy import MongodbProxy
+from ctf_server.service.flag_service import FlagService
+
+
+class TestFlagListing:
+    """Tests paginated and streamed flag listing"""
+
+    def test_pages_should_cover_all_flags_once(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test reading all pages with continuation tokens"""
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+        )
+
+        first_page = flag_service.get_flags_page(2)
+        second_page = flag_service.get_flags_page(2, first_page.continuation_token)
+
+        assert len(first_page.flags) == 2
+        assert first_page.continuation_token is not None
+        assert len(second_page.flags) == 1
+        assert second_page.continuation_token is None
+        assert first_page.flags + second_page.flags == flag_service.get_all_flags()
+
+    def test_iterated_flags_should_match_all_flags(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test streamed listing returns the same flags"""
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+        )
+
+        assert list(flag_service.iter_all_flags()) == flag_service.get_all_flags()
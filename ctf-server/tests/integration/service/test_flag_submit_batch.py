@@ -0,0 +1,64 @@
+"""Test flag management service module - batch submit part"""
+
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.mongodb_proxy import MongodbProxy
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+from ctf_server.service.flag_service import FlagService
+
+
+class TestFlagSubmitBatch:
+    """Tests submit of many flags at once"""
+
+    def test_batch_should_return_state_per_flag_in_input_order(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test states of mixed batch"""
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+        )
+        flags = [
+            Flag(
+                value="flag{test_1}", task_id="firsttask", challenge_id="firstchallenge"
+            ),
+            Flag(
+                value="flag{test_2_1}",
+                task_id="firsttask",
+                challenge_id="secondchallenge",
+            ),
+            Flag(
+                value="flag{Invalid}",
+                task_id="secondtask",
+                challenge_id="firstchallenge",
+            ),
+            Flag(
+                value="flag{wrong}", task_id="secondtask", challenge_id="firstchallenge"
+            ),
+            Flag(
+                value="flag{test_1}", task_id="missing", challenge_id="firstchallenge"
+            ),
+            Flag(value="flag{test_1}", task_id="firsttask", challenge_id="missing"),
+        ]
+
+        states = flag_service.submit_flags(flags)
+
+        assert states == [
+            State.VALID_FLAG,
+            State.VALID_FLAG,
+            State.INVALID_FORMAT,
+            State.INVALID_FLAG,
+            State.INVALID_FLAG,
+            State.INVALID_FLAG,
+        ]
+
+    def test_empty_batch_should_return_no_states(
+        self, flag_collection_with_data, connection_url
+    ):
+        """Test empty batch"""
+        flag_service = FlagService(
+            MongodbProxy(connection_url),
+            PlainInputStoredHashedStrategy(),
+        )
+
+        assert not flag_service.submit_flags([])
@@ -0,0 +1,146 @@
+"""Behaviour every storage service has to share, test classes of storages
+inherit the contract and provide storage fixture"""
+
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.storage_service import StorageService
+from ctf_server.model.flag_import import ImportStatus
+
+
+def _flag(
+    challenge_id: str = "firstchallenge", task_id: str = "firsttask", value="hash"
+) -> FlagDto:
+    return FlagDto(id=None, value=value, challenge_id=challenge_id, task_id=task_id)
+
+
+class StorageContract:
+    """Tests storage through StorageService interface only"""
+
+    def test_created_flag_should_be_read_back(self, storage: StorageService) -> None:
+        """Created flag gets id assigned by storage"""
+        created_flag = storage.create_flag(_flag())
+
+        assert created_flag.id is not None
+        assert storage.get_flag("firstchallenge", "firsttask") == created_flag
+        assert storage.get_flag("firstchallenge", "missing") is None
+
+    def test_second_flag_of_task_should_not_be_created(
+        self, storage: StorageService
+    ) -> None:
+        """Challenge and task pair is unique"""
+        storage.create_flag(_flag())
+
+        assert storage.create_flag(_flag(value="other")) is None
+        assert storage.get_flag("firstchallenge", "firsttask").value == "hash"
+
+    def test_raw_digest_should_be_kept_as_bytes(self, storage: StorageService) -> None:
+        """Binary flag value is not turned into text"""
+        storage.create_flag(_flag(value=bytes(range(16))))
+
+        assert storage.get_flag("firstchallenge", "firsttask").value == bytes(range(16))
+
+    def test_bulk_create_should_report_duplicates_in_input_order(
+        self, storage: StorageService
+    ) -> None:
+        """Repeated pairs and already stored pairs are duplicates"""
+        storage.create_flag(_flag(task_id="stored"))
+
+        statuses = storage.create_flags(
+            [_flag(task_id="new"), _flag(task_id="stored"), _flag(task_id="new")]
+        )
+
+        assert statuses == [
+            ImportStatus.CREATED,
+            ImportStatus.DUPLICATE,
+            ImportStatus.DUPLICATE,
+        ]
+        assert len(storage.get_all_flags()) == 2
+
+    def test_flags_should_be_found_for_requested_tasks_only(
+        self, storage: StorageService
+    ) -> None:
+        """Missing tasks and other challenges are left out"""
+        storage.create_flags(
+            [_flag(task_id="a"), _flag(task_id="b"), _flag("secondchallenge", "a")]
+        )
+
+        flags = storage.get_flags("firstchallenge", ["a", "b", "missing"])
+
+        assert sorted((flag.challenge_id, flag.task_id) for flag in flags) == [
+            ("firstchallenge", "a"),
+            ("firstchallenge", "b"),
+        ]
+
+    def test_update_should_change_value_of_existing_flag_only(
+        self, storage: StorageService
+    ) -> None:
+        """Flag keeps its id, missing flag is not created by update"""
+        created_flag = storage.create_flag(_flag())
+
+        updated_flag = storage.update_flag(_flag(value="new"))
+
+        assert (updated_flag.id, updated_flag.value) == (created_flag.id, "new")
+        assert storage.update_flag(_flag(task_id="missing")) is None
+        assert len(storage.get_all_flags()) == 1
+
+    def test_update_with_same_value_should_return_flag(
+        self, storage: StorageService
+    ) -> None:
+        """Matched flag is returned even when write changed nothing"""
+        created_flag = storage.create_flag(_flag())
+
+        assert storage.update_flag(_flag()) == created_flag
+
+    def test_flag_should_be_deleted_by_id_within_its_challenge(
+        self, storage: StorageService
+    ) -> None:
+        """Id of flag from other challenge deletes nothing"""
+        created_flag = storage.create_flag(_flag())
+
+        assert not storage.delete_flag("secondchallenge", created_flag.id)
+        assert storage.delete_flag("firstchallenge", created_flag.id)
+        assert not storage.delete_flag("firstchallenge", created_flag.id)
+        assert storage.get_flag("firstchallenge", "firsttask") is None
+        assert storage.create_flag(_flag()) is not None
+
+    def test_pages_should_return_every_flag_once_in_creation_order(
+        self, storage: StorageService
+    ) -> None:
+        """Deleting flag between pages does not move the next page"""
+        storage.create_flags([_flag(task_id=str(index)) for index in range(5)])
+
+        first_page = storage.get_flags_page(2)
+        storage.delete_flag("firstchallenge", first_page.flags[-1].id)
+        second_page = storage.get_flags_page(2, first_page.continuation_token)
+        last_page = storage.get_flags_page(2, second_page.continuation_token)
+
+        assert [flag.task_id for flag in first_page.flags] == ["0", "1"]
+        assert [flag.task_id for flag in second_page.flags] == ["2", "3"]
+        assert [flag.task_id for flag in last_page.flags] == ["4"]
+        assert last_page.continuation_token is None
+        assert [flag.task_id for flag in storage.iter_all_flags()] == [
+            "0",
+            "2",
+            "3",
+            "4",
+        ]
+
+    def test_invalid_continuation_token_should_be_rejected(
+        self, storage: StorageService
+    ) -> None:
+        """Token not issued by storage is an error"""
+        with pytest.raises(ValueError):
+            storage.get_flags_page(2, "not-a-token")
+
+    def test_concurrent_creates_should_store_single_flag(
+        self, storage: StorageService
+    ) -> None:
+        """Only one of threads creating the same task succeeds"""
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(lambda _: storage.create_flag(_flag()), range(8))
+            )
+
+        assert len([result for result in results if result is not None]) == 1
+        assert len(storage.get_all_flags()) == 1
@@ -0,0 +1,49 @@
+"""Test team crediting of submission routes"""
+
+import pytest
+from fastapi.testclient import TestClient
+from ctf_server import config
+from ctf_server.api.challenge_app import create_app
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.async_memory_storage import AsyncInMemoryStorage
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+from ctf_server.service.async_flag_service import AsyncFlagService
+
+
+class _RecordingFlagService(AsyncFlagService):
+    """Flag service remembering teams submissions were credited to"""
+
+    def __init__(self) -> None:
+        super().__init__(AsyncInMemoryStorage(), PlainInputStoredHashedStrategy())
+        self.team_ids: list[str] = []
+
+    async def submit_flag(self, flag: Flag, team_id: str = None) -> State:
+        self.team_ids.append(team_id)
+        return await super().submit_flag(flag, team_id)
+
+    async def submit_flags(self, flags: list[Flag], team_id: str = None) -> list:
+        self.team_ids.append(team_id)
+        return await super().submit_flags(flags, team_id)
+
+
+_FLAG = {"value": "flag{test}", "challenge_id": "challenge", "task_id": "task"}
+
+
+class TestFlagRoutes:
+    """Tests team id passed to flag service"""
+
+    @pytest.mark.parametrize("trusted, team_id", [(False, None), (True, "team")])
+    def test_submission_should_be_credited_only_to_trusted_team(
+        self, monkeypatch, trusted: bool, team_id: str
+    ) -> None:
+        """Team header sent by client is ignored unless proxy sets it"""
+        monkeypatch.setitem(config.rate_limit, "trust_team_header", trusted)
+        flag_service = _RecordingFlagService()
+        headers = {config.rate_limit["team_header"]: "team"}
+
+        with TestClient(create_app(flag_service)) as client:
+            client.post("/submit-flag", json=_FLAG, headers=headers)
+            client.post("/submit-flags", json=[_FLAG], headers=headers)
+
+        assert flag_service.team_ids == [team_id, team_id]
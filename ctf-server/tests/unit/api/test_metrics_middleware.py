@@ -0,0 +1,77 @@
+"""Test request metrics and /metrics endpoint"""
+
+from fastapi.testclient import TestClient
+from ctf_server.api.challenge_app import create_app
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.core.metrics import REGISTRY
+from ctf_server.db.async_memory_storage import AsyncInMemoryStorage
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.storage_service import StorageThrottledError
+from ctf_server.service.async_flag_service import AsyncFlagService
+
+
+class _FailingStorage(AsyncInMemoryStorage):
+    """Storage whose reads fail with error given by challenge id"""
+
+    async def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        if challenge_id == "throttled":
+            raise StorageThrottledError("Throttled", retry_after_seconds=1)
+        raise RuntimeError("Storage is down")
+
+
+def _client() -> TestClient:
+    flag_service = AsyncFlagService(_FailingStorage(), PlainInputStoredHashedStrategy())
+    return TestClient(create_app(flag_service), raise_server_exceptions=False)
+
+
+def _request_count(route: str, status: str) -> int:
+    prefix = (
+        f'ctf_http_request_seconds_count{{method="GET",route="{route}",'
+        f'status="{status}"}} '
+    )
+    for line in REGISTRY.render().splitlines():
+        if line.startswith(prefix):
+            return int(line[len(prefix) :])
+    return 0
+
+
+class TestMetricsMiddleware:
+    """Tests latency histogram labels of requests sent through the app"""
+
+    def test_failed_requests_should_be_labelled_with_error_status(self) -> None:
+        """Handled and unhandled errors are recorded with status sent"""
+        unhandled = _request_count("/flag/", "500")
+        throttled = _request_count("/flag/", "503")
+
+        with _client() as client:
+            failed = client.get("/flag/", params={"challenge_id": "c", "task_id": "t"})
+            limited = client.get(
+                "/flag/", params={"challenge_id": "throttled", "task_id": "t"}
+            )
+
+        assert (failed.status_code, limited.status_code) == (500, 503)
+        assert _request_count("/flag/", "500") == unhandled + 1
+        assert _request_count("/flag/", "503") == throttled + 1
+
+    def test_unknown_path_should_not_add_label_value(self) -> None:
+        """Paths without route share one label value"""
+        not_found = _request_count("unmatched", "404")
+
+        with _client() as client:
+            client.get("/missing/path")
+
+        assert _request_count("unmatched", "404") == not_found + 1
+
+    def test_metrics_should_include_histograms_and_service_stats(self) -> None:
+        """Histograms are followed by counters of flag service as gauges"""
+        with _client() as client:
+            client.get("/stats")
+            response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE ctf_http_request_seconds histogram" in response.text
+        assert 'ctf_http_request_seconds_count{method="GET",route="/stats",' in (
+            response.text
+        )
+        assert "ctf_submission_gate_accepted " in response.text
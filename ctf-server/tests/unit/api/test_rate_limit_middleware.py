@@ -0,0 +1,75 @@
+"""Test rate limiting of submission routes"""
+
+import fastapi
+from fastapi.testclient import TestClient
+from ctf_server.api.challenge_app import create_app
+from ctf_server.api.rate_limit_middleware import RateLimitMiddleware
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.async_memory_storage import AsyncInMemoryStorage
+from ctf_server.db.rate_limit_backend import InMemoryRateLimitBackend
+from ctf_server.service.async_flag_service import AsyncFlagService
+from ctf_server.service.rate_limiter import RateLimiter
+
+
+def _client(team_burst: float) -> TestClient:
+    rate_limiter = RateLimiter(
+        InMemoryRateLimitBackend(), team_rate=0.5, team_burst=team_burst, global_rate=0
+    )
+    flag_service = AsyncFlagService(
+        AsyncInMemoryStorage(), PlainInputStoredHashedStrategy()
+    )
+    return TestClient(create_app(flag_service, rate_limiter))
+
+
+def _flag(task_id: str = "task") -> dict:
+    return {"value": "flag{test}", "challenge_id": "challenge", "task_id": task_id}
+
+
+class TestRateLimitMiddleware:
+    """Tests 429 answers of submission routes"""
+
+    def test_limited_submit_should_get_retry_after(self) -> None:
+        """Request over team burst is answered with 429 and Retry-After"""
+        with _client(team_burst=2) as client:
+            assert client.post("/submit-flag", json=_flag()).status_code == 400
+            assert client.post("/submit-flag", json=_flag()).status_code == 400
+            response = client.post("/submit-flag", json=_flag())
+
+        assert response.status_code == 429
+        assert response.json() == {"detail": "RATE_LIMITED"}
+        assert response.headers["Retry-After"] == "2"
+
+    def test_batch_should_cost_one_token_per_flag(self) -> None:
+        """Batch takes tokens of all its flags, not one per request"""
+        with _client(team_burst=4) as client:
+            flags = [_flag(str(index)) for index in range(3)]
+            assert client.post("/submit-flags", json=flags).status_code == 200
+            response = client.post("/submit-flags", json=flags)
+            single = client.post("/submit-flag", json=_flag())
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert single.status_code == 429
+
+    def test_client_behind_proxy_should_use_forwarded_address(self) -> None:
+        """Entries made up by client do not get new buckets and clients
+        behind the same proxy do not share one"""
+        app = fastapi.FastAPI()
+        app.add_middleware(
+            RateLimitMiddleware,
+            rate_limiter=RateLimiter(
+                InMemoryRateLimitBackend(), team_rate=0.5, team_burst=1, global_rate=0
+            ),
+            trusted_proxy_hops=1,
+        )
+        app.add_api_route("/submit-flag", lambda: {}, methods=["POST"])
+
+        def submit(forwarded_for: str) -> int:
+            return client.post(
+                "/submit-flag", headers={"X-Forwarded-For": forwarded_for}
+            ).status_code
+
+        with TestClient(app) as client:
+            assert submit("1.1.1.1, 10.0.0.1") == 200
+            assert submit("2.2.2.2, 10.0.0.1") == 429
+            assert submit("10.0.0.2") == 200
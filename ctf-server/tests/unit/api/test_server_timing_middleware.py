@@ -0,0 +1,78 @@
+"""Test Server-Timing header and slow request capture"""
+
+import re
+from fastapi.testclient import TestClient
+from ctf_server.api.challenge_app import create_app
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.async_memory_storage import AsyncInMemoryStorage
+from ctf_server.db.instrumented_storage import AsyncInstrumentedStorage
+from ctf_server.service.async_flag_service import AsyncFlagService
+from ctf_server.service.slow_request_log import SlowRequestLog
+
+_SERVER_TIMING = re.compile(
+    r'^([\w.]+;dur=\d+\.\d{3}(;desc="\d+ calls")?, )*total;dur=\d+\.\d{3}$'
+)
+
+
+def _client(slow_request_log: SlowRequestLog) -> TestClient:
+    flag_service = AsyncFlagService(
+        AsyncInstrumentedStorage(AsyncInMemoryStorage(), "memory"),
+        PlainInputStoredHashedStrategy(),
+    )
+    return TestClient(create_app(flag_service, slow_request_log=slow_request_log))
+
+
+def _flag(task_id: str = "task") -> dict:
+    return {"value": "flag{test}", "challenge_id": "challenge", "task_id": task_id}
+
+
+class TestServerTimingMiddleware:
+    """Tests time breakdown of requests sent through the app"""
+
+    def test_header_should_list_spans_and_total(self) -> None:
+        """Every span has duration in milliseconds, total comes last"""
+        with _client(SlowRequestLog(threshold_ms=1e9)) as client:
+            client.post("/flag", json=_flag())
+            header = client.post("/submit-flag", json=_flag()).headers["Server-Timing"]
+
+        assert _SERVER_TIMING.match(header), header
+        spans = [entry.split(";")[0] for entry in header.split(", ")]
+        assert {"validator", "crypto", "storage.get_flag", "serialize"} <= set(spans)
+        assert spans[-1] == "total"
+
+    def test_spans_called_many_times_should_have_call_count(self) -> None:
+        """Repeated span is sent once with number of calls"""
+        with _client(SlowRequestLog(threshold_ms=1e9)) as client:
+            header = client.post(
+                "/flags/import", json=[_flag("first"), _flag("second")]
+            ).headers["Server-Timing"]
+
+        assert _SERVER_TIMING.match(header), header
+        assert re.search(r'(^|, )crypto;dur=[\d.]+;desc="2 calls"', header), header
+
+    def test_requests_over_threshold_should_be_captured(self) -> None:
+        """Slow requests are kept with route template and breakdown"""
+        with _client(SlowRequestLog(threshold_ms=0)) as client:
+            client.get("/flag/", params={"challenge_id": "c", "task_id": "t"})
+            response = client.get("/admin/slow-requests", params={"limit": 1})
+
+        body = response.json()
+        assert response.status_code == 200
+        assert body["threshold_ms"] == 0
+        assert body["captured"] >= 1
+        [request] = body["requests"]
+        assert (request["method"], request["path"], request["route"]) == (
+            "GET",
+            "/flag/",
+            "/flag/",
+        )
+        assert request["status"] == 200
+        assert "storage.get_flag" in request["breakdown_ms"]
+
+    def test_requests_under_threshold_should_not_be_captured(self) -> None:
+        """Fast requests only get the header"""
+        with _client(SlowRequestLog(threshold_ms=1e9)) as client:
+            client.get("/flag/", params={"challenge_id": "c", "task_id": "t"})
+            body = client.get("/admin/slow-requests").json()
+
+        assert (body["captured"], body["requests"]) == (0, [])
@@ -146,3 +146,57 @@ class TestFlagValidator:
     def test_hash_should_be_equal_to_md5_value(self, word: str, md5_value: str) -> None:
         """Test hashing calculates valid md5 value"""
         assert Crypto.hash_to_md5(word) == md5_value
+
+    def test_provided_word_should_match_raw_digest(self) -> None:
+        """Stored value may be kept as raw digest instead of hex text"""
+        digest = bytes.fromhex("5aff3eee24f45a8f5a4c8e69c3a048b2")
+
+        assert Crypto.digest_md5("flag{test_flag}") == digest
+        assert Crypto.compare_word_with_hash("flag{test_flag}", digest)
+        assert not Crypto.compare_word_with_hash("flag{other_flag}", digest)
+
+    @pytest.mark.parametrize(
+        "provided_hash, expected",
+        [
+            ("5aff3eee24f45a8f5a4c8e69c3a048b2", True),
+            ("5AFF3EEE24F45A8F5A4C8E69C3A048B2", True),
+            ("a6e203ab6b2a031032ffa6b26ce3ee19", False),
+            ("not_a_hex_value", False),
+            ("5a ff3eee24f45a8f5a4c8e69c3a048b2", False),
+            ("5aff3eee24f45a8f5a4c8e69c3a048b2 ", False),
+        ],
+    )
+    def test_provided_hash_should_be_compared_with_raw_digest(
+        self, provided_hash: str, expected: bool
+    ) -> None:
+        """Hex value given by user is decoded before comparison with digest"""
+        digest = bytes.fromhex("5aff3eee24f45a8f5a4c8e69c3a048b2")
+
+        assert Crypto.compare_hashes(provided_hash, digest) is expected
+
+    @pytest.mark.parametrize(
+        "provided_hash",
+        [
+            "5AFF3EEE24F45A8F5A4C8E69C3A048B2",
+            "5a ff3eee24f45a8f5a4c8e69c3a048b2",
+            "5aff3eee24f45a8f5a4c8e69c3a048b",
+        ],
+    )
+    def test_provided_hash_should_compare_the_same_with_hex_and_digest(
+        self, provided_hash: str
+    ) -> None:
+        """Result does not depend on format stored value is kept in"""
+        hex_value = "5aff3eee24f45a8f5a4c8e69c3a048b2"
+
+        assert Crypto.compare_hashes(provided_hash, hex_value) is (
+            Crypto.compare_hashes(provided_hash, bytes.fromhex(hex_value))
+        )
+
+    def test_raw_digest_should_be_shown_as_hex(self) -> None:
+        """Digests are hex encoded when flags are returned to users"""
+        digest = bytes.fromhex("5aff3eee24f45a8f5a4c8e69c3a048b2")
+
+        assert Crypto.to_hex(digest) == "5aff3eee24f45a8f5a4c8e69c3a048b2"
+        assert Crypto.to_hex("5aff3eee24f45a8f5a4c8e69c3a048b2") == (
+            "5aff3eee24f45a8f5a4c8e69c3a048b2"
+        )
@@ -0,0 +1,84 @@
+"""Test flag format registry module"""
+
+import pytest
+from ctf_server.core.flag_format_registry import FlagFormat, FlagFormatRegistry
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+
+
+class TestFlagFormat:
+    """Tests for single flag format"""
+
+    @pytest.mark.parametrize(
+        "flag, result",
+        [
+            ("flag{test_flag}", True),
+            ("flag{}", False),
+            ("flag{Test}", False),
+            ("flag{test}x", False),
+            ("xflag{test}", False),
+            ("flag{", False),
+        ],
+    )
+    def test_default_format_should_match_flag_braces(self, flag: str, result: bool):
+        """Default format is flag{<a-z0-9_>}"""
+        assert FlagFormat().matches(flag) == result
+
+    @pytest.mark.parametrize(
+        "flag, result",
+        [
+            ("CTF[ABC123]", True),
+            ("CTF[abc]", False),
+            ("CTF[ABCDEFGHIJ]", False),
+            ("flag{abc}", False),
+        ],
+    )
+    def test_custom_format_should_use_prefix_pattern_and_length(
+        self, flag: str, result: bool
+    ):
+        """Custom prefix, suffix, body pattern and length limit are applied"""
+        flag_format = FlagFormat.from_dict(
+            {"prefix": "CTF[", "suffix": "]", "pattern": "[A-Z0-9]+", "max_length": 12}
+        )
+        assert flag_format.matches(flag) == result
+
+    @pytest.mark.parametrize(
+        "flag, result",
+        [("flag{abc}", True), ("flag{ABC}", False), ("flag{}", False)],
+    )
+    def test_anchored_pattern_should_match_body(self, flag: str, result: bool):
+        """Anchors refer to start and end of body, not of whole flag"""
+        flag_format = FlagFormat(body_pattern=r"^[a-z]+$")
+
+        assert flag_format.matches(flag) == result
+
+
+class TestFlagFormatRegistry:
+    """Tests for per challenge flag formats"""
+
+    def test_challenge_without_format_should_use_default(self) -> None:
+        """Only registered challenge uses its own format"""
+        registry = FlagFormatRegistry()
+        registry.register("custom", FlagFormat(prefix="ctf{"))
+
+        assert registry.is_valid("ctf{abc}", "custom")
+        assert not registry.is_valid("flag{abc}", "custom")
+        assert registry.is_valid("flag{abc}", "other")
+        assert registry.is_valid("flag{abc}")
+
+    def test_batch_validation_should_keep_input_order(self) -> None:
+        """Many flags of different challenges are checked in one call"""
+        registry = FlagFormatRegistry(formats={"custom": FlagFormat(prefix="ctf{")})
+
+        assert registry.validate_many(
+            ["ctf{abc}", "flag{abc}", "flag{abc}", "ctf{abc}"],
+            ["custom", "custom", "other", "other"],
+        ) == [True, False, True, False]
+
+    def test_strategy_should_use_registry(self) -> None:
+        """Strategy checks flag format of flag challenge"""
+        registry = FlagFormatRegistry(formats={"custom": FlagFormat(prefix="ctf{")})
+        strategy = PlainInputStoredHashedStrategy(registry)
+
+        assert strategy.is_valid_format("ctf{abc}", "custom")
+        assert not strategy.is_valid_format("ctf{abc}")
+        assert strategy.are_valid_formats(["ctf{abc}"], ["custom"]) == [True]
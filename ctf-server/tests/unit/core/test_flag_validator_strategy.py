@@ -42,6 +42,8 @@ class TestFlagValidatorStrategy:
             ("ec1936de82200b89affbaae27305cf10", True),
             ("ah", False),
             ("ec1936de82200b89awwbaae27305cf10", False),
+            ("0x371def", False),
+            (" 371def", False),
         ],
     )
     def test_flag_format_check_by_hashed_input_strategies(
@@ -0,0 +1,106 @@
+"""Test metrics module"""
+
+import asyncio
+import pytest
+from ctf_server.core.metrics import (
+    STORAGE_ERRORS,
+    STORAGE_SECONDS,
+    MetricsRegistry,
+    render_stats,
+    timed,
+)
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.instrumented_storage import InstrumentedStorage
+from ctf_server.db.memory_storage import InMemoryStorage
+
+
+class TestMetrics:
+    """Tests metric types and Prometheus text format"""
+
+    def test_histogram_buckets_should_be_rendered_cumulative(self) -> None:
+        """Value equal to bucket bound falls into that bucket"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram(
+            "latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)
+        )
+
+        for value in (0.1, 0.5, 5.0):
+            histogram.observe(value, "/flag")
+
+        lines = registry.render().splitlines()
+        assert 'latency_seconds_bucket{route="/flag",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{route="/flag",le="1.0"} 2' in lines
+        assert 'latency_seconds_bucket{route="/flag",le="+Inf"} 3' in lines
+        assert 'latency_seconds_count{route="/flag"} 3' in lines
+        assert 'latency_seconds_sum{route="/flag"} 5.6' in lines
+
+    def test_counter_label_values_should_be_escaped(self) -> None:
+        """Quotes in label values do not break text format"""
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests", ("team",))
+
+        counter.inc('say "hi"')
+        counter.inc('say "hi"', amount=2)
+
+        assert 'requests_total{team="say \\"hi\\""} 3' in registry.render()
+
+    def test_metric_name_should_be_registered_once(self) -> None:
+        """Second metric with the same name would render duplicated series"""
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests")
+
+        with pytest.raises(ValueError):
+            registry.histogram("requests_total", "Requests")
+
+    def test_timed_should_record_coroutines_and_generators(self) -> None:
+        """Coroutine is timed until it returns, generator until exhausted"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("operation_seconds", "Latency", ("operation",))
+
+        @timed(histogram, "read")
+        async def read() -> int:
+            return 1
+
+        @timed(histogram, "iterate")
+        def iterate():
+            yield from range(3)
+
+        assert asyncio.run(read()) == 1
+        assert list(iterate()) == [0, 1, 2]
+        assert (histogram.count("read"), histogram.count("iterate")) == (1, 1)
+
+    def test_stats_should_be_rendered_as_gauges(self) -> None:
+        """Nested numbers and booleans become gauges, None is left out"""
+        text = render_stats(
+            "ctf",
+            {
+                "flag_cache": {"hits": 3, "ratio": 0.5},
+                "scoreboard": {"ready": True},
+                "flag_replica": None,
+            },
+        )
+
+        assert text.splitlines() == [
+            "# TYPE ctf_flag_cache_hits gauge",
+            "ctf_flag_cache_hits 3",
+            "# TYPE ctf_flag_cache_ratio gauge",
+            "ctf_flag_cache_ratio 0.5",
+            "# TYPE ctf_scoreboard_ready gauge",
+            "ctf_scoreboard_ready 1",
+        ]
+
+    def test_storage_calls_should_be_counted_by_backend_and_operation(self) -> None:
+        """Every call is one round trip, raised errors are counted too"""
+        storage = InstrumentedStorage(InMemoryStorage(), "test-backend")
+        calls = STORAGE_SECONDS.count("test-backend", "get_flag")
+
+        storage.get_flag("challenge", "task")
+        storage.create_flag(
+            FlagDto(id=None, value="hash", challenge_id="challenge", task_id="task")
+        )
+        with pytest.raises(ValueError):
+            storage.get_flags_page(10, "not-a-token")
+
+        assert STORAGE_SECONDS.count("test-backend", "get_flag") == calls + 1
+        assert STORAGE_SECONDS.count("test-backend", "create_flag") == 1
+        assert STORAGE_ERRORS.value("test-backend", "get_flags_page") == 1
@@ -0,0 +1,58 @@
+"""Test request timing module"""
+
+import asyncio
+from ctf_server.core.request_timing import (
+    finish_request_timing,
+    record_span,
+    start_request_timing,
+    timed_span,
+)
+
+
+@timed_span("work")
+def _work(value: int) -> int:
+    return value * 2
+
+
+class TestRequestTiming:
+    """Tests collecting spans of current request"""
+
+    def test_spans_should_be_summed_per_name_within_request(self) -> None:
+        """Repeated calls add up and are counted"""
+        timing, token = start_request_timing()
+        try:
+            assert _work(1) == 2
+            _work(2)
+            record_span("storage.get_flag", 0.5)
+        finally:
+            finish_request_timing(token)
+
+        spans = timing.spans()
+        assert list(spans) == ["work", "storage.get_flag"]
+        assert spans["work"][1] == 2
+        assert spans["storage.get_flag"] == (0.5, 1)
+
+    def test_spans_outside_of_request_should_be_ignored(self) -> None:
+        """Code running outside of timed request is not measured"""
+        timing, token = start_request_timing()
+        finish_request_timing(token)
+
+        assert _work(1) == 2
+        record_span("storage.get_flag", 0.5)
+
+        assert not timing.spans()
+
+    def test_worker_thread_should_record_into_request_of_caller(self) -> None:
+        """Storage calls moved to threads keep request context"""
+
+        async def handle_request():
+            timing, token = start_request_timing()
+            try:
+                await asyncio.to_thread(record_span, "storage.create_flag", 0.25)
+            finally:
+                finish_request_timing(token)
+            return timing
+
+        timing = asyncio.run(handle_request())
+
+        assert timing.spans() == {"storage.create_flag": (0.25, 1)}
@@ -0,0 +1,71 @@
+"""Test submission gate module"""
+
+import pytest
+from ctf_server.core.flag_validator import FlagValidator
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.core.submission_gate import SubmissionGate
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+
+
+def _gate() -> SubmissionGate:
+    return SubmissionGate(
+        FlagValidator(PlainInputStoredHashedStrategy()),
+        max_flag_length=32,
+        max_id_length=16,
+    )
+
+
+class TestSubmissionGate:
+    """Tests for staged validation of submitted flags"""
+
+    @pytest.mark.parametrize(
+        "value, challenge_id, task_id, state",
+        [
+            ("flag{valid}", "challenge", "task", None),
+            ("flag{" + "a" * 64 + "}", "challenge", "task", State.INVALID_FORMAT),
+            ("flag{valid}", "c" * 17, "task", State.INVALID_FLAG),
+            ("flag{valid}", "challenge", "t" * 17, State.INVALID_FLAG),
+            ("flag{zażółć}", "challenge", "task", State.INVALID_FORMAT),
+            ("flag{new\nline}", "challenge", "task", State.INVALID_FORMAT),
+            ("flag{Invalid}", "challenge", "task", State.INVALID_FORMAT),
+        ],
+    )
+    def test_gate_should_reject_invalid_submissions(
+        self, value: str, challenge_id: str, task_id: str, state: State
+    ) -> None:
+        """Flags breaking any stage are rejected with state, others pass"""
+        flag = Flag(value=value, challenge_id=challenge_id, task_id=task_id)
+        assert _gate().check(flag) == state
+
+    def test_rejects_should_be_counted_per_stage(self) -> None:
+        """Each reject is counted by the first stage which failed"""
+        gate = _gate()
+        for value in ("flag{valid}", "x" * 33, "flag{ą}", "flag{A}", "flag{B}"):
+            gate.check(Flag(value=value, challenge_id="c", task_id="t"))
+
+        stats = gate.stats()
+        assert stats.accepted == 1
+        assert stats.rejected_size == 1
+        assert stats.rejected_charset == 1
+        assert stats.rejected_format == 2
+
+    def test_batch_check_should_keep_input_order(self) -> None:
+        """Batch check gives the same states as single checks"""
+        flags = [
+            Flag(value=value, challenge_id="c", task_id="t")
+            for value in ("flag{valid}", "x" * 33, "flag{ą}", "flag{A}", "flag{ok}")
+        ]
+
+        assert _gate().check_many(flags) == [_gate().check(flag) for flag in flags]
+        assert _gate().check_many([]) == []
+
+    def test_stored_flag_check_should_not_count_rejects(self) -> None:
+        """Flags about to be stored go through size and charset stages only"""
+        gate = _gate()
+        too_long = Flag(value="x" * 33, challenge_id="c", task_id="t")
+        invalid_format = Flag(value="flag{A}", challenge_id="c", task_id="t")
+
+        assert gate.check_stored(too_long) == State.INVALID_FORMAT
+        assert gate.check_stored(invalid_format) is None
+        assert gate.stats() == _gate().stats()
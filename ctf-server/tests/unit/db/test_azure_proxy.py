@@ -0,0 +1,249 @@
+"""Test Cosmos DB proxies against container kept in memory"""
+
+import asyncio
+import pytest
+import azure.cosmos.exceptions as exceptions
+from ctf_server.db.async_azure_proxy import AsyncAzureProxy
+from ctf_server.db.azure_proxy import AzureProxy
+from ctf_server.db.dto.flag_documents import (
+    COSMOS_FLAG_UNIQUE_KEY_POLICY,
+    cosmos_flag_id,
+)
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.model.flag_import import ImportStatus
+
+
+class _Container:
+    """Keeps items the way Cosmos container does, task ids are unique within
+    partition only when container has unique key policy. Requests are
+    answered with lists, like CosmosRequests returns them"""
+
+    def __init__(self, unique_key: bool = True) -> None:
+        self.items: dict[tuple[str, str], dict] = {}
+        self.unique_key = unique_key
+        self.queries = 0
+        self.replace_conflicts = 0
+
+    def read(self, response_hook=None) -> dict:
+        if self.unique_key:
+            return {"id": "Flags", "uniqueKeyPolicy": COSMOS_FLAG_UNIQUE_KEY_POLICY}
+        return {"id": "Flags", "uniqueKeyPolicy": {"uniqueKeys": []}}
+
+    def query_items(self, query: str, parameters: list, response_hook=None, **_):
+        self.queries += 1
+        values = {parameter["name"]: parameter["value"] for parameter in parameters}
+        task_ids = values.get("@task_ids", [values.get("@task_id")])
+        items = [
+            dict(item)
+            for item in self.items.values()
+            if item["partitionKey"] == values["@challenge_id"]
+            and item["task_id"] in task_ids
+        ]
+        if "SELECT VALUE record.task_id" in query:
+            return [item["task_id"] for item in items]
+        return items
+
+    def create_item(self, body: dict, response_hook=None) -> dict:
+        key = (body["partitionKey"], body["id"])
+        task_taken = self.unique_key and any(
+            (item["partitionKey"], item["task_id"])
+            == (body["partitionKey"], body["task_id"])
+            for item in self.items.values()
+        )
+        if key in self.items or task_taken:
+            raise exceptions.CosmosResourceExistsError(
+                status_code=409, message="exists"
+            )
+        self.items[key] = dict(body, _etag="1")
+        return dict(self.items[key])
+
+    def replace_item(
+        self, item: str, body: dict, etag=None, match_condition=None, response_hook=None
+    ) -> dict:
+        key = (body["partitionKey"], item)
+        if key not in self.items:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message="")
+        if self.replace_conflicts:
+            self.replace_conflicts -= 1
+            raise exceptions.CosmosAccessConditionFailedError(
+                status_code=412, message=""
+            )
+        assert etag in (None, self.items[key]["_etag"])
+        self.items[key] = dict(body, _etag=str(int(self.items[key]["_etag"]) + 1))
+        return dict(self.items[key])
+
+    def execute_item_batch(
+        self, batch_operations: list, partition_key: str, response_hook=None
+    ) -> list:
+        items = dict(self.items)
+        try:
+            for _, (body,) in batch_operations:
+                self.create_item(body)
+        except exceptions.CosmosResourceExistsError as error:
+            self.items = items
+            raise exceptions.CosmosBatchOperationError(
+                error_index=0, headers={}, status_code=409
+            ) from error
+        return []
+
+
+class _AsyncContainer:
+    """Coroutine methods over container kept in memory"""
+
+    def __init__(self, container: _Container) -> None:
+        self._container = container
+
+    def __getattr__(self, name: str):
+        method = getattr(self._container, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+class _AzureProxy(AzureProxy):
+    """Proxy working on given container instead of Cosmos account"""
+
+    def __init__(self, container: _Container, deterministic_ids: bool = False) -> None:
+        self._fake_container = container
+        super().__init__(deterministic_ids)
+
+    def _get_client(self):
+        return None
+
+    def _get_or_create_database(self):
+        return None
+
+    def _get_or_create_container(self):
+        return self._fake_container
+
+
+class _AsyncAzureProxy(AsyncAzureProxy):
+    """Asynchronous proxy working on given container"""
+
+    def __init__(self, container: _Container) -> None:
+        self._fake_container = _AsyncContainer(container)
+        super().__init__(deterministic_ids=False)
+
+    def _get_client(self):
+        return None
+
+    async def _get_or_create_database(self):
+        return None
+
+    async def _get_or_create_container(self, database):
+        return self._fake_container
+
+
+def _flag(task_id: str = "task", value: str = "hash") -> FlagDto:
+    return FlagDto(
+        id="1710000000", value=value, challenge_id="challenge", task_id=task_id
+    )
+
+
+def _legacy_item(task_id: str = "task") -> dict:
+    return {
+        "id": "1710000000",
+        "partitionKey": "challenge",
+        "challenge_id": "challenge",
+        "task_id": task_id,
+        "value": "hash",
+        "_etag": "1",
+    }
+
+
+class TestAzureProxy:
+    """Tests create and update of flags in Cosmos container"""
+
+    @pytest.mark.parametrize("unique_key", [True, False])
+    def test_existing_flag_should_not_be_created_again(self, unique_key: bool) -> None:
+        """Second create of the same task is rejected with or without unique key"""
+        container = _Container(unique_key)
+        proxy = _AzureProxy(container)
+
+        created_flag = proxy.create_flag(_flag())
+
+        assert created_flag.id == cosmos_flag_id("challenge", "task")
+        assert proxy.create_flag(_flag(value="other")) is None
+        assert len(container.items) == 1
+
+    def test_tasks_created_in_the_same_second_should_not_collide(self) -> None:
+        """Service ids are ignored, item id is derived from task"""
+        proxy = _AzureProxy(_Container())
+
+        assert proxy.create_flag(_flag("first")) is not None
+        assert proxy.create_flag(_flag("second")) is not None
+
+    def test_legacy_flag_should_be_found_without_unique_key(self) -> None:
+        """Container without unique key is queried before create"""
+        container = _Container(unique_key=False)
+        container.items[("challenge", "1710000000")] = _legacy_item()
+        proxy = _AzureProxy(container)
+
+        assert proxy.create_flag(_flag()) is None
+        assert container.queries == 1
+        assert len(container.items) == 1
+
+    def test_container_with_unique_key_should_not_be_queried_on_create(self) -> None:
+        """Unique key rejects legacy flag, so create is single request"""
+        container = _Container(unique_key=True)
+        container.items[("challenge", "1710000000")] = _legacy_item()
+        proxy = _AzureProxy(container)
+
+        assert proxy.create_flag(_flag()) is None
+        assert container.queries == 0
+
+    def test_bulk_create_should_report_existing_flags(self) -> None:
+        """Flags already stored under legacy id are duplicates"""
+        container = _Container(unique_key=False)
+        container.items[("challenge", "1710000000")] = _legacy_item("stored")
+        proxy = _AzureProxy(container)
+
+        statuses = proxy.create_flags([_flag("new"), _flag("stored"), _flag("new")])
+
+        assert statuses == [
+            ImportStatus.CREATED,
+            ImportStatus.DUPLICATE,
+            ImportStatus.DUPLICATE,
+        ]
+        assert len(container.items) == 2
+
+    def test_update_should_retry_when_etag_changed(self) -> None:
+        """Replace conflicting with other writer is tried again"""
+        container = _Container()
+        container.items[("challenge", "1710000000")] = _legacy_item()
+        container.replace_conflicts = 1
+        proxy = _AzureProxy(container)
+
+        updated_flag = proxy.update_flag(_flag(value="new"))
+
+        assert (updated_flag.id, updated_flag.value) == ("1710000000", "new")
+        assert container.queries == 2
+
+    def test_update_should_give_up_when_flag_keeps_changing(self) -> None:
+        """Update fails after all attempts conflicted"""
+        container = _Container()
+        container.items[("challenge", "1710000000")] = _legacy_item()
+        container.replace_conflicts = AzureProxy._UPDATE_ATTEMPTS
+        proxy = _AzureProxy(container)
+
+        assert proxy.update_flag(_flag(value="new")) is None
+        assert container.items[("challenge", "1710000000")]["value"] == "hash"
+
+    def test_async_proxy_should_query_before_create_without_unique_key(self) -> None:
+        """Asynchronous proxy detects missing unique key the same way"""
+        container = _Container(unique_key=False)
+        container.items[("challenge", "1710000000")] = _legacy_item()
+        proxy = _AsyncAzureProxy(container)
+
+        async def create_both() -> tuple[FlagDto, FlagDto]:
+            return await proxy.create_flag(_flag()), await proxy.create_flag(
+                _flag("other")
+            )
+
+        existing_flag, new_flag = asyncio.run(create_both())
+
+        assert existing_flag is None
+        assert new_flag.id == cosmos_flag_id("challenge", "other")
+        assert container.queries == 2
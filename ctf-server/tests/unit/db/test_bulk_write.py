@@ -0,0 +1,61 @@
+"""Test bulk write helpers"""
+
+from ctf_server.db.bulk_write import (
+    chunked,
+    group_new_flags_by_challenge,
+    mongo_bulk_insert_statuses,
+    split_stored_flags,
+)
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.model.flag_import import ImportStatus
+
+
+def _flag(challenge_id: str, task_id: str) -> FlagDto:
+    return FlagDto(id="1", value="hash", challenge_id=challenge_id, task_id=task_id)
+
+
+class TestBulkWrite:
+    """Tests helpers used by storage bulk writes"""
+
+    def test_flags_should_be_grouped_by_challenge_without_repeated_keys(self) -> None:
+        """Repeated challenge and task pair is a duplicate"""
+        flags = [
+            _flag("first", "a"),
+            _flag("second", "a"),
+            _flag("first", "b"),
+            _flag("first", "a"),
+        ]
+
+        statuses, indexes = group_new_flags_by_challenge(flags)
+
+        assert statuses == [None, None, None, ImportStatus.DUPLICATE]
+        assert indexes == {"first": [0, 2], "second": [1]}
+
+    def test_stored_flags_should_be_duplicates(self) -> None:
+        """Flags stored already or repeated in input are not inserted"""
+        flags = [
+            _flag("first", "a"),
+            _flag("second", "a"),
+            _flag("first", "b"),
+            _flag("first", "b"),
+        ]
+
+        statuses, new_indexes = split_stored_flags(flags, {("first", "a")})
+
+        assert statuses == [ImportStatus.DUPLICATE, None, None, ImportStatus.DUPLICATE]
+        assert new_indexes == [1, 2]
+
+    def test_indexes_should_be_split_into_chunks(self) -> None:
+        """Last chunk keeps the remainder"""
+        assert list(chunked(list(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+
+    def test_mongo_write_errors_should_be_translated_to_statuses(self) -> None:
+        """Duplicate key errors are duplicates, other errors are errors"""
+        statuses = mongo_bulk_insert_statuses(
+            3, [{"index": 0, "code": 11000}, {"index": 2, "code": 121}]
+        )
+        assert statuses == [
+            ImportStatus.DUPLICATE,
+            ImportStatus.CREATED,
+            ImportStatus.ERROR,
+        ]
@@ -0,0 +1,165 @@
+"""Test Cosmos DB requests module"""
+
+import asyncio
+import pytest
+from azure.core.paging import ItemPaged
+import azure.cosmos.exceptions as exceptions
+from ctf_server.db import cosmos_requests
+from ctf_server.db.cosmos_requests import CosmosRequestCharges, CosmosRequests
+from ctf_server.db.storage_service import StorageThrottledError
+
+
+def _error(status_code: int, headers: dict) -> exceptions.CosmosHttpResponseError:
+    error = exceptions.CosmosHttpResponseError(status_code=status_code, message="error")
+    error.headers = headers
+    return error
+
+
+class _Container:
+    """Answers every call with next response, exceptions are raised"""
+
+    def __init__(self, *responses) -> None:
+        self._responses = list(responses)
+        self.calls = 0
+
+    def read_item(self, item: str, response_hook) -> dict:
+        self.calls += 1
+        response = self._responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        response_hook({"x-ms-request-charge": "1.5"}, response)
+        return response
+
+
+class TestCosmosRequests:
+    """Tests throttling retries and request charge accounting"""
+
+    @pytest.fixture(name="delays")
+    def fixture_delays(self, monkeypatch: pytest.MonkeyPatch) -> list[float]:
+        """Delays of retries, nothing is slept"""
+        delays = []
+        monkeypatch.setattr(cosmos_requests.time, "sleep", delays.append)
+        return delays
+
+    def test_throttled_request_should_be_retried_after_requested_delay(
+        self, delays: list[float]
+    ) -> None:
+        """Delay is x-ms-retry-after-ms extended by bounded jitter"""
+        charges = CosmosRequestCharges()
+        throttled = _error(
+            429, {"x-ms-retry-after-ms": "100", "x-ms-request-charge": "0.2"}
+        )
+        container = _Container(throttled, throttled, {"id": "flag"})
+
+        result = CosmosRequests(charges=charges).call(
+            "get_flag", container.read_item, item="flag"
+        )
+
+        assert result == {"id": "flag"}
+        max_delay = 0.1 * (1 + cosmos_requests.RETRY_JITTER)
+        assert len(delays) == 2
+        assert all(0.1 <= delay <= max_delay for delay in delays)
+        assert charges.stats()["get_flag"] == {
+            "requests": 3,
+            "request_units": pytest.approx(1.9),
+            "throttled_requests": 2,
+            "throttle_failures": 0,
+        }
+
+    def test_request_throttled_after_all_retries_should_raise(
+        self, delays: list[float]
+    ) -> None:
+        """Throttling is not mistaken for missing flag"""
+        charges = CosmosRequestCharges()
+        throttled = _error(429, {"x-ms-retry-after-ms": "2000"})
+        container = _Container(*[throttled] * 3)
+
+        with pytest.raises(StorageThrottledError) as error:
+            CosmosRequests(max_retries=2, charges=charges).call(
+                "get_flag", container.read_item, item="flag"
+            )
+
+        assert error.value.retry_after_seconds == 2
+        assert (container.calls, len(delays)) == (3, 2)
+        assert charges.stats()["get_flag"]["throttle_failures"] == 1
+
+    def test_total_wait_should_be_bounded(self, delays: list[float]) -> None:
+        """Retry which would exceed max wait is not attempted"""
+        throttled = _error(429, {"x-ms-retry-after-ms": "600"})
+        container = _Container(*[throttled] * 3)
+
+        with pytest.raises(StorageThrottledError):
+            CosmosRequests(max_wait_seconds=1, charges=CosmosRequestCharges()).call(
+                "get_flag", container.read_item, item="flag"
+            )
+
+        assert len(delays) == 1
+
+    def test_other_errors_should_not_be_retried(self, delays: list[float]) -> None:
+        """Missing item is raised to the proxy right away"""
+        container = _Container(exceptions.CosmosResourceNotFoundError(status_code=404))
+
+        with pytest.raises(exceptions.CosmosResourceNotFoundError):
+            CosmosRequests(charges=CosmosRequestCharges()).call(
+                "get_flag", container.read_item, item="flag"
+            )
+
+        assert (container.calls, delays) == (1, [])
+
+    def test_response_hook_should_skip_pager_of_query(self) -> None:
+        """Query calls hook with stale headers of previous request when pager
+        is created, those are not charged to the query"""
+        charges = CosmosRequestCharges()
+        hook = CosmosRequests(charges=charges).response_hook("get_flags")
+        headers = {"x-ms-request-charge": "2.5"}
+
+        hook(headers, ItemPaged(lambda token: None, lambda response: (None, [])))
+        hook(headers, {"Documents": []})
+
+        assert charges.stats()["get_flags"]["request_units"] == 2.5
+
+    def test_response_hook_should_accept_headers_only(self) -> None:
+        """Database creation calls hook without result"""
+        charges = CosmosRequestCharges()
+
+        CosmosRequests(charges=charges).response_hook("create_database")(
+            {"x-ms-request-charge": "1"}
+        )
+
+        assert charges.stats()["create_database"]["requests"] == 1
+
+    @pytest.mark.parametrize("sdk_retries, max_retries", [(False, 0), (True, 9)])
+    def test_sdk_retries_should_be_kept_only_when_requested(
+        self, sdk_retries: bool, max_retries: int
+    ) -> None:
+        """Clients not sending requests through CosmosRequests keep SDK retries"""
+        options = cosmos_requests.cosmos_client_options(sdk_retries)
+
+        retry_options = options["connection_policy"].RetryOptions
+        assert retry_options.MaxRetryAttemptCount == max_retries
+
+    def test_coroutine_should_be_retried_when_throttled(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Asyncio container methods are awaited on every attempt"""
+        delays = []
+
+        async def sleep(delay: float) -> None:
+            delays.append(delay)
+
+        monkeypatch.setattr(cosmos_requests.asyncio, "sleep", sleep)
+        container = _Container(_error(429, {}), {"id": "flag"})
+
+        async def read_item(item: str, response_hook) -> dict:
+            return container.read_item(item, response_hook)
+
+        result = asyncio.run(
+            CosmosRequests(charges=CosmosRequestCharges()).call_async(
+                "get_flag", read_item, item="flag"
+            )
+        )
+
+        assert result == {"id": "flag"}
+        assert delays == [
+            pytest.approx(cosmos_requests.FALLBACK_RETRY_AFTER_SECONDS, rel=0.2)
+        ]
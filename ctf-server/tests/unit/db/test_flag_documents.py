@@ -0,0 +1,216 @@
+"""Test flag document conversions"""
+
+import pytest
+from bson import ObjectId, Timestamp
+from ctf_server.db.dto.flag_change import FLAG_DELETE, FLAG_UPSERT
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.dto.flag_documents import (
+    cosmos_flag_id,
+    cosmos_item_to_flag_change,
+    cosmos_item_to_flag_dto,
+    flag_dto_to_cosmos_item,
+    flag_dto_to_mongo_document,
+    has_mongo_flag_index,
+    mongo_document_to_flag_dto,
+    mongo_flag_keys_query,
+    mongo_flag_value_update,
+    mongo_change_to_flag_change,
+    mongo_documents_to_page,
+    mongo_page_query,
+    unique_flags_per_task,
+)
+
+
+class TestCosmosFlagId:
+    """Tests deterministic Cosmos DB ids"""
+
+    def test_id_should_be_the_same_for_the_same_challenge_and_task(self) -> None:
+        """Id has to be stable between calls"""
+        assert cosmos_flag_id("firstchallenge", "firsttask") == cosmos_flag_id(
+            "firstchallenge", "firsttask"
+        )
+
+    def test_id_should_differ_when_ids_are_shifted_between_fields(self) -> None:
+        """Concatenation of challenge and task ids must not collide"""
+        assert cosmos_flag_id("ab", "c") != cosmos_flag_id("a", "bc")
+
+    def test_id_should_not_contain_characters_forbidden_by_cosmos(self) -> None:
+        """Ids with slashes or hashes are rejected by Cosmos DB"""
+        flag_id = cosmos_flag_id("challenge/1", "task#?\\")
+        assert not any(sign in flag_id for sign in "/\\?#")
+
+
+_HEX_VALUE = "5aff3eee24f45a8f5a4c8e69c3a048b2"
+
+
+def _flag(value: str | bytes) -> FlagDto:
+    return FlagDto(id="1", value=value, challenge_id="challenge", task_id="task")
+
+
+class TestFlagValueFormats:
+    """Tests storing flag values as hex text and as raw digests"""
+
+    @pytest.mark.parametrize("value", [_HEX_VALUE, bytes.fromhex(_HEX_VALUE)])
+    def test_cosmos_item_should_keep_value_format(self, value: str | bytes) -> None:
+        """Value read back from item is the same as written one"""
+        item = flag_dto_to_cosmos_item(_flag(value))
+
+        assert cosmos_item_to_flag_dto(item).value == value
+
+    @pytest.mark.parametrize("value", [_HEX_VALUE, bytes.fromhex(_HEX_VALUE)])
+    def test_mongo_document_should_keep_value_format(self, value: str | bytes) -> None:
+        """Value read back from document is the same as written one"""
+        document = dict(flag_dto_to_mongo_document(_flag(value)), _id="1")
+
+        assert mongo_document_to_flag_dto(document).value == value
+
+    def test_raw_digest_should_be_tagged_with_algorithm(self) -> None:
+        """Readers tell formats apart by tag, not by value shape"""
+        item = flag_dto_to_cosmos_item(_flag(bytes.fromhex(_HEX_VALUE)))
+
+        assert item["digest_algorithm"] == "md5"
+        assert "digest_algorithm" not in flag_dto_to_cosmos_item(_flag(_HEX_VALUE))
+
+    def test_unknown_algorithm_should_be_rejected(self) -> None:
+        """Values of algorithm which is not supported cannot be compared"""
+        item = dict(flag_dto_to_cosmos_item(_flag(_HEX_VALUE)), digest_algorithm="sha1")
+
+        with pytest.raises(ValueError):
+            cosmos_item_to_flag_dto(item)
+
+    def test_hex_value_update_should_remove_tag(self) -> None:
+        """Document rewritten with hex value must not keep old digest tag"""
+        assert mongo_flag_value_update(_flag(_HEX_VALUE)) == {
+            "$set": {"value": _HEX_VALUE},
+            "$unset": {"digest_algorithm": ""},
+        }
+
+
+class TestUniqueFlagsPerTask:
+    """Tests filtering of ambiguous batch reads"""
+
+    def test_tasks_with_many_flags_should_be_left_out(self) -> None:
+        """Only tasks with exactly one stored flag are kept"""
+        flags = [
+            FlagDto(id="1", value="a", challenge_id="challenge", task_id="first"),
+            FlagDto(id="2", value="b", challenge_id="challenge", task_id="second"),
+            FlagDto(id="3", value="c", challenge_id="challenge", task_id="second"),
+        ]
+
+        assert unique_flags_per_task(flags) == [flags[0]]
+
+
+class TestMongoPaging:
+    """Tests paging helpers of Mongo DB proxies"""
+
+    def test_first_page_should_not_filter_documents(self) -> None:
+        """First page starts from the beginning of collection"""
+        assert mongo_page_query(None) == {}
+
+    def test_invalid_token_should_be_rejected(self) -> None:
+        """Token which is not document id is invalid"""
+        with pytest.raises(ValueError):
+            mongo_page_query("not-an-object-id")
+
+    def test_page_should_have_token_only_when_next_page_exists(self) -> None:
+        """Extra document marks that next page exists"""
+        documents = [
+            {"_id": ObjectId(), "challenge_id": "c", "task_id": str(i), "value": "v"}
+            for i in range(3)
+        ]
+
+        page = mongo_documents_to_page(documents, 2)
+        last_page = mongo_documents_to_page(documents[:2], 2)
+
+        assert [flag.task_id for flag in page.flags] == ["0", "1"]
+        assert page.continuation_token == str(documents[1]["_id"])
+        assert mongo_page_query(page.continuation_token) == {
+            "_id": {"$gt": documents[1]["_id"]}
+        }
+        assert last_page.continuation_token is None
+
+
+class TestMongoFlagIndex:
+    """Tests detection of unique flag index and lookup of stored flags"""
+
+    def test_unique_index_should_be_found_under_any_name(self) -> None:
+        """Index created by operators counts, non unique index does not"""
+        keys = [("challenge_id", 1), ("task_id", 1)]
+
+        assert has_mongo_flag_index({"ops_index": {"key": keys, "unique": True}})
+        assert not has_mongo_flag_index({"ops_index": {"key": keys}})
+        assert not has_mongo_flag_index(
+            {"_id_": {"key": [("_id", 1)]}, "task": {"key": keys[1:], "unique": True}}
+        )
+
+    def test_stored_flags_should_be_queried_per_challenge(self) -> None:
+        """Every challenge gets one clause with its task ids"""
+        flags = [
+            FlagDto(id=None, value="v", challenge_id="first", task_id="b"),
+            FlagDto(id=None, value="v", challenge_id="second", task_id="a"),
+            FlagDto(id=None, value="v", challenge_id="first", task_id="a"),
+        ]
+
+        assert mongo_flag_keys_query(flags) == {
+            "$or": [
+                {"challenge_id": "first", "task_id": {"$in": ["a", "b"]}},
+                {"challenge_id": "second", "task_id": {"$in": ["a"]}},
+            ]
+        }
+
+
+class TestFlagChanges:
+    """Tests conversions of change stream events"""
+
+    def test_mongo_insert_should_be_upsert(self) -> None:
+        """Inserted document is converted to flag"""
+        document_id = ObjectId()
+        change = mongo_change_to_flag_change(
+            {
+                "operationType": "insert",
+                "clusterTime": Timestamp(1700000000, 1),
+                "documentKey": {"_id": document_id},
+                "fullDocument": {
+                    "_id": document_id,
+                    "challenge_id": "c",
+                    "task_id": "t",
+                    "value": "v",
+                },
+            }
+        )
+
+        assert change.operation == FLAG_UPSERT
+        assert change.flag_id == document_id
+        assert change.flag.task_id == "t"
+        assert change.timestamp == 1700000000
+
+    def test_mongo_delete_should_keep_document_id(self) -> None:
+        """Deleted document is identified by its id only"""
+        document_id = ObjectId()
+        change = mongo_change_to_flag_change(
+            {"operationType": "delete", "documentKey": {"_id": document_id}}
+        )
+
+        assert change.operation == FLAG_DELETE
+        assert change.flag_id == document_id
+        assert change.flag is None
+
+    def test_mongo_events_without_flag_should_be_skipped(self) -> None:
+        """Collection events and updates of deleted documents are ignored"""
+        assert mongo_change_to_flag_change({"operationType": "drop"}) is None
+        assert (
+            mongo_change_to_flag_change(
+                {"operationType": "update", "fullDocument": None}
+            )
+            is None
+        )
+
+    def test_cosmos_item_should_be_upsert(self) -> None:
+        """Change feed item is converted to flag with item timestamp"""
+        change = cosmos_item_to_flag_change(
+            {"id": "1", "challenge_id": "c", "task_id": "t", "value": "v", "_ts": 5}
+        )
+
+        assert change.operation == FLAG_UPSERT
+        assert change.flag_id == "1"
+        assert change.timestamp == 5
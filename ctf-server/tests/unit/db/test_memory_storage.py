@@ -0,0 +1,97 @@
+"""Test in-memory storage module"""
+
+import asyncio
+import threading
+import pytest
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.async_memory_storage import AsyncInMemoryStorage
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.memory_storage import InMemoryStorage
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+from ctf_server.service.flag_service import FlagService
+from tests.storage_contract import StorageContract
+
+
+def _flag(challenge_id: str = "challenge", task_id: str = "task") -> FlagDto:
+    return FlagDto(id=None, value="hash", challenge_id=challenge_id, task_id=task_id)
+
+
+class TestInMemoryStorage(StorageContract):
+    """Tests storage contract and in-memory specific behaviour"""
+
+    @pytest.fixture(name="storage")
+    def fixture_storage(self) -> InMemoryStorage:
+        """Empty storage"""
+        return InMemoryStorage()
+
+    def test_returned_flag_should_not_share_state_with_storage(
+        self, storage: InMemoryStorage
+    ) -> None:
+        """Changing returned flag without update keeps stored value"""
+        storage.create_flag(_flag())
+
+        storage.get_flag("challenge", "task").value = "changed"
+
+        assert storage.get_flag("challenge", "task").value == "hash"
+
+    def test_concurrent_creates_should_store_every_task_once(
+        self, storage: InMemoryStorage
+    ) -> None:
+        """Every task is created by exactly one of threads"""
+        results: list[FlagDto] = []
+
+        def create() -> None:
+            for index in range(200):
+                results.append(storage.create_flag(_flag(task_id=str(index))))
+
+        threads = [threading.Thread(target=create) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len([flag for flag in results if flag is not None]) == 200
+        assert len({flag.id for flag in storage.get_all_flags()}) == 200
+
+    def test_flag_service_should_work_on_storage(self) -> None:
+        """Service flows run without database"""
+        flag_service = FlagService(InMemoryStorage(), PlainInputStoredHashedStrategy())
+        flag = Flag(challenge_id="challenge", task_id="task", value="flag{memory}")
+
+        flag_service.create_flag(flag)
+
+        assert flag_service.submit_flag(flag) == State.VALID_FLAG
+        assert flag_service.submit_flag(
+            flag.model_copy(update={"value": "flag{no}"})
+        ) == (State.INVALID_FLAG)
+
+    def test_flags_over_submission_limits_should_not_be_stored(self) -> None:
+        """Flags which could never be submitted are not created or imported"""
+        flag_service = FlagService(InMemoryStorage(), PlainInputStoredHashedStrategy())
+        long_value = Flag(challenge_id="c", task_id="t", value="flag{" + "a" * 300)
+        long_id = Flag(challenge_id="c" * 200, task_id="t", value="flag{memory}")
+
+        assert flag_service.create_flag(long_value) is None
+        assert flag_service.create_flag(long_id) is None
+        assert [
+            result.error for result in flag_service.import_flags([long_value, long_id])
+        ] == [State.INVALID_FORMAT.name, State.INVALID_FLAG.name]
+        assert not flag_service.get_all_flags()
+
+
+class TestAsyncInMemoryStorage:
+    """Tests coroutines over in-memory storage"""
+
+    def test_async_storage_should_share_flags_with_wrapped_storage(self) -> None:
+        """Flags created by coroutines are visible to synchronous users"""
+        storage = InMemoryStorage()
+        async_storage = AsyncInMemoryStorage(storage)
+
+        async def create_and_list() -> list[FlagDto]:
+            await async_storage.create_flag(_flag())
+            return [flag async for flag in async_storage.iter_all_flags()]
+
+        flags = asyncio.run(create_and_list())
+
+        assert flags == [storage.get_flag("challenge", "task")]
@@ -0,0 +1,92 @@
+"""Test Mongo DB client registry module"""
+
+import asyncio
+import pytest
+from ctf_server import config
+from ctf_server.db import mongo_client_registry
+from ctf_server.db.mongo_client_registry import (
+    acquire_async_mongo_client,
+    acquire_mongo_client,
+    close_mongo_clients,
+    mongo_pool_stats,
+    release_mongo_client,
+)
+
+# Clients connect lazily, no server is needed
+_CONNECTION_STRING = "mongodb://localhost:27017"
+
+
+class TestMongoClientRegistry:
+    """Tests sharing, releasing and options of registered clients"""
+
+    @pytest.fixture(autouse=True)
+    def fixture_close_clients(self):
+        """Every test starts with empty registry"""
+        yield
+        close_mongo_clients()
+
+    def test_client_should_be_shared_until_last_release(self) -> None:
+        """Client is closed and removed when its last user releases it"""
+        client = acquire_mongo_client(_CONNECTION_STRING)
+
+        assert acquire_mongo_client(_CONNECTION_STRING) is client
+        assert acquire_mongo_client(_CONNECTION_STRING + "/other") is not client
+        release_mongo_client(client)
+        assert acquire_mongo_client(_CONNECTION_STRING) is client
+        release_mongo_client(client)
+        release_mongo_client(client)
+        assert acquire_mongo_client(_CONNECTION_STRING) is not client
+
+    def test_client_should_be_created_with_configured_pool_options(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Empty and zero settings are left to driver defaults"""
+        monkeypatch.setitem(config.mongo, "max_pool_size", 7)
+        monkeypatch.setitem(config.mongo, "wait_queue_timeout_ms", 1500)
+        monkeypatch.setitem(config.mongo, "compressors", "zlib")
+        monkeypatch.setitem(config.mongo, "write_concern", "majority")
+
+        options = acquire_mongo_client(_CONNECTION_STRING).options
+
+        assert options.pool_options.max_pool_size == 7
+        assert options.pool_options.wait_queue_timeout == 1.5
+        assert options.write_concern.document == {"w": "majority"}
+        assert options.read_concern.level is None
+
+    def test_async_client_should_be_shared_within_event_loop_only(self) -> None:
+        """Motor client bound to one loop is not handed out to another"""
+
+        async def acquire_twice():
+            return (
+                acquire_async_mongo_client(_CONNECTION_STRING),
+                acquire_async_mongo_client(_CONNECTION_STRING),
+            )
+
+        first_loop_clients = asyncio.run(acquire_twice())
+        second_loop_clients = asyncio.run(acquire_twice())
+
+        assert first_loop_clients[0] is first_loop_clients[1]
+        assert second_loop_clients[0] is not first_loop_clients[0]
+        assert mongo_pool_stats().clients == 2
+
+    def test_pool_events_should_be_summed_over_clients(self) -> None:
+        """Check outs in progress are waiting until connection is handed out"""
+        acquire_mongo_client(_CONNECTION_STRING)
+        acquire_mongo_client(_CONNECTION_STRING + "/other")
+        first, second = [
+            registered.listener
+            for registered in mongo_client_registry._clients.values()
+        ]
+        for listener in (first, second):
+            listener.connection_created(None)
+            listener.connection_check_out_started(None)
+            listener.connection_checked_out(None)
+        second.connection_check_out_started(None)
+        first.connection_check_out_started(None)
+        first.connection_check_out_failed(None)
+
+        stats = mongo_pool_stats()
+
+        assert (stats.open_connections, stats.checked_out_connections) == (2, 2)
+        assert (stats.waiting_check_outs, stats.check_out_failures) == (1, 1)
+        assert stats.max_pool_size == config.mongo["max_pool_size"]
@@ -0,0 +1,136 @@
+"""Test SQLite proxy module"""
+
+import asyncio
+import threading
+import pytest
+from ctf_server.db.async_sqlite_proxy import AsyncSqliteProxy
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.sqlite_proxy import SQLITE_FLAG_INDEX_NAME, SqliteProxy
+from tests.storage_contract import StorageContract
+
+
+def _flag(task_id: str = "task") -> FlagDto:
+    return FlagDto(id=None, value="hash", challenge_id="challenge", task_id=task_id)
+
+
+class _RecordingSqliteProxy(SqliteProxy):
+    """Proxy remembering threads which read flags"""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.reading_threads: set[int] = set()
+        self.page_calls = 0
+
+    def get_flag(self, challenge_id: str, task_id: str) -> FlagDto:
+        self.reading_threads.add(threading.get_ident())
+        return super().get_flag(challenge_id, task_id)
+
+    def get_flags_page(self, page_size: int, continuation_token: str = None):
+        self.reading_threads.add(threading.get_ident())
+        self.page_calls += 1
+        return super().get_flags_page(page_size, continuation_token)
+
+
+class TestSqliteProxy(StorageContract):
+    """Tests storage contract and SQLite specific behaviour"""
+
+    @pytest.fixture(name="storage")
+    def fixture_storage(self, tmp_path) -> SqliteProxy:
+        """Proxy of new database file"""
+        proxy = SqliteProxy(str(tmp_path / "flags.sqlite3"))
+        yield proxy
+        proxy.close()
+
+    def test_database_should_run_in_wal_mode_with_unique_index(
+        self, storage: SqliteProxy
+    ) -> None:
+        """Schema and journal mode are prepared on start"""
+        connection = storage._connection()  # pylint: disable=protected-access
+
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        index = connection.execute(
+            f"PRAGMA index_info({SQLITE_FLAG_INDEX_NAME})"
+        ).fetchall()
+        assert [column[2] for column in index] == ["challenge_id", "task_id"]
+
+    def test_flags_should_survive_reopening_database(self, tmp_path) -> None:
+        """Flags are kept in database file"""
+        path = str(tmp_path / "flags.sqlite3")
+        proxy = SqliteProxy(path)
+        proxy.create_flag(_flag())
+        proxy.close()
+
+        reopened_proxy = SqliteProxy(path)
+
+        assert reopened_proxy.get_flag("challenge", "task").value == "hash"
+        reopened_proxy.close()
+
+    def test_every_thread_should_use_own_connection(self, storage: SqliteProxy) -> None:
+        """Connection is reused within thread and not shared between threads"""
+        connections = []
+
+        def connect() -> None:
+            connections.append(
+                storage._connection()
+            )  # pylint: disable=protected-access
+            connections.append(
+                storage._connection()
+            )  # pylint: disable=protected-access
+
+        thread = threading.Thread(target=connect)
+        thread.start()
+        thread.join()
+
+        assert connections[0] is connections[1]
+        assert (
+            connections[0] is not storage._connection()
+        )  # pylint: disable=protected-access
+
+    def test_delete_with_foreign_id_should_delete_nothing(
+        self, storage: SqliteProxy
+    ) -> None:
+        """Ids of other storages are not row ids"""
+        storage.create_flag(_flag())
+
+        assert not storage.delete_flag("challenge", "65f1c0ffee0000000000beef")
+        assert storage.get_flag("challenge", "task") is not None
+
+
+class TestAsyncSqliteProxy:
+    """Tests coroutines over SQLite proxy"""
+
+    def test_flags_written_in_worker_threads_should_be_read_back(
+        self, tmp_path
+    ) -> None:
+        """Writes run on own connections of worker threads"""
+        proxy = SqliteProxy(str(tmp_path / "flags.sqlite3"))
+        async_proxy = AsyncSqliteProxy(proxy)
+
+        async def create_and_read() -> list[FlagDto]:
+            await async_proxy.create_flags([_flag("a"), _flag("b")])
+            flags = await async_proxy.get_flags("challenge", ["a", "b"])
+            await async_proxy.close()
+            return flags
+
+        flags = asyncio.run(create_and_read())
+
+        assert sorted(flag.task_id for flag in flags) == ["a", "b"]
+
+    def test_reads_should_not_run_on_event_loop(self, tmp_path, monkeypatch) -> None:
+        """Every page of listing is read in worker thread by separate call"""
+        monkeypatch.setattr(AsyncSqliteProxy, "_PAGE_SIZE", 2)
+        proxy = _RecordingSqliteProxy(str(tmp_path / "flags.sqlite3"))
+        proxy.create_flags([_flag(str(index)) for index in range(5)])
+        async_proxy = AsyncSqliteProxy(proxy)
+
+        async def read_all() -> list[FlagDto]:
+            await async_proxy.get_flag("challenge", "0")
+            flags = [flag async for flag in async_proxy.iter_all_flags()]
+            await async_proxy.close()
+            return flags
+
+        flags = asyncio.run(read_all())
+
+        assert [flag.task_id for flag in flags] == ["0", "1", "2", "3", "4"]
+        assert proxy.page_calls == 3
+        assert threading.get_ident() not in proxy.reading_threads
@@ -0,0 +1,78 @@
+"""Test load test harness"""
+
+import asyncio
+import pytest
+from ctf_server.loadtest.harness import build_report, percentile, run_asgi
+from ctf_server.loadtest.scenario import (
+    FLAG_KINDS,
+    TRAFFIC_KINDS,
+    LoadScenario,
+    parse_mix,
+)
+
+
+class TestLoadScenario:
+    """Tests traffic definition"""
+
+    def test_mix_should_fill_missing_kinds_with_zero(self) -> None:
+        """Kinds left out of mix are not generated"""
+        assert parse_mix("submit=3, list=1", TRAFFIC_KINDS) == {
+            "submit": 3.0,
+            "get": 0.0,
+            "list": 1.0,
+            "create": 0.0,
+        }
+
+    @pytest.mark.parametrize("text", ["upload=1", "submit=-1", "submit=0", ""])
+    def test_invalid_mix_should_be_rejected(self, text: str) -> None:
+        """Unknown kinds and mixes without positive weight are rejected"""
+        with pytest.raises(ValueError):
+            parse_mix(text, TRAFFIC_KINDS)
+
+    def test_requests_should_be_deterministic_for_seed(self) -> None:
+        """The same seed gives the same traffic, so runs can be compared"""
+
+        def routes(seed: int) -> list[str]:
+            scenario = LoadScenario(
+                parse_mix("submit=1,get=1,list=1,create=1", TRAFFIC_KINDS),
+                parse_mix("valid=1", FLAG_KINDS),
+                seed=seed,
+            )
+            return [request.route for request in scenario.requests(50)]
+
+        assert routes(1) == routes(1)
+        assert len(set(routes(1))) == 4
+
+
+class TestLoadReport:
+    """Tests latency summary"""
+
+    def test_percentile_should_use_nearest_rank(self) -> None:
+        """Percentile is one of measured values"""
+        values = [float(value) for value in range(1, 101)]
+
+        assert percentile(values, 0.50) == 50.0
+        assert percentile(values, 0.99) == 99.0
+        assert percentile([], 0.99) == 0.0
+
+
+class TestAsgiLoadTest:
+    """Tests in-process run against in-memory storage"""
+
+    def test_submissions_should_get_expected_states(self) -> None:
+        """Valid flags are accepted and unknown tasks are rejected"""
+        scenario = LoadScenario(
+            parse_mix("submit=1", TRAFFIC_KINDS),
+            parse_mix("valid=1,unknown=1", FLAG_KINDS),
+            challenges=2,
+            tasks_per_challenge=2,
+        )
+
+        routes, duration = asyncio.run(run_asgi(scenario, 100, 8))
+        report = build_report(routes, duration, {})
+
+        submit = report["routes"]["POST /submit-flag"]
+        assert submit["requests"] == 100
+        assert submit["errors"] == 0
+        assert set(submit["statuses"]) == {"200", "400"}
+        assert submit["p50_ms"] <= submit["p99_ms"]
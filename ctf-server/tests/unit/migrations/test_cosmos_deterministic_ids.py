@@ -0,0 +1,103 @@
+"""Test Cosmos DB deterministic ids migration"""
+
+import azure.cosmos.exceptions as exceptions
+from ctf_server.db.dto.flag_documents import cosmos_flag_id
+from ctf_server.migrations.cosmos_deterministic_ids import (
+    migrate_to_deterministic_ids,
+)
+
+
+class _Container:
+    """Keeps items in memory the way Cosmos container does, task ids are
+    unique within partition when container has unique key policy"""
+
+    def __init__(self, items: list[dict], unique_task_ids: bool = True) -> None:
+        self.items = {item["id"]: item for item in items}
+        self.unique_task_ids = unique_task_ids
+
+    def read_all_items(self):
+        return [dict(item, _etag="etag") for item in self.items.values()]
+
+    def execute_item_batch(self, batch_operations: list, partition_key: str) -> list:
+        """Applies all operations or none of them"""
+        items = dict(self.items)
+        for index, (operation, args) in enumerate(batch_operations):
+            if operation == "create":
+                if args[0]["id"] in items or self._task_taken(items, args[0]):
+                    raise exceptions.CosmosBatchOperationError(
+                        error_index=index, headers={}, status_code=409
+                    )
+                assert args[0]["partitionKey"] == partition_key
+                items[args[0]["id"]] = args[0]
+            else:
+                assert items[args[0]]["partitionKey"] == partition_key
+                del items[args[0]]
+        self.items = items
+        return []
+
+    def _task_taken(self, items: dict, new_item: dict) -> bool:
+        return self.unique_task_ids and any(
+            (item["partitionKey"], item["task_id"])
+            == (new_item["partitionKey"], new_item["task_id"])
+            for item in items.values()
+        )
+
+
+def _item(item_id: str, challenge_id: str, task_id: str) -> dict:
+    return {
+        "id": item_id,
+        "partitionKey": challenge_id,
+        "challenge_id": challenge_id,
+        "task_id": task_id,
+        "value": "5aff3eee24f45a8f5a4c8e69c3a048b2",
+    }
+
+
+class TestCosmosDeterministicIdsMigration:
+    """Tests rewriting legacy timestamp ids"""
+
+    def test_legacy_items_should_get_deterministic_ids(self) -> None:
+        """Items with timestamp ids are moved to deterministic ids"""
+        new_id = cosmos_flag_id("firstchallenge", "secondtask")
+        container = _Container(
+            [
+                _item("1710000000", "firstchallenge", "firsttask"),
+                _item(new_id, "firstchallenge", "secondtask"),
+            ]
+        )
+
+        report = migrate_to_deterministic_ids(container)
+
+        assert report.migrated == ["1710000000"]
+        assert report.already_migrated == [new_id]
+        assert set(container.items) == {
+            cosmos_flag_id("firstchallenge", "firsttask"),
+            new_id,
+        }
+        assert all("_etag" not in item for item in container.items.values())
+
+    def test_dry_run_should_not_change_items(self) -> None:
+        """Dry run only reports items"""
+        container = _Container([_item("1710000000", "firstchallenge", "firsttask")])
+
+        report = migrate_to_deterministic_ids(container, dry_run=True)
+
+        assert report.migrated == ["1710000000"]
+        assert set(container.items) == {"1710000000"}
+
+    def test_duplicated_legacy_items_should_be_reported_as_conflict(self) -> None:
+        """Second item for the same challenge and task is not migrated, such
+        items exist only in containers without unique key policy"""
+        container = _Container(
+            [
+                _item("1710000000", "firstchallenge", "firsttask"),
+                _item("1710000001", "firstchallenge", "firsttask"),
+            ],
+            unique_task_ids=False,
+        )
+
+        report = migrate_to_deterministic_ids(container)
+
+        assert report.migrated == ["1710000000"]
+        assert report.conflicts == ["1710000001"]
+        assert "1710000001" in container.items
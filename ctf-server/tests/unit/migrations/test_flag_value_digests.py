@@ -0,0 +1,168 @@
+"""Test migration of flag values to raw digests"""
+
+import base64
+import azure.cosmos.exceptions as exceptions
+from pymongo import UpdateOne
+from pymongo.results import BulkWriteResult
+from ctf_server.migrations.flag_value_digests import (
+    migrate_cosmos_flag_values,
+    migrate_mongo_flag_values,
+)
+
+_HEX_VALUE = "5aff3eee24f45a8f5a4c8e69c3a048b2"
+
+
+class _Container:
+    """Keeps items in memory the way Cosmos container does"""
+
+    def __init__(self, items: list[dict], changed_ids: set[str] = frozenset()) -> None:
+        self.items = {item["id"]: item for item in items}
+        self.changed_ids = changed_ids
+
+    def read_all_items(self):
+        return [dict(item, _etag="etag") for item in self.items.values()]
+
+    def replace_item(self, item: str, body: dict, **_) -> dict:
+        if item in self.changed_ids:
+            raise exceptions.CosmosAccessConditionFailedError()
+        self.items[item] = body
+        return body
+
+
+class _Collection:
+    """Records bulk writes the way Mongo collection receives them, documents
+    with changed ids get other value after they were read"""
+
+    def __init__(self, documents: list[dict], changed_ids: set = frozenset()) -> None:
+        self.documents = {document["_id"]: document for document in documents}
+        self.changed_ids = changed_ids
+        self.operations: list[UpdateOne] = []
+
+    def find(self, query: dict, _projection: dict):
+        ids = query.get("_id", {}).get("$in", self.documents)
+        return [dict(self.documents[document_id]) for document_id in ids]
+
+    def bulk_write(self, operations: list[UpdateOne], ordered: bool):
+        assert not ordered
+        self.operations.extend(operations)
+        for document_id in self.changed_ids:
+            self.documents[document_id]["value"] = "changed"
+        matched = 0
+        for operation in operations:
+            # pylint: disable=protected-access
+            document = self.documents[operation._filter["_id"]]
+            if document["value"] == operation._filter["value"]:
+                document.update(operation._doc["$set"])
+                matched += 1
+        return BulkWriteResult({"nMatched": matched}, acknowledged=True)
+
+
+def _item(item_id: str, value: str, **fields) -> dict:
+    return {
+        "id": item_id,
+        "partitionKey": "challenge",
+        "challenge_id": "challenge",
+        "task_id": item_id,
+        "value": value,
+        **fields,
+    }
+
+
+class TestCosmosFlagValueMigration:
+    """Tests rewriting Cosmos DB items"""
+
+    def test_hex_values_should_be_replaced_with_digests(self) -> None:
+        """Hex items are rewritten, tagged and invalid ones are left untouched"""
+        digest_item = _item(
+            "2",
+            base64.b64encode(bytes.fromhex(_HEX_VALUE)).decode(),
+            digest_algorithm="md5",
+        )
+        container = _Container(
+            [_item("1", _HEX_VALUE), digest_item, _item("3", "plain_text")]
+        )
+
+        report = migrate_cosmos_flag_values(container)
+
+        assert report.migrated == ["1"]
+        assert report.already_migrated == ["2"]
+        assert report.invalid == ["3"]
+        assert container.items["1"]["value"] == digest_item["value"]
+        assert container.items["1"]["digest_algorithm"] == "md5"
+
+    def test_items_changed_meanwhile_should_be_reported(self) -> None:
+        """Replace is conditional, item updated by application is not overwritten"""
+        container = _Container([_item("1", _HEX_VALUE)], changed_ids={"1"})
+
+        report = migrate_cosmos_flag_values(container)
+
+        assert report.conflicts == ["1"]
+        assert container.items["1"]["value"] == _HEX_VALUE
+
+    def test_dry_run_should_not_change_items(self) -> None:
+        """Dry run only reports items"""
+        container = _Container([_item("1", _HEX_VALUE)])
+
+        report = migrate_cosmos_flag_values(container, dry_run=True)
+
+        assert report.migrated == ["1"]
+        assert container.items["1"]["value"] == _HEX_VALUE
+
+
+class TestMongoFlagValueMigration:
+    """Tests rewriting Mongo DB documents"""
+
+    def test_hex_values_should_be_updated_to_digests(self) -> None:
+        """Update is guarded by old value, so concurrent writes win"""
+        collection = _Collection(
+            [
+                {"_id": 1, "value": _HEX_VALUE},
+                {
+                    "_id": 2,
+                    "value": bytes.fromhex(_HEX_VALUE),
+                    "digest_algorithm": "md5",
+                },
+                {"_id": 3, "value": "plain_text"},
+            ]
+        )
+
+        report = migrate_mongo_flag_values(collection)
+
+        assert (report.migrated, report.already_migrated, report.invalid) == (
+            ["1"],
+            ["2"],
+            ["3"],
+        )
+        assert collection.operations == [
+            UpdateOne(
+                {"_id": 1, "value": _HEX_VALUE},
+                {
+                    "$set": {
+                        "value": bytes.fromhex(_HEX_VALUE),
+                        "digest_algorithm": "md5",
+                    }
+                },
+            )
+        ]
+
+    def test_documents_changed_meanwhile_should_be_reported(self) -> None:
+        """Documents not matched by guarded update are conflicts"""
+        collection = _Collection(
+            [{"_id": 1, "value": _HEX_VALUE}, {"_id": 2, "value": _HEX_VALUE}],
+            changed_ids={2},
+        )
+
+        report = migrate_mongo_flag_values(collection)
+
+        assert (report.migrated, report.conflicts) == (["1"], ["2"])
+        assert collection.documents[1]["value"] == bytes.fromhex(_HEX_VALUE)
+        assert collection.documents[2]["value"] == "changed"
+
+    def test_dry_run_should_not_write(self) -> None:
+        """Dry run only reports documents"""
+        collection = _Collection([{"_id": 1, "value": _HEX_VALUE}])
+
+        report = migrate_mongo_flag_values(collection, dry_run=True)
+
+        assert report.migrated == ["1"]
+        assert not collection.operations
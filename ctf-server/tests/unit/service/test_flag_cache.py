@@ -0,0 +1,96 @@
+"""Test flag cache module"""
+
+import time
+import pytest
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.service.flag_cache import FlagCache
+
+
+def _flag(challenge_id: str, task_id: str) -> FlagDto:
+    return FlagDto(
+        id=f"{challenge_id}-{task_id}",
+        value="5aff3eee24f45a8f5a4c8e69c3a048b2",
+        challenge_id=challenge_id,
+        task_id=task_id,
+    )
+
+
+class TestFlagCache:
+    """Tests for flag cache"""
+
+    def test_cached_flag_should_be_returned_and_counted_as_hit(self) -> None:
+        """Flag put in cache should be returned for the same key"""
+        cache = FlagCache(max_size=10, ttl_seconds=60)
+        flag = _flag("firstchallenge", "firsttask")
+
+        assert cache.get("firstchallenge", "firsttask") is None
+        cache.put(flag)
+        assert cache.get("firstchallenge", "firsttask") == flag
+
+        stats = cache.stats()
+        assert stats.hits == 1
+        assert stats.misses == 1
+        assert stats.size == 1
+
+    def test_expired_flag_should_not_be_returned(self) -> None:
+        """Flag older than ttl should be treated as miss"""
+        cache = FlagCache(max_size=10, ttl_seconds=0.01)
+        cache.put(_flag("firstchallenge", "firsttask"))
+        time.sleep(0.02)
+
+        assert cache.get("firstchallenge", "firsttask") is None
+        stats = cache.stats()
+        assert stats.expirations == 1
+        assert stats.size == 0
+
+    def test_least_recently_used_flag_should_be_evicted(self) -> None:
+        """When cache is full the least recently used entry is removed"""
+        cache = FlagCache(max_size=2, ttl_seconds=60)
+        cache.put(_flag("firstchallenge", "firsttask"))
+        cache.put(_flag("firstchallenge", "secondtask"))
+        cache.get("firstchallenge", "firsttask")
+        cache.put(_flag("secondchallenge", "firsttask"))
+
+        assert cache.get("firstchallenge", "secondtask") is None
+        assert cache.get("firstchallenge", "firsttask") is not None
+        assert cache.get("secondchallenge", "firsttask") is not None
+        assert cache.stats().evictions == 1
+
+    def test_invalidated_flag_should_not_be_returned(self) -> None:
+        """Invalidated entry should be removed from cache"""
+        cache = FlagCache(max_size=10, ttl_seconds=60)
+        cache.put(_flag("firstchallenge", "firsttask"))
+        cache.invalidate("firstchallenge", "firsttask")
+
+        assert cache.get("firstchallenge", "firsttask") is None
+        assert cache.stats().size == 0
+
+    def test_cache_with_invalid_size_should_not_be_created(self) -> None:
+        """Cache size has to be positive"""
+        with pytest.raises(ValueError):
+            FlagCache(max_size=0)
+
+    def test_flag_read_before_invalidation_should_not_be_cached(self) -> None:
+        """Read which started before update finished does not bring back old
+        value, read started after it is cached"""
+        cache = FlagCache(max_size=10, ttl_seconds=60)
+        read_generation = cache.generation()
+        cache.invalidate("firstchallenge", "firsttask")
+
+        cache.put(_flag("firstchallenge", "firsttask"), read_generation)
+        cache.put(_flag("firstchallenge", "secondtask"), read_generation)
+        assert cache.get("firstchallenge", "firsttask") is None
+        assert cache.get("firstchallenge", "secondtask") is not None
+
+        cache.put(_flag("firstchallenge", "firsttask"), cache.generation())
+        assert cache.get("firstchallenge", "firsttask") is not None
+
+    def test_flag_read_before_clear_should_not_be_cached(self) -> None:
+        """Clear invalidates every key"""
+        cache = FlagCache(max_size=10, ttl_seconds=60)
+        read_generation = cache.generation()
+        cache.clear()
+
+        cache.put(_flag("firstchallenge", "firsttask"), read_generation)
+
+        assert cache.stats().size == 0
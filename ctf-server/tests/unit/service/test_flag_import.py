@@ -0,0 +1,62 @@
+"""Test flag file parsing module"""
+
+import pytest
+from ctf_server.model.flag import Flag
+from ctf_server.model.flag_import import FlagImportResult, ImportStatus
+from ctf_server.service.flag_import import (
+    merge_import_results,
+    parse_flag_file,
+    summarize_import,
+)
+
+
+class TestFlagImport:
+    """Tests for parsing and reporting of imported flag files"""
+
+    def test_json_file_should_be_parsed_to_flags(self) -> None:
+        """Every valid JSON object is parsed to flag"""
+        rows = parse_flag_file(
+            '[{"challenge_id": "c1", "task_id": "t1", "value": "flag{a}"}]', "json"
+        )
+        assert rows == [Flag(challenge_id="c1", task_id="t1", value="flag{a}")]
+
+    def test_csv_file_should_be_parsed_with_invalid_rows_reported(self) -> None:
+        """Rows with missing columns are reported as errors"""
+        rows = parse_flag_file(
+            "challenge_id,task_id,value\nc1,t1,flag{a}\nc1,t2\n", "csv"
+        )
+        assert rows[0] == Flag(challenge_id="c1", task_id="t1", value="flag{a}")
+        assert isinstance(rows[1], FlagImportResult)
+        assert rows[1].row == 2
+        assert rows[1].task_id == "t2"
+        assert rows[1].status == ImportStatus.ERROR
+
+    @pytest.mark.parametrize(
+        "content, file_format",
+        [('{"value": "flag{a}"}', "json"), ("", "xml")],
+    )
+    def test_invalid_file_should_not_be_parsed(
+        self, content: str, file_format: str
+    ) -> None:
+        """Unsupported format or JSON which is not a list is rejected"""
+        with pytest.raises(ValueError):
+            parse_flag_file(content, file_format)
+
+    def test_report_should_keep_file_row_numbers(self) -> None:
+        """Import results are renumbered to rows of the file"""
+        invalid_row = FlagImportResult(row=1, status=ImportStatus.ERROR)
+        rows = [invalid_row, Flag(challenge_id="c1", task_id="t1", value="flag{a}")]
+        results = [
+            FlagImportResult(
+                row=1, challenge_id="c1", task_id="t1", status=ImportStatus.CREATED
+            )
+        ]
+
+        report = merge_import_results(rows, results)
+
+        assert [result.row for result in report] == [1, 2]
+        assert summarize_import(report) == {
+            "CREATED": 1,
+            "DUPLICATE": 0,
+            "ERROR": 1,
+        }
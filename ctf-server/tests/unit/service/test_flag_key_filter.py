@@ -0,0 +1,154 @@
+"""Test flag key filter module"""
+
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Iterator
+from ctf_server.core.flag_validator_strategy import PlainInputStoredHashedStrategy
+from ctf_server.db.async_memory_storage import AsyncInMemoryStorage
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.db.memory_storage import InMemoryStorage
+from ctf_server.model.flag import Flag
+from ctf_server.model.state import State
+from ctf_server.service.async_flag_service import AsyncFlagService
+from ctf_server.service.flag_key_filter import FlagKeyFilter
+from ctf_server.service.flag_service import FlagService
+
+
+class _SlowStorage(InMemoryStorage):
+    """Storage whose listing of all flags waits until it is released"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.released = threading.Event()
+
+    def iter_all_flags(self) -> Iterator[FlagDto]:
+        assert self.released.wait(5)
+        yield from super().iter_all_flags()
+
+
+class _AsyncSlowStorage(AsyncInMemoryStorage):
+    """Asynchronous storage whose listing of all flags waits until released"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.released = asyncio.Event()
+
+    async def iter_all_flags(self) -> AsyncIterator[FlagDto]:
+        await self.released.wait()
+        async for flag_dto in super().iter_all_flags():
+            yield flag_dto
+
+
+_FLAG = Flag(value="flag{test}", challenge_id="challenge", task_id="task")
+
+
+class TestFlagKeyFilter:
+    """Tests for flag key filter"""
+
+    def test_filter_should_accept_everything_before_load(self) -> None:
+        """Unknown pairs are not rejected until keys are loaded"""
+        key_filter = FlagKeyFilter(refresh_seconds=60)
+
+        assert key_filter.might_exist("firstchallenge", "firsttask")
+        assert not key_filter.stats().loaded
+
+    def test_filter_should_reject_unknown_keys_after_load(self) -> None:
+        """Only loaded or added pairs might exist"""
+        key_filter = FlagKeyFilter(refresh_seconds=60, miss_lookups_per_second=0)
+        key_filter.load([("firstchallenge", "firsttask")])
+
+        assert key_filter.might_exist("firstchallenge", "firsttask")
+        assert not key_filter.might_exist("firstchallenge", "secondtask")
+        key_filter.add("firstchallenge", "secondtask")
+        assert key_filter.might_exist("firstchallenge", "secondtask")
+        key_filter.remove("firstchallenge", "firsttask")
+        assert not key_filter.might_exist("firstchallenge", "firsttask")
+
+        stats = key_filter.stats()
+        assert stats.rejected == 2
+        assert stats.size == 1
+
+    def test_only_one_refresh_should_be_reserved(self) -> None:
+        """Concurrent callers do not load keys at the same time"""
+        key_filter = FlagKeyFilter(refresh_seconds=60)
+
+        assert key_filter.begin_refresh()
+        assert not key_filter.begin_refresh()
+        key_filter.abort_refresh()
+        assert key_filter.begin_refresh()
+        key_filter.load([])
+        assert not key_filter.begin_refresh()
+
+    def test_outdated_filter_should_be_refreshed(self) -> None:
+        """Refresh is due after refresh interval"""
+        key_filter = FlagKeyFilter(refresh_seconds=0)
+        key_filter.load([])
+
+        assert key_filter.begin_refresh()
+
+    def test_unknown_keys_should_share_budget_of_storage_lookups(self) -> None:
+        """Flag created by other worker is found in storage while budget lasts,
+        guessed pairs over the budget are rejected whatever pair they use"""
+        key_filter = FlagKeyFilter(refresh_seconds=60, miss_lookups_per_second=2)
+        key_filter.load([])
+
+        assert key_filter.might_exist("firstchallenge", "firsttask")
+        key_filter.record_lookup("firstchallenge", "firsttask", found=True)
+        assert key_filter.might_exist("secondchallenge", "guessedtask")
+        key_filter.record_lookup("secondchallenge", "guessedtask", found=False)
+        assert not key_filter.might_exist("secondchallenge", "othertask")
+        assert not key_filter.might_exist("secondchallenge", "guessedtask")
+        assert key_filter.might_exist("firstchallenge", "firsttask")
+
+        stats = key_filter.stats()
+        assert (stats.miss_checks, stats.rejected, stats.size) == (2, 2, 1)
+
+    def test_failed_refresh_should_be_counted_and_released(self) -> None:
+        """Next caller can load keys after loading failed"""
+        key_filter = FlagKeyFilter(refresh_seconds=60)
+
+        assert key_filter.begin_refresh()
+        key_filter.abort_refresh()
+
+        assert key_filter.stats().refresh_errors == 1
+        assert key_filter.begin_refresh()
+
+    def test_service_should_load_keys_outside_of_request(self) -> None:
+        """Submit which triggers refresh does not wait for keys of all flags"""
+        storage = _SlowStorage()
+        key_filter = FlagKeyFilter(refresh_seconds=60)
+        flag_service = FlagService(
+            storage, PlainInputStoredHashedStrategy(), flag_key_filter=key_filter
+        )
+
+        assert flag_service.submit_flag(_FLAG) == State.INVALID_FLAG
+        assert not key_filter.stats().loaded
+        storage.released.set()
+        for _ in range(500):
+            if key_filter.stats().loaded:
+                break
+            time.sleep(0.01)
+
+        assert key_filter.stats().loaded
+
+    def test_async_service_should_load_keys_in_background_task(self) -> None:
+        """Asynchronous submit does not wait for keys of all flags"""
+        key_filter = FlagKeyFilter(refresh_seconds=60)
+
+        async def submit_then_load() -> State:
+            storage = _AsyncSlowStorage()
+            flag_service = AsyncFlagService(
+                storage, PlainInputStoredHashedStrategy(), flag_key_filter=key_filter
+            )
+            state = await flag_service.submit_flag(_FLAG)
+            assert not key_filter.stats().loaded
+            storage.released.set()
+            for _ in range(100):
+                if key_filter.stats().loaded:
+                    break
+                await asyncio.sleep(0)
+            return state
+
+        assert asyncio.run(submit_then_load()) == State.INVALID_FLAG
+        assert key_filter.stats().loaded
@@ -0,0 +1,181 @@
+"""Test flag replica module"""
+
+import time
+from typing import Iterator
+import pytest
+from ctf_server import config
+from ctf_server.db.dto.flag_change import FLAG_DELETE, FLAG_UPSERT, FlagChangeDto
+from ctf_server.db.dto.flag_dto import FlagDto
+from ctf_server.service.flag_replica import FlagReplica, create_flag_replica
+
+
+def _flag(challenge_id: str, task_id: str, value: str = "value") -> FlagDto:
+    return FlagDto(
+        id=f"{challenge_id}-{task_id}",
+        value=value,
+        challenge_id=challenge_id,
+        task_id=task_id,
+    )
+
+
+class _ChangeStreamStorage:
+    """Storage stand-in serving fixed flags and changes"""
+
+    supports_change_stream = True
+
+    def __init__(self, flags: list[FlagDto], changes: list[FlagChangeDto]) -> None:
+        self.flags = flags
+        self.changes = changes
+        self.streams_opened = 0
+
+    def iter_all_flags(self) -> Iterator[FlagDto]:
+        """Iterate over stored flags"""
+        yield from self.flags
+
+    def open_change_stream(self) -> Iterator[FlagChangeDto]:
+        """Yield changes then heartbeats forever"""
+        self.streams_opened += 1
+        changes = list(self.changes)
+
+        def stream():
+            yield from changes
+            while True:
+                yield None
+                time.sleep(0.01)
+
+        return stream()
+
+
+class TestFlagReplica:
+    """Tests for flag replica"""
+
+    def test_loaded_flags_should_be_returned(self) -> None:
+        """Flags of tasks with single flag should be kept"""
+        replica = FlagReplica(lambda: None)
+        replica.load(
+            [
+                _flag("firstchallenge", "firsttask"),
+                _flag("firstchallenge", "secondtask"),
+                _flag("firstchallenge", "secondtask", "other"),
+            ]
+        )
+
+        assert replica.get("firstchallenge", "firsttask").value == "value"
+        assert replica.get("firstchallenge", "secondtask") is None
+        assert replica.stats().size == 1
+
+    def test_changes_should_update_and_delete_flags(self) -> None:
+        """Upsert replaces flag of the task and delete removes it by flag id"""
+        replica = FlagReplica(lambda: None)
+        replica.load([_flag("firstchallenge", "firsttask")])
+
+        replica.apply(
+            FlagChangeDto(
+                operation=FLAG_UPSERT,
+                flag_id="firstchallenge-firsttask",
+                flag=_flag("firstchallenge", "firsttask", "updated"),
+                timestamp=time.time() - 2,
+            )
+        )
+        assert replica.get("firstchallenge", "firsttask").value == "updated"
+
+        replica.apply(
+            FlagChangeDto(operation=FLAG_DELETE, flag_id="firstchallenge-firsttask")
+        )
+        assert replica.get("firstchallenge", "firsttask") is None
+
+        stats = replica.stats()
+        assert stats.changes_applied == 2
+        assert stats.lag_seconds >= 2
+        assert stats.size == 0
+
+    def test_delete_of_unknown_flag_should_be_ignored(self) -> None:
+        """Delete event for flag missing in replica changes nothing"""
+        replica = FlagReplica(lambda: None)
+        replica.load([_flag("firstchallenge", "firsttask")])
+
+        replica.apply(FlagChangeDto(operation=FLAG_DELETE, flag_id="unknown"))
+
+        assert replica.get("firstchallenge", "firsttask") is not None
+
+    def test_replica_should_not_be_ready_before_start(self) -> None:
+        """Reads go to storage until replica is loaded"""
+        replica = FlagReplica(lambda: None)
+
+        stats = replica.stats()
+        assert not replica.is_ready
+        assert stats.staleness_seconds is None
+        assert stats.lag_seconds is None
+
+    def test_started_replica_should_follow_change_stream(self) -> None:
+        """Background thread loads flags and applies streamed changes"""
+        storage = _ChangeStreamStorage(
+            [_flag("firstchallenge", "firsttask")],
+            [
+                FlagChangeDto(
+                    operation=FLAG_UPSERT,
+                    flag_id="firstchallenge-secondtask",
+                    flag=_flag("firstchallenge", "secondtask"),
+                )
+            ],
+        )
+        replica = FlagReplica(lambda: storage, resync_interval_seconds=60)
+        replica.start()
+        try:
+            assert replica.wait_ready(timeout=1)
+            deadline = time.monotonic() + 1
+            while replica.stats().changes_applied == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert replica.get("firstchallenge", "secondtask") is not None
+            assert replica.stats().staleness_seconds < 1
+        finally:
+            replica.stop(timeout=1)
+        assert not replica.is_ready
+
+    def test_replica_should_resync_after_interval(self) -> None:
+        """Flags are loaded again with new change stream after resync interval"""
+        storage = _ChangeStreamStorage([_flag("firstchallenge", "firsttask")], [])
+        replica = FlagReplica(lambda: storage, resync_interval_seconds=0)
+        replica.start()
+        try:
+            deadline = time.monotonic() + 1
+            while replica.stats().resyncs == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert replica.stats().resyncs > 0
+            assert storage.streams_opened > 1
+        finally:
+            replica.stop(timeout=1)
+
+    def test_storage_without_change_stream_should_leave_replica_not_ready(
+        self,
+    ) -> None:
+        """Replica stops when storage cannot stream changes"""
+
+        class _Storage:
+            supports_change_stream = False
+
+            def open_change_stream(self):
+                raise AssertionError("Change stream should not be opened")
+
+        replica = FlagReplica(_Storage)
+        replica.start()
+        replica.stop(timeout=1)
+
+        assert not replica.is_ready
+
+    @pytest.mark.parametrize(
+        "backend,is_created", [("memory", False), ("sqlite", False), ("mongodb", True)]
+    )
+    def test_replica_should_be_enabled_only_for_storage_with_change_stream(
+        self, monkeypatch: pytest.MonkeyPatch, backend: str, is_created: bool
+    ) -> None:
+        """Enabled replica on storage which cannot stream changes is rejected
+        at startup"""
+        monkeypatch.setitem(config.flag_replica, "enabled", True)
+        monkeypatch.setitem(config.storage, "backend", backend)
+
+        if is_created:
+            assert create_flag_replica(lambda: None) is not None
+        else:
+            with pytest.raises(ValueError):
+                create_flag_replica(lambda: None)
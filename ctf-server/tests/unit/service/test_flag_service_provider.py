@@ -0,0 +1,92 @@
+"""Test flag service provider module"""
+
+import threading
+import pytest
+from ctf_server.service.flag_service_provider import FlagServiceProvider
+
+
+class _BrokenConnectionError(Exception):
+    pass
+
+
+class _Service:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _CountingFactory:
+    def __init__(self) -> None:
+        self.created = []
+
+    def __call__(self):
+        service = _Service()
+        self.created.append(service)
+        return service
+
+
+class TestFlagServiceProvider:
+    """Tests for lazily created shared flag service"""
+
+    def test_service_should_be_created_once_for_concurrent_calls(self) -> None:
+        """Concurrent first calls should share single service instance"""
+        factory = _CountingFactory()
+        provider = FlagServiceProvider(factory)
+        services = []
+        threads = [
+            threading.Thread(target=lambda: services.append(provider.get()))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(factory.created) == 1
+        assert all(service is factory.created[0] for service in services)
+
+    def test_service_should_be_recreated_after_recoverable_error(self) -> None:
+        """Action failing with recoverable error is retried on new service"""
+        factory = _CountingFactory()
+        provider = FlagServiceProvider(
+            factory, recoverable_errors=(_BrokenConnectionError,)
+        )
+
+        def action(service):
+            if service is factory.created[0]:
+                raise _BrokenConnectionError()
+            return "done"
+
+        assert provider.run(action) == "done"
+        assert len(factory.created) == 2
+        assert provider.get() is factory.created[1]
+        assert [service.closed for service in factory.created] == [True, False]
+
+    def test_service_replaced_by_other_thread_should_not_be_closed(self) -> None:
+        """Reset with stale service keeps and does not close current one"""
+        factory = _CountingFactory()
+        provider = FlagServiceProvider(factory)
+        broken_service = provider.get()
+        provider.reset(broken_service)
+        current_service = provider.get()
+
+        provider.reset(broken_service)
+
+        assert provider.get() is current_service
+        assert not current_service.closed
+
+    def test_not_recoverable_error_should_be_raised(self) -> None:
+        """Errors other than recoverable should not drop service"""
+        factory = _CountingFactory()
+        provider = FlagServiceProvider(
+            factory, recoverable_errors=(_BrokenConnectionError,)
+        )
+
+        def action(_):
+            raise ValueError()
+
+        with pytest.raises(ValueError):
+            provider.run(action)
+        assert len(factory.created) == 1
@@ -0,0 +1,50 @@
+"""Test rank index module"""
+
+import random
+import pytest
+from ctf_server.service.rank_index import RankIndex
+
+
+class TestRankIndex:
+    """Tests ordered keys with positional lookups"""
+
+    def test_keys_should_be_kept_in_order(self) -> None:
+        """Iteration and positions follow key order, not insertion order"""
+        index = RankIndex()
+        for key in [5, 1, 4, 2, 3]:
+            index.add(key)
+
+        assert list(index) == [1, 2, 3, 4, 5]
+        assert [index.index(key) for key in [1, 3, 5]] == [0, 2, 4]
+
+    def test_removed_key_should_shift_positions(self) -> None:
+        """Keys after removed one move one position up"""
+        index = RankIndex()
+        for key in range(10):
+            index.add(key)
+
+        index.remove(3)
+
+        assert len(index) == 9
+        assert index.index(4) == 3
+        with pytest.raises(KeyError):
+            index.index(3)
+        with pytest.raises(KeyError):
+            index.remove(3)
+
+    def test_random_operations_should_match_sorted_list(self) -> None:
+        """Positions stay correct after many inserts and removals"""
+        generator = random.Random(7)
+        index = RankIndex()
+        expected: list[int] = []
+        for key in generator.sample(range(100_000), 2_000):
+            if expected and generator.random() < 0.3:
+                removed = expected.pop(generator.randrange(len(expected)))
+                index.remove(removed)
+            index.add(key)
+            expected.append(key)
+        expected.sort()
+
+        assert list(index) == expected
+        for key in generator.sample(expected, 100):
+            assert index.index(key) == expected.index(key)
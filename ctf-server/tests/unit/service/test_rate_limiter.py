@@ -0,0 +1,130 @@
+"""Test rate limiter module"""
+
+import pytest
+from ctf_server.db.rate_limit_backend import InMemoryRateLimitBackend
+from ctf_server.service.rate_limiter import (
+    RateLimitDecision,
+    RateLimiter,
+    forwarded_client_address,
+    rate_limit_key,
+    retry_after_header,
+)
+
+
+class TestInMemoryRateLimitBackend:
+    """Tests for in-memory token buckets"""
+
+    def test_burst_should_be_allowed_then_limited(self) -> None:
+        """Bucket allows capacity requests at once and then asks to wait"""
+        backend = InMemoryRateLimitBackend()
+
+        assert [backend.acquire("key", 1, 3) for _ in range(3)] == [0, 0, 0]
+        retry_after = backend.acquire("key", 1, 3)
+        assert 0 < retry_after <= 1
+
+    def test_buckets_should_be_independent(self) -> None:
+        """Each key has its own bucket"""
+        backend = InMemoryRateLimitBackend()
+
+        assert backend.acquire("first", 1, 1) == 0
+        assert backend.acquire("second", 1, 1) == 0
+        assert backend.acquire("first", 1, 1) > 0
+
+    def test_bucket_should_be_refilled(self) -> None:
+        """Tokens are added with configured rate"""
+        backend = InMemoryRateLimitBackend()
+
+        assert backend.acquire("key", 1000, 1) == 0
+        retry_after = backend.acquire("key", 1000, 1)
+        if retry_after:
+            assert retry_after <= 0.001
+
+
+class TestRateLimiter:
+    """Tests for team and global limits"""
+
+    def test_team_limit_should_not_affect_other_teams(self) -> None:
+        """Team over its limit is limited alone"""
+        limiter = RateLimiter(
+            InMemoryRateLimitBackend(),
+            team_rate=0.001,
+            team_burst=2,
+            global_rate=0,
+            global_burst=0,
+        )
+
+        assert limiter.acquire("first").allowed
+        assert limiter.acquire("first").allowed
+        decision = limiter.acquire("first")
+        assert not decision.allowed
+        assert decision.scope == "team"
+        assert limiter.acquire("second").allowed
+
+        stats = limiter.stats()
+        assert stats.allowed == 3
+        assert stats.limited_team == 1
+
+    def test_global_limit_should_be_shared_by_teams(self) -> None:
+        """Global bucket limits all teams together"""
+        limiter = RateLimiter(
+            InMemoryRateLimitBackend(),
+            team_rate=1,
+            team_burst=10,
+            global_rate=0.001,
+            global_burst=2,
+        )
+
+        assert limiter.acquire("first").allowed
+        assert limiter.acquire("second").allowed
+        decision = limiter.acquire("third")
+        assert not decision.allowed
+        assert decision.scope == "global"
+        assert limiter.stats().limited_global == 1
+
+    def test_client_address_should_be_used_without_team(self) -> None:
+        """Requests without team id are limited per client address"""
+        assert rate_limit_key("team", "10.0.0.1", trust_team_header=True) == "team"
+        assert rate_limit_key(None, "10.0.0.1", trust_team_header=True) == (
+            "client:10.0.0.1"
+        )
+        assert rate_limit_key("", None, trust_team_header=True) == "client:unknown"
+
+    def test_untrusted_team_header_should_be_ignored(self) -> None:
+        """Made up team ids do not get new buckets"""
+        assert rate_limit_key("team", "10.0.0.1", trust_team_header=False) == (
+            "client:10.0.0.1"
+        )
+
+    def test_cost_above_burst_should_wait_for_full_bucket(self) -> None:
+        """Request costing more than capacity is allowed once bucket is full"""
+        limiter = RateLimiter(
+            InMemoryRateLimitBackend(), team_rate=1, team_burst=2, global_rate=0
+        )
+
+        assert limiter.acquire("team", cost=5).allowed
+        decision = limiter.acquire("team", cost=5)
+        assert not decision.allowed
+        assert decision.retry_after_seconds == pytest.approx(2, abs=0.1)
+
+    @pytest.mark.parametrize(
+        "forwarded_for, trusted_hops, address",
+        [
+            ("6.6.6.6, 10.0.0.1:5123", 1, "10.0.0.1"),
+            ("6.6.6.6, 10.0.0.1, 192.168.0.2", 2, "10.0.0.1"),
+            ("[2001:db8::1]:443", 1, "2001:db8::1"),
+            ("2001:db8::1", 1, "2001:db8::1"),
+            ("10.0.0.1", 3, "10.0.0.1"),
+            ("6.6.6.6, 10.0.0.1", 0, "peer"),
+            (None, 1, "peer"),
+        ],
+    )
+    def test_client_address_should_come_from_trusted_proxy(
+        self, forwarded_for: str, trusted_hops: int, address: str
+    ) -> None:
+        """Entries sent by client left of trusted proxies are ignored"""
+        assert forwarded_client_address(forwarded_for, trusted_hops, "peer") == address
+
+    def test_retry_after_should_be_rounded_up(self) -> None:
+        """Retry-After is whole number of seconds, at least one"""
+        assert retry_after_header(RateLimitDecision(False, 0.2)) == "1"
+        assert retry_after_header(RateLimitDecision(False, 2.1)) == "3"
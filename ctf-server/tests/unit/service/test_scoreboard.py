@@ -0,0 +1,139 @@
+"""Test scoreboard module"""
+
+from datetime import datetime, timedelta, timezone
+from ctf_server import config
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.service.scoreboard import Scoreboard, create_scoreboard
+
+_START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def _at(minutes: int) -> datetime:
+    return _START + timedelta(minutes=minutes)
+
+
+def _event(
+    team_id: str, task_id: str, minutes: int, state: str = "VALID_FLAG"
+) -> SubmissionEventDto:
+    return SubmissionEventDto(
+        team_id=team_id,
+        challenge_id="challenge",
+        task_id=task_id,
+        state=state,
+        timestamp=_at(minutes),
+    )
+
+
+class TestScoreboard:
+    """Tests scores and ranking of teams"""
+
+    def test_teams_should_be_ranked_by_score(self) -> None:
+        """Team with more points is ranked higher"""
+        scoreboard = Scoreboard(default_points=100, challenge_points={"hard": 300})
+        scoreboard.record_solve("first", "challenge", "task", _at(1))
+        scoreboard.record_solve("second", "hard", "task", _at(2))
+
+        top = scoreboard.top(10)
+
+        assert [(entry.rank, entry.team_id, entry.score) for entry in top] == [
+            (1, "second", 300),
+            (2, "first", 100),
+        ]
+
+    def test_equal_scores_should_be_ranked_by_last_solve(self) -> None:
+        """Team which reached the score earlier is ranked higher"""
+        scoreboard = Scoreboard(default_points=100, challenge_points={})
+        scoreboard.record_solve("late", "challenge", "task", _at(5))
+        scoreboard.record_solve("early", "challenge", "task", _at(1))
+
+        assert scoreboard.team_entry("early").rank == 1
+        assert scoreboard.team_entry("late").rank == 2
+
+    def test_task_should_be_counted_once_per_team(self) -> None:
+        """Submitting the same accepted flag again does not add points"""
+        scoreboard = Scoreboard(default_points=100, challenge_points={})
+
+        assert scoreboard.record_solve("team", "challenge", "task", _at(1))
+        assert not scoreboard.record_solve("team", "challenge", "task", _at(2))
+        entry = scoreboard.team_entry("team")
+        assert (entry.score, entry.solves, entry.last_solve_at) == (100, 1, _at(1))
+
+    def test_top_should_be_limited(self) -> None:
+        """Only requested number of teams is returned"""
+        scoreboard = Scoreboard(default_points=1, challenge_points={})
+        for index in range(5):
+            scoreboard.record_solve(f"team{index}", "challenge", "task", _at(index))
+
+        assert [entry.team_id for entry in scoreboard.top(2)] == ["team0", "team1"]
+        assert scoreboard.team_entry("unknown") is None
+
+    def test_rebuild_should_count_only_accepted_flags_of_teams(self) -> None:
+        """History of rejected flags and anonymous submissions gives no points"""
+        scoreboard = Scoreboard(default_points=100, challenge_points={})
+
+        scoreboard.rebuild(
+            [
+                _event("first", "second_task", 3),
+                _event("first", "task", 1),
+                _event("second", "task", 2, state="INVALID_FLAG"),
+                _event(None, "task", 2),
+                _event("first", "task", 4),
+            ]
+        )
+
+        assert scoreboard.is_ready
+        assert [(entry.team_id, entry.score) for entry in scoreboard.top(10)] == [
+            ("first", 200)
+        ]
+        assert scoreboard.team_entry("first").last_solve_at == _at(3)
+
+    def test_solves_recorded_during_rebuild_should_be_kept(self) -> None:
+        """Rebuild replaces scores but keeps solves which are not in history yet"""
+        scoreboard = Scoreboard(default_points=100, challenge_points={})
+
+        def history():
+            yield _event("first", "task", 1)
+            scoreboard.record_solve("second", "challenge", "task", _at(2))
+
+        scoreboard.rebuild(history())
+
+        assert [entry.team_id for entry in scoreboard.top(10)] == ["first", "second"]
+
+    def test_solves_missing_from_history_should_survive_rebuild(self) -> None:
+        """Solves still buffered or dropped by submission log are merged"""
+        scoreboard = Scoreboard(default_points=100, challenge_points={})
+        scoreboard.record_solve("first", "challenge", "task", _at(1))
+        scoreboard.record_solve("second", "challenge", "task", _at(2))
+
+        scoreboard.rebuild([_event("first", "task", 1), _event("first", "other", 3)])
+
+        assert [(entry.team_id, entry.score) for entry in scoreboard.top(10)] == [
+            ("first", 200),
+            ("second", 100),
+        ]
+        assert scoreboard.stats().solves == 3
+
+    def test_scoreboard_without_submission_log_should_warn(self, caplog) -> None:
+        """Enabled scoreboard has no history when submission log is disabled"""
+        scoreboard = create_scoreboard(None)
+
+        assert scoreboard is not None
+        assert "Submission log is disabled" in caplog.text
+
+    def test_scoreboard_without_history_should_be_ready_on_start(self) -> None:
+        """Nothing has to be loaded when submission log is disabled"""
+        scoreboard = Scoreboard()
+
+        scoreboard.start()
+
+        assert scoreboard.is_ready
+
+    def test_scoreboard_with_untrusted_team_header_should_warn(
+        self, monkeypatch, caplog
+    ) -> None:
+        """Submissions are not credited without authenticating proxy"""
+        monkeypatch.setitem(config.rate_limit, "trust_team_header", False)
+
+        create_scoreboard(None)
+
+        assert "Team header is not trusted" in caplog.text
@@ -0,0 +1,97 @@
+"""Test single flight module"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from ctf_server.service.single_flight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight:
+    """Tests coalescing of lookups made by threads"""
+
+    def test_concurrent_calls_should_share_single_execution(self) -> None:
+        """Callers waiting for the same key get result of one lookup"""
+        single_flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        executions = []
+
+        def lookup():
+            executions.append(1)
+            started.set()
+            release.wait()
+            return "value"
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            leader = executor.submit(single_flight.do, "key", lookup)
+            started.wait()
+            followers = [
+                executor.submit(single_flight.do, "key", lookup) for _ in range(4)
+            ]
+            while single_flight.stats().coalesced < 4:
+                pass
+            release.set()
+            results = [leader.result()] + [future.result() for future in followers]
+
+        assert results == ["value"] * 5
+        assert len(executions) == 1
+        stats = single_flight.stats()
+        assert stats.executions == 1
+        assert stats.coalesce_ratio == pytest.approx(0.8)
+
+    def test_error_should_be_shared_and_not_cached(self) -> None:
+        """Error is raised to caller and next call runs lookup again"""
+        single_flight = SingleFlight()
+
+        def failing_lookup():
+            raise RuntimeError("storage down")
+
+        with pytest.raises(RuntimeError):
+            single_flight.do("key", failing_lookup)
+        assert single_flight.do("key", lambda: "value") == "value"
+        assert single_flight.stats().executions == 2
+
+
+class TestAsyncSingleFlight:
+    """Tests coalescing of lookups made by coroutines"""
+
+    def test_concurrent_calls_should_share_single_execution(self) -> None:
+        """Coroutines awaiting the same key get result of one lookup"""
+        single_flight = AsyncSingleFlight()
+        executions = []
+
+        async def lookup():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def run():
+            return await asyncio.gather(
+                *(single_flight.do("key", lookup) for _ in range(5)),
+                single_flight.do("other", lookup),
+            )
+
+        results = asyncio.run(run())
+
+        assert results == ["value"] * 6
+        assert len(executions) == 2
+        assert single_flight.stats().coalesced == 4
+
+    def test_cancelled_caller_should_not_cancel_lookup(self) -> None:
+        """Other callers still get result when first caller is cancelled"""
+        single_flight = AsyncSingleFlight()
+
+        async def lookup():
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def run():
+            first = asyncio.ensure_future(single_flight.do("key", lookup))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(single_flight.do("key", lookup))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == "value"
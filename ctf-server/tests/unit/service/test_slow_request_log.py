@@ -0,0 +1,102 @@
+"""Test slow request log and Server-Timing middleware"""
+
+import asyncio
+from datetime import datetime, timezone
+from ctf_server.api.server_timing_middleware import (
+    ServerTimingMiddleware,
+    server_timing_header,
+)
+from ctf_server.core.request_timing import record_span
+from ctf_server.service.slow_request_log import SlowRequest, SlowRequestLog
+
+
+def _slow_request(path: str) -> SlowRequest:
+    return SlowRequest(
+        timestamp=datetime(2024, 3, 1, tzinfo=timezone.utc),
+        method="POST",
+        path=path,
+        route=path,
+        status=200,
+        duration_ms=300.0,
+        breakdown_ms={},
+    )
+
+
+async def _app(scope, receive, send) -> None:
+    record_span("storage.get_flag", 0.002)
+    record_span("validator", 0.001)
+    record_span("validator", 0.001)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def _call(middleware: ServerTimingMiddleware) -> list[dict]:
+    scope = {"type": "http", "method": "POST", "path": "/submit-flag", "headers": []}
+    messages = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages
+
+
+class TestSlowRequestLog:
+    """Tests ring buffer of slow requests"""
+
+    def test_oldest_request_should_be_dropped_when_buffer_is_full(self) -> None:
+        """Buffer keeps the most recent requests, newest first"""
+        slow_request_log = SlowRequestLog(threshold_ms=100, size=2)
+
+        for path in ("/first", "/second", "/third"):
+            slow_request_log.capture(_slow_request(path))
+
+        assert [request.path for request in slow_request_log.recent()] == [
+            "/third",
+            "/second",
+        ]
+        assert slow_request_log.recent(1)[0].path == "/third"
+        stats = slow_request_log.stats()
+        assert (stats.captured, stats.kept) == (3, 2)
+
+    def test_threshold_should_be_inclusive(self) -> None:
+        """Request taking exactly threshold is slow"""
+        slow_request_log = SlowRequestLog(threshold_ms=100, size=2)
+
+        assert slow_request_log.is_slow(100)
+        assert not slow_request_log.is_slow(99.9)
+
+
+class TestServerTimingMiddleware:
+    """Tests header and capture of slow requests"""
+
+    def test_spans_should_be_sent_in_header_and_captured(self) -> None:
+        """Breakdown of slow request is kept with its path and status"""
+        slow_request_log = SlowRequestLog(threshold_ms=0, size=10)
+
+        messages = _call(ServerTimingMiddleware(_app, slow_request_log))
+
+        header = dict(messages[0]["headers"])[b"server-timing"].decode()
+        assert header.startswith(
+            'storage.get_flag;dur=2.000, validator;dur=2.000;desc="2 calls", total;dur='
+        )
+        captured = slow_request_log.recent()[0]
+        assert (captured.path, captured.status) == ("/submit-flag", 200)
+        assert captured.breakdown_ms == {"storage.get_flag": 2.0, "validator": 2.0}
+
+    def test_fast_request_should_not_be_captured(self) -> None:
+        """Only requests above threshold are kept"""
+        slow_request_log = SlowRequestLog(threshold_ms=60_000, size=10)
+
+        _call(ServerTimingMiddleware(_app, slow_request_log))
+
+        assert not slow_request_log.recent()
+
+    def test_header_should_list_spans_and_total_in_milliseconds(self) -> None:
+        """Call count is described only for repeated spans"""
+        assert server_timing_header({"crypto": (0.0005, 1)}, 0.01) == (
+            "crypto;dur=0.500, total;dur=10.000"
+        )
@@ -0,0 +1,179 @@
+"""Test submission log module"""
+
+import json
+import threading
+from datetime import datetime, timezone
+import pytest
+from ctf_server.db.dto.submission_event import SubmissionEventDto
+from ctf_server.db.submission_log_sink import FileSubmissionLogSink, SubmissionLogSink
+from ctf_server.service.submission_log import SubmissionLog
+
+
+class _Sink(SubmissionLogSink):
+    """Keeps written batches, fails first writes when asked to"""
+
+    def __init__(self, failures: int = 0) -> None:
+        self.batches: list[list[SubmissionEventDto]] = []
+        self.failures = failures
+        self.closed = False
+        self.written = threading.Event()
+
+    def write(self, events: list[SubmissionEventDto]) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("storage unavailable")
+        self.batches.append(events)
+        self.written.set()
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _event(task_id: str = "task") -> SubmissionEventDto:
+    return SubmissionEventDto(
+        team_id="team",
+        challenge_id="challenge",
+        task_id=task_id,
+        state="VALID_FLAG",
+        timestamp=datetime(2024, 3, 1, tzinfo=timezone.utc),
+    )
+
+
+class TestSubmissionLog:
+    """Tests for buffering, overflow policies and draining"""
+
+    def test_stop_should_write_queued_events_in_batches(self) -> None:
+        """Events still queued on shutdown are written before writer exits"""
+        sink = _Sink()
+        submission_log = SubmissionLog(
+            sink, queue_size=10, flush_size=2, flush_interval_seconds=60
+        )
+
+        for index in range(5):
+            assert submission_log.record(_event(str(index)))
+        submission_log.stop()
+
+        assert [len(batch) for batch in sink.batches] == [2, 2, 1]
+        assert sink.closed
+        assert submission_log.stats().written == 5
+
+    def test_full_batch_should_be_written_without_waiting_for_interval(self) -> None:
+        """Writer wakes up as soon as flush size events are queued"""
+        sink = _Sink()
+        submission_log = SubmissionLog(
+            sink, queue_size=10, flush_size=2, flush_interval_seconds=60
+        )
+        submission_log.start()
+
+        submission_log.record(_event())
+        submission_log.record(_event())
+
+        assert sink.written.wait(5)
+        submission_log.stop()
+
+    @pytest.mark.parametrize(
+        "overflow_policy, kept_tasks",
+        [("drop_newest", ["0", "1"]), ("drop_oldest", ["1", "2"])],
+    )
+    def test_full_queue_should_drop_events_by_policy(
+        self, overflow_policy: str, kept_tasks: list[str]
+    ) -> None:
+        """Queue never grows over its size"""
+        sink = _Sink()
+        submission_log = SubmissionLog(
+            sink,
+            queue_size=2,
+            flush_size=10,
+            flush_interval_seconds=60,
+            overflow_policy=overflow_policy,
+        )
+
+        for index in range(3):
+            submission_log.record(_event(str(index)))
+        stats = submission_log.stats()
+        submission_log.stop()
+
+        assert (stats.queued, stats.dropped) == (2, 1)
+        assert [event.task_id for event in sink.batches[0]] == kept_tasks
+
+    def test_blocking_policy_should_drop_after_timeout(self) -> None:
+        """Caller waits for free space only up to block timeout"""
+        submission_log = SubmissionLog(
+            _Sink(),
+            queue_size=1,
+            flush_size=10,
+            flush_interval_seconds=60,
+            overflow_policy="block",
+            block_timeout_seconds=0.01,
+        )
+
+        assert submission_log.is_blocking
+        assert submission_log.record(_event())
+        assert not submission_log.record(_event())
+
+    def test_failed_batch_should_be_retried(self) -> None:
+        """Batch is kept after failed write and written by the next attempt"""
+        sink = _Sink(failures=1)
+        submission_log = SubmissionLog(
+            sink, queue_size=10, flush_size=1, flush_interval_seconds=0.01
+        )
+        submission_log.start()
+
+        submission_log.record(_event())
+
+        assert sink.written.wait(5)
+        submission_log.stop()
+        stats = submission_log.stats()
+        assert (stats.written, stats.write_errors, stats.lost) == (1, 1, 0)
+
+    def test_failed_batch_on_shutdown_should_be_lost(self) -> None:
+        """Draining does not wait for storage which keeps failing"""
+        sink = _Sink(failures=10)
+        submission_log = SubmissionLog(
+            sink, queue_size=10, flush_size=10, flush_interval_seconds=60
+        )
+
+        submission_log.record(_event())
+        submission_log.stop()
+
+        assert submission_log.stats().lost == 1
+        assert not submission_log.record(_event())
+
+    def test_unknown_overflow_policy_should_be_rejected(self) -> None:
+        """Misconfigured policy fails on startup, not on first full queue"""
+        with pytest.raises(ValueError):
+            SubmissionLog(_Sink(), overflow_policy="drop_all")
+
+
+class TestFileSubmissionLogSink:
+    """Tests for local JSON lines sink"""
+
+    def test_events_should_be_appended_as_json_lines(self, tmp_path) -> None:
+        """Every event is one line, file is appended on each start"""
+        file_path = tmp_path / "submissions.jsonl"
+        for _ in range(2):
+            sink = FileSubmissionLogSink(str(file_path))
+            sink.write([_event()])
+            sink.close()
+
+        lines = [json.loads(line) for line in file_path.read_text().splitlines()]
+        assert len(lines) == 2
+        assert lines[0]["team_id"] == "team"
+        assert lines[0]["timestamp"] == "2024-03-01T00:00:00+00:00"
+
+    def test_events_should_be_read_back_by_state(self, tmp_path) -> None:
+        """History read by scoreboard rebuild contains only requested state"""
+        sink = FileSubmissionLogSink(str(tmp_path / "submissions.jsonl"))
+        rejected = SubmissionEventDto(
+            team_id=None,
+            challenge_id="challenge",
+            task_id="task",
+            state="INVALID_FLAG",
+            timestamp=datetime(2024, 3, 1, tzinfo=timezone.utc),
+        )
+        accepted = _event()
+        sink.write([accepted, rejected])
+
+        assert list(sink.iter_events("VALID_FLAG")) == [accepted]
+        assert [event.id for event in sink.iter_events()] == [accepted.id, rejected.id]
+        sink.close()